@@ -3,12 +3,24 @@ import logging
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.fsm.storage.base import BaseStorage
 from dotenv import load_dotenv
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from config import load_config
-from database import init_db, import_users_from_excel
+from database import init_db, import_users_from_excel, configure_db, close_db, checkpoint_wal
 from handlers import auth, start, profile, tickets, admin, admin_tickets, equipment, workplaces, faq
+from utils.assignment import AssignmentEngine, make_policy
+from utils.auth_checks import AuthMiddleware
+from utils.broadcast import Broadcaster
+from utils.fsm_storage import SQLiteStorage
+from utils.jobstore import SQLiteJobStore
+from utils.mailings import JOBSTORE_ALIAS, MailingScheduler
+from utils.notifications import NotificationOutbox
+from utils.routing import AdminRouting
+from utils.sla import SlaEngine
+from utils.ticket_cards import TicketCardEditor
+from utils.webhook import run_webhook
 
 # --- Logging setup ---
 logging.basicConfig(
@@ -19,6 +31,24 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def create_dispatcher(storage: BaseStorage) -> Dispatcher:
+    """Диспетчер со всеми роутерами и middleware (используется и бенчмарками)."""
+    dp = Dispatcher(storage=storage)
+    # Роль пользователя определяется один раз на апдейт (из кэша) и передаётся в обработчики как user_role
+    dp.update.outer_middleware(AuthMiddleware())
+
+    dp.include_router(start.router)
+    dp.include_router(auth.router)
+    dp.include_router(profile.router)
+    dp.include_router(tickets.router)
+    dp.include_router(admin.router)
+    dp.include_router(admin_tickets.router)
+    dp.include_router(equipment.router)
+    dp.include_router(workplaces.router)
+    dp.include_router(faq.router)
+    return dp
+
+
 async def main():
     load_dotenv()
     config = load_config()
@@ -26,17 +56,43 @@ async def main():
     if not config.tg_bot.token:
         logger.critical("Не найден BOT_TOKEN в .env.")
         return
+    if config.webhook.mode == 'webhook' and not config.webhook.url:
+        logger.critical("BOT_MODE=webhook, но не задан WEBHOOK_URL.")
+        return
+
+    configure_db(config.db)
 
     try:
         await init_db()
-        # Однократно переносим пользователей из Excel в справочник БД, дальше работаем только с SQLite
+        # Синхронизируем справочник пользователей с Excel; если файл не менялся, запуск занимает миллисекунды
         await asyncio.to_thread(import_users_from_excel)
         logger.info("DB: успешно инициализирована и миграции применены.")
     except Exception as e:
         logger.critical(f"DB: ошибка инициализации/миграции: {e}")
         return
 
-    scheduler = AsyncIOScheduler()
+    # Служебные задачи (WAL, SLA, очистка FSM) живут в памяти; плановые рассылки — в БД и переживают рестарт
+    scheduler = AsyncIOScheduler(jobstores={JOBSTORE_ALIAS: SQLiteJobStore()})
+    scheduler.add_job(
+        checkpoint_wal,
+        trigger='interval',
+        minutes=config.db.wal_checkpoint_minutes,
+        id='db_wal_checkpoint',
+        replace_existing=True,
+    )
+    # Состояния диалогов (создание заявки, авторизация, учёт оборудования) переживают рестарт
+    storage = SQLiteStorage(
+        cache_size=config.db.fsm_cache_size,
+        state_ttl=config.db.fsm_state_ttl_hours * 3600,
+        flush_interval=config.db.fsm_flush_interval_ms / 1000,
+    )
+    scheduler.add_job(
+        storage.purge_expired,
+        trigger='interval',
+        hours=1,
+        id='fsm_purge_expired',
+        replace_existing=True,
+    )
     scheduler.start()
     logger.info("Scheduler запущен.")
 
@@ -44,22 +100,72 @@ async def main():
         token=config.tg_bot.token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
-    dp = Dispatcher()
+    dp = create_dispatcher(storage)
 
-    # Handlers
-    dp.include_router(start.router)
-    dp.include_router(auth.router)
-    dp.include_router(profile.router)
-    dp.include_router(tickets.router)
-    dp.include_router(admin.router)
-    dp.include_router(admin_tickets.router)
-    dp.include_router(equipment.router)
-    dp.include_router(workplaces.router)
-    dp.include_router(faq.router)
+    # Рассылки: общие лимиты Telegram на весь бот; прерванные рестартом рассылки продолжаются
+    broadcaster = Broadcaster(bot)
+    await broadcaster.resume_unfinished()
+    mailings = MailingScheduler(scheduler, broadcaster)
+    await mailings.start()
+
+    # Уведомления по заявкам пишутся в outbox вместе с заявкой и доставляются в тех же лимитах, что и рассылки;
+    # карточки новых заявок у администраторов обновляются на месте при смене исполнителя и статуса
+    cards = TicketCardEditor(bot, bucket=broadcaster.bucket, chat_limiter=broadcaster.chat_limiter)
+    cards.start()
+    outbox = NotificationOutbox(bot, bucket=broadcaster.bucket, chat_limiter=broadcaster.chat_limiter, cards=cards)
+    outbox.start()
+    scheduler.add_job(
+        outbox.purge_sent,
+        trigger='interval',
+        hours=24,
+        id='outbox_purge_sent',
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        cards.purge_old,
+        trigger='interval',
+        hours=24,
+        id='ticket_cards_purge',
+        replace_existing=True,
+    )
+
+    # SLA: сроки незакрытых заявок восстанавливаются из БД, планировщик будится только к ближайшему
+    sla = SlaEngine(scheduler, outbox)
+    await sla.start()
+
+    # Автоназначение: нагрузка администраторов строится из БД и дальше ведётся в памяти;
+    # периодическая пересборка подбирает изменения в обход обработчиков (новые администраторы, правки в БД)
+    assigner = AssignmentEngine(make_policy(config.assignment.policy, config.assignment.floor_penalty))
+    await assigner.start()
+    scheduler.add_job(
+        assigner.rebuild,
+        trigger='interval',
+        minutes=config.assignment.rebuild_minutes,
+        id='assignment_rebuild',
+        replace_existing=True,
+    )
+
+    # Маршруты «администратор — этажи/категории» в памяти: уведомление о заявке получают только ответственные
+    routing = AdminRouting()
+    await routing.start()
 
+    workflow_data = dict(scheduler=scheduler, broadcaster=broadcaster, sla=sla, mailings=mailings, outbox=outbox,
+                         cards=cards, assigner=assigner, routing=routing)
+    allowed_updates = dp.resolve_used_update_types()
     logger.info("IT-ecosystem bot запущен и готов принимать обновления.")
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types(), scheduler=scheduler)
+    if config.webhook.mode == 'webhook':
+        # Под пиковой нагрузкой вебхук не ждёт циклов getUpdates; остановка дорабатывает принятые обновления
+        await run_webhook(dp, bot, config.webhook, allowed_updates=allowed_updates, **workflow_data)
+    else:
+        # Снимаем вебхук, оставшийся от запуска в режиме webhook: иначе getUpdates вернёт Conflict
+        await bot.delete_webhook()
+        await dp.start_polling(bot, allowed_updates=allowed_updates, **workflow_data)
     scheduler.shutdown()
+    await broadcaster.stop()
+    await outbox.stop()
+    await cards.stop()
+    await storage.close()
+    await close_db()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+# Файл: it_ecosystem_bot/benchmarks/admin_stats.py
+"""
+Сверка материализованной статистики администраторов (admin_stats,
+admin_close_time_buckets) с пересчётом по таблице tickets.
+
+1. Часть закрытых заявок синтетической БД превращается в «закрытые через
+   меню статусов» старой версией (без closed_at, закрытие только в истории),
+   статистика строится миграциями 10 и 17 — как при обновлении рабочей БД.
+2. Администраторы одновременно гоняют заявки по всем путям: меню статусов
+   (в том числе закрытие, переход между закрытыми статусами и повторное
+   открытие), «Закрыть» с запросом оценки и оценка автора.
+После каждого шага число закрытий, сумма времени закрытия и гистограмма для
+p90 — за всё время и по дням — должны совпасть с пересчётом по заявкам.
+Оценки не сверяются: оценки до миграции 10 есть только в суммах sys_admins.
+
+    python -m benchmarks.admin_stats --tickets 20000 --operations 5000
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+import database
+from benchmarks.synthetic import USER_ID_BASE, create_schema, populate
+from config import DbConfig
+
+STATUSES = ['open', 'in_progress', 'on_hold', 'await_rating', 'closed']
+
+
+def _legacy_closes(path: str, share: float, seed: int) -> int:
+    """Закрытия меню статусов до исправления: closed_at не ставился, переход есть только в истории."""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+    rows = conn.execute("""
+        SELECT id, admin_id, status, closed_at FROM tickets
+        WHERE status IN ('await_rating', 'closed') AND admin_id IS NOT NULL
+    """).fetchall()
+    legacy = [row for row in rows if rnd.random() < share]
+    conn.execute("BEGIN")
+    conn.executemany("""
+        INSERT INTO ticket_history (ticket_id, old_status, new_status, changed_by, changed_at, comment)
+        VALUES (?, 'in_progress', ?, ?, ?, NULL)
+    """, [(ticket_id, status, admin_id, closed_at) for ticket_id, admin_id, status, closed_at in legacy])
+    conn.executemany("UPDATE tickets SET closed_at = NULL WHERE id = ?", [(row[0],) for row in legacy])
+    conn.execute("COMMIT")
+    conn.close()
+    return len(legacy)
+
+
+def _migrate_stats(path: str):
+    """Статистика с нуля миграциями 10 и 17 (populate пишет заявки мимо них)."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN")
+    conn.execute("DELETE FROM admin_stats")
+    conn.execute("DELETE FROM admin_close_time_buckets")
+    database._create_admin_stats(conn)
+    database._backfill_status_closes(conn)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def _compare(path: str) -> tuple:
+    """(заявок, расхождений) между таблицами статистики и пересчётом по заявкам."""
+    conn = sqlite3.connect(path)
+    counts, sums, buckets = defaultdict(int), defaultdict(float), defaultdict(int)
+    closed = conn.execute("""
+        SELECT admin_id, date(closed_at), (julianday(closed_at) - julianday(created_at)) * 86400
+        FROM tickets
+        WHERE admin_id IS NOT NULL AND closed_at IS NOT NULL AND status IN ('await_rating', 'closed')
+    """).fetchall()
+    for admin_id, day, seconds in closed:
+        bucket = bisect_left(database.CLOSE_TIME_BUCKETS, max(seconds or 0, 0))
+        for period in (database.ADMIN_STATS_ALL, day):
+            counts[admin_id, period] += 1
+            sums[admin_id, period] += seconds or 0
+            buckets[admin_id, period, bucket] += 1
+
+    mismatches = 0
+    stored = {(admin_id, period): (count, total) for admin_id, period, count, total in conn.execute(
+        "SELECT admin_id, period, closed_count, close_seconds_sum FROM admin_stats")}
+    for key in set(stored) | set(counts):
+        count, total = stored.get(key, (0, 0.0))
+        if count != counts.get(key, 0) or not math.isclose(total, sums.get(key, 0.0), rel_tol=1e-9, abs_tol=1.0):
+            mismatches += 1
+    stored_buckets = {(admin_id, period, bucket): count for admin_id, period, bucket, count in conn.execute(
+        "SELECT admin_id, period, bucket, count FROM admin_close_time_buckets")}
+    for key in set(stored_buckets) | set(buckets):
+        if stored_buckets.get(key, 0) != buckets.get(key, 0):
+            mismatches += 1
+    # Закрытая заявка без closed_at не попала бы ни в статистику, ни в пересчёт выше
+    mismatches += conn.execute("""
+        SELECT COUNT(*) FROM tickets
+        WHERE admin_id IS NOT NULL AND closed_at IS NULL AND status IN ('await_rating', 'closed')
+    """).fetchone()[0]
+    conn.close()
+    return len(closed), mismatches
+
+
+async def _workload(path: str, admin_ids: list, operations: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    ticket_ids = [row[0] for row in conn.execute("SELECT id FROM tickets ORDER BY id DESC LIMIT 2000")]
+    conn.close()
+
+    done = defaultdict(int)
+
+    async def operation(ticket_id: int, admin_id: int):
+        kind = rnd.choice(('status', 'status', 'close', 'rate'))
+        if kind == 'status':
+            status = rnd.choice(STATUSES)
+            if await database.update_ticket_status(ticket_id, status, admin_id, None):
+                done[status] += 1
+        elif kind == 'close':
+            if await database.close_ticket_for_rating(ticket_id, admin_id) is not None:
+                done['close_for_rating'] += 1
+        elif await database.finalize_ticket_rating(ticket_id, rnd.randint(1, 5)) is not None:
+            done['rating'] += 1
+
+    started = time.perf_counter()
+    # Пачки одновременных операций: несколько администраторов нередко трогают одну заявку
+    for _ in range(operations // 100):
+        await asyncio.gather(*(operation(rnd.choice(ticket_ids), rnd.choice(admin_ids)) for _ in range(100)))
+    elapsed = time.perf_counter() - started
+    return {'elapsed': elapsed, 'done': dict(done), 'operations': operations // 100 * 100}
+
+
+async def _run(path: str, args) -> int:
+    database.configure_db(DbConfig(path=path))
+    admin_ids = [USER_ID_BASE + i for i in range(args.admins)]
+    ok = True
+
+    legacy = _legacy_closes(path, args.legacy_share, args.seed)
+    _migrate_stats(path)
+    closed, mismatches = _compare(path)
+    print(f"после миграций: закрытых заявок {closed} (из них закрыты меню статусов без closed_at: {legacy}), "
+          f"расхождений {mismatches}")
+    ok = ok and mismatches == 0 and legacy > 0
+
+    result = await _workload(path, admin_ids, args.operations, args.seed)
+    closed, mismatches = _compare(path)
+    done = ", ".join(f"{name} {count}" for name, count in sorted(result['done'].items()))
+    print(f"после {result['operations']} операций за {result['elapsed']:.2f} c ({done}): "
+          f"закрытых заявок {closed}, расхождений {mismatches}")
+    ok = ok and mismatches == 0 and result['done'].get('closed', 0) > 0
+
+    started = time.perf_counter()
+    for admin_id in admin_ids:
+        await database.get_admin_stats(admin_id)
+    stats_ms = (time.perf_counter() - started) / len(admin_ids) * 1000
+    print(f"get_admin_stats: {stats_ms:.2f} мс на администратора")
+
+    await database.close_db()
+    print("OK" if ok else "ОШИБКА")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--admins", type=int, default=10)
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--legacy-share", type=float, default=0.2,
+                        help="Доля закрытых заявок, закрытых меню статусов до исправления")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "admin_stats.db")
+        create_schema(path)
+        populate(path, tickets=args.tickets, users=1000, admins=args.admins, equipment=100)
+        return asyncio.run(_run(path, args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
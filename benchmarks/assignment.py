@@ -0,0 +1,267 @@
+# Файл: it_ecosystem_bot/benchmarks/assignment.py
+"""
+Симуляция автоназначения заявок (utils/assignment.py) на истории заявок.
+
+История — моменты создания, приоритеты, этажи и длительность работ: либо из
+БД (--db, закрытые заявки; длительность — от создания до закрытия), либо
+синтетическая (пуассоновский поток с загрузкой --utilization). Она
+проигрывается в модельном времени (событийная симуляция, без ожиданий) для
+каждого правила:
+
+    manual         — заявка в общей очереди; свободный администратор замечает
+                     её в среднем через --reaction минут (уведомление пришло всем,
+                     никто не отвечает за него лично), закончив работу — берёт
+                     следующую сразу;
+    least_loaded,
+    floor_affinity — исполнитель выбирается при создании через AssignmentEngine
+                     (тот же код, что в боте, без БД); свободный исполнитель
+                     реагирует на личное назначение в среднем через --notice минут.
+                     Назначенная заявка остаётся открытой: администратор без
+                     своих заявок (или при более срочной чужой) берёт не начатую чужую.
+
+Если этаж заявки не тот, где администратор был в последний раз, к работе
+добавляется --walk минут. Ожидание заявки — от создания до начала работы.
+Дополнительно замеряется стоимость выбора исполнителя на большой нагрузке.
+
+    python -m benchmarks.assignment --tickets 20000 --admins 12
+    python -m benchmarks.assignment --db it_ecosystem.db
+"""
+import argparse
+import heapq
+import math
+import random
+import sqlite3
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+from utils.assignment import AssignmentEngine, make_policy
+
+PRIORITIES = ('high', 'medium', 'low')
+PRIORITY_MIX = (0.2, 0.5, 0.3)
+PRIORITY_RANK = {'high': 0, 'medium': 1, 'low': 2}
+
+
+class Ticket(NamedTuple):
+    id: int
+    created: float  # минуты от начала истории
+    priority: str
+    floor: Optional[int]
+    work: float  # минуты работы без учёта перехода между этажами
+
+
+def synthetic_history(tickets: int, admins: int, utilization: float, floors: int, work: float,
+                      seed: int) -> List[Ticket]:
+    rnd = random.Random(seed)
+    # Средняя длительность логнормального распределения с sigma=0.8 равна work
+    mu = _lognormal_mu(work, 0.8)
+    rate = utilization * admins / work
+    history, now = [], 0.0
+    for i in range(tickets):
+        now += rnd.expovariate(rate)
+        history.append(Ticket(i + 1, now, rnd.choices(PRIORITIES, PRIORITY_MIX)[0], rnd.randint(1, floors),
+                              rnd.lognormvariate(mu, 0.8)))
+    return history
+
+
+def db_history(path: str, limit: int) -> List[Ticket]:
+    conn = sqlite3.connect(path)
+    rows = conn.execute("""
+        SELECT id, created_at, priority, floor, closed_at FROM tickets
+        WHERE closed_at IS NOT NULL ORDER BY created_at, id LIMIT ?
+    """, (limit,)).fetchall()
+    conn.close()
+    if not rows:
+        return []
+
+    def minutes(value: str) -> float:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp() / 60
+
+    start = minutes(rows[0][1])
+    history = []
+    for ticket_id, created_at, priority, floor, closed_at in rows:
+        created = minutes(created_at) - start
+        # Закрытие в истории включает ожидание; работа ограничена разумными пределами
+        work = min(max(minutes(closed_at) - minutes(created_at), 5.0), 480.0)
+        history.append(Ticket(ticket_id, created, priority or 'medium', floor, work))
+    return history
+
+
+def _lognormal_mu(mean: float, sigma: float) -> float:
+    return math.log(mean) - sigma ** 2 / 2
+
+
+class Admin:
+    def __init__(self, admin_id: int, floor: Optional[int]):
+        self.id = admin_id
+        self.floor = floor
+        self.busy = False
+        self.noticing = False  # уже запланирована реакция на личное назначение
+        self.queue: List[tuple] = []  # личная очередь: (ранг приоритета, создание, заявка)
+        self.done = 0
+
+
+def simulate(history: List[Ticket], admins: int, policy_name: str, args) -> Dict[str, float]:
+    rnd = random.Random(args.seed)
+    engine = AssignmentEngine(make_policy(policy_name, args.floor_penalty))
+    staff = {i: Admin(i, rnd.randint(1, args.floors)) for i in range(1, admins + 1)}
+    engine.load(staff, [])
+
+    events: List[tuple] = []
+    seq = 0
+
+    def schedule(at: float, kind: str, payload):
+        nonlocal seq
+        seq += 1
+        heapq.heappush(events, (at, seq, kind, payload))
+
+    shared: List[tuple] = []  # общая очередь заявок без исполнителя
+    waits: Dict[int, float] = {}
+    walks = 0
+
+    def start(admin: Admin, ticket: Ticket, now: float):
+        nonlocal walks
+        admin.busy = True
+        waits[ticket.id] = now - ticket.created
+        duration = ticket.work
+        if ticket.floor is not None and ticket.floor != admin.floor:
+            duration += args.walk
+            walks += 1
+            admin.floor = ticket.floor
+        engine.ticket_changed(ticket.id, admin.id, 'in_progress', ticket.priority, ticket.floor)
+        schedule(now + duration, 'finish', (admin, ticket))
+
+    def next_from_queues(admin: Admin, now: float) -> bool:
+        # Своя заявка, если нигде нет более срочной; иначе (и когда свои кончились) — самая срочная
+        # открытая: из общей очереди или ещё не начатая чужая (автоназначенная заявка остаётся 'open')
+        queues = [q for q in [shared, *(other.queue for other in staff.values())] if q]
+        if not queues:
+            return False
+        queue = min(queues, key=lambda q: q[0][:2])
+        if admin.queue and admin.queue[0][0] <= queue[0][0]:
+            queue = admin.queue
+        start(admin, heapq.heappop(queue)[2], now)
+        return True
+
+    for ticket in history:
+        schedule(ticket.created, 'arrival', ticket)
+    for admin in staff.values():
+        schedule(rnd.expovariate(1 / args.reaction), 'check', admin)
+
+    while events:
+        now, _, kind, payload = heapq.heappop(events)
+        if kind == 'arrival':
+            ticket = payload
+            entry = (PRIORITY_RANK.get(ticket.priority, 1), ticket.created, ticket)
+            assignment = engine.pick(ticket.priority, ticket.floor)
+            if assignment is None:
+                heapq.heappush(shared, entry)
+                continue
+            engine.bind(assignment, ticket.id)
+            admin = staff[assignment.admin_id]
+            heapq.heappush(admin.queue, entry)
+            if not admin.busy and not admin.noticing:
+                admin.noticing = True
+                schedule(now + rnd.expovariate(1 / args.notice), 'notice', admin)
+        elif kind == 'notice':
+            admin = payload
+            admin.noticing = False
+            if not admin.busy:
+                next_from_queues(admin, now)
+        elif kind == 'check':
+            # Свободный администратор время от времени заглядывает в общую очередь
+            admin = payload
+            if len(waits) == len(history):
+                continue
+            if not admin.busy and not next_from_queues(admin, now):
+                schedule(now + rnd.expovariate(1 / args.reaction), 'check', admin)
+        elif kind == 'finish':
+            admin, ticket = payload
+            admin.busy = False
+            admin.done += 1
+            engine.ticket_changed(ticket.id, admin.id, 'closed')
+            if not next_from_queues(admin, now):
+                schedule(now + rnd.expovariate(1 / args.reaction), 'check', admin)
+
+    values = sorted(waits.values())
+    high = sorted(waits[t.id] for t in history if t.priority == 'high')
+    done = [admin.done for admin in staff.values()]
+    return {
+        'p50': _percentile(values, 0.5), 'p95': _percentile(values, 0.95), 'mean': sum(values) / len(values),
+        'high_p95': _percentile(high, 0.95) if high else 0.0, 'walks': walks / len(history),
+        'spread': max(done) / max(1, min(done)),
+    }
+
+
+def _percentile(values: list, p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def pick_cost(admins: int, open_tickets: int, operations: int) -> float:
+    """Микросекунд на заявку: выбор исполнителя, привязка и снятие при закрытии."""
+    rnd = random.Random(1)
+    engine = AssignmentEngine(make_policy('floor_affinity'))
+    engine.load(range(admins), [{'id': i, 'admin_id': rnd.randrange(admins), 'priority': rnd.choice(PRIORITIES),
+                                 'floor': rnd.randint(1, 10)} for i in range(open_tickets)])
+    open_ids: Deque[tuple] = deque()
+    started = time.perf_counter()
+    for i in range(operations):
+        ticket_id = open_tickets + i
+        assignment = engine.pick(rnd.choice(PRIORITIES), rnd.randint(1, 10))
+        engine.bind(assignment, ticket_id)
+        open_ids.append((ticket_id, assignment.admin_id))
+        if len(open_ids) > 1000:
+            closed_id, admin_id = open_ids.popleft()
+            engine.ticket_changed(closed_id, admin_id, 'closed')
+    return (time.perf_counter() - started) / operations * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="БД с историей заявок (по умолчанию история синтетическая)")
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--admins", type=int, default=8)
+    parser.add_argument("--utilization", type=float, default=0.7, help="Загрузка администраторов работой")
+    parser.add_argument("--floors", type=int, default=6)
+    parser.add_argument("--work", type=float, default=30.0, help="Средняя длительность работы, мин")
+    parser.add_argument("--walk", type=float, default=10.0, help="Переход на другой этаж, мин")
+    parser.add_argument("--reaction", type=float, default=15.0,
+                        help="Средняя задержка, с которой свободный администратор замечает заявку в общей очереди, мин")
+    parser.add_argument("--notice", type=float, default=3.0,
+                        help="Средняя задержка реакции на личное назначение, мин")
+    parser.add_argument("--floor-penalty", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.db:
+        history = db_history(args.db, args.tickets)
+        if not history:
+            print(f"В {args.db} нет закрытых заявок")
+            return 1
+        source = f"{args.db}: {len(history)} закрытых заявок"
+    else:
+        history = synthetic_history(args.tickets, args.admins, args.utilization, args.floors, args.work, args.seed)
+        source = f"синтетическая история: {len(history)} заявок, загрузка {args.utilization:.0%}"
+    print(f"{source}, администраторов: {args.admins}")
+
+    results = {}
+    for policy_name in ('manual', 'least_loaded', 'floor_affinity'):
+        result = results[policy_name] = simulate(history, args.admins, policy_name, args)
+        print(f"{policy_name:>15}: ожидание p50 {result['p50']:6.1f} мин, p95 {result['p95']:6.1f} мин, "
+              f"среднее {result['mean']:6.1f} мин, p95 high {result['high_p95']:6.1f} мин; "
+              f"переходов между этажами {result['walks']:.0%}, разброс числа заявок {result['spread']:.2f}")
+
+    cost = pick_cost(200, 100_000, 100_000)
+    print(f"выбор исполнителя: {cost:.1f} мкс на заявку (200 администраторов, 100000 незакрытых заявок)")
+
+    manual = results['manual']
+    ok = all(results[name]['mean'] < manual['mean'] and results[name]['p95'] < manual['p95']
+             for name in ('least_loaded', 'floor_affinity'))
+    print("OK" if ok else "ОШИБКА")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
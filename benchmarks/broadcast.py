@@ -0,0 +1,120 @@
+# Файл: it_ecosystem_bot/benchmarks/broadcast.py
+"""
+Прогон движка рассылок (utils/broadcast.py) на фейковом боте.
+
+Фейковый бот отвечает с задержкой, часть получателей «заблокировала бота»,
+изредка приходит RetryAfter. Рассылка останавливается на середине (как при
+рестарте) и возобновляется новым экземпляром Broadcaster. Проверяется, что
+каждый получатель обработан, повторные отправки возможны только для сообщений
+в полёте, а глобальный лимит скорости соблюдается.
+
+    python -m benchmarks.broadcast --users 5000 --rate 25     # реальный лимит Telegram, ~3.5 мин
+    python -m benchmarks.broadcast --users 5000 --rate 2000   # накладные расходы движка
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+import database
+from benchmarks.synthetic import create_schema
+from config import DbConfig
+from utils.broadcast import Broadcaster
+
+
+class FakeBot:
+    def __init__(self, latency: float, retry_after_rate: float, seed: int = 1):
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.rnd = random.Random(seed)
+        self.sent = Counter()
+        self.send_times = []
+        self.retry_afters = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        method = SendMessage(chat_id=chat_id, text=text)
+        self.send_times.append(time.monotonic())
+        await asyncio.sleep(self.latency)
+        if chat_id % 50 == 0:
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        if self.rnd.random() < self.retry_after_rate:
+            self.retry_afters += 1
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=1)
+        self.sent[chat_id] += 1
+
+    async def edit_message_text(self, *args, **kwargs):
+        return True
+
+
+def _max_per_second(times: list) -> int:
+    times = sorted(times)
+    best, lo = 0, 0
+    for hi, t in enumerate(times):
+        while t - times[lo] >= 1.0:
+            lo += 1
+        best = max(best, hi - lo + 1)
+    return best
+
+
+async def _run(path: str, users: int, rate: float, latency: float, stop_after: float) -> int:
+    database.configure_db(DbConfig(path=path))
+    bot = FakeBot(latency, retry_after_rate=0.001)
+
+    first = Broadcaster(bot, rate=rate, progress_interval=0.5)
+    started = time.monotonic()
+    broadcast_id = await first.start('text', 'Проверка рассылки', progress_chat_id=1, progress_message_id=1)
+    await asyncio.sleep(stop_after)
+    await first.stop()
+    interrupted = dict((await database.get_broadcast(broadcast_id))['counts'])
+
+    second = Broadcaster(bot, rate=rate, progress_interval=0.5)
+    resumed = await second.resume_unfinished()
+    await second.wait(broadcast_id)
+    elapsed = time.monotonic() - started
+
+    final = await database.get_broadcast(broadcast_id)
+    await database.close_db()
+
+    duplicates = sum(1 for count in bot.sent.values() if count > 1)
+    peak = _max_per_second(bot.send_times)
+    print(f"получателей: {final['total']}, после остановки: {interrupted}, возобновлены: {resumed}")
+    print(f"итог: {final['status']} {final['counts']}, RetryAfter: {bot.retry_afters}, "
+          f"повторных доставок: {duplicates}")
+    print(f"время: {elapsed:.1f} c, пик отправок: {peak}/с при лимите {rate:g}/с")
+
+    ok = (final['status'] == 'done' and final['counts'].get('pending', 0) == 0
+          and final['total'] == users and duplicates <= 10 and peak <= rate + 1)
+    print("OK" if ok else "ОШИБКА")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="Задержка ответа фейкового API, с")
+    parser.add_argument("--stop-after", type=float, default=None, help="Когда прервать первый прогон, с")
+    args = parser.parse_args()
+    stop_after = args.stop_after if args.stop_after is not None else args.users / args.rate / 2
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "broadcast.db")
+        create_schema(path)
+        conn = sqlite3.connect(path)
+        conn.executemany("INSERT INTO authorized_users (telegram_id, login, full_name) VALUES (?, ?, ?)",
+                         [(1000 + i, f"user{i}", f"Сотрудник {i}") for i in range(args.users)])
+        conn.commit()
+        conn.close()
+        return asyncio.run(_run(path, args.users, args.rate, args.latency, stop_after))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
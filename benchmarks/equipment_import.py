@@ -0,0 +1,90 @@
+# Файл: it_ecosystem_bot/benchmarks/equipment_import.py
+"""
+Замер потокового импорта оборудования (utils/equipment_import.py).
+
+Генерирует .xlsx и .csv на N строк (часть строк намеренно с ошибками),
+импортирует каждый в чистую БД и печатает время, скорость и прирост RSS.
+
+    python -m benchmarks.equipment_import --rows 50000
+"""
+import argparse
+import asyncio
+import csv
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import database
+from benchmarks.synthetic import create_schema
+from config import DbConfig
+from utils.equipment_import import import_equipment_file
+
+CATEGORIES = ["laptop", "LT", "монитор", "desktop", "mouse", "headset", "неизвестно"]
+
+
+def _rows(count: int):
+    yield ["category", "model", "serial", "workplace"]
+    for i in range(count):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        workplace = "TSS-WS-2001" if i % 3 == 0 else ("NO-SUCH-WS" if i % 997 == 0 else "")
+        yield [category, f"Модель {i % 40}" if i % 501 else "", f"SN{i:08d}", workplace]
+
+
+def _write_csv(path: str, count: int):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        csv.writer(f, delimiter=";").writerows(_rows(count))
+
+
+def _write_xlsx(path: str, count: int):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for row in _rows(count):
+        ws.append(row)
+    wb.save(path)
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _import(db_path: str, source: str, report: str):
+    create_schema(db_path)
+    database.configure_db(DbConfig(path=db_path))
+
+    async def _workplaces():
+        return {wp['number']: wp['id'] for wp in await database.get_all_workplaces()}
+
+    workplace_ids = asyncio.run(_workplaces())
+    rss_before = _max_rss_mb()
+    started = time.perf_counter()
+    result = import_equipment_file(source, report, workplace_ids)
+    elapsed = time.perf_counter() - started
+    rss_growth = _max_rss_mb() - rss_before
+    asyncio.run(database.close_db())
+    return result, elapsed, rss_growth
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for ext, writer in ((".csv", _write_csv), (".xlsx", _write_xlsx)):
+            source = os.path.join(tmpdir, f"equipment{ext}")
+            writer(source, args.rows)
+            result, elapsed, rss_growth = _import(os.path.join(tmpdir, f"import{ext}.db"), source,
+                                                  os.path.join(tmpdir, f"report{ext}.csv"))
+            print(f"{ext:<5} строк={result.total} импортировано={result.imported} ошибок={result.failed} "
+                  f"время={elapsed:.2f} c ({result.total / elapsed:,.0f} строк/с) прирост RSS={rss_growth:.1f} МБ")
+            ok = ok and result.total == args.rows and result.imported + result.failed == result.total
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
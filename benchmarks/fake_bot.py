@@ -0,0 +1,117 @@
+# Файл: it_ecosystem_bot/benchmarks/fake_bot.py
+"""
+Бот без сети для прогонов через настоящий Dispatcher.
+
+FakeSession подменяет HTTP-сессию aiogram: исходящие вызовы API не уходят в
+Telegram, а записываются (метод, чат, время) и получают правдоподобный ответ.
+getUpdates отдаёт обновления из очереди, в которую их кладёт сценарий, с
+заданной задержкой сети — так моделируется long polling. Обновление в очереди
+может быть JSON-строкой: тогда оно разбирается при выдаче, как ответ настоящего API.
+"""
+import asyncio
+import datetime
+import itertools
+import time
+from typing import Any, List, NamedTuple, Optional
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.methods import GetMe, GetUpdates, TelegramMethod
+from aiogram.types import CallbackQuery, Chat, Message, PhotoSize, Update, User
+
+BOT_ID = 42
+BOT_TOKEN = f"{BOT_ID}:TEST"
+
+
+class ApiCall(NamedTuple):
+    at: float  # time.perf_counter()
+    method: str
+    chat_id: Optional[int]
+
+
+class FakeSession(BaseSession):
+    """Сессия aiogram, записывающая вызовы API вместо отправки."""
+
+    def __init__(self, rtt: float = 0.0, poll_limit: int = 100):
+        super().__init__()
+        self.rtt = rtt
+        self.poll_limit = poll_limit
+        self.calls: List[ApiCall] = []
+        self.updates: asyncio.Queue = asyncio.Queue()
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        if isinstance(method, GetUpdates):
+            return await self._get_updates(bot, method)
+        chat_id = getattr(method, 'chat_id', None)
+        self.calls.append(ApiCall(time.perf_counter(), method.__api_method__, chat_id))
+        if isinstance(method, GetMe):
+            return User(id=BOT_ID, is_bot=True, first_name="Bot", username="test_bot")
+        returning = method.__returning__
+        if returning is Message or Message in getattr(returning, '__args__', ()):
+            return Message(message_id=next(self._message_ids), date=datetime.datetime.now(),
+                           chat=Chat(id=chat_id or 0, type='private'), text=getattr(method, 'text', None)).as_(bot)
+        return True
+
+    async def _get_updates(self, bot: Bot, method: GetUpdates) -> List[Update]:
+        # Один «сетевой» круг на вызов: задержка, затем всё, что накопилось, но не больше limit
+        await asyncio.sleep(self.rtt)
+        batch = []
+        if self.updates.empty():
+            try:
+                batch.append(await asyncio.wait_for(self.updates.get(), timeout=method.timeout or 0.1))
+            except asyncio.TimeoutError:
+                return []
+        limit = method.limit or self.poll_limit
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return [Update.model_validate_json(item, context={'bot': bot}) if isinstance(item, str) else item
+                for item in batch]
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+    def sent(self, method: str = 'sendMessage') -> List[ApiCall]:
+        return [call for call in self.calls if call.method == method]
+
+
+def make_bot(session: Optional[FakeSession] = None) -> Bot:
+    return Bot(token=BOT_TOKEN, session=session or FakeSession(),
+               default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+
+class UpdateFactory:
+    """Синтетические обновления Telegram от имени пользователей."""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+        self._callback_ids = itertools.count(1)
+
+    @staticmethod
+    def _user(user_id: int) -> User:
+        return User(id=user_id, is_bot=False, first_name=f"User{user_id}")
+
+    def message(self, user_id: int, text: str) -> Update:
+        return Update(update_id=next(self._update_ids), message=Message(
+            message_id=next(self._message_ids), date=datetime.datetime.now(),
+            chat=Chat(id=user_id, type='private'), from_user=self._user(user_id), text=text))
+
+    def photo(self, user_id: int, file_id: str = "photo-file-id") -> Update:
+        return Update(update_id=next(self._update_ids), message=Message(
+            message_id=next(self._message_ids), date=datetime.datetime.now(),
+            chat=Chat(id=user_id, type='private'), from_user=self._user(user_id),
+            photo=[PhotoSize(file_id=file_id, file_unique_id=file_id, width=100, height=100)]))
+
+    def callback(self, user_id: int, data: str) -> Update:
+        message = Message(message_id=next(self._message_ids), date=datetime.datetime.now(),
+                          chat=Chat(id=user_id, type='private'),
+                          from_user=User(id=BOT_ID, is_bot=True, first_name="Bot"), text="…")
+        return Update(update_id=next(self._update_ids), callback_query=CallbackQuery(
+            id=str(next(self._callback_ids)), from_user=self._user(user_id), chat_instance=str(user_id),
+            message=message, data=data))
@@ -0,0 +1,115 @@
+# Файл: it_ecosystem_bot/benchmarks/fsm_storage.py
+"""
+Сравнение SQLiteStorage (utils/fsm_storage.py) с MemoryStorage aiogram.
+
+Сценарий повторяет диалог создания заявки: на каждый шаг фильтр читает
+состояние, обработчик дополняет данные и переключает состояние.
+Проверяется:
+    * стоимость чтений (get_state/get_data) при попадании в кэш;
+    * стоимость шага диалога с записью;
+    * что после «рестарта» (новый экземпляр хранилища на той же БД) все
+      незавершённые диалоги восстанавливаются с теми же данными;
+    * что брошенные состояния не читаются и удаляются purge_expired.
+
+    python -m benchmarks.fsm_storage --users 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import database
+from benchmarks.synthetic import create_schema
+from config import DbConfig
+from utils.fsm_storage import SQLiteStorage
+
+BOT_ID = 42
+STEPS = ["floor", "workplace", "category", "title", "description", "photo"]
+READS = 200_000
+
+
+def _keys(users: int):
+    return [StorageKey(bot_id=BOT_ID, chat_id=1000 + i, user_id=1000 + i) for i in range(users)]
+
+
+async def _dialog(storage, keys) -> float:
+    """Прогоняет шаги диалога для всех пользователей; возвращает мкс на шаг."""
+    started = time.perf_counter()
+    for step in STEPS:
+        for key in keys:
+            await storage.get_state(key)
+            await storage.update_data(key, {step: f"{step}-{key.user_id}"})
+            await storage.set_state(key, f"TicketStates:{step}")
+    return (time.perf_counter() - started) / (len(STEPS) * len(keys)) * 1e6
+
+
+async def _reads(storage, keys) -> float:
+    started = time.perf_counter()
+    for i in range(READS):
+        key = keys[i % len(keys)]
+        await storage.get_state(key)
+        await storage.get_data(key)
+    return (time.perf_counter() - started) / READS * 1e6
+
+
+async def _run(path: str, users: int) -> int:
+    database.configure_db(DbConfig(path=path))
+    keys = _keys(users)
+
+    memory = MemoryStorage()
+    memory_step = await _dialog(memory, keys)
+    memory_read = await _reads(memory, keys)
+
+    storage = SQLiteStorage(cache_size=users * 2)
+    sqlite_step = await _dialog(storage, keys)
+    sqlite_read = await _reads(storage, keys)
+    started = time.perf_counter()
+    await storage.close()
+    close_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{'':14}{'шаг диалога, мкс':>18}{'чтение, мкс':>14}")
+    print(f"{'MemoryStorage':14}{memory_step:>18.2f}{memory_read:>14.2f}")
+    print(f"{'SQLiteStorage':14}{sqlite_step:>18.2f}{sqlite_read:>14.2f}")
+    print(f"сбросов в БД за диалог: {storage.flushes}, финальный сброс при close: {close_ms:.1f} мс")
+
+    # «Рестарт»: холодный кэш, всё читается из БД
+    restarted = SQLiteStorage(cache_size=users * 2)
+    started = time.perf_counter()
+    restored = 0
+    for key in keys:
+        if (await restarted.get_state(key) == f"TicketStates:{STEPS[-1]}"
+                and await restarted.get_data(key) == await memory.get_data(key)):
+            restored += 1
+    cold_us = (time.perf_counter() - started) / users * 1e6
+    print(f"после рестарта восстановлено диалогов: {restored} из {users} ({cold_us:.1f} мкс на холодное чтение)")
+
+    # Брошенные состояния: хранилище с нулевым TTL ничего не читает, purge удаляет все строки
+    expired = SQLiteStorage(state_ttl=0)
+    abandoned_read = await expired.get_state(keys[0])
+    purged = await expired.purge_expired()
+    print(f"брошенное состояние читается как: {abandoned_read!r}, удалено purge_expired: {purged}")
+
+    await database.close_db()
+    ok = restored == users and abandoned_read is None and purged == users
+    print("OK" if ok else "ОШИБКА")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "fsm.db")
+        create_schema(path)
+        return asyncio.run(_run(path, args.users))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,537 @@
+# Файл: it_ecosystem_bot/benchmarks/load.py
+"""
+Нагрузочный прогон: синтетические обновления Telegram через настоящие роутеры.
+
+Бот работает через FakeSession (исходящие вызовы API записываются, а не
+отправляются), диспетчер — app.create_dispatcher с SQLiteStorage, сервисы
+(планировщик, рассылки, SLA) — как в app.main. Для каждого размера БД
+(--sizes, число заявок) создаётся временная база, и в неё подаётся поток
+сессий от разных пользователей вперемешку:
+    login     — /start, «Войти», логин, пароль (справочник Excel подменяется
+                синтетическими записями);
+    ticket    — полный диалог создания заявки (этаж, место, категория,
+                заголовок, описание, фото или «Пропустить»);
+    my        — «Мои запросы»;
+    admin     — сводка, фильтр, страницы списка, карточка, история,
+                назначение на себя, смена статуса с комментарием;
+    broadcast — рассылка «сейчас» всем пользователям.
+Обновления подаются так же, как в боте по умолчанию: dp.start_polling
+забирает их через getUpdates фейковой сессии и обрабатывает каждое отдельной
+задачей. Пользователь отправляет следующее сообщение, получив ответ на
+предыдущее, поэтому FSM-диалоги не ломаются. С --webhook поток вместо этого
+подаётся в пул воркеров utils/webhook.py (BOT_MODE=webhook).
+
+На каждой базе два прогона. «Все разом» (--sessions) — пропускная
+способность и задержка обновления от поступления до конца обработки под
+насыщением. С темпом --rate (--paced-sessions) — время работы каждого
+обработчика (p50/p95/p99) и время в БД (ожидание пула/писателя и сами
+запросы) без очереди, когда цифры не зависят от соседних апдейтов.
+--json сохраняет результат, --baseline сравнивает с сохранённым и
+завершается с ошибкой, если медиана времени обработчика или пропускная
+способность ухудшились больше --tolerance (хвосты p95/p99 на сотне вызовов
+слишком шумные для автоматического порога, они только в отчёте).
+
+    python -m benchmarks.load --sizes 1000,100000 --sessions 2000
+    python -m benchmarks.load --sizes 1000 --webhook    # через пул вебхука
+    python -m benchmarks.load --json base.json          # до изменений
+    python -m benchmarks.load --baseline base.json      # после
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject, Update
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+import database
+from app import create_dispatcher
+from benchmarks.fake_bot import FakeSession, UpdateFactory, make_bot
+from benchmarks.synthetic import USER_ID_BASE, create_schema, populate
+from config import DbConfig, WebhookConfig
+from handlers import auth
+from handlers.tickets import TICKET_CATEGORIES
+from utils.broadcast import Broadcaster
+from utils.fsm_storage import SQLiteStorage
+from utils.jobstore import SQLiteJobStore
+from utils.mailings import JOBSTORE_ALIAS, MailingScheduler
+from utils.notifications import NotificationOutbox
+from utils.assignment import AssignmentEngine, LeastLoadedPolicy
+from utils.routing import AdminRouting
+from utils.sla import SlaEngine
+from utils.ticket_cards import TicketCardEditor
+from utils.webhook import UpdatePool
+
+ADMINS = 20  # populate() делает администраторами первых 20 пользователей
+LOGIN_PASSWORD = "load-pass"
+# Доли сессий в потоке; рассылок — фиксированное число (--broadcasts)
+MIX = {'login': 0.1, 'ticket': 0.25, 'my': 0.35, 'admin': 0.3}
+NEW_STATUSES = ["in_progress", "on_hold", "closed"]
+
+# Время в БД текущего обработчика; None — вне обработчика (фильтры, middleware)
+_db_time: ContextVar[Optional[List[float]]] = ContextVar('load_db_time', default=None)
+
+
+def _timed(call: Callable[[Any], Awaitable[Any]]) -> Callable[[Any], Awaitable[Any]]:
+    async def wrapper(fn):
+        started = time.perf_counter()
+        try:
+            return await call(fn)
+        finally:
+            spent = _db_time.get()
+            if spent is not None:
+                spent[0] += time.perf_counter() - started
+
+    return wrapper
+
+
+def _instrument_db() -> Callable[[], None]:
+    """Включает учёт времени в database._read/_write; возвращает функцию отката."""
+    read, write = database._read, database._write
+    database._read, database._write = _timed(read), _timed(write)
+
+    def restore():
+        database._read, database._write = read, write
+
+    return restore
+
+
+class HandlerMetrics(BaseMiddleware):
+    """Inner-middleware диспетчера (наследуется всеми роутерами): время обработчика и время в БД."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[tuple]] = defaultdict(list)
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        spent = [0.0]
+        token = _db_time.set(spent)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.samples[data['handler'].callback.__name__].append((time.perf_counter() - started, spent[0]))
+            _db_time.reset(token)
+
+
+class UpdateTracker(BaseMiddleware):
+    """Outer-middleware обновлений: задержка от поступления до конца обработки и необработанные апдейты."""
+
+    def __init__(self):
+        self.arrived: Dict[int, float] = {}
+        self.latencies: List[float] = []
+        self.unhandled: List[int] = []
+        self.failed = 0
+        # Ожидающие конца обработки обновления (следующее сообщение того же пользователя)
+        self.waiters: Dict[int, asyncio.Event] = {}
+
+    async def __call__(self, handler, event: Update, data: Dict[str, Any]) -> Any:
+        try:
+            result = await handler(event, data)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.latencies.append(time.perf_counter() - self.arrived.pop(event.update_id))
+            waiter = self.waiters.pop(event.update_id, None)
+            if waiter is not None:
+                waiter.set()
+        if result is UNHANDLED:
+            self.unhandled.append(event.update_id)
+        return result
+
+
+# --- Сценарии ----------------------------------------------------------------
+
+class Scenario:
+    """Генератор сессий пользователей по данным синтетической БД."""
+
+    def __init__(self, path: str, users: int, seed: int):
+        self.rnd = random.Random(seed)
+        self.factory = UpdateFactory()
+        self.users = users
+        conn = sqlite3.connect(path)
+        self.workplaces = conn.execute(
+            "SELECT floor, number FROM workplaces WHERE floor IS NOT NULL ORDER BY id").fetchall()
+        self.open_tickets = [row[0] for row in conn.execute(
+            "SELECT id FROM tickets WHERE status = 'open' ORDER BY id DESC LIMIT 5000")]
+        conn.close()
+        self.logins: List[dict] = []
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def _user(self) -> int:
+        return USER_ID_BASE + self.rnd.randrange(ADMINS, self.users)
+
+    def _admin(self) -> int:
+        return USER_ID_BASE + self.rnd.randrange(ADMINS)
+
+    def login(self):
+        index = len(self.logins)
+        user_id = USER_ID_BASE + self.users + index
+        record = {'login': f"load{index}", 'password': LOGIN_PASSWORD, 'full_name': f"Нагрузочный {index}",
+                  'department': "IT", 'position': "Специалист", 'role': "user"}
+        self.logins.append(record)
+        f = self.factory
+        return user_id, [f.message(user_id, "/start"), f.callback(user_id, "auth_login_btn"),
+                         f.message(user_id, record['login']), f.message(user_id, LOGIN_PASSWORD)]
+
+    def ticket(self):
+        user_id, f = self._user(), self.factory
+        floor, number = self.rnd.choice(self.workplaces)
+        last = f.photo(user_id) if self.rnd.random() < 0.3 else f.callback(user_id, "skip_photo")
+        return user_id, [f.message(user_id, "🟦 Создать запрос"), f.callback(user_id, f"floor_{floor}"),
+                         f.callback(user_id, f"wp_{number}"),
+                         f.callback(user_id, f"cat_{self.rnd.choice(TICKET_CATEGORIES)}"),
+                         f.message(user_id, "Не печатает принтер"),
+                         f.message(user_id, "После обновления драйвера принтер не печатает, очередь висит."),
+                         last]
+
+    def my(self):
+        user_id = self._user()
+        return user_id, [self.factory.message(user_id, "🗂 Мои запросы")]
+
+    def admin(self):
+        admin_id, f = self._admin(), self.factory
+        ticket_id = self.rnd.choice(self.open_tickets)
+        status = self.rnd.choice(NEW_STATUSES)
+        return admin_id, [
+            f.message(admin_id, "📋 Все заявки"),
+            f.message(admin_id, "/filter_tickets"),
+            f.callback(admin_id, "filter_status_open"),
+            f.callback(admin_id, f"tickets_page:open:next:{ticket_id}"),
+            f.callback(admin_id, f"ticket_detail_{ticket_id}"),
+            f.callback(admin_id, f"ticket_history_{ticket_id}"),
+            f.callback(admin_id, f"ticket_assign_{ticket_id}"),
+            f.callback(admin_id, f"ticket_status_{ticket_id}"),
+            f.callback(admin_id, f"newstatus_{status}_{ticket_id}"),
+            f.message(admin_id, "Проверено на месте"),
+        ]
+
+    def broadcast(self):
+        admin_id, f = self._admin(), self.factory
+        return admin_id, [f.message(admin_id, "📢 Рассылка"),
+                          f.message(admin_id, "Плановые работы в сети в субботу с 10:00"),
+                          f.callback(admin_id, "mail_schedule_now")]
+
+    def stream(self, sessions: int, broadcasts: int) -> List[Update]:
+        """Сессии вперемешку; обновления одного пользователя сохраняют порядок."""
+        kinds = self.rnd.choices(list(MIX), weights=list(MIX.values()), k=sessions) + ['broadcast'] * broadcasts
+        per_user: Dict[int, List[Update]] = defaultdict(list)
+        for kind in kinds:
+            user_id, updates = getattr(self, kind)()
+            per_user[user_id].extend(updates)
+            self.counts[kind] += 1
+
+        queues = [list(reversed(updates)) for updates in per_user.values()]
+        weights = [len(queue) for queue in queues]
+        result = []
+        while queues:
+            i = self.rnd.choices(range(len(queues)), weights=weights)[0]
+            result.append(queues[i].pop())
+            weights[i] -= 1
+            if not queues[i]:
+                queues[i], weights[i] = queues[-1], weights[-1]
+                queues.pop()
+                weights.pop()
+        return result
+
+
+# --- Прогон ------------------------------------------------------------------
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+def _count(path: str, sql: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _latency(values: List[float]) -> Dict[str, float]:
+    return {name: _percentile(values, p) * 1000 for name, p in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))}
+
+
+def _arrivals(updates: List[Update], started: float, rate: float) -> Dict[int, List[tuple]]:
+    """Время поступления каждого обновления по расписанию, по пользователям в исходном порядке."""
+    per_user: Dict[int, List[tuple]] = defaultdict(list)
+    for i, update in enumerate(updates):
+        user_id = (update.message or update.callback_query).from_user.id
+        per_user[user_id].append((started + i / rate if rate else started, update))
+    return per_user
+
+
+async def _drive_polling(dp, bot, workflow_data, updates: List[Update], tracker: UpdateTracker,
+                         rate: float) -> float:
+    """
+    Режим по умолчанию (app.main): dp.start_polling, обновления приходят через getUpdates
+    фейковой сессии, каждое обрабатывается отдельной задачей. Пользователь отправляет
+    следующее сообщение, только получив ответ на предыдущее, — иначе шаги FSM-диалога
+    обгоняли бы друг друга, чего у живого пользователя не бывает.
+    """
+    session = bot.session
+    services = {key: value for key, value in workflow_data.items() if key not in ('dispatcher', 'bots')}
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False,
+                                                   polling_timeout=1, **services))
+    started = time.perf_counter()
+
+    async def user_session(arrivals: List[tuple]):
+        for arrival, update in arrivals:
+            if arrival > time.perf_counter():
+                await asyncio.sleep(arrival - time.perf_counter())
+            # Время поступления — по расписанию: ожидание ответа на своё предыдущее сообщение входит в задержку
+            tracker.arrived[update.update_id] = arrival
+            handled = tracker.waiters[update.update_id] = asyncio.Event()
+            session.updates.put_nowait(update)
+            await handled.wait()
+
+    await asyncio.gather(*(user_session(arrivals) for arrivals in _arrivals(updates, started, rate).values()))
+    elapsed = time.perf_counter() - started
+    await dp.stop_polling()
+    await polling
+    return elapsed
+
+
+async def _drive_webhook(dp, bot, workflow_data, updates: List[Update], tracker: UpdateTracker, workers: int,
+                         rate: float) -> float:
+    """Режим вебхука: поток подаётся в свежий пул воркеров utils/webhook.py и ждёт обработки."""
+    pool = UpdatePool(dp, bot, workers, workers * 32, workflow_data)
+    pool.start()
+    started = time.perf_counter()
+    for i, update in enumerate(updates):
+        # Время поступления — по расписанию: ожидание места в очереди входит в задержку
+        arrival = started + i / rate if rate else started
+        if arrival > time.perf_counter():
+            await asyncio.sleep(arrival - time.perf_counter())
+        tracker.arrived[update.update_id] = arrival
+        await pool.submit(update)
+    await pool.close(timeout=600)
+    return time.perf_counter() - started
+
+
+async def _drive(dp, bot, workflow_data, updates: List[Update], tracker: UpdateTracker, args, rate: float) -> float:
+    """Подаёт поток выбранным способом и ждёт обработки; возвращает длительность в секундах."""
+    if args.webhook:
+        return await _drive_webhook(dp, bot, workflow_data, updates, tracker, args.workers, rate)
+    return await _drive_polling(dp, bot, workflow_data, updates, tracker, rate)
+
+
+async def _run_size(path: str, args) -> Dict[str, Any]:
+    """
+    Два прогона на одной БД: «все разом» — пропускная способность под насыщением;
+    с темпом --rate — задержки обработчиков без очереди, по ним ищутся регрессии.
+    """
+    database.configure_db(DbConfig(path=path))
+    scenario = Scenario(path, args.users, args.seed)
+    burst = scenario.stream(args.sessions, args.broadcasts)
+    paced = scenario.stream(args.paced_sessions, 0)
+    # Справочник для авторизации: то, что ExcelParser загрузил бы из users.xlsx
+    auth.ALL_USERS[:] = scenario.logins
+    tickets_before = _count(path, "SELECT COUNT(*) FROM tickets")
+
+    session = FakeSession()
+    bot = make_bot(session)
+    storage = SQLiteStorage()
+    dp = create_dispatcher(storage)
+    metrics, tracker = HandlerMetrics(), UpdateTracker()
+    dp.update.outer_middleware(tracker)
+    dp.message.middleware(metrics)
+    dp.callback_query.middleware(metrics)
+
+    scheduler = AsyncIOScheduler(jobstores={JOBSTORE_ALIAS: SQLiteJobStore()})
+    scheduler.start()
+    broadcaster = Broadcaster(bot)
+    mailings = MailingScheduler(scheduler, broadcaster)
+    await mailings.start()
+    cards = TicketCardEditor(bot, bucket=broadcaster.bucket, chat_limiter=broadcaster.chat_limiter)
+    cards.start()
+    outbox = NotificationOutbox(bot, bucket=broadcaster.bucket, chat_limiter=broadcaster.chat_limiter, cards=cards)
+    outbox.start()
+    sla = SlaEngine(scheduler, outbox)
+    await sla.start()
+    assigner = AssignmentEngine(LeastLoadedPolicy())
+    await assigner.start()
+    routing = AdminRouting()
+    await routing.start()
+    # Просроченные сроки синтетической истории эскалируются при старте (уведомления — через outbox);
+    # замер — после этого
+    sent = -1
+    while (sent != len(session.calls) or (sla._heap and sla._heap[0][0] <= time.time())
+           or (await database.get_outbox_stats(0))['counts'].get('pending', 0)):
+        sent = len(session.calls)
+        await asyncio.sleep(0.2)
+    workflow_data = {'dispatcher': dp, 'bots': [bot], **dp.workflow_data,
+                     'scheduler': scheduler, 'broadcaster': broadcaster, 'sla': sla, 'mailings': mailings,
+                     'outbox': outbox, 'cards': cards, 'assigner': assigner,
+                     'routing': routing}
+
+    restore = _instrument_db()
+    burst_elapsed = await _drive(dp, bot, workflow_data, burst, tracker, args, 0)
+    burst_latencies, tracker.latencies = tracker.latencies, []
+    metrics.samples.clear()
+    await _drive(dp, bot, workflow_data, paced, tracker, args, args.rate)
+    restore()
+
+    scheduler.shutdown(wait=False)
+    await broadcaster.stop()
+    await outbox.stop()
+    await cards.stop()
+    await storage.close()
+    await database.close_db()
+
+    created = _count(path, "SELECT COUNT(*) FROM tickets") - tickets_before
+    authorized = _count(path, "SELECT COUNT(*) FROM authorized_users WHERE login LIKE 'load%'")
+    return {
+        'mode': 'webhook' if args.webhook else 'polling',
+        'updates': len(burst),
+        'elapsed': burst_elapsed,
+        'throughput': len(burst) / burst_elapsed,
+        'latency': _latency(burst_latencies),
+        'paced': {'updates': len(paced), 'rate': args.rate, 'latency': _latency(tracker.latencies)},
+        'handlers': {
+            name: {
+                'count': len(samples),
+                **_latency([s[0] for s in samples]),
+                'db': sum(s[1] for s in samples) / len(samples) * 1000,
+                'total': sum(s[0] for s in samples) * 1000,
+            }
+            for name, samples in metrics.samples.items()
+        },
+        'sessions': dict(scenario.counts),
+        'checks': {
+            'unhandled': len(tracker.unhandled),
+            'failed': tracker.failed,
+            'tickets_created': [created, scenario.counts['ticket']],
+            'logins': [authorized, scenario.counts['login']],
+        },
+    }
+
+
+def _measure(tickets: int, args) -> Dict[str, Any]:
+    """
+    Один размер БД в отдельном процессе: роутеры подключаются к диспетчеру один раз
+    на процесс, а кэши database и хранилища FSM не переходят между базами.
+    """
+    # Логи обработчиков на каждый апдейт засоряют вывод; предупреждения и ошибки остаются
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "load.db")
+        create_schema(path)
+        populate(path, tickets=tickets, users=args.users, admins=ADMINS, equipment=1000)
+        return asyncio.run(_run_size(path, args))
+
+
+def _report(tickets: int, result: Dict[str, Any]):
+    latency = result['latency']
+    print(f"\n=== БД: {tickets} заявок, {result.get('mode', 'polling')}; сессии: "
+          + ", ".join(f"{kind} {count}" for kind, count in sorted(result['sessions'].items())))
+    paced = result['paced']
+    print(f"все разом: {result['updates']} обновлений за {result['elapsed']:.2f} c — "
+          f"{result['throughput']:.0f} обн./с; задержка обновления p50/p95/p99: "
+          f"{latency['p50']:.0f}/{latency['p95']:.0f}/{latency['p99']:.0f} мс")
+    latency = paced['latency']
+    print(f"темп {paced['rate']:.0f} обн./с: {paced['updates']} обновлений; задержка обновления p50/p95/p99: "
+          f"{latency['p50']:.1f}/{latency['p95']:.1f}/{latency['p99']:.1f} мс; обработчики:")
+    print(f"{'обработчик':30}{'вызовов':>9}{'p50, мс':>9}{'p95, мс':>9}{'p99, мс':>9}{'БД ср., мс':>12}{'доля БД':>9}")
+    for name, h in sorted(result['handlers'].items(), key=lambda item: -item[1]['total']):
+        share = h['db'] * h['count'] / h['total'] if h['total'] else 0.0
+        print(f"{name:30}{h['count']:>9}{h['p50']:>9.2f}{h['p95']:>9.2f}{h['p99']:>9.2f}"
+              f"{h['db']:>12.2f}{share:>9.0%}")
+
+
+def _check(result: Dict[str, Any]) -> List[str]:
+    checks = result['checks']
+    errors = []
+    if checks['unhandled']:
+        errors.append(f"необработанных обновлений: {checks['unhandled']}")
+    if checks['failed']:
+        errors.append(f"обработчики упали: {checks['failed']}")
+    for name in ('tickets_created', 'logins'):
+        got, expected = checks[name]
+        if got != expected:
+            errors.append(f"{name}: {got} вместо {expected}")
+    return errors
+
+
+def _compare(baseline: Dict[str, Any], results: Dict[str, Any], tolerance: float) -> List[str]:
+    """Регрессии относительно сохранённого прогона: медианы обработчиков и пропускная способность."""
+    regressions = []
+    for size, result in results.items():
+        base = baseline.get(size)
+        if base is None:
+            continue
+        # Прогоны до появления режима polling шли через пул вебхука
+        if base.get('mode', 'webhook') != result['mode']:
+            regressions.append(f"{size}: базовый прогон в режиме {base.get('mode', 'webhook')}, "
+                               f"текущий — {result['mode']}; запустите с тем же режимом")
+            continue
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{size}: пропускная способность {result['throughput']:.0f} "
+                               f"против {base['throughput']:.0f} обн./с")
+        for name, h in result['handlers'].items():
+            old = base['handlers'].get(name)
+            # Порог в 1 мс отсекает шум на обработчиках, которые работают микросекунды
+            if old and h['p50'] > old['p50'] * (1 + tolerance) and h['p50'] - old['p50'] > 1.0:
+                regressions.append(f"{size}: {name} p50 {h['p50']:.2f} против {old['p50']:.2f} мс")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000", help="размеры БД (число заявок) через запятую")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--broadcasts", type=int, default=2)
+    parser.add_argument("--webhook", action="store_true",
+                        help="подавать обновления через пул вебхука (utils/webhook.py), а не long polling")
+    parser.add_argument("--workers", type=int, default=WebhookConfig().workers,
+                        help="размер пула обработчиков вебхука")
+    parser.add_argument("--paced-sessions", type=int, default=500, help="сессий в прогоне с темпом --rate")
+    parser.add_argument("--rate", type=float, default=200, help="темп второго прогона, обновлений в секунду")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="сохранить результат в файл")
+    parser.add_argument("--baseline", help="сравнить с результатом, сохранённым через --json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимое ухудшение (доля)")
+    args = parser.parse_args()
+
+    results, errors = {}, []
+    for tickets in (int(size) for size in args.sizes.split(",")):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = executor.submit(_measure, tickets, args).result()
+        _report(tickets, result)
+        results[str(tickets)] = result
+        errors += [f"{tickets}: {error}" for error in _check(result)]
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            errors += _compare(json.load(f), results, args.tolerance)
+
+    print()
+    for error in errors:
+        print(f"ОШИБКА: {error}")
+    if not errors:
+        print("OK")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
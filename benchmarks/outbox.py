@@ -0,0 +1,164 @@
+# Файл: it_ecosystem_bot/benchmarks/outbox.py
+"""
+Прогон outbox уведомлений (utils/notifications.py) на фейковом боте.
+
+Сравнивается время до подтверждения пользователю: прежде finalize_ticket
+отправлял уведомление каждому администратору по очереди и только потом
+отвечал, теперь заявка и уведомления пишутся одной транзакцией, а доставка
+идёт в фоне. Фейковый API отвечает с задержкой, один администратор
+«заблокировал бота», часть отправок падает с сетевой ошибкой, изредка
+приходит RetryAfter. Воркер останавливается на середине (как при рестарте),
+и доставку заканчивает новый экземпляр. Проверяется, что ни одно уведомление
+не потеряно, заблокированный чат ушёл в dead-letter, а повторы возможны
+только для сообщений в полёте.
+
+    python -m benchmarks.outbox --tickets 300 --admins 20 --latency 0.05
+    python -m benchmarks.outbox --tickets 30 --rate 25 --chat-interval 1   # реальные лимиты Telegram
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+import database
+from benchmarks.synthetic import USER_ID_BASE, create_schema, populate
+from config import DbConfig
+from utils.broadcast import ChatRateLimiter, TokenBucket
+from utils.notifications import CONCURRENCY, NotificationOutbox
+
+DATA = {'title': "Не печатает принтер", 'description': "Замятие бумаги", 'priority': 'medium',
+        'category': "Принтер", 'floor': 3, 'workplace': "301"}
+
+
+class FakeBot:
+    def __init__(self, latency: float, fail_rate: float, blocked: int, seed: int = 1):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.blocked = blocked
+        self.rnd = random.Random(seed)
+        self.sent = Counter()
+        self.failures = 0
+        self.retry_afters = 0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        method = SendMessage(chat_id=chat_id, text=text)
+        await asyncio.sleep(self.latency)
+        if chat_id == self.blocked:
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        roll = self.rnd.random()
+        if roll < self.fail_rate:
+            self.failures += 1
+            raise TelegramNetworkError(method=method, message="Request timeout error")
+        if roll > 1 - self.fail_rate / 20:
+            self.retry_afters += 1
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=1)
+        self.sent[(chat_id, text)] += 1
+
+
+def _percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def _inline(bot: FakeBot, admin_ids: list, tickets: int) -> list:
+    """Прежняя схема: ответ пользователю только после отправки всем администраторам."""
+    confirms = []
+    for _ in range(tickets):
+        started = time.perf_counter()
+        await database.save_new_ticket(USER_ID_BASE + 100, DATA)
+        for admin_id in admin_ids:
+            try:
+                await bot.send_message(admin_id, "🆕 Новая заявка")
+            except Exception:
+                pass
+        confirms.append(time.perf_counter() - started)
+    return confirms
+
+
+async def _run(path: str, args) -> int:
+    database.configure_db(DbConfig(path=path))
+    admin_ids = [USER_ID_BASE + i for i in range(args.admins)]
+    bot = FakeBot(args.latency, args.fail_rate, blocked=admin_ids[-1])
+
+    inline = await _inline(FakeBot(args.latency, 0.0, blocked=admin_ids[-1]), admin_ids, min(args.tickets, 20))
+
+    # Лимиты общие для обоих воркеров, как у бота с рассылками; короткая аренда —
+    # чтобы прерванные отправки вернулись в очередь за время прогона
+    bucket, chat_limiter = TokenBucket(args.rate), ChatRateLimiter(args.chat_interval)
+    first = NotificationOutbox(bot, bucket=bucket, chat_limiter=chat_limiter, lease=args.lease)
+    first.start()
+    started = time.perf_counter()
+
+    async def create_ticket(delay: float) -> float:
+        await asyncio.sleep(delay)
+        began = time.perf_counter()
+        await database.save_new_ticket(USER_ID_BASE + 100 + int(delay * 1000) % 1000, DATA, notify_admins=True)
+        first.wake()
+        return time.perf_counter() - began
+
+    # Заявки приходят равномерно за --spread секунд
+    confirms = await asyncio.gather(*(create_ticket(args.spread * i / args.tickets) for i in range(args.tickets)))
+    await asyncio.sleep(max(0.0, args.stop_after - (time.perf_counter() - started)))
+    await first.stop()
+    interrupted = (await database.get_outbox_stats(0))['counts']
+
+    second = NotificationOutbox(bot, bucket=bucket, chat_limiter=chat_limiter, lease=args.lease)
+    second.start()
+    while (await database.get_outbox_stats(0))['counts'].get('pending', 0):
+        await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - started
+    await second.stop()
+
+    final = await database.get_outbox_stats(0)
+    await database.close_db()
+
+    expected = args.tickets * (args.admins - 1)
+    duplicates = sum(count - 1 for count in bot.sent.values())
+    counts = final['counts']
+    print(f"заявок: {args.tickets}, администраторов: {args.admins}, задержка API: {args.latency * 1000:.0f} мс")
+    print(f"подтверждение пользователю: прежде p50 {_percentile(inline, 0.5) * 1000:.0f} мс, "
+          f"с outbox p50 {_percentile(confirms, 0.5) * 1000:.1f} мс, p95 {_percentile(confirms, 0.95) * 1000:.1f} мс")
+    print(f"после остановки: {interrupted}, итог: {counts}")
+    print(f"сетевых ошибок: {bot.failures}, RetryAfter: {bot.retry_afters}, повторных доставок: {duplicates}")
+    print(f"задержка доставки: p50 {final['latency_p50']:.2f} c, p95 {final['latency_p95']:.2f} c, "
+          f"макс. {final['latency_max']:.2f} c; всё доставлено за {elapsed:.1f} c")
+
+    ok = (len(bot.sent) == expected and counts.get('sent', 0) == expected
+          and counts.get('dead', 0) == args.tickets and not counts.get('pending')
+          and duplicates <= CONCURRENCY)
+    print("OK" if ok else "ОШИБКА")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=100)
+    parser.add_argument("--admins", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа фейкового API, с")
+    parser.add_argument("--rate", type=float, default=2000, help="Глобальный лимит отправок в секунду")
+    parser.add_argument("--chat-interval", type=float, default=0.01, help="Пауза между сообщениями в один чат, с")
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="Доля отправок с сетевой ошибкой")
+    parser.add_argument("--spread", type=float, default=5.0, help="За сколько секунд приходят заявки")
+    parser.add_argument("--stop-after", type=float, default=3.0, help="Когда остановить первый воркер, с")
+    parser.add_argument("--lease", type=float, default=2.0, help="Аренда уведомления воркером, с")
+    args = parser.parse_args()
+    # Каждое уведомление заблокированному администратору — предупреждение в логе; в выводе прогона они лишние
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "outbox.db")
+        create_schema(path)
+        populate(path, tickets=1000, users=1000, admins=args.admins, equipment=100)
+        return asyncio.run(_run(path, args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+# Файл: it_ecosystem_bot/benchmarks/query_plans.py
+"""
+Проверка планов запросов database.py на синтетической БД.
+
+Скрипт вызывает каждую функцию database.py, перехватывает реально выполненный SQL
+(sqlite3 trace callback) и прогоняет его через EXPLAIN QUERY PLAN. Полный проход
+таблицы (SCAN без индекса или по индексу без LIMIT) считается регрессией, если
+функция с этой таблицей не входит в список заведомо полных выборок по малым
+таблицам. Код возврата 1 при найденных регрессиях и при исключениях, которые
+больше не нужны.
+
+    python -m benchmarks.query_plans --tickets 1000000
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import database
+import utils.db_pool as db_pool
+from benchmarks.synthetic import USER_ID_BASE, create_schema, populate
+from config import DbConfig
+
+# Функции, которым по смыслу нужна вся таблица: функция -> (таблица, чем ограничен её размер).
+# Проход разрешён только по указанной таблице; таблица должна оставаться малой
+# при любом числе заявок — иначе это регрессия, а не исключение.
+FULL_SCAN_ALLOWED = {
+    # Рассылка всем: по строке на сотрудника из справочника users.xlsx (сотни–тысячи)
+    "get_all_users_for_mailing": ("authorized_users", "сотрудники организации"),
+    # Справочник рабочих мест: сид DEFAULT_WORKPLACES (~230) плюс созданные вручную
+    "get_all_workplaces": ("workplaces", "рабочие места здания"),
+    # Материалы FAQ добавляют администраторы вручную: десятки записей
+    "get_all_faq_materials": ("faq_materials", "материалы FAQ"),
+    # Маршруты уведомлений: администраторы × (этажи + категории), десятки–сотни строк
+    "get_admin_routes": ("admin_routes", "маршруты администраторов"),
+    # Только действующие рассылки: частичный индекс WHERE status = 'active', единицы–десятки
+    "get_active_scheduled_mailings": ("scheduled_mailings", "действующие плановые рассылки"),
+    # Счётчики по статусам для /outbox: доставленные старше SENT_RETENTION_DAYS удаляет
+    # purge_sent_notifications, так что в таблице уведомления за несколько дней
+    "get_outbox_stats": ("notification_outbox", "уведомления за срок хранения"),
+}
+
+# Работают с таблицей faq, которой нет в схеме
+SKIPPED = {"add_faq_item", "get_faq_items", "delete_faq_item"}
+
+STATEMENT_PREFIXES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+_current = threading.local()
+_traced = defaultdict(list)
+
+
+def _trace(sql: str):
+    name = getattr(_current, "name", None)
+    if name and sql.lstrip().upper().startswith(STATEMENT_PREFIXES):
+        _traced[name].append(" ".join(sql.split()))
+
+
+def _install_tracing():
+    original = db_pool._open_connection
+
+    def traced_open(*args, **kwargs):
+        conn = original(*args, **kwargs)
+        conn.set_trace_callback(_trace)
+        return conn
+
+    db_pool._open_connection = traced_open
+
+
+def _tag(name: str, fn):
+    """Оборачивает функцию БД так, чтобы трассировка знала, какой вызов её породил."""
+
+    def wrapped(conn):
+        _current.name = name
+        try:
+            return fn(conn)
+        finally:
+            _current.name = None
+
+    return wrapped
+
+
+async def _call_all() -> list[str]:
+    user_id = USER_ID_BASE + 100
+    admin_id = USER_ID_BASE + 1
+    ticket_id = 500
+    calls = [
+        ("get_auth_directory_user", lambda: database.get_auth_directory_user("user100")),
+        ("get_user_role", lambda: database.get_user_role(user_id)),
+        ("get_full_user_profile", lambda: database.get_full_user_profile(user_id)),
+        ("save_authorized_user", lambda: database.save_authorized_user(user_id, {
+            "login": "user100", "full_name": "Сотрудник 100", "department": "IT",
+            "position": "Специалист", "role": "user", "email": "user100@example.com"})),
+        ("save_new_ticket", lambda: database.save_new_ticket(user_id, {
+            "title": "Проверка", "description": "Проверка планов", "priority": "medium",
+            "category": "Другое"}, notify_admins=True)),
+        ("save_new_ticket_assigned", lambda: database.save_new_ticket(user_id, {
+            "title": "Проверка", "description": "Проверка планов", "priority": "high",
+            "category": "Другое", "floor": 2}, notify_admins=True, assignee=admin_id)),
+        ("get_admin_telegram_ids", database.get_admin_telegram_ids),
+        ("get_open_ticket_loads", database.get_open_ticket_loads),
+        ("add_admin_route", lambda: database.add_admin_route(admin_id, "floor", "4")),
+        ("get_admin_routes", database.get_admin_routes),
+        ("save_new_ticket_routed", lambda: database.save_new_ticket(user_id, {
+            "title": "Проверка", "description": "Проверка планов", "priority": "low",
+            "category": "Доступы", "floor": 4}, notify_admins=True, recipients=[admin_id, admin_id + 1])),
+        ("remove_admin_routes", lambda: database.remove_admin_routes(admin_id, "floor")),
+        ("get_all_tickets", lambda: database.get_all_tickets(status="open")),
+        ("get_ticket_by_id", lambda: database.get_ticket_by_id(ticket_id)),
+        ("get_tickets_page", lambda: database.get_tickets_page(status="open")),
+        ("get_tickets_page_next", lambda: database.get_tickets_page(status="open", after_id=ticket_id)),
+        ("get_tickets_page_prev", lambda: database.get_tickets_page(before_id=ticket_id)),
+        ("get_ticket_dashboard", database.get_ticket_dashboard),
+        ("get_ticket_details", lambda: database.get_ticket_details(ticket_id)),
+        ("assign_ticket_to_admin", lambda: database.assign_ticket_to_admin(ticket_id, admin_id)),
+        ("claim_ticket", lambda: database.claim_ticket(ticket_id + 1, admin_id, expected_version=0)),
+        ("update_ticket_status", lambda: database.update_ticket_status(ticket_id, "on_hold", admin_id, "Пауза",
+                                                                       expected_version=1)),
+        ("get_ticket_history", lambda: database.get_ticket_history(ticket_id)),
+        ("get_user_tickets", lambda: database.get_user_tickets(user_id)),
+        ("get_admin_info", lambda: database.get_admin_info(admin_id)),
+        ("get_admin_stats", lambda: database.get_admin_stats(admin_id)),
+        ("get_sla_open_tickets", database.get_sla_open_tickets),
+        ("fire_sla_events", lambda: database.fire_sla_events([(ticket_id, "resolution")], notify_admins=True,
+                                                             digest_threshold=0)),
+        ("fire_sla_events_merged", lambda: database.fire_sla_events([(ticket_id + 2, "resolution")],
+                                                                    notify_admins=True, digest_threshold=0)),
+        ("update_ticket_status_closed", lambda: database.update_ticket_status(ticket_id + 1, "closed", admin_id)),
+        ("create_scheduled_mailing", lambda: database.create_scheduled_mailing("План", "weekdays_19", admin_id)),
+        ("get_scheduled_mailing", lambda: database.get_scheduled_mailing(1)),
+        ("get_active_scheduled_mailings", database.get_active_scheduled_mailings),
+        ("mark_scheduled_mailing_run", lambda: database.mark_scheduled_mailing_run(1, 1)),
+        ("cancel_scheduled_mailing", lambda: database.cancel_scheduled_mailing(1)),
+        ("save_fsm_records", lambda: database.save_fsm_records([("42:1:1::::default", "S", "{}", time.time())],
+                                                               ["42:2:2::::default"])),
+        ("get_fsm_record", lambda: database.get_fsm_record("42:1:1::::default", 0)),
+        ("purge_fsm_records", lambda: database.purge_fsm_records(0)),
+        ("register_sys_admin", lambda: database.register_sys_admin(admin_id, "Сотрудник 1", "Администратор")),
+        ("update_admin_rating", lambda: database.update_admin_rating(admin_id, 5)),
+        ("close_ticket_for_rating", lambda: database.close_ticket_for_rating(ticket_id, admin_id, notify_user=True)),
+        ("finalize_ticket_rating", lambda: database.finalize_ticket_rating(ticket_id, 5, notify_admin=True)),
+        ("get_next_notification_due", database.get_next_notification_due),
+        ("claim_notifications", lambda: database.claim_notifications(time.time(), 8, 120)),
+        ("mark_notification", lambda: database.mark_notification(1, "sent", 1, sent_at=time.time(),
+                                                                 ticket_card=(ticket_id, admin_id, 1))),
+        ("get_ticket_card", lambda: database.get_ticket_card(ticket_id)),
+        ("forget_ticket_notifications", lambda: database.forget_ticket_notifications(ticket_id, [admin_id])),
+        ("purge_ticket_notifications", lambda: database.purge_ticket_notifications(time.time() - 86400)),
+        ("get_outbox_stats", lambda: database.get_outbox_stats(time.time() - 3600)),
+        ("requeue_dead_notifications", database.requeue_dead_notifications),
+        ("purge_sent_notifications", lambda: database.purge_sent_notifications(time.time())),
+        ("create_equipment", lambda: database.create_equipment("SY-9999999", "Модель", "SN-QP", "laptop")),
+        ("get_equipment", lambda: database.get_equipment(inv_number="SY-0000100")),
+        ("get_equipment_by_id", lambda: database.get_equipment(equipment_id=100)),
+        ("assign_equipment_to_user", lambda: database.assign_equipment_to_user(100, user_id, admin_id)),
+        ("get_equipment_page", database.get_equipment_page),
+        ("get_equipment_page_next", lambda: database.get_equipment_page(after_id=25_000)),
+        ("get_equipment_page_prev", lambda: database.get_equipment_page(before_id=25_000)),
+        ("get_equipment_counts", database.get_equipment_counts),
+        ("delete_equipment", lambda: database.delete_equipment("SY-9999999")),
+        ("get_user_equipment", lambda: database.get_user_equipment(user_id)),
+        ("get_workplace_by_number", lambda: database.get_workplace_by_number("101")),
+        ("get_workplace_equipment", lambda: database.get_workplace_equipment(1)),
+        ("get_all_workplaces", database.get_all_workplaces),
+        ("create_workplace", lambda: database.create_workplace("QP-1", "IT", "Тест")),
+        ("delete_workplace", lambda: database.delete_workplace("QP-1")),
+        ("get_available_floors", database.get_available_floors),
+        ("get_workplaces_by_floor", lambda: database.get_workplaces_by_floor(1)),
+        ("get_all_users_for_mailing", database.get_all_users_for_mailing),
+        ("add_ticket_attachment", lambda: database.add_ticket_attachment(ticket_id, "file-id", "photo")),
+        ("save_faq_material", lambda: database.save_faq_material("Гайд", "Описание")),
+        ("get_latest_faq_material", database.get_latest_faq_material),
+        ("get_all_faq_materials", database.get_all_faq_materials),
+        ("get_user_credentials", lambda: database.get_user_credentials(user_id)),
+    ]
+
+    # Подменяем _read/_write, чтобы пометить каждую функцию БД именем вызывающей корутины
+    original_read, original_write = database._read, database._write
+    failed = []
+    try:
+        for name, call in calls:
+            database._read = lambda fn, n=name: original_read(_tag(n, fn))
+            database._write = lambda fn, n=name: original_write(_tag(n, fn))
+            try:
+                await call()
+            except Exception as e:
+                failed.append(f"{name}: {e}")
+    finally:
+        database._read, database._write = original_read, original_write
+        await database.close_db()
+    return failed
+
+
+def _explain(conn: sqlite3.Connection, sql: str) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def _scanned_table(detail: str, sql: str) -> str | None:
+    """Таблица, которую план проходит целиком, или None.
+
+    "SCAN t" — полный проход таблицы; "SCAN t USING [COVERING] INDEX ..." — тоже
+    проход всей таблицы, только в порядке индекса, если выражение не ограничено LIMIT.
+    """
+    if not detail.startswith("SCAN "):
+        return None
+    if " USING " in detail and " LIMIT " in f" {sql.upper()} ":
+        return None
+    return detail.split()[1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--db", help="Готовая синтетическая БД (по умолчанию создаётся во временном каталоге)")
+    args = parser.parse_args()
+
+    tmpdir = None
+    path = args.db
+    if path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, "synthetic.db")
+    try:
+        if not os.path.exists(path) or args.db is None:
+            create_schema(path)
+            started = time.perf_counter()
+            stats = populate(path, tickets=args.tickets)
+            print(f"Синтетическая БД: {stats} ({time.perf_counter() - started:.1f} c)")
+
+        _install_tracing()
+        database.configure_db(DbConfig(path=path))
+        failed = asyncio.run(_call_all())
+
+        regressions, warnings, allowed_scans = [], [], set()
+        conn = sqlite3.connect(path)
+        for name in sorted(_traced):
+            for sql in dict.fromkeys(_traced[name]):
+                for detail in _explain(conn, sql):
+                    table = _scanned_table(detail, sql)
+                    if table is not None and FULL_SCAN_ALLOWED.get(name, (None,))[0] != table:
+                        regressions.append((name, detail, sql))
+                    elif table is not None:
+                        allowed_scans.add(name)
+                    elif "USE TEMP B-TREE" in detail:
+                        warnings.append((name, detail))
+        conn.close()
+
+        print(f"Проверено функций: {len(_traced)}, выражений: {sum(len(set(v)) for v in _traced.values())}")
+        for name in sorted(allowed_scans):
+            table, bound = FULL_SCAN_ALLOWED[name]
+            print(f"  исключение      {name}: SCAN {table} ({bound})")
+        # Исключение, которое больше не нужно, убирается из списка, чтобы не прикрыть будущий проход
+        stale = sorted(set(FULL_SCAN_ALLOWED) - allowed_scans)
+        for name in stale:
+            print(f"  лишнее исключение {name}: полного прохода {FULL_SCAN_ALLOWED[name][0]} нет")
+        for name, detail in warnings:
+            print(f"  предупреждение  {name}: {detail}")
+        for line in failed:
+            print(f"  ошибка вызова   {line}")
+        for name, detail, sql in regressions:
+            print(f"  ПОЛНЫЙ ПРОХОД   {name}: {detail}\n                  {sql}")
+        if regressions or failed or stale:
+            return 1
+        print("OK: полных проходов таблиц вне списка исключений нет.")
+        return 0
+    finally:
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# Файл: it_ecosystem_bot/benchmarks/routing.py
+"""
+Маршрутизация уведомлений о новых заявках (utils/routing.py) на фейковом боте.
+
+Одни и те же заявки (этаж и категория случайные) создаются дважды, как в
+finalize_ticket, и доставляются через outbox:
+    1. без маршрутов — уведомление получает каждый администратор;
+    2. администраторы распределены по этажам (по нескольку на этаж), двое
+       отвечают за категорию «Доступы», последний этаж ни за кем не закреплён.
+Сравнивается число вызовов API на заявку. Проверяется, что заявку получили
+ровно ответственные за её этаж или категорию, а заявки с незакреплённого этажа
+(без ответственных) — все администраторы. Дополнительно замеряется поиск
+ответственных в индексе.
+
+    python -m benchmarks.routing --tickets 500 --admins 20 --floors 6
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import database
+from benchmarks.fake_bot import FakeSession, make_bot
+from benchmarks.synthetic import USER_ID_BASE, create_schema, populate
+from config import DbConfig
+from handlers.tickets import TICKET_CATEGORIES
+from utils.broadcast import ChatRateLimiter, TokenBucket
+from utils.notifications import NotificationOutbox
+from utils.routing import AdminRouting
+
+SPECIAL_CATEGORY = "Доступы"
+
+
+def _tickets(count: int, floors: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    return [{'title': f"Проблема {i}", 'description': "Описание", 'priority': 'medium',
+             'category': rnd.choice(TICKET_CATEGORIES), 'floor': rnd.randint(1, floors), 'workplace': "101"}
+            for i in range(count)]
+
+
+async def _deliver(path: str, tickets: list, routing: AdminRouting) -> tuple:
+    """Создаёт заявки и ждёт доставки; возвращает (вызовов API, {заявка: получатели}, данные заявок)."""
+    session = FakeSession()
+    bot = make_bot(session)
+    outbox = NotificationOutbox(bot, bucket=TokenBucket(100_000), chat_limiter=ChatRateLimiter(0.0), concurrency=32)
+    outbox.start()
+    created = {}
+    for data in tickets:
+        recipients = routing.recipients(data['floor'], data['category'])
+        ticket_id, _ = await database.save_new_ticket(USER_ID_BASE + 100, data, notify_admins=True,
+                                                      recipients=recipients)
+        created[ticket_id] = data
+    outbox.wake()
+    while (await database.get_outbox_stats(0))['counts'].get('pending', 0):
+        await asyncio.sleep(0.05)
+    await outbox.stop()
+
+    delivered = defaultdict(set)
+    conn = sqlite3.connect(path)
+    placeholders = ", ".join(["?"] * len(created))
+    for ticket_id, chat_id in conn.execute(f"""
+        SELECT json_extract(payload, '$.ticket_id'), chat_id FROM notification_outbox
+        WHERE kind = 'ticket_created' AND status = 'sent' AND json_extract(payload, '$.ticket_id') IN ({placeholders})
+    """, list(created)):
+        delivered[ticket_id].add(chat_id)
+    conn.close()
+    return len(session.sent()), delivered, created
+
+
+async def _run(path: str, args) -> int:
+    database.configure_db(DbConfig(path=path))
+    admin_ids = [USER_ID_BASE + i for i in range(args.admins)]
+    tickets = _tickets(args.tickets, args.floors, args.seed)
+
+    routing = AdminRouting()
+    await routing.start()
+    before_calls, before, _ = await _deliver(path, tickets, routing)
+
+    # Все этажи, кроме последнего, поровну между администраторами; двое отвечают ещё и за категорию
+    covered = list(range(1, args.floors))
+    expected_by_floor = defaultdict(set)
+    for i, admin_id in enumerate(admin_ids):
+        floor = covered[i % len(covered)]
+        await routing.add(admin_id, 'floor', floor)
+        expected_by_floor[floor].add(admin_id)
+    specialists = set(admin_ids[:2])
+    for admin_id in specialists:
+        await routing.add(admin_id, 'category', SPECIAL_CATEGORY)
+
+    restarted = AdminRouting()  # индекс после рестарта строится из таблицы
+    await restarted.start()
+    after_calls, after, created = await _deliver(path, tickets, restarted)
+
+    wrong = 0
+    for ticket_id, data in created.items():
+        expected = set(expected_by_floor.get(data['floor'], ()))
+        if data['category'] == SPECIAL_CATEGORY:
+            expected |= specialists
+        if after[ticket_id] != (expected or set(admin_ids)):
+            wrong += 1
+    fallback = sum(1 for data in created.values()
+                   if data['floor'] not in expected_by_floor and data['category'] != SPECIAL_CATEGORY)
+
+    started = time.perf_counter()
+    lookups = 100_000
+    for i in range(lookups):
+        restarted.recipients(i % args.floors + 1, TICKET_CATEGORIES[i % len(TICKET_CATEGORIES)])
+    lookup_us = (time.perf_counter() - started) / lookups * 1e6
+
+    await database.close_db()
+    print(f"заявок: {args.tickets}, администраторов: {args.admins}, этажей: {args.floors} "
+          f"(последний без ответственных)")
+    print(f"без маршрутов: {before_calls} вызовов API, {before_calls / args.tickets:.1f} на заявку")
+    print(f"с маршрутами:  {after_calls} вызовов API, {after_calls / args.tickets:.1f} на заявку "
+          f"(в {before_calls / max(1, after_calls):.1f} раза меньше); всем администраторам — {fallback} заявок "
+          f"без ответственных")
+    print(f"получатели не совпали с ответственными: {wrong}; поиск ответственных: {lookup_us:.2f} мкс")
+
+    ok = (wrong == 0 and all(before[ticket_id] == set(admin_ids) for ticket_id in before)
+          and after_calls < before_calls)
+    print("OK" if ok else "ОШИБКА")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=500)
+    parser.add_argument("--admins", type=int, default=20)
+    parser.add_argument("--floors", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "routing.db")
+        create_schema(path)
+        populate(path, tickets=1000, users=1000, admins=args.admins, equipment=100)
+        return asyncio.run(_run(path, args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# Файл: it_ecosystem_bot/benchmarks/sla.py
+"""
+Прогон SLA-движка (utils/sla.py) на синтетической БД.
+
+Проверяется:
+    * время построения кучи из всех незакрытых заявок при старте;
+    * стоимость постановки/снятия таймера (track / ticket_assigned) на большой куче;
+    * что просроченные сроки эскалируются ровно один раз — и после «рестарта»
+      (новый экземпляр движка на той же БД) повторных эскалаций нет;
+    * что уведомления об эскалациях доставлены через outbox (фейковый бот):
+      каждый администратор узнал о каждой эскалации — отдельным сообщением
+      или в сводке, — в очереди ничего не осталось и не ушло в dead-letter.
+
+    python -m benchmarks.sla --tickets 200000 --new 2000
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+import database
+from benchmarks.fake_bot import FakeSession, make_bot
+from benchmarks.synthetic import create_schema, populate
+from config import DbConfig
+from utils.broadcast import ChatRateLimiter, TokenBucket
+from utils.notifications import NotificationOutbox
+from utils.sla import SlaEngine
+
+# Короткие сроки, чтобы новые заявки просрочились за время прогона
+FAST_POLICIES = {'high': (1, 2), 'medium': (1, 2), 'low': (1, 2)}
+
+
+def _sla_events(path: str) -> int:
+    conn = sqlite3.connect(path)
+    count = conn.execute("SELECT COUNT(*) FROM sla_events").fetchone()[0]
+    conn.close()
+    return count
+
+
+def _notified(path: str) -> dict:
+    """Доставленные уведомления: по администратору — сколько эскалаций покрыто (сообщения + строки сводок)."""
+    conn = sqlite3.connect(path)
+    covered = dict(conn.execute("""
+        SELECT chat_id, SUM(CASE kind WHEN 'sla_digest' THEN json_extract(payload, '$.count') ELSE 1 END)
+        FROM notification_outbox WHERE kind IN ('sla_escalation', 'sla_digest') AND status = 'sent'
+        GROUP BY chat_id
+    """).fetchall())
+    conn.close()
+    return covered
+
+
+async def _settle(path: str, engine: SlaEngine) -> int:
+    """Ждёт, пока все наступившие сроки обработаны, уведомления доставлены и число эскалаций перестало расти."""
+    previous = -1
+    while True:
+        await asyncio.sleep(0.5)
+        current = _sla_events(path)
+        due = engine._heap and engine._heap[0][0] <= time.time()
+        pending = (await database.get_outbox_stats(0))['counts'].get('pending', 0)
+        if current == previous and not due and not pending:
+            return current
+        previous = current
+
+
+async def _run(path: str, new_tickets: int) -> int:
+    database.configure_db(DbConfig(path=path))
+    scheduler = AsyncIOScheduler()
+    scheduler.start()
+    session = FakeSession()
+    outbox = NotificationOutbox(make_bot(session), bucket=TokenBucket(100_000), chat_limiter=ChatRateLimiter(0.0),
+                                concurrency=32)
+    outbox.start()
+
+    engine = SlaEngine(scheduler, outbox, policies=FAST_POLICIES)
+    started = time.perf_counter()
+    loaded = await engine.start()
+    print(f"старт: {loaded} таймеров за {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    # Исторические заявки давно просрочены: ждём, пока движок их эскалирует
+    started = time.perf_counter()
+    historical = await _settle(path, engine)
+    print(f"обработка просроченных: {time.perf_counter() - started:.1f} с (с ожиданием стабилизации)")
+    print(f"эскалировано исторических сроков: {historical}")
+
+    # Новые заявки: половину сразу берут в работу (срок реакции снимается)
+    ticket_ids = []
+    for _ in range(new_tickets):
+        ticket_id, _ = await database.save_new_ticket(database_user_id, {'title': 'SLA', 'priority': 'high'})
+        ticket_ids.append(ticket_id)
+    started = time.perf_counter()
+    for ticket_id in ticket_ids:
+        engine.track(ticket_id, 'high')
+    track_us = (time.perf_counter() - started) / new_tickets * 1e6
+    started = time.perf_counter()
+    for ticket_id in ticket_ids[::2]:
+        await database.assign_ticket_to_admin(ticket_id, database_user_id)
+        engine.ticket_assigned(ticket_id)
+    print(f"track: {track_us:.1f} мкс/заявка, куча: {len(engine._heap)} записей")
+
+    await asyncio.sleep(max(FAST_POLICIES['high']))
+    fired = await _settle(path, engine) - historical
+    expected = new_tickets // 2 + new_tickets  # реакция для невзятых + решение для всех
+    admin_ids = await database.get_admin_telegram_ids()
+    covered = _notified(path)
+    missed = sum(1 for admin_id in admin_ids if covered.get(admin_id, 0) != historical + fired)
+    print(f"эскалировано новых сроков: {fired} (ожидалось {expected}); сообщений администраторам: "
+          f"{len(session.sent())}, не узнали о всех эскалациях: {missed} из {len(admin_ids)}, "
+          f"dead-letter: {outbox.dead}")
+
+    # «Рестарт»: новый движок на той же БД не должен ничего эскалировать повторно
+    scheduler.remove_all_jobs()
+    restarted = SlaEngine(scheduler, outbox, policies=FAST_POLICIES)
+    await restarted.start()
+    before = _sla_events(path)
+    await asyncio.sleep(1.5)
+    repeated = _sla_events(path) - before
+    print(f"после рестарта: {restarted.pending} таймеров без эскалаций, повторных эскалаций: {repeated}")
+
+    scheduler.shutdown(wait=False)
+    await outbox.stop()
+    await database.close_db()
+    ok = fired == expected and repeated == 0 and missed == 0 and outbox.dead == 0 and bool(admin_ids)
+    print("OK" if ok else "ОШИБКА")
+    return 0 if ok else 1
+
+
+database_user_id = 0
+
+
+def main() -> int:
+    global database_user_id
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=200_000)
+    parser.add_argument("--new", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "sla.db")
+        create_schema(path)
+        populate(path, tickets=args.tickets)
+        from benchmarks.synthetic import USER_ID_BASE
+        database_user_id = USER_ID_BASE + 1
+        return asyncio.run(_run(path, args.new))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+# Файл: it_ecosystem_bot/benchmarks/startup.py
+"""
+Замер времени старта БД (configure_db + init_db + close_db).
+
+    cold    — пустой файл: все миграции и сид рабочих мест;
+    warm    — повторный старт: схема актуальна, сид не менялся (штатный перезапуск бота);
+    forced  — журнал миграций и хэш сида сброшены, все шаги выполняются заново,
+              как это происходило на каждом старте до версионирования схемы.
+
+    python -m benchmarks.startup --runs 20 --tickets 100000
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import database
+from benchmarks.synthetic import create_schema, populate
+from config import DbConfig
+
+
+async def _boot(path: str) -> tuple[float, int]:
+    started = time.perf_counter()
+    database.configure_db(DbConfig(path=path))
+    await database.init_db()
+    writes = database._get_writer().writes
+    await database.close_db()
+    return time.perf_counter() - started, writes
+
+
+def _reset_versioning(path: str):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("DELETE FROM schema_version")
+    conn.execute("DELETE FROM db_meta WHERE key = ?", (database.WORKPLACES_SEED_KEY,))
+    conn.close()
+
+
+def _report(label: str, samples: list[tuple[float, int]]):
+    times = sorted(t * 1000 for t, _ in samples)
+    p90 = times[min(len(times) - 1, int(len(times) * 0.9))]
+    print(f"{label:<7} median={statistics.median(times):8.2f} мс  p90={p90:8.2f} мс  "
+          f"записей={samples[-1][1]}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--tickets", type=int, default=0, help="Наполнить БД синтетикой перед замером warm/forced")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cold = []
+        for i in range(args.runs):
+            cold.append(asyncio.run(_boot(os.path.join(tmpdir, f"cold-{i}.db"))))
+
+        path = os.path.join(tmpdir, "bench.db")
+        create_schema(path)
+        if args.tickets:
+            print(f"Синтетическая БД: {populate(path, tickets=args.tickets)}")
+
+        warm = [asyncio.run(_boot(path)) for _ in range(args.runs)]
+
+        forced = []
+        for _ in range(args.runs):
+            _reset_versioning(path)
+            forced.append(asyncio.run(_boot(path)))
+
+    _report("cold", cold)
+    _report("warm", warm)
+    _report("forced", forced)
+    if warm[-1][1] != 0:
+        print("ОШИБКА: повторный старт выполнил записи в БД")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# Файл: it_ecosystem_bot/benchmarks/synthetic.py
+"""Генерация синтетической БД заданного размера для бенчмарков и проверки планов запросов."""
+import asyncio
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator
+
+import database
+from config import DbConfig
+
+DEPARTMENTS = ["IT", "HR", "Бухгалтерия", "Логистика", "Продажи", "Склад", "Маркетинг"]
+CATEGORIES = ["Офисное ПО", "Железо", "Сеть/Интернет", "Доступы", "Другое"]
+STATUSES = ["open"] * 2 + ["in_progress"] * 2 + ["on_hold", "await_rating"] + ["closed"] * 14
+PRIORITIES = ["low", "medium", "medium", "high"]
+EQUIPMENT_CATEGORIES = ["laptop", "desktop", "monitor", "printer", "keyboard", "mouse", "headset"]
+
+USER_ID_BASE = 100_000
+CHUNK = 50_000
+
+
+def _chunks(rows: Iterable[tuple], size: int = CHUNK) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows: Iterable[tuple]):
+    for chunk in _chunks(rows):
+        conn.execute("BEGIN")
+        conn.executemany(sql, chunk)
+        conn.execute("COMMIT")
+
+
+def create_schema(path: str, pool_size: int = 4):
+    """Создаёт схему штатным init_db (вместе с миграциями и индексами)."""
+    database.configure_db(DbConfig(path=path, pool_size=pool_size))
+
+    async def _init():
+        await database.init_db()
+        await database.close_db()
+
+    asyncio.run(_init())
+
+
+def populate(path: str, tickets: int = 1_000_000, users: int = 5_000, admins: int = 20,
+             equipment: int = 50_000, seed: int = 42) -> dict:
+    """Заполняет БД (схема уже должна существовать) синтетическими данными."""
+    rnd = random.Random(seed)
+    started = time.perf_counter()
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA synchronous=OFF")
+
+    user_ids = [USER_ID_BASE + i for i in range(users)]
+    admin_ids = user_ids[:admins]
+
+    _insert(conn, """
+        INSERT OR IGNORE INTO authorized_users (telegram_id, login, full_name, department, position, role, email)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (uid, f"user{i}", f"Сотрудник {i}", rnd.choice(DEPARTMENTS), "Специалист",
+         "admin" if i < admins else "user", f"user{i}@example.com")
+        for i, uid in enumerate(user_ids)
+    ))
+    _insert(conn, "INSERT OR IGNORE INTO sys_admins (telegram_id, full_name) VALUES (?, ?)",
+            ((uid, f"Сотрудник {i}") for i, uid in enumerate(admin_ids)))
+    _insert(conn, """
+        INSERT OR IGNORE INTO auth_directory (login, password, full_name, department, position, role, email)
+        VALUES (?, ?, ?, ?, ?, 'user', ?)
+    """, ((f"user{i}", f"pass{i}", f"Сотрудник {i}", rnd.choice(DEPARTMENTS), "Специалист",
+           f"user{i}@example.com") for i in range(users)))
+
+    workplaces = conn.execute("SELECT number, floor FROM workplaces WHERE floor IS NOT NULL").fetchall()
+    workplace_ids = [r[0] for r in conn.execute("SELECT id FROM workplaces")]
+
+    # Заявки равномерно распределены по ~3 годам истории, номера уникальны в пределах дня
+    start = datetime.now() - timedelta(days=1000)
+    step = timedelta(days=1000) / max(tickets, 1)
+
+    def ticket_rows():
+        day, seq = None, 0
+        for i in range(tickets):
+            created = start + step * i
+            if created.date() != day:
+                day, seq = created.date(), 0
+            seq += 1
+            status = rnd.choice(STATUSES)
+            wp_number, floor = rnd.choice(workplaces) if workplaces else (None, None)
+            yield (
+                rnd.choice(user_ids), f"TK{created:%y%m%d}{seq:04d}", f"Проблема {i}", f"Описание проблемы {i}",
+                status, rnd.choice(PRIORITIES), rnd.choice(CATEGORIES),
+                rnd.choice(admin_ids) if status != "open" else None,
+                created.strftime("%Y-%m-%d %H:%M:%S"),
+                (created + timedelta(hours=rnd.randint(1, 72))).strftime("%Y-%m-%d %H:%M:%S")
+                if status in ("closed", "await_rating") else None,
+                wp_number, floor,
+            )
+
+    _insert(conn, """
+        INSERT INTO tickets (user_id, ticket_number, title, description, status, priority, category, admin_id,
+                             created_at, closed_at, pc_name, floor)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, ticket_rows())
+    # Счётчики номеров, как их оставила бы штатная выдача через save_new_ticket
+    conn.execute("""
+        INSERT OR REPLACE INTO ticket_sequences (day, last_value)
+        SELECT substr(ticket_number, 3, 6), MAX(CAST(substr(ticket_number, 9) AS INTEGER))
+        FROM tickets GROUP BY substr(ticket_number, 3, 6)
+    """)
+
+    _insert(conn, """
+        INSERT INTO ticket_history (ticket_id, old_status, new_status, changed_by, changed_at, comment)
+        SELECT id, 'open', 'in_progress', admin_id, created_at, 'Назначен администратор'
+        FROM tickets WHERE admin_id IS NOT NULL AND id BETWEEN ? AND ?
+    """, ((lo, lo + CHUNK - 1) for lo in range(1, tickets + 1, CHUNK)))
+
+    _insert(conn, """
+        INSERT INTO equipment (inv_number, model, serial, category, status, user_id, workplace_id, assigned_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (f"SY-{i:07d}", f"Модель {i % 50}", f"SN{i:09d}", rnd.choice(EQUIPMENT_CATEGORIES),
+         status, rnd.choice(user_ids) if status == "assigned" else None,
+         rnd.choice(workplace_ids) if workplace_ids else None,
+         "2025-01-01 10:00:00" if status == "assigned" else None)
+        for i, status in ((i, rnd.choice(["available", "assigned"])) for i in range(equipment))
+    ))
+
+    _insert(conn, "INSERT INTO faq_materials (title, description) VALUES (?, ?)",
+            ((f"Гайд {i}", f"Описание гайда {i}") for i in range(50)))
+    _insert(conn, "INSERT INTO user_credentials (telegram_id, service, login) VALUES (?, ?, ?)",
+            ((rnd.choice(user_ids), "VPN", f"user{i}") for i in range(users)))
+
+    conn.close()
+    return {
+        "tickets": tickets,
+        "users": users,
+        "admins": admins,
+        "equipment": equipment,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
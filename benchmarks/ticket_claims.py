@@ -0,0 +1,146 @@
+# Файл: it_ecosystem_bot/benchmarks/ticket_claims.py
+"""
+Гонки администраторов за заявки и обновление карточек (utils/ticket_cards.py).
+
+1. Все администраторы одновременно нажимают «Назначить на себя» на каждой из
+   --tickets открытых заявок: у каждой заявки должен быть ровно один
+   победитель и одна запись в истории, проигравшие узнают победителя.
+2. Два администратора открыли одну заявку и меняют статус: второе изменение
+   по устаревшей версии должно быть отклонено.
+3. Новые заявки рассылаются администраторам через outbox (фейковый бот),
+   затем каждую берут в работу и несколько раз меняют статус. Редактор
+   карточек должен обновить каждую карточку один раз за окно, а не на каждое
+   изменение.
+
+    python -m benchmarks.ticket_claims --tickets 200 --admins 20
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import database
+from benchmarks.fake_bot import FakeSession, make_bot
+from benchmarks.synthetic import USER_ID_BASE, create_schema, populate
+from config import DbConfig
+from utils.broadcast import ChatRateLimiter, TokenBucket
+from utils.notifications import NotificationOutbox
+from utils.ticket_cards import TicketCardEditor
+
+DATA = {'title': "Не печатает принтер", 'description': "Замятие бумаги", 'priority': 'medium',
+        'category': "Принтер", 'floor': 3, 'workplace': "301"}
+
+
+async def _claim_race(path: str, admin_ids: list, tickets: int) -> bool:
+    conn = sqlite3.connect(path)
+    ticket_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM tickets WHERE status = 'open' ORDER BY id LIMIT ?", (tickets,))]
+    history_before = conn.execute("SELECT COUNT(*) FROM ticket_history").fetchone()[0]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(database.claim_ticket(ticket_id, admin_id)
+                                     for ticket_id in ticket_ids for admin_id in admin_ids))
+    elapsed = time.perf_counter() - started
+
+    winners = {}
+    for result in results:
+        if result['claimed']:
+            winners[result['admin_id']] = winners.get(result['admin_id'], 0) + 1
+    claimed = sum(winners.values())
+    losers_see_winner = all(result['claimed'] or result['admin_id'] in admin_ids for result in results)
+    history = conn.execute("SELECT COUNT(*) FROM ticket_history").fetchone()[0] - history_before
+    conn.close()
+
+    print(f"гонка: {len(results)} нажатий на {len(ticket_ids)} заявок за {elapsed * 1000:.0f} мс — "
+          f"назначено {claimed}, записей в истории {history}, разных победителей {len(winners)}")
+    return claimed == history == len(ticket_ids) and losers_see_winner
+
+
+async def _stale_update(path: str, admin_ids: list) -> bool:
+    conn = sqlite3.connect(path)
+    ticket_id = conn.execute("SELECT id FROM tickets WHERE status = 'open' ORDER BY id DESC LIMIT 1").fetchone()[0]
+    conn.close()
+
+    seen = (await database.get_ticket_details(ticket_id))['version']
+    first = await database.update_ticket_status(ticket_id, 'on_hold', admin_ids[0], None, expected_version=seen)
+    second = await database.update_ticket_status(ticket_id, 'closed', admin_ids[1], None, expected_version=seen)
+    status = (await database.get_ticket_details(ticket_id))['status']
+    print(f"устаревшая версия: первое изменение {first}, второе {second}, статус {status}")
+    return first and not second and status == 'on_hold'
+
+
+async def _cards(admin_ids: list, tickets: int, changes: int, interval: float) -> bool:
+    session = FakeSession()
+    bot = make_bot(session)
+    bucket, chat_limiter = TokenBucket(10_000), ChatRateLimiter(0.0)
+    cards = TicketCardEditor(bot, bucket=bucket, chat_limiter=chat_limiter, interval=interval)
+    outbox = NotificationOutbox(bot, bucket=bucket, chat_limiter=chat_limiter, cards=cards, concurrency=32)
+    cards.start()
+    outbox.start()
+
+    ticket_ids = []
+    for i in range(tickets):
+        ticket_id, _ = await database.save_new_ticket(USER_ID_BASE + 100 + i, DATA, notify_admins=True)
+        ticket_ids.append(ticket_id)
+    outbox.wake()
+    while (await database.get_outbox_stats(0))['counts'].get('pending', 0):
+        await asyncio.sleep(0.05)
+    cards_sent = len(session.sent())
+
+    # Заявку берут в работу и меняют статус несколько раз подряд — всё в пределах одного окна
+    started = time.perf_counter()
+    for i, ticket_id in enumerate(ticket_ids):
+        admin_id = admin_ids[i % len(admin_ids)]
+        await database.claim_ticket(ticket_id, admin_id)
+        cards.ticket_changed(ticket_id)
+        for status in (['on_hold', 'in_progress'] * changes)[:changes]:
+            await database.update_ticket_status(ticket_id, status, admin_id)
+            cards.ticket_changed(ticket_id)
+    expected = tickets * len(admin_ids)
+    while len(session.sent('editMessageText')) < expected and time.perf_counter() - started < 60:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(interval * 2)  # лишние правки, если бы они были, успели бы прийти
+    elapsed = time.perf_counter() - started
+
+    await outbox.stop()
+    await cards.stop()
+    edits = len(session.sent('editMessageText'))
+    print(f"карточки: отправлено {cards_sent}, изменений заявок {tickets * (changes + 1)}, "
+          f"правок {edits} (ожидалось {expected}) пачками: {cards.batches}, за {elapsed:.2f} c")
+    # Изменения одной заявки могут попасть на границу окна — тогда её карточки правятся дважды
+    return cards_sent == expected and expected <= edits <= expected + len(admin_ids) * cards.batches \
+        and cards.failed == 0
+
+
+async def _run(path: str, args) -> int:
+    database.configure_db(DbConfig(path=path))
+    admin_ids = [USER_ID_BASE + i for i in range(args.admins)]
+    ok = await _claim_race(path, admin_ids, args.tickets)
+    ok = await _stale_update(path, admin_ids) and ok
+    ok = await _cards(admin_ids, args.cards, args.changes, args.interval) and ok
+    await database.close_db()
+    print("OK" if ok else "ОШИБКА")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=200, help="Заявок в гонке назначения")
+    parser.add_argument("--admins", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=50, help="Новых заявок с карточками")
+    parser.add_argument("--changes", type=int, default=3, help="Смен статуса каждой заявки после назначения")
+    parser.add_argument("--interval", type=float, default=1.0, help="Окно редактора карточек, с")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "claims.db")
+        create_schema(path)
+        populate(path, tickets=5000, users=1000, admins=args.admins, equipment=100)
+        return asyncio.run(_run(path, args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
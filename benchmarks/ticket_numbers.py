@@ -0,0 +1,83 @@
+# Файл: it_ecosystem_bot/benchmarks/ticket_numbers.py
+"""
+Стресс-тест выдачи номеров заявок: N заявок из M конкурентных корутин.
+
+Проверяет, что все номера уникальны, ни одна вставка не упала на UNIQUE,
+а счётчик дня в ticket_sequences совпадает с числом созданных заявок.
+Печатает пропускную способность (заявок в секунду).
+
+    python -m benchmarks.ticket_numbers --tickets 10000 --workers 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import database
+from config import DbConfig
+
+USER_ID = 1
+
+
+async def _worker(worker_id: int, count: int, results: list, errors: list):
+    for i in range(count):
+        try:
+            results.append(await database.save_new_ticket(USER_ID, {
+                'title': f'Нагрузка {worker_id}-{i}', 'description': 'Стресс-тест номеров',
+                'category': 'Другое', 'priority': 'medium',
+            }))
+        except Exception as e:
+            errors.append(e)
+
+
+async def _run(path: str, tickets: int, workers: int) -> int:
+    database.configure_db(DbConfig(path=path))
+    await database.init_db()
+    await database.save_authorized_user(USER_ID, {
+        'login': 'stress', 'full_name': 'Стресс-тест', 'department': 'IT', 'position': 'Специалист',
+    })
+
+    per_worker, extra = divmod(tickets, workers)
+    results, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(w, per_worker + (1 if w < extra else 0), results, errors) for w in range(workers)
+    ))
+    elapsed = time.perf_counter() - started
+
+    def _counters(conn):
+        return conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0], \
+            conn.execute("SELECT COALESCE(SUM(last_value), 0) FROM ticket_sequences").fetchone()[0]
+
+    stored, sequence_total = await database._read(_counters)
+    writer = database._get_writer()
+    batches, writes = writer.batches, writer.writes
+    await database.close_db()
+
+    numbers = [number for _, number in results]
+    collisions = len(numbers) - len(set(numbers))
+    print(f"заявок: {len(results)} из {tickets}, корутин: {workers}, ошибок: {len(errors)}, коллизий: {collisions}")
+    print(f"время: {elapsed:.2f} c, {len(results) / elapsed:,.0f} заявок/с, "
+          f"транзакций: {batches} (в среднем {writes / max(batches, 1):.1f} записей на транзакцию)")
+    if errors:
+        print(f"первая ошибка: {errors[0]!r}")
+
+    ok = not errors and collisions == 0 and stored == tickets == sequence_total
+    print("OK" if ok else f"ОШИБКА: в БД {stored} заявок, сумма счётчиков {sequence_total}")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        return asyncio.run(_run(os.path.join(tmpdir, "tickets.db"), args.tickets, args.workers))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Файл: it_ecosystem_bot/benchmarks/user_sync.py
+"""
+Замер инкрементальной синхронизации справочника (database.import_users_from_excel).
+
+Сценарии на одном файле из N строк:
+    first      — первая синхронизация в пустую БД;
+    restart    — повторный старт, файл не менялся (проверка mtime/размера);
+    touched    — mtime изменился, содержимое прежнее (проверка SHA-256);
+    changed    — изменено 1% строк и уволено 0.5% сотрудников.
+
+    python -m benchmarks.user_sync --rows 20000
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import database
+from benchmarks.synthetic import create_schema
+from config import DbConfig
+
+HEADERS = ["Name", "Department", "Position", "Login", "Password", "Email Address", "Status"]
+
+
+def _write_directory(path: str, rows: int, changed_every: int = 0, terminated_every: int = 0):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(HEADERS)
+    for i in range(rows):
+        changed = changed_every and i % changed_every == 0
+        terminated = terminated_every and i % terminated_every == 1
+        ws.append([f"Сотрудник {i}", "IT" if not changed else "HR", "Специалист", f"user{i}", f"pass{i}",
+                   f"user{i}@example.com", "Terminated" if terminated else "Active"])
+    wb.save(path)
+
+
+def _timed_sync(path: str) -> float:
+    started = time.perf_counter()
+    database.import_users_from_excel(path)
+    return (time.perf_counter() - started) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "sync.db")
+        xlsx = os.path.join(tmpdir, "users.xlsx")
+        create_schema(db_path)
+        database.configure_db(DbConfig(path=db_path))
+        _write_directory(xlsx, args.rows)
+
+        results = {"first": _timed_sync(xlsx), "restart": _timed_sync(xlsx)}
+        os.utime(xlsx)
+        results["touched"] = _timed_sync(xlsx)
+        _write_directory(xlsx, args.rows, changed_every=100, terminated_every=200)
+        results["changed"] = _timed_sync(xlsx)
+        asyncio.run(database.close_db())
+
+        conn = sqlite3.connect(db_path)
+        active, deleted = conn.execute(
+            "SELECT SUM(active = 1), SUM(active = 0) FROM auth_directory").fetchone()
+        conn.close()
+
+    for name, ms in results.items():
+        print(f"{name:<8} {ms:10.2f} мс")
+    print(f"активных логинов: {active}, помечено удалёнными: {deleted}")
+    expected_deleted = len(range(1, args.rows, 200))
+    return 0 if deleted == expected_deleted and active == args.rows - expected_deleted else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# Файл: it_ecosystem_bot/benchmarks/webhook.py
+"""
+Сравнение long polling и вебхука (utils/webhook.py) на одном потоке обновлений.
+
+Бот работает через FakeSession (без сети), обработчики — настоящие роутеры
+app.py на синтетической БД. Сценарий — «после массового сбоя»: N обновлений
+(/start и «Мои запросы» от разных пользователей) приходят разом.
+    polling — обновления отдаются через getUpdates пачками по 100, каждый вызов
+              стоит --rtt-ms;
+    webhook — «Telegram» (отдельный процесс) шлёт их POST-запросами на
+              локальный aiohttp-сервер в --connections параллельных
+              соединений, каждый запрос тоже задерживается на --rtt-ms.
+Задержка обновления — от момента поступления до ответа бота (sendMessage).
+Режимы прогоняются поочерёдно --rounds раз; проверка не проходит, если медиана
+p50 или p95 вебхука хуже, чем у polling, при настройках WebhookConfig по умолчанию.
+
+    python -m benchmarks.webhook --updates 5000 --rtt-ms 50
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from typing import Dict, List
+
+import aiohttp
+
+import database
+from app import create_dispatcher
+from benchmarks.fake_bot import FakeSession, UpdateFactory, make_bot
+from benchmarks.synthetic import USER_ID_BASE, create_schema, populate
+from config import DbConfig, WebhookConfig
+from utils.fsm_storage import SQLiteStorage
+from utils.webhook import SECRET_HEADER, run_webhook
+
+SECRET = "benchmark-secret"
+TEXTS = ["/start", "🗂 Мои запросы"]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def _latencies(injected: Dict[int, deque], session: FakeSession) -> List[float]:
+    """Сопоставляет ответы обновлениям по чату в порядке поступления."""
+    result = []
+    for call in session.sent():
+        queue = injected.get(call.chat_id)
+        if queue:
+            result.append(call.at - queue.popleft())
+    return result
+
+
+async def _wait_answers(session: FakeSession, expected: int, timeout: float = 300.0):
+    deadline = time.perf_counter() + timeout
+    while len(session.sent()) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+
+async def _run_polling(dp, updates, rtt: float) -> Dict:
+    session = FakeSession(rtt=rtt)
+    bot = make_bot(session)
+    injected: Dict[int, deque] = defaultdict(deque)
+    started = time.perf_counter()
+    # Сериализация входит в замер, но на фоне обработки её доля мала
+    for update in updates:
+        injected[update.message.chat.id].append(started)
+        session.updates.put_nowait(update.model_dump_json(exclude_none=True))
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False,
+                                                   polling_timeout=1))
+    await _wait_answers(session, len(updates))
+    elapsed = time.perf_counter() - started
+    await dp.stop_polling()
+    await polling
+    return {'elapsed': elapsed, 'latencies': _latencies(injected, session)}
+
+
+def _telegram_sender(host: str, port: int, path: str, bodies: List[str], connections: int, rtt: float, go, done):
+    """
+    «Telegram» в отдельном процессе, чтобы HTTP-клиент не делил event loop с ботом.
+    По соединению (keep-alive) следующий запрос уходит только после ответа на предыдущий.
+    Запросы собираются вручную поверх asyncio-потоков: на одном CPU клиент aiohttp
+    сам съедал заметную долю процессора бота, а настоящий Telegram его не тратит.
+    """
+    requests = deque(
+        (f"POST {path} HTTP/1.1\r\nHost: {host}\r\n{SECRET_HEADER}: {SECRET}\r\n"
+         f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body
+        for body in (body.encode() for body in bodies))
+
+    async def connection():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while requests:
+                request = requests.popleft()
+                await asyncio.sleep(rtt)
+                writer.write(request)
+                head = await reader.readuntil(b"\r\n\r\n")
+                status = head.split(b" ", 2)[1]
+                assert status == b"200", status
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line[:15].lower() == b"content-length:":
+                        length = int(line[15:])
+                if length:
+                    await reader.readexactly(length)
+        finally:
+            writer.close()
+
+    async def send():
+        go.wait()
+        await asyncio.gather(*(connection() for _ in range(connections)))
+
+    asyncio.run(send())
+    done.set()
+
+
+async def _wait_server(url: str):
+    async with aiohttp.ClientSession() as client:
+        for _ in range(100):
+            try:
+                async with client.post(url, data=b"{}") as response:
+                    if response.status == 401:
+                        return
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.05)
+
+
+async def _run_webhook(dp, updates, rtt: float, connections: int, workers: int) -> Dict:
+    session = FakeSession()
+    bot = make_bot(session)
+    port = _free_port()
+    stop = asyncio.Event()
+    config = WebhookConfig(mode='webhook', host="127.0.0.1", port=port, secret=SECRET, workers=workers)
+    server = asyncio.create_task(run_webhook(dp, bot, config, stop=stop, set_webhook=False))
+    url = f"http://127.0.0.1:{port}{config.path}"
+    await _wait_server(url)
+
+    context = multiprocessing.get_context("spawn")
+    go, done = context.Event(), context.Event()
+    bodies = [update.model_dump_json(exclude_none=True) for update in updates]
+    sender = context.Process(target=_telegram_sender,
+                             args=("127.0.0.1", port, config.path, bodies, connections, rtt, go, done))
+    sender.start()
+    await asyncio.sleep(1.0)  # запуск интерпретатора дочернего процесса не входит в замер
+
+    injected: Dict[int, deque] = defaultdict(deque)
+    started = time.perf_counter()
+    for update in updates:
+        injected[update.message.chat.id].append(started)
+    go.set()
+    await _wait_answers(session, len(updates))
+    elapsed = time.perf_counter() - started
+    await asyncio.to_thread(sender.join)
+    stop.set()
+    await server
+    return {'elapsed': elapsed, 'latencies': _latencies(injected, session)}
+
+
+def _report(name: str, count: int, result: Dict):
+    latencies = [value * 1000 for value in result['latencies']]
+    print(f"{name:8}{count / result['elapsed']:>12.0f}{_percentile(latencies, 0.5):>10.0f}"
+          f"{_percentile(latencies, 0.95):>10.0f}{_percentile(latencies, 0.99):>10.0f}{max(latencies):>10.0f}")
+
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+async def _run(path: str, args) -> int:
+    database.configure_db(DbConfig(path=path))
+    storage = SQLiteStorage()
+    dp = create_dispatcher(storage)
+    rnd = random.Random(1)
+    factory = UpdateFactory()
+    updates = [factory.message(USER_ID_BASE + rnd.randrange(args.users), rnd.choice(TEXTS))
+               for _ in range(args.updates)]
+    # Прогрев кэшей ролей, чтобы оба режима шли в равных условиях
+    for user_id in {update.message.chat.id for update in updates}:
+        await database.get_user_role(user_id)
+
+    rtt = args.rtt_ms / 1000
+    print(f"{args.updates} обновлений разом, задержка сети {args.rtt_ms} мс, "
+          f"max_connections {args.connections}, воркеров {args.workers}")
+    print(f"{'режим':8}{'обн./с':>12}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'max, мс':>10}")
+    results = {'polling': [], 'webhook': []}
+    # Режимы чередуются: фоновые колебания нагрузки машины делятся между ними поровну
+    for _ in range(args.rounds):
+        results['polling'].append(await _run_polling(dp, updates, rtt))
+        _report("polling", args.updates, results['polling'][-1])
+        results['webhook'].append(await _run_webhook(dp, updates, rtt, args.connections, args.workers))
+        _report("webhook", args.updates, results['webhook'][-1])
+
+    await storage.close()
+    await database.close_db()
+    if any(len(result['latencies']) != args.updates for runs in results.values() for result in runs):
+        print("ОШИБКА: не на все обновления пришёл ответ")
+        return 1
+    slower = []
+    for name, p in (("p50", 0.5), ("p95", 0.95)):
+        polling, webhook = (_median([_percentile(result['latencies'], p) * 1000 for result in results[mode]])
+                            for mode in ('polling', 'webhook'))
+        print(f"медиана {name} по {args.rounds} прогонам: polling {polling:.0f} мс, webhook {webhook:.0f} мс")
+        if webhook > polling:
+            slower.append(name)
+    if slower:
+        print(f"ОШИБКА: вебхук медленнее polling по {', '.join(slower)}")
+        return 1
+    print("OK")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--tickets", type=int, default=50_000)
+    parser.add_argument("--rtt-ms", type=float, default=50.0)
+    parser.add_argument("--rounds", type=int, default=3, help="прогонов каждого режима (сравниваются медианы)")
+    defaults = WebhookConfig()
+    parser.add_argument("--connections", type=int, default=defaults.max_connections, help="max_connections вебхука")
+    parser.add_argument("--workers", type=int, default=defaults.workers, help="размер пула обработчиков")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "webhook.db")
+        create_schema(path)
+        populate(path, tickets=args.tickets, users=args.users, equipment=1000)
+        return asyncio.run(_run(path, args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
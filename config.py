@@ -1,5 +1,5 @@
 # Файл: it_ecosystem_bot/config.py
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import os
 
 @dataclass
@@ -7,13 +7,90 @@ class TgBot:
     """Конфигурация Telegram бота."""
     token: str
 
+@dataclass
+class DbConfig:
+    """Конфигурация SQLite: пул соединений и профиль PRAGMA."""
+    path: str = 'it_ecosystem.db'
+    pool_size: int = 4
+    statement_cache_size: int = 256
+    journal_mode: str = 'WAL'
+    synchronous: str = 'NORMAL'
+    cache_size_kb: int = 16384
+    mmap_size_mb: int = 128
+    temp_store: str = 'MEMORY'
+    busy_timeout_ms: int = 5000
+    wal_checkpoint_minutes: int = 5
+    user_cache_size: int = 10000
+    user_cache_ttl_seconds: int = 300
+    dashboard_cache_ttl_seconds: int = 5
+    fsm_cache_size: int = 10000
+    fsm_state_ttl_hours: int = 24
+    fsm_flush_interval_ms: int = 500
+
+@dataclass
+class WebhookConfig:
+    """Режим получения обновлений: long polling (по умолчанию) или вебхук на aiohttp."""
+    mode: str = 'polling'
+    url: str = ''  # публичный HTTPS-адрес, на который Telegram шлёт обновления (без path)
+    path: str = '/webhook'
+    secret: str = ''  # пусто — секрет генерируется при каждом запуске
+    host: str = '0.0.0.0'
+    port: int = 8080
+    workers: int = 32
+    queue_size: int = 1000
+    max_connections: int = 100  # максимум Telegram: приём вебхука ограничен max_connections запросами за RTT
+
+@dataclass
+class AssignmentConfig:
+    """Автоназначение новых заявок: правило (least_loaded, floor_affinity, manual) и штраф за другой этаж."""
+    policy: str = 'least_loaded'
+    floor_penalty: float = 2.0
+    rebuild_minutes: int = 10
+
 @dataclass
 class Config:
     """Общая конфигурация приложения."""
     tg_bot: TgBot
+    db: DbConfig
+    webhook: WebhookConfig = field(default_factory=WebhookConfig)
+    assignment: AssignmentConfig = field(default_factory=AssignmentConfig)
 
 def load_config() -> Config:
     """Загружает конфигурацию из переменных окружения."""
     return Config(
-        tg_bot=TgBot(token=os.getenv('BOT_TOKEN'))
-    )
\ No newline at end of file
+        tg_bot=TgBot(token=os.getenv('BOT_TOKEN')),
+        db=DbConfig(
+            path=os.getenv('DB_PATH', 'it_ecosystem.db'),
+            pool_size=int(os.getenv('DB_POOL_SIZE', 4)),
+            statement_cache_size=int(os.getenv('DB_STATEMENT_CACHE_SIZE', 256)),
+            journal_mode=os.getenv('DB_JOURNAL_MODE', 'WAL').upper(),
+            synchronous=os.getenv('DB_SYNCHRONOUS', 'NORMAL').upper(),
+            cache_size_kb=int(os.getenv('DB_CACHE_SIZE_KB', 16384)),
+            mmap_size_mb=int(os.getenv('DB_MMAP_SIZE_MB', 128)),
+            temp_store=os.getenv('DB_TEMP_STORE', 'MEMORY').upper(),
+            busy_timeout_ms=int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000)),
+            wal_checkpoint_minutes=int(os.getenv('DB_WAL_CHECKPOINT_MINUTES', 5)),
+            user_cache_size=int(os.getenv('DB_USER_CACHE_SIZE', 10000)),
+            user_cache_ttl_seconds=int(os.getenv('DB_USER_CACHE_TTL_SECONDS', 300)),
+            dashboard_cache_ttl_seconds=int(os.getenv('DB_DASHBOARD_CACHE_TTL_SECONDS', 5)),
+            fsm_cache_size=int(os.getenv('DB_FSM_CACHE_SIZE', 10000)),
+            fsm_state_ttl_hours=int(os.getenv('DB_FSM_STATE_TTL_HOURS', 24)),
+            fsm_flush_interval_ms=int(os.getenv('DB_FSM_FLUSH_INTERVAL_MS', 500)),
+        ),
+        webhook=WebhookConfig(
+            mode=os.getenv('BOT_MODE', 'polling').lower(),
+            url=os.getenv('WEBHOOK_URL', '').rstrip('/'),
+            path=os.getenv('WEBHOOK_PATH', '/webhook'),
+            secret=os.getenv('WEBHOOK_SECRET', ''),
+            host=os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+            port=int(os.getenv('WEBHOOK_PORT', 8080)),
+            workers=int(os.getenv('WEBHOOK_WORKERS', 32)),
+            queue_size=int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000)),
+            max_connections=int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 100)),
+        ),
+        assignment=AssignmentConfig(
+            policy=os.getenv('ASSIGN_POLICY', 'least_loaded').lower(),
+            floor_penalty=float(os.getenv('ASSIGN_FLOOR_PENALTY', 2.0)),
+            rebuild_minutes=int(os.getenv('ASSIGN_REBUILD_MINUTES', 10)),
+        ),
+    )
@@ -0,0 +1,40 @@
+# Файл: it_ecosystem_bot/conftest.py
+"""Общие фикстуры тестов: временная БД database.py и пользователи в ней."""
+import asyncio
+
+import pytest
+
+import database
+from config import DbConfig
+
+
+class TempDb:
+    """Временная БД; run() выполняет сценарий между init_db и close_db в своём цикле событий."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def run(self, scenario):
+        async def main():
+            database.configure_db(DbConfig(path=self.path))
+            await database.init_db()
+            try:
+                return await scenario()
+            finally:
+                await database.close_db()
+
+        return asyncio.run(main())
+
+    async def user(self, telegram_id: int, full_name: str = "Автор", role: str = 'user'):
+        await database.save_authorized_user(telegram_id, {
+            'login': f"u{telegram_id}", 'full_name': full_name, 'department': 'IT', 'position': 'p', 'role': role,
+        })
+
+    async def admins(self, *admin_ids: int):
+        for admin_id in admin_ids:
+            await self.user(admin_id, f"Админ {admin_id}", role='admin')
+
+
+@pytest.fixture
+def db(tmp_path) -> TempDb:
+    return TempDb(str(tmp_path / "test.db"))
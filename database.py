@@ -1,64 +1,180 @@
 ﻿# Файл: it_ecosystem_bot/database.py
 import sqlite3
-import asyncio
 import logging
 import time
 import os
-from typing import Dict, Any, List, Tuple, Optional
+import hashlib
+import json
+from bisect import bisect_left
+from typing import Callable, Dict, Any, Iterable, List, Tuple, Optional
 import re
 
+from config import DbConfig
+from utils.cache import TTLCache
+from utils.db_pool import ConnectionPool, WriteQueue
+
 logger = logging.getLogger(__name__)
 
 DB_PATH = 'it_ecosystem.db'
+DB_POOL_SIZE = 4
+DB_STATEMENT_CACHE_SIZE = 256
+DB_JOURNAL_MODE = 'WAL'
+# Профиль PRAGMA, применяемый к каждому соединению пула и писателя
+DB_PRAGMAS: Dict[str, Any] = {
+    'synchronous': 'NORMAL',
+    'cache_size': -16384,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+_pool: Optional[ConnectionPool] = None
+_writer: Optional[WriteQueue] = None
+
+# Кэши «горячих» чтений; инвалидируются функциями, изменяющими authorized_users/sys_admins
+_role_cache = TTLCache('user_roles')
+_profile_cache = TTLCache('user_profiles')
+_admin_ids_cache = TTLCache('admin_ids', maxsize=1)
+# Сводка заявок: короткий TTL, сбрасывается любой записью в tickets
+_dashboard_cache = TTLCache('ticket_dashboard', maxsize=8, ttl=5.0)
+
+
+# --- ПУЛ СОЕДИНЕНИЙ ---
+def configure_db(db_config: DbConfig):
+    """Применяет настройки БД из конфигурации (вызывается до init_db)."""
+    global DB_PATH, DB_POOL_SIZE, DB_STATEMENT_CACHE_SIZE, DB_JOURNAL_MODE, DB_PRAGMAS
+    _close_connections()
+    DB_PATH = db_config.path
+    DB_POOL_SIZE = db_config.pool_size
+    DB_STATEMENT_CACHE_SIZE = db_config.statement_cache_size
+    DB_JOURNAL_MODE = db_config.journal_mode
+    DB_PRAGMAS = {
+        'synchronous': db_config.synchronous,
+        # отрицательное значение cache_size задаётся в KiB, а не в страницах
+        'cache_size': -abs(db_config.cache_size_kb),
+        'mmap_size': db_config.mmap_size_mb * 1024 * 1024,
+        'temp_store': db_config.temp_store,
+        'busy_timeout': db_config.busy_timeout_ms,
+    }
+    for cache in (_role_cache, _profile_cache):
+        cache.configure(db_config.user_cache_size, db_config.user_cache_ttl_seconds)
+    _admin_ids_cache.configure(1, db_config.user_cache_ttl_seconds)
+    _dashboard_cache.configure(8, db_config.dashboard_cache_ttl_seconds)
+
+
+def _invalidate_user(telegram_id: int):
+    """Сбрасывает кэшированные роль/профиль пользователя и список администраторов."""
+    _role_cache.invalidate(telegram_id)
+    _profile_cache.invalidate(telegram_id)
+    _admin_ids_cache.invalidate('admins')
+
+
+def _invalidate_tickets():
+    """Сбрасывает кэшированную сводку заявок (после любой записи в tickets)."""
+    _dashboard_cache.clear()
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Метрики кэшей (попадания/промахи/вытеснения) для мониторинга."""
+    return {cache.name: cache.stats()
+            for cache in (_role_cache, _profile_cache, _admin_ids_cache, _dashboard_cache)}
+
+
+def _get_pool() -> ConnectionPool:
+    """Возвращает пул соединений для чтения, создавая его при первом обращении."""
+    global _pool
+    if _pool is None or _pool.path != DB_PATH:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(DB_PATH, DB_POOL_SIZE, DB_STATEMENT_CACHE_SIZE, DB_PRAGMAS)
+        logger.info(f"DB: пул соединений создан ({DB_PATH}, size={DB_POOL_SIZE}).")
+    return _pool
+
+
+def _get_writer() -> WriteQueue:
+    """Возвращает очередь единственного потока-писателя."""
+    global _writer
+    if _writer is None or _writer.path != DB_PATH:
+        if _writer is not None:
+            _writer.close()
+        _writer = WriteQueue(DB_PATH, DB_STATEMENT_CACHE_SIZE, DB_PRAGMAS, DB_JOURNAL_MODE)
+    return _writer
+
+
+async def _read(fn):
+    """Выполняет читающую функцию fn(conn) параллельно на пуле чтения."""
+    return await _get_pool().read(fn)
+
+
+async def _write(fn):
+    """Ставит пишущую функцию fn(conn) в очередь писателя и ждёт фиксации транзакции."""
+    return await _get_writer().submit(fn)
+
+
+def _close_connections():
+    global _pool, _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+async def checkpoint_wal(mode: str = 'PASSIVE') -> Tuple[int, int, int] | None:
+    """Переносит накопленный WAL в основной файл БД (периодическая задача планировщика)."""
+
+    def _checkpoint(conn):
+        return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+    result = await _get_writer().maintenance(_checkpoint)
+    if result:
+        busy, log_frames, checkpointed = result
+        logger.info(f"DB: WAL checkpoint {mode}: страниц в журнале {log_frames}, перенесено {checkpointed}, busy={busy}.")
+    return result
+
+
+async def get_db_settings() -> Dict[str, Any]:
+    """Возвращает фактически действующие настройки SQLite (для отчёта при старте)."""
+
+    def _get(conn):
+        settings = {'journal_mode': conn.execute("PRAGMA journal_mode").fetchone()[0]}
+        for name in DB_PRAGMAS:
+            settings[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        return settings
+
+    return await _read(_get)
+
+
+async def close_db():
+    """Дожидается записи очереди писателя и закрывает соединения (при остановке бота)."""
+    if _writer is not None:
+        await _writer.drain()
+    _close_connections()
 
 
 # --- ФУНКЦИИ МИГРАЦИИ И ДОПОЛНЕНИЯ ТАБЛИЦ ---
-def _ensure_workplaces_columns_and_tables():
-    """Проверяет и добавляет необходимые колонки в существующие таблицы (миграция)."""
-    conn = sqlite3.connect(DB_PATH)
+def _ensure_workplaces_columns_and_tables(conn):
+    """Добавляет колонки и таблицы, которых нет в базах старых версий (миграция 2).
+
+    Колонка добавляется, только если её нет в PRAGMA table_info; ошибка ALTER
+    не глотается, а откатывает миграцию, и она повторится при следующем старте.
+    """
     cursor = conn.cursor()
 
-    # --- Миграция workplaces ---
-    cursor.execute("PRAGMA table_info(workplaces)")
-    cols = {r[1] for r in cursor.fetchall()}
-    if 'floor' not in cols:
-        try:
-            cursor.execute("ALTER TABLE workplaces ADD COLUMN floor INTEGER")
-        except sqlite3.Error as e:
-            logger.error(f"DB: Ошибка добавления колонки floor: {e}")
-    if 'primary_pc' not in cols:
-        try:
-            cursor.execute("ALTER TABLE workplaces ADD COLUMN primary_pc TEXT")
-        except sqlite3.Error as e:
-            logger.error(f"DB: Ошибка добавления колонки primary_pc: {e}")
-    if 'peripherals' not in cols:
-        try:
-            cursor.execute("ALTER TABLE workplaces ADD COLUMN peripherals TEXT")
-        except sqlite3.Error as e:
-            logger.error(f"DB: Ошибка добавления колонки peripherals: {e}")
-
-    # --- Миграция authorized_users (email) ---
-    cursor.execute("PRAGMA table_info(authorized_users)")
-    auth_cols = {r[1] for r in cursor.fetchall()}
-    if 'email' not in auth_cols:
-        try:
-            cursor.execute("ALTER TABLE authorized_users ADD COLUMN email TEXT")
-        except sqlite3.Error:
-            pass
-
-    # --- Миграция tickets (pc_name, floor) ---
-    cursor.execute("PRAGMA table_info(tickets)")
-    ticket_cols = {r[1] for r in cursor.fetchall()}
-    if 'pc_name' not in ticket_cols:
-        try:
-            cursor.execute("ALTER TABLE tickets ADD COLUMN pc_name TEXT DEFAULT NULL")
-        except sqlite3.Error:
-            pass
-    if 'floor' not in ticket_cols:
-        try:
-            cursor.execute("ALTER TABLE tickets ADD COLUMN floor INTEGER DEFAULT NULL")
-        except sqlite3.Error:
-            pass
+    missing_columns = [
+        ('workplaces', 'floor', 'INTEGER'),
+        ('workplaces', 'primary_pc', 'TEXT'),
+        ('workplaces', 'peripherals', 'TEXT'),
+        ('authorized_users', 'email', 'TEXT'),
+        ('tickets', 'pc_name', 'TEXT DEFAULT NULL'),
+        ('tickets', 'floor', 'INTEGER DEFAULT NULL'),
+    ]
+    for table, column, definition in missing_columns:
+        cols = {r[1] for r in cursor.execute(f"PRAGMA table_info({table})")}
+        if column not in cols:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            logger.info(f"DB: добавлена колонка {table}.{column}")
 
     # --- Создание дополнительных таблиц, если отсутствуют ---
     cursor.execute("""
@@ -87,45 +203,81 @@ def _ensure_workplaces_columns_and_tables():
         )
     """)
 
-    conn.commit()
-    conn.close()
-
-def _seed_default_workplaces():
-    """Автосоздание рабочих мест по умолчанию, если их нет."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    for sql in [
-        'ALTER TABLE workplaces ADD COLUMN floor INTEGER',
-        'ALTER TABLE workplaces ADD COLUMN primary_pc TEXT',
-        'ALTER TABLE workplaces ADD COLUMN peripherals TEXT',
-    ]:
-        try:
-            c.execute(sql)
-        except Exception:
-            pass
 
-    def upsert(number: str, floor: int):
-        c.execute('SELECT id FROM workplaces WHERE number=?', (number,))
-        row = c.fetchone()
-        if row:
-            c.execute('UPDATE workplaces SET floor=?, primary_pc=? WHERE id=?', (floor, number, row[0]))
-        else:
-            c.execute('INSERT INTO workplaces (number, department, location, floor, primary_pc) VALUES (?, ?, ?, ?, ?)',
-                      (number, None, None, floor, number),)
+# Вторичные индексы под запросы этого модуля: (имя, таблица, колонки).
+# Порядок колонок: сначала равенство из WHERE, затем колонка ORDER BY.
+INDEXES: List[Tuple[str, str, str]] = [
+    ('idx_tickets_user_created', 'tickets', 'user_id, created_at'),
+    ('idx_tickets_status_created', 'tickets', 'status, created_at'),
+    ('idx_tickets_priority_created', 'tickets', 'priority, created_at'),
+    ('idx_tickets_created', 'tickets', 'created_at'),
+    ('idx_ticket_history_ticket', 'ticket_history', 'ticket_id, changed_at'),
+    ('idx_ticket_attachments_ticket', 'ticket_attachments', 'ticket_id'),
+    ('idx_equipment_workplace', 'equipment', 'workplace_id, inv_number'),
+    ('idx_equipment_user_status', 'equipment', 'user_id, status, assigned_at'),
+    ('idx_equipment_status_created', 'equipment', 'status, created_at'),
+    ('idx_equipment_created', 'equipment', 'created_at'),
+    ('idx_authorized_users_role', 'authorized_users', 'role'),
+    ('idx_workplaces_floor', 'workplaces', 'floor, number'),
+    ('idx_user_credentials_user', 'user_credentials', 'telegram_id, created_at'),
+    ('idx_faq_materials_created', 'faq_materials', 'created_at'),
+]
+
 
-    for num in range(2001, 2093):
-        upsert(f'TSS-WS-{num}', 2)
-    for num in range(1, 73):
-        upsert(f'TSS-WS-{num:03d}', 4)
-    for num in range(5001, 5063):
-        upsert(f'TSS-WS-{num}', 5)
+def _ensure_indexes(conn):
+    """Создает вторичные индексы (миграция); повторный запуск ничего не делает."""
+    for name, table, columns in INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
 
-    conn.commit()
-    conn.close()
+
+# Рабочие места по умолчанию: (номер, этаж)
+DEFAULT_WORKPLACES: List[Tuple[str, int]] = (
+    [(f'TSS-WS-{num}', 2) for num in range(2001, 2093)]
+    + [(f'TSS-WS-{num:03d}', 4) for num in range(1, 73)]
+    + [(f'TSS-WS-{num}', 5) for num in range(5001, 5063)]
+)
+WORKPLACES_SEED_KEY = 'workplaces_seed_hash'
+WORKPLACES_SEED_HASH = hashlib.sha256(repr(DEFAULT_WORKPLACES).encode('utf-8')).hexdigest()
+
+
+def _seed_default_workplaces(conn):
+    """Создает/обновляет рабочие места по умолчанию и запоминает хэш сида в db_meta."""
+    conn.executemany("""
+        INSERT INTO workplaces (number, floor, primary_pc) VALUES (?, ?, ?)
+        ON CONFLICT(number) DO UPDATE SET floor = excluded.floor, primary_pc = excluded.primary_pc
+    """, [(number, floor, number) for number, floor in DEFAULT_WORKPLACES])
+    _set_meta(conn, WORKPLACES_SEED_KEY, WORKPLACES_SEED_HASH)
+
+
+USERS_SYNC_META_KEY = 'users_excel_state'
+USERS_SYNC_CHUNK = 5000
+
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _directory_fingerprint(*values) -> str:
+    """Отпечаток строки справочника: меняется при изменении любого синхронизируемого поля."""
+    return hashlib.sha1('\x1f'.join('' if v is None else str(v) for v in values).encode('utf-8')).hexdigest()
 
 
 def import_users_from_excel(file_path: str = "users.xlsx"):
-    """Импортирует пользователей из Excel в auth_directory (замена Excel-парсера)."""
+    """
+    Инкрементально синхронизирует auth_directory с Excel-справочником.
+
+    Если mtime и размер файла не изменились с прошлого запуска, синхронизация
+    пропускается без чтения файла; при изменённом mtime, но прежнем SHA-256
+    обновляется только сохранённое состояние. Иначе лист читается потоково
+    (read_only), для каждой строки считается отпечаток, и одной транзакцией
+    записываются только новые/изменённые логины. Логины, пропавшие из файла
+    или помеченные уволенными, помечаются удалёнными (active = 0, deleted_at).
+    Роль, выданная в боте, при обновлении сохраняется.
+    """
     try:
         from openpyxl import load_workbook
     except ImportError:
@@ -136,74 +288,106 @@ def import_users_from_excel(file_path: str = "users.xlsx"):
         logger.warning(f"Файл {file_path} не найден, пропускаем импорт.")
         return
 
-    wb = load_workbook(file_path)
-    ws = wb.active
-    headers = [cell.value for cell in ws[1]]
-
-    def col(name: str) -> int | None:
-        try:
-            return headers.index(name)
-        except ValueError:
-            return None
-
-    idx_name = col("Name")
-    idx_dept = col("Department")
-    idx_pos = col("Position")
-    idx_login = col("Login")
-    idx_pass = col("Password")
-    idx_email = col("Email Address")
-    idx_status = col("Status")
-
-    if idx_login is None or idx_pass is None:
-        logger.error("В Excel нет столбцов Login/Password, импорт невозможен.")
+    started = time.perf_counter()
+    stat = os.stat(file_path)
+    stored = _get_pool().run(lambda conn: _get_meta(conn, USERS_SYNC_META_KEY))
+    stored_mtime, stored_size, stored_hash = (stored.split(':') if stored else (None, None, None))
+    if stored_mtime == str(stat.st_mtime_ns) and stored_size == str(stat.st_size):
+        logger.info(f"DB: справочник {file_path} не изменился, синхронизация пропущена.")
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    count = 0
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        login = (row[idx_login] or "").strip().lower()
-        password = (row[idx_pass] or "").strip()
-        if not login or not password:
-            continue
-
-        status = (row[idx_status] or "").lower() if idx_status is not None else ""
-        if "terminated" in status or "❌" in status:
-            continue  # пропускаем уволенных
-
-        full_name = row[idx_name] if idx_name is not None else None
-        dept = row[idx_dept] if idx_dept is not None else None
-        pos = row[idx_pos] if idx_pos is not None else None
-        email = row[idx_email] if idx_email is not None else None
+    file_hash = _file_sha256(file_path)
+    state = f"{stat.st_mtime_ns}:{stat.st_size}:{file_hash}"
+    if file_hash == stored_hash:
+        _get_writer().run(lambda conn: _set_meta(conn, USERS_SYNC_META_KEY, state))
+        logger.info(f"DB: содержимое {file_path} не изменилось (изменился только mtime), синхронизация пропущена.")
+        return
 
-        try:
-            c.execute("""
-                INSERT OR REPLACE INTO auth_directory (login, password, full_name, department, position, role, email)
-                VALUES (?, ?, ?, ?, ?, COALESCE((SELECT role FROM auth_directory WHERE login=?), 'user'), ?)
-            """, (login, password, full_name, dept, pos, login, email))
-            count += 1
-        except sqlite3.Error as e:
-            logger.error(f"DB: ошибка импорта пользователя {login}: {e}")
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = [str(h).strip() if h is not None else None for h in next(rows, ())]
+
+        def col(name: str) -> int | None:
+            try:
+                return headers.index(name)
+            except ValueError:
+                return None
+
+        idx_name = col("Name")
+        idx_dept = col("Department")
+        idx_pos = col("Position")
+        idx_login = col("Login")
+        idx_pass = col("Password")
+        idx_email = col("Email Address")
+        idx_status = col("Status")
+
+        if idx_login is None or idx_pass is None:
+            logger.error("В Excel нет столбцов Login/Password, импорт невозможен.")
+            return
 
-    conn.commit()
-    conn.close()
-    logger.info(f"Импортировано пользователей в auth_directory: {count}")
+        def cell(row, idx):
+            return row[idx] if idx is not None and idx < len(row) else None
+
+        existing = _get_pool().run(lambda conn: {
+            login: (fingerprint, active)
+            for login, fingerprint, active in conn.execute("SELECT login, fingerprint, active FROM auth_directory")
+        })
+
+        upserts, total = [], 0
+        for row in rows:
+            login = str(cell(row, idx_login) or "").strip().lower()
+            password = str(cell(row, idx_pass) or "").strip()
+            if not login or not password:
+                continue
+            total += 1
+
+            status = str(cell(row, idx_status) or "").lower()
+            if "terminated" in status or "❌" in status:
+                continue  # уволенные остаются в existing и ниже помечаются удалёнными
+
+            values = (password, cell(row, idx_name), cell(row, idx_dept), cell(row, idx_pos), cell(row, idx_email))
+            fingerprint = _directory_fingerprint(*values)
+            if existing.get(login) != (fingerprint, 1):
+                upserts.append((login, *values, fingerprint))
+            existing.pop(login, None)
+
+        # Всё, что осталось в existing и ещё активно, — пропавшие из файла или уволенные логины
+        deletions = [(login,) for login, (_, active) in existing.items() if active]
+    finally:
+        wb.close()
+
+    def _sync(conn):
+        for pos in range(0, len(upserts), USERS_SYNC_CHUNK):
+            conn.executemany("""
+                INSERT INTO auth_directory (login, password, full_name, department, position, email, fingerprint,
+                                            active, deleted_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1, NULL)
+                ON CONFLICT(login) DO UPDATE SET
+                    password = excluded.password, full_name = excluded.full_name,
+                    department = excluded.department, position = excluded.position, email = excluded.email,
+                    fingerprint = excluded.fingerprint, active = 1, deleted_at = NULL
+            """, upserts[pos:pos + USERS_SYNC_CHUNK])
+        conn.executemany("UPDATE auth_directory SET active = 0, deleted_at = CURRENT_TIMESTAMP WHERE login = ?",
+                         deletions)
+        _set_meta(conn, USERS_SYNC_META_KEY, state)
+
+    _get_writer().run(_sync)
+    logger.info(f"DB: справочник синхронизирован за {time.perf_counter() - started:.2f} c: "
+                f"строк {total}, обновлено {len(upserts)}, помечено удалёнными {len(deletions)}.")
 
 
 async def get_auth_directory_user(login: str) -> Optional[Dict[str, str]]:
     """Получить запись пользователя из справочника auth_directory по логину."""
 
-    def _get():
-        conn = sqlite3.connect(DB_PATH)
+    def _get(conn):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT login, password, full_name, department, position, role, email
             FROM auth_directory
-            WHERE login = ?
+            WHERE login = ? AND active = 1
         """, (login.lower(),))
         row = cursor.fetchone()
-        conn.close()
         if not row:
             return None
         return {
@@ -216,129 +400,504 @@ async def get_auth_directory_user(login: str) -> Optional[Dict[str, str]]:
             "email": row[6],
         }
 
-    return await asyncio.to_thread(_get)
+    return await _read(_get)
 
 
 
-async def init_db():
-    """Инициализирует базу данных и создает все необходимые таблицы."""
+# --- ВЕРСИОНИРОВАННЫЕ МИГРАЦИИ ---
+def _create_base_tables(conn):
+    """Базовая схема: создает основные таблицы приложения."""
+    cursor = conn.cursor()
 
-    def create_tables():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+    # 1. Таблица: authorized_users
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS authorized_users (
+            telegram_id INTEGER PRIMARY KEY, login TEXT UNIQUE, full_name TEXT, department TEXT, position TEXT,
+            role TEXT DEFAULT 'user', email TEXT, authorized_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
 
-        # 1. Таблица: authorized_users
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS authorized_users (
-                telegram_id INTEGER PRIMARY KEY, login TEXT UNIQUE, full_name TEXT, department TEXT, position TEXT,
-                role TEXT DEFAULT 'user', email TEXT, authorized_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    # 2. Таблица: tickets
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, ticket_number TEXT UNIQUE, title TEXT, description TEXT,
+            status TEXT DEFAULT 'open', priority TEXT DEFAULT 'medium', category TEXT, admin_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, closed_at TIMESTAMP, pc_name TEXT, floor INTEGER,
+            FOREIGN KEY (user_id) REFERENCES authorized_users (telegram_id)
+        )
+    """)
 
-        # 2. Таблица: tickets
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tickets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, ticket_number TEXT UNIQUE, title TEXT, description TEXT,
-                status TEXT DEFAULT 'open', priority TEXT DEFAULT 'medium', category TEXT, admin_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, closed_at TIMESTAMP, pc_name TEXT, floor INTEGER,
-                FOREIGN KEY (user_id) REFERENCES authorized_users (telegram_id)
-            )
-        """)
+    # 3. Таблица: sys_admins (Для хранения рейтинга администраторов)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sys_admins (
+            telegram_id INTEGER PRIMARY KEY, full_name TEXT, total_rating REAL DEFAULT 0.0, rating_count INTEGER DEFAULT 0, 
+            FOREIGN KEY (telegram_id) REFERENCES authorized_users (telegram_id)
+        )
+    """)
 
-        # 3. Таблица: sys_admins (Для хранения рейтинга администраторов)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sys_admins (
-                telegram_id INTEGER PRIMARY KEY, full_name TEXT, total_rating REAL DEFAULT 0.0, rating_count INTEGER DEFAULT 0, 
-                FOREIGN KEY (telegram_id) REFERENCES authorized_users (telegram_id)
-            )
-        """)
+    # 4. Таблица: ticket_history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, ticket_id INTEGER NOT NULL, old_status TEXT, new_status TEXT,
+            changed_by INTEGER, changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, comment TEXT,
+            FOREIGN KEY (ticket_id) REFERENCES tickets (id), FOREIGN KEY (changed_by) REFERENCES authorized_users (telegram_id)
+        )
+    """)
 
-        # 4. Таблица: ticket_history
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ticket_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, ticket_id INTEGER NOT NULL, old_status TEXT, new_status TEXT,
-                changed_by INTEGER, changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, comment TEXT,
-                FOREIGN KEY (ticket_id) REFERENCES tickets (id), FOREIGN KEY (changed_by) REFERENCES authorized_users (telegram_id)
-            )
-        """)
+    # 5. Таблица: workplaces (Рабочие места)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS workplaces (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, number TEXT UNIQUE NOT NULL, department TEXT, location TEXT, 
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
 
-        # 5. Таблица: workplaces (Рабочие места)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS workplaces (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, number TEXT UNIQUE NOT NULL, department TEXT, location TEXT, 
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    # 6. Таблица: equipment (Оборудование)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS equipment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, inv_number TEXT UNIQUE NOT NULL, model TEXT, serial TEXT, category TEXT,
+            status TEXT DEFAULT 'available', user_id INTEGER, workplace_id INTEGER, assigned_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES authorized_users (telegram_id),
+            FOREIGN KEY (workplace_id) REFERENCES workplaces (id)
+        )
+    """)
 
-        # 6. Таблица: equipment (Оборудование)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS equipment (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, inv_number TEXT UNIQUE NOT NULL, model TEXT, serial TEXT, category TEXT,
-                status TEXT DEFAULT 'available', user_id INTEGER, workplace_id INTEGER, assigned_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES authorized_users (telegram_id),
-                FOREIGN KEY (workplace_id) REFERENCES workplaces (id)
-            )
-        """)
+    # 7. Таблица: equipment_history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS equipment_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, equipment_id INTEGER NOT NULL, from_user_id INTEGER, to_user_id INTEGER,
+            assigned_by INTEGER, assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, reason TEXT,
+            FOREIGN KEY (equipment_id) REFERENCES equipment (id), FOREIGN KEY (from_user_id) REFERENCES authorized_users (telegram_id),
+            FOREIGN KEY (to_user_id) REFERENCES authorized_users (telegram_id), FOREIGN KEY (assigned_by) REFERENCES authorized_users (telegram_id)
+        )
+    """)
 
-        # 7. Таблица: equipment_history
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS equipment_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, equipment_id INTEGER NOT NULL, from_user_id INTEGER, to_user_id INTEGER,
-                assigned_by INTEGER, assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, reason TEXT,
-                FOREIGN KEY (equipment_id) REFERENCES equipment (id), FOREIGN KEY (from_user_id) REFERENCES authorized_users (telegram_id),
-                FOREIGN KEY (to_user_id) REFERENCES authorized_users (telegram_id), FOREIGN KEY (assigned_by) REFERENCES authorized_users (telegram_id)
-            )
-        """)
+    # 8. Таблица: licenses
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS licenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, license_number TEXT UNIQUE, product TEXT, version TEXT,
+            expiry_date DATE, status TEXT DEFAULT 'active', cost REAL, assigned_to INTEGER, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (assigned_to) REFERENCES authorized_users (telegram_id)
+        )
+    """)
 
-        # 8. Таблица: licenses
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS licenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, license_number TEXT UNIQUE, product TEXT, version TEXT,
-                expiry_date DATE, status TEXT DEFAULT 'active', cost REAL, assigned_to INTEGER, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (assigned_to) REFERENCES authorized_users (telegram_id)
-            )
-        """)
+    # 9. Таблица: faq_materials (КРИТИЧЕСКИ ВАЖНО)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS faq_materials (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, 
+            title TEXT NOT NULL, 
+            description TEXT,
+            file_id TEXT,
+            file_type TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
 
-        # 9. Таблица: faq_materials (КРИТИЧЕСКИ ВАЖНО)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS faq_materials (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                title TEXT NOT NULL, 
-                description TEXT,
-                file_id TEXT,
-                file_type TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+    # 10. Таблица: auth_directory (справочник логинов/паролей)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS auth_directory (
+            login TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            full_name TEXT,
+            department TEXT,
+            position TEXT,
+            role TEXT DEFAULT 'user',
+            email TEXT
+        )
+    """)
 
-        # 10. Таблица: auth_directory (справочник логинов/паролей)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS auth_directory (
-                login TEXT PRIMARY KEY,
-                password TEXT NOT NULL,
-                full_name TEXT,
-                department TEXT,
-                position TEXT,
-                role TEXT DEFAULT 'user',
-                email TEXT
-            )
+def _create_ticket_sequences(conn):
+    """Счётчики номеров заявок по дням; заполняются по уже выданным номерам TKyymmddNNNN."""
+    conn.execute("CREATE TABLE IF NOT EXISTS ticket_sequences (day TEXT PRIMARY KEY, last_value INTEGER NOT NULL)")
+    conn.execute("""
+        INSERT OR IGNORE INTO ticket_sequences (day, last_value)
+        SELECT substr(ticket_number, 3, 6), MAX(CAST(substr(ticket_number, 9) AS INTEGER))
+        FROM tickets
+        WHERE ticket_number GLOB 'TK[0-9][0-9][0-9][0-9][0-9][0-9]*'
+        GROUP BY substr(ticket_number, 3, 6)
+    """)
+
+
+def _add_auth_directory_sync_columns(conn):
+    """Колонки инкрементальной синхронизации справочника: отпечаток строки и пометка удаления."""
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(auth_directory)")}
+    if 'fingerprint' not in cols:
+        conn.execute("ALTER TABLE auth_directory ADD COLUMN fingerprint TEXT")
+    if 'active' not in cols:
+        conn.execute("ALTER TABLE auth_directory ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+    if 'deleted_at' not in cols:
+        conn.execute("ALTER TABLE auth_directory ADD COLUMN deleted_at TIMESTAMP")
+
+
+def _create_broadcast_tables(conn):
+    """Рассылки и состояние доставки по каждому получателю (для возобновления после рестарта)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, text TEXT NOT NULL, file_id TEXT, file_type TEXT,
+            created_by INTEGER, status TEXT NOT NULL DEFAULT 'running', progress_chat_id INTEGER,
+            progress_message_id INTEGER, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, finished_at TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            broadcast_id INTEGER NOT NULL, chat_id INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0, error TEXT, updated_at TIMESTAMP,
+            PRIMARY KEY (broadcast_id, chat_id),
+            FOREIGN KEY (broadcast_id) REFERENCES broadcasts (id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_broadcast_deliveries_status "
+                 "ON broadcast_deliveries (broadcast_id, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts (status)")
+
+
+def _create_faq_deliveries(conn):
+    """Кому какой материал FAQ уже доставлен; рассылка материала связывается с ним через broadcasts.faq_id."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS faq_deliveries (
+            faq_id INTEGER NOT NULL, telegram_id INTEGER NOT NULL, delivered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (faq_id, telegram_id),
+            FOREIGN KEY (faq_id) REFERENCES faq_materials (id)
+        ) WITHOUT ROWID
+    """)
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(broadcasts)")}
+    if 'faq_id' not in cols:
+        conn.execute("ALTER TABLE broadcasts ADD COLUMN faq_id INTEGER REFERENCES faq_materials (id)")
+
+
+INVENTORY_NUMBER_RE = re.compile(r'^([A-Z]+)-(\d{4})-(\d+)$')
+
+
+def _create_inventory_sequences(conn):
+    """Счётчики инвентарных номеров по (код категории, год); заполняются по существующему оборудованию."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS inventory_sequences (
+            category_code TEXT NOT NULL, year INTEGER NOT NULL, last_value INTEGER NOT NULL,
+            PRIMARY KEY (category_code, year)
+        )
+    """)
+    last_values: Dict[Tuple[str, int], int] = {}
+    for (inv_number,) in conn.execute("SELECT inv_number FROM equipment"):
+        match = INVENTORY_NUMBER_RE.match(inv_number or '')
+        if match:
+            key = (match.group(1), int(match.group(2)))
+            last_values[key] = max(last_values.get(key, 0), int(match.group(3)))
+    conn.executemany("INSERT OR IGNORE INTO inventory_sequences (category_code, year, last_value) VALUES (?, ?, ?)",
+                     [(code, year, value) for (code, year), value in last_values.items()])
+
+
+# Разрезы сводки заявок; для каждого ведётся счётчик в ticket_counters и есть индекс (<разрез>, created_at)
+DASHBOARD_DIMENSIONS = ('status', 'priority', 'floor', 'category')
+
+
+def _counter_delta_sql(dim: str, ref: str, delta: int, condition: str = "") -> str:
+    where = f"{ref}.{dim} IS NOT NULL" + (f" AND {condition}" if condition else "")
+    return (f"INSERT INTO ticket_counters (dim, value, count) SELECT '{dim}', {ref}.{dim}, {delta} WHERE {where} "
+            f"ON CONFLICT(dim, value) DO UPDATE SET count = count + ({delta});")
+
+
+def _create_ticket_counters(conn):
+    """
+    Счётчики заявок по разрезам сводки, которые ведут триггеры на tickets.
+    Сводка читает готовые числа вместо подсчёта по всей таблице.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_counters (
+            dim TEXT NOT NULL, value NOT NULL, count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dim, value)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_floor_created ON tickets (floor, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tickets_category_created ON tickets (category, created_at)")
+
+    inserted = "\n".join(_counter_delta_sql(dim, "NEW", 1) for dim in DASHBOARD_DIMENSIONS)
+    deleted = "\n".join(_counter_delta_sql(dim, "OLD", -1) for dim in DASHBOARD_DIMENSIONS)
+    updated = "\n".join(
+        _counter_delta_sql(dim, "OLD", -1, f"OLD.{dim} IS NOT NEW.{dim}") + "\n"
+        + _counter_delta_sql(dim, "NEW", 1, f"OLD.{dim} IS NOT NEW.{dim}")
+        for dim in DASHBOARD_DIMENSIONS
+    )
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_insert AFTER INSERT ON tickets BEGIN\n{inserted}\nEND")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_delete AFTER DELETE ON tickets BEGIN\n{deleted}\nEND")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_ticket_counters_update "
+                 f"AFTER UPDATE OF {', '.join(DASHBOARD_DIMENSIONS)} ON tickets BEGIN\n{updated}\nEND")
+
+    # Начальные значения по уже накопленным заявкам
+    conn.execute("DELETE FROM ticket_counters")
+    for dim in DASHBOARD_DIMENSIONS:
+        conn.execute(f"""
+            INSERT INTO ticket_counters (dim, value, count)
+            SELECT '{dim}', {dim}, COUNT(*) FROM tickets WHERE {dim} IS NOT NULL GROUP BY {dim}
         """)
 
-        conn.commit()
-        conn.close()
 
-    await asyncio.to_thread(create_tables)
-    await asyncio.to_thread(_ensure_workplaces_columns_and_tables)
-    await asyncio.to_thread(_seed_default_workplaces)
+# Верхние границы корзин гистограммы времени закрытия, секунды (последняя — «больше 30 дней»)
+CLOSE_TIME_BUCKETS: Tuple[int, ...] = (
+    5 * 60, 15 * 60, 30 * 60, 3600, 2 * 3600, 4 * 3600, 8 * 3600, 86400, 2 * 86400, 3 * 86400,
+    7 * 86400, 14 * 86400, 30 * 86400,
+)
+ADMIN_STATS_ALL = 'all'  # period для накопленной статистики; остальные периоды — дни 'YYYY-MM-DD'
+CLOSED_TICKET_STATUSES = ('await_rating', 'closed')  # заявка решена: учитывается в статистике закрытий
+
+
+def _create_admin_stats(conn):
+    """
+    Материализованная статистика администраторов: счётчики за всё время и по дням,
+    гистограмма времени закрытия (для p90) и оценок. Ведётся в тех же транзакциях,
+    что закрывают и оценивают заявки.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_stats (
+            admin_id INTEGER NOT NULL, period TEXT NOT NULL,
+            closed_count INTEGER NOT NULL DEFAULT 0, close_seconds_sum REAL NOT NULL DEFAULT 0,
+            rating_count INTEGER NOT NULL DEFAULT 0, rating_sum INTEGER NOT NULL DEFAULT 0,
+            rating_1 INTEGER NOT NULL DEFAULT 0, rating_2 INTEGER NOT NULL DEFAULT 0,
+            rating_3 INTEGER NOT NULL DEFAULT 0, rating_4 INTEGER NOT NULL DEFAULT 0,
+            rating_5 INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (admin_id, period)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_close_time_buckets (
+            admin_id INTEGER NOT NULL, period TEXT NOT NULL, bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (admin_id, period, bucket)
+        ) WITHOUT ROWID
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tickets)")}
+    if 'rating' not in columns:
+        conn.execute("ALTER TABLE tickets ADD COLUMN rating INTEGER")
+
+    # Начальные значения: закрытые заявки из истории и суммарные оценки из sys_admins
+    closed = conn.execute("""
+        SELECT admin_id, date(closed_at), (julianday(closed_at) - julianday(created_at)) * 86400
+        FROM tickets
+        WHERE admin_id IS NOT NULL AND closed_at IS NOT NULL AND status IN ('await_rating', 'closed')
+    """).fetchall()
+    for admin_id, day, seconds in closed:
+        _record_ticket_closed(conn, admin_id, day, seconds)
+    for admin_id, total_rating, rating_count in conn.execute(
+            "SELECT telegram_id, total_rating, rating_count FROM sys_admins WHERE rating_count > 0").fetchall():
+        conn.execute("""
+            INSERT INTO admin_stats (admin_id, period, rating_count, rating_sum) VALUES (?, ?, ?, ?)
+            ON CONFLICT(admin_id, period) DO UPDATE SET
+                rating_count = excluded.rating_count, rating_sum = excluded.rating_sum
+        """, (admin_id, ADMIN_STATS_ALL, rating_count, total_rating))
+
+
+def _create_sla_events(conn):
+    """Сработавшие SLA-эскалации: по одной записи на (заявка, вид срока), чтобы не эскалировать повторно."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sla_events (
+            ticket_id INTEGER NOT NULL, kind TEXT NOT NULL, fired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (ticket_id, kind)
+        ) WITHOUT ROWID
+    """)
+
+
+def _create_scheduled_mailings(conn):
+    """
+    Плановые рассылки и хранилище задач APScheduler. Задача ссылается на рассылку по id,
+    текст и получатели читаются в момент запуска. Активная рассылка с тем же текстом и
+    расписанием может быть только одна (частичный уникальный индекс).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scheduled_mailings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, text TEXT NOT NULL, text_hash TEXT NOT NULL,
+            schedule TEXT NOT NULL, created_by INTEGER, status TEXT NOT NULL DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, cancelled_at TIMESTAMP,
+            last_run_at TIMESTAMP, last_broadcast_id INTEGER REFERENCES broadcasts (id)
+        )
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_scheduled_mailings_active "
+                 "ON scheduled_mailings (schedule, text_hash) WHERE status = 'active'")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_jobs (
+            id TEXT PRIMARY KEY, next_run_time REAL, job_state BLOB NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scheduler_jobs_next_run ON scheduler_jobs (next_run_time)")
+
+
+def _create_fsm_states(conn):
+    """Состояния FSM диалогов (utils/fsm_storage.py): переживают рестарт, брошенные удаляются по updated_at."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL DEFAULT '{}', updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states (updated_at)")
+
+
+def _create_notification_outbox(conn):
+    """
+    Outbox уведомлений (utils/notifications.py): строки пишутся в транзакции изменения заявки,
+    отправляет их фоновый воркер. Время — unix-секунды (REAL), задержка доставки = sent_at - created_at.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, kind TEXT NOT NULL,
+            payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL, created_at REAL NOT NULL, sent_at REAL, error TEXT
+        )
+    """)
+    # Выборка к отправке идёт по (status, next_attempt_at) уже в нужном порядке, без сортировки
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notification_outbox_due "
+                 "ON notification_outbox (status, next_attempt_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notification_outbox_status "
+                 "ON notification_outbox (status, sent_at)")
+
+
+def _add_ticket_versions(conn):
+    """
+    Версия заявки для оптимистичной блокировки (каждое изменение статуса/исполнителя увеличивает её)
+    и индекс карточек: какое сообщение о заявке получил каждый администратор (utils/ticket_cards.py).
+    """
+    ticket_cols = {r[1] for r in conn.execute("PRAGMA table_info(tickets)")}
+    if 'version' not in ticket_cols:
+        conn.execute("ALTER TABLE tickets ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ticket_notifications (
+            ticket_id INTEGER NOT NULL, chat_id INTEGER NOT NULL, message_id INTEGER NOT NULL,
+            sent_at REAL NOT NULL, PRIMARY KEY (ticket_id, chat_id, message_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ticket_notifications_sent ON ticket_notifications (sent_at)")
+
+
+def _create_admin_routes(conn):
+    """Маршрутизация уведомлений о новых заявках: за какие этажи и категории отвечает администратор."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS admin_routes (
+            admin_id INTEGER NOT NULL, kind TEXT NOT NULL CHECK (kind IN ('floor', 'category')),
+            value TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (admin_id, kind, value)
+        ) WITHOUT ROWID
+    """)
+
+
+def _backfill_status_closes(conn):
+    """
+    Заявки, закрытые через меню статусов до того, как update_ticket_status стал вести
+    статистику: closed_at берётся из последнего перехода в закрытый статус по истории,
+    и закрытие учитывается в admin_stats.
+    """
+    closed = conn.execute("""
+        UPDATE tickets SET closed_at = (
+            SELECT MAX(h.changed_at) FROM ticket_history h
+            WHERE h.ticket_id = tickets.id AND h.new_status IN ('await_rating', 'closed')
+        )
+        WHERE closed_at IS NULL AND admin_id IS NOT NULL AND status IN ('await_rating', 'closed')
+        RETURNING admin_id, date(closed_at), (julianday(closed_at) - julianday(created_at)) * 86400
+    """).fetchall()
+    for admin_id, day, seconds in closed:
+        if day is not None:
+            _record_ticket_closed(conn, admin_id, day, seconds)
+
+
+# Упорядоченный реестр миграций: (версия, имя, функция). Каждая версия применяется
+# один раз в собственной транзакции и фиксируется в schema_version.
+# Новые шаги добавляются только в конец списка, уже выпущенные не меняются.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, 'base_tables', _create_base_tables),
+    (2, 'legacy_columns_and_tables', _ensure_workplaces_columns_and_tables),
+    (3, 'secondary_indexes', _ensure_indexes),
+    (4, 'ticket_sequences', _create_ticket_sequences),
+    (5, 'inventory_sequences', _create_inventory_sequences),
+    (6, 'auth_directory_sync', _add_auth_directory_sync_columns),
+    (7, 'broadcasts', _create_broadcast_tables),
+    (8, 'faq_deliveries', _create_faq_deliveries),
+    (9, 'ticket_counters', _create_ticket_counters),
+    (10, 'admin_stats', _create_admin_stats),
+    (11, 'sla_events', _create_sla_events),
+    (12, 'scheduled_mailings', _create_scheduled_mailings),
+    (13, 'fsm_states', _create_fsm_states),
+    (14, 'notification_outbox', _create_notification_outbox),
+    (15, 'ticket_versions', _add_ticket_versions),
+    (16, 'admin_routes', _create_admin_routes),
+    (17, 'status_closes', _backfill_status_closes),
+]
+
+
+def _create_meta_tables(conn):
+    """Служебные таблицы: журнал применённых миграций и key-value метаданные БД."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS db_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+
+def _get_meta(conn, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM db_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(conn, key: str, value: str):
+    conn.execute("INSERT INTO db_meta (key, value) VALUES (?, ?) "
+                 "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+
+def _read_schema_state(conn) -> Tuple[set, Optional[str]] | None:
+    """Возвращает (применённые версии, хэш сида рабочих мест) или None для БД без служебных таблиц."""
+    cursor = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('schema_version', 'db_meta')")
+    if cursor.fetchone()[0] < 2:
+        return None
+    applied = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+    return applied, _get_meta(conn, WORKPLACES_SEED_KEY)
+
+
+def _migration_step(version: int, name: str, migrate: Callable[[sqlite3.Connection], None]):
+    def _apply(conn):
+        # Повторная проверка внутри транзакции писателя: версию мог применить другой процесс
+        if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone():
+            return False
+        migrate(conn)
+        conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+        return True
+
+    return _apply
+
+
+async def init_db():
+    """Приводит схему к актуальной версии и при необходимости обновляет сид рабочих мест."""
+    # Писатель открывается первым: он переводит файл в journal_mode профиля до открытия читающих соединений
+    await _get_writer().maintenance(lambda conn: None)
+    state = await _read(_read_schema_state)
+    if state is None:
+        await _write(_create_meta_tables)
+        state = (set(), None)
+    applied, seed_hash = state
+
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        started = time.perf_counter()
+        try:
+            done = await _write(_migration_step(version, name, migrate))
+        except sqlite3.Error as e:
+            logger.critical(f"DB: миграция {version} ({name}) не применена: {e}")
+            raise
+        if done:
+            logger.info(f"DB: применена миграция {version} ({name}) за {time.perf_counter() - started:.3f} c")
+
+    if seed_hash != WORKPLACES_SEED_HASH:
+        await _write(_seed_default_workplaces)
+        logger.info(f"DB: сид рабочих мест обновлён ({len(DEFAULT_WORKPLACES)} записей)")
+
+    settings = await get_db_settings()
+    logger.info("DB: профиль SQLite: " + ", ".join(f"{k}={v}" for k, v in settings.items()))
+
 
 # --- ОСНОВНЫЕ ФУНКЦИИ ПОЛЬЗОВАТЕЛЯ И АВТОРИЗАЦИИ ---
 
 async def save_authorized_user(telegram_id: int, user_data: Dict[str, str]):
     """Сохраняет нового авторизованного пользователя в authorized_users."""
 
-    def insert_user():
-        conn = sqlite3.connect(DB_PATH)
+    def insert_user(conn):
         cursor = conn.cursor()
         login = user_data['login']
         full_name = user_data['full_name']
@@ -355,40 +914,47 @@ async def save_authorized_user(telegram_id: int, user_data: Dict[str, str]):
             return True
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка сохранения пользователя {telegram_id}: {e}")
-            return False
-        finally:
-            conn.commit()
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(insert_user)
+    try:
+        result = await _write(insert_user)
+    except sqlite3.Error:
+        return False
+    _invalidate_user(telegram_id)
+    return result
 
 
 async def get_user_role(telegram_id: int) -> str | None:
-    """Получает роль пользователя."""
+    """Получает роль пользователя (через кэш)."""
+    hit, role = _role_cache.get(telegram_id)
+    if hit:
+        return role
 
-    def fetch_role():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_role(conn):
         cursor = conn.cursor()
         cursor.execute("SELECT role FROM authorized_users WHERE telegram_id = ?", (telegram_id,))
         result = cursor.fetchone()
-        conn.close()
         return result[0] if result else None
 
-    return await asyncio.to_thread(fetch_role)
+    generation = _role_cache.generation()
+    role = await _read(fetch_role)
+    _role_cache.set(telegram_id, role, generation)
+    return role
 
 
 async def get_full_user_profile(telegram_id: int) -> Dict[str, str] | None:
-    """Получает полные данные профиля для отображения."""
+    """Получает полные данные профиля для отображения (через кэш)."""
+    hit, profile = _profile_cache.get(telegram_id)
+    if hit:
+        return dict(profile) if profile else None
 
-    def fetch_profile():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_profile(conn):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT full_name, login, department, position, role, email, authorized_at
             FROM authorized_users WHERE telegram_id = ?
         """, (telegram_id,))
         result = cursor.fetchone()
-        conn.close()
         if result:
             return {
                 'full_name': result[0],
@@ -401,41 +967,57 @@ async def get_full_user_profile(telegram_id: int) -> Dict[str, str] | None:
             }
         return None
 
-    return await asyncio.to_thread(fetch_profile)
+    generation, role_generation = _profile_cache.generation(), _role_cache.generation()
+    profile = await _read(fetch_profile)
+    _profile_cache.set(telegram_id, profile, generation)
+    # Роль входит в профиль: заодно прогреваем кэш ролей
+    _role_cache.set(telegram_id, profile['role'] if profile else None, role_generation)
+    return dict(profile) if profile else None
 
 
 async def remove_authorized_user(telegram_id: int) -> bool:
     """Удаляет пользователя из таблицы authorized_users (деавторизация)."""
 
-    def delete_user():
-        conn = sqlite3.connect(DB_PATH)
+    def delete_user(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("DELETE FROM authorized_users WHERE telegram_id = ?", (telegram_id,))
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка удаления пользователя {telegram_id}: {e}")
-            return False
-        finally:
-            conn.commit()
-            conn.close()
-            return True
+            raise
+        return True
 
-    return await asyncio.to_thread(delete_user)
+    try:
+        result = await _write(delete_user)
+    except sqlite3.Error:
+        return False
+    _invalidate_user(telegram_id)
+    return result
 
 
 # --- ФУНКЦИИ УПРАВЛЕНИЯ ЗАЯВКАМИ ---
 
-async def save_new_ticket(user_id: int, data: Dict[str, Any]) -> Tuple[int, str]:
-    """��������� ����� ������ � ������� (id, �����)."""
-
-    def insert_ticket():
-        conn = sqlite3.connect(DB_PATH)
+async def save_new_ticket(user_id: int, data: Dict[str, Any], notify_admins: bool = False,
+                          assignee: int | None = None, recipients: Iterable[int] | None = None) -> Tuple[int, str]:
+    """
+    Сохраняет новую заявку и возвращает (id, номер).
+    notify_admins: уведомления администраторам ставятся в outbox в той же транзакции.
+    assignee: исполнитель, выбранный автоназначением; заявка остаётся 'open', пока он её не возьмёт.
+    recipients: ответственные администраторы (utils/routing.py); уведомляются только те из них, кто
+    всё ещё администратор, а если таких нет (или recipients не задан) — все администраторы.
+    """
+    recipients = sorted(set(recipients or ()))
+
+    def insert_ticket(conn):
         cursor = conn.cursor()
         date_part = time.strftime("%y%m%d", time.localtime())
-        cursor.execute(f"SELECT MAX(ticket_number) FROM tickets WHERE ticket_number LIKE 'TK{date_part}%'" )
-        last_num = cursor.fetchone()[0]
-
-        sequence = int(last_num[-4:]) + 1 if last_num else 1
+        # Счётчик дня увеличивается в той же транзакции, что и вставка заявки
+        cursor.execute("""
+            INSERT INTO ticket_sequences (day, last_value) VALUES (?, 1)
+            ON CONFLICT(day) DO UPDATE SET last_value = last_value + 1
+            RETURNING last_value
+        """, (date_part,))
+        sequence = cursor.fetchone()[0]
         ticket_number = f"TK{date_part}{sequence:04d}"
 
         columns = ["user_id", "ticket_number", "title", "description", "category", "priority"]
@@ -454,38 +1036,118 @@ async def save_new_ticket(user_id: int, data: Dict[str, Any]) -> Tuple[int, str]
         if 'workplace' in data:
             columns.append("pc_name")
             values.append(data.get('workplace'))
+        if assignee is not None:
+            columns.append("admin_id")
+            values.append(assignee)
 
         cols_sql = ", ".join(columns)
         placeholders = ", ".join(["?"] * len(values))
         cursor.execute(f"INSERT INTO tickets ({cols_sql}) VALUES ({placeholders})", values)
 
         ticket_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        admin_name = None
+        if assignee is not None:
+            cursor.execute("""
+                INSERT INTO ticket_history (ticket_id, old_status, new_status, changed_by, comment)
+                VALUES (?, 'open', 'open', NULL, 'Назначена автоматически')
+            """, (ticket_id,))
+            row = cursor.execute("""
+                SELECT COALESCE(a.full_name, u.full_name)
+                FROM authorized_users u LEFT JOIN sys_admins a ON a.telegram_id = u.telegram_id
+                WHERE u.telegram_id = ?
+            """, (assignee,)).fetchone()
+            admin_name = row[0] if row else None
+        if notify_admins:
+            author = cursor.execute("SELECT full_name FROM authorized_users WHERE telegram_id = ?",
+                                    (user_id,)).fetchone()
+            admin_ids = []
+            if recipients:
+                placeholders = ", ".join(["?"] * len(recipients))
+                admin_ids = [row[0] for row in cursor.execute(
+                    f"SELECT telegram_id FROM authorized_users WHERE role = 'admin' AND telegram_id IN ({placeholders})",
+                    recipients)]
+            if not admin_ids:
+                admin_ids = [row[0] for row in cursor.execute(
+                    "SELECT telegram_id FROM authorized_users WHERE role = 'admin'")]
+            _enqueue_notifications(conn, 'ticket_created', admin_ids, {
+                'ticket_id': ticket_id, 'number': ticket_number, 'author': author[0] if author else None,
+                'floor': data.get('floor'), 'workplace': data.get('workplace'),
+                'category': data.get('category'), 'title': data.get('title'), 'version': 0,
+                'admin_id': assignee, 'admin_name': admin_name,
+            })
         return ticket_id, ticket_number
 
-    return await asyncio.to_thread(insert_ticket)
+    result = await _write(insert_ticket)
+    _invalidate_tickets()
+    return result
 
 
 async def get_admin_telegram_ids() -> list[int]:
-    """Получает все Telegram ID пользователей с ролью 'admin'."""
+    """Получает все Telegram ID пользователей с ролью 'admin' (через кэш)."""
+    hit, admin_ids = _admin_ids_cache.get('admins')
+    if hit:
+        return list(admin_ids)
 
-    def fetch_admin_ids():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_admin_ids(conn):
         cursor = conn.cursor()
         cursor.execute("SELECT telegram_id FROM authorized_users WHERE role = 'admin'")
         admin_ids = [row[0] for row in cursor.fetchall()]
-        conn.close()
         return admin_ids
 
-    return await asyncio.to_thread(fetch_admin_ids)
+    generation = _admin_ids_cache.generation()
+    admin_ids = await _read(fetch_admin_ids)
+    _admin_ids_cache.set('admins', tuple(admin_ids), generation)
+    return admin_ids
+
+
+async def get_admin_routes() -> List[Tuple[int, str, str]]:
+    """Вся таблица маршрутизации (администратор, 'floor' / 'category', значение) — для индекса в памяти."""
+
+    def fetch_routes(conn):
+        return [tuple(row) for row in conn.execute("SELECT admin_id, kind, value FROM admin_routes")]
+
+    return await _read(fetch_routes)
+
+
+async def add_admin_route(admin_id: int, kind: str, value: str) -> bool:
+    """Добавляет маршрут; False — если он уже был."""
+
+    def _add(conn):
+        return conn.execute("INSERT OR IGNORE INTO admin_routes (admin_id, kind, value) VALUES (?, ?, ?)",
+                            (admin_id, kind, value)).rowcount > 0
+
+    return await _write(_add)
+
+
+async def remove_admin_routes(admin_id: int, kind: str | None = None, value: str | None = None) -> int:
+    """Удаляет маршруты администратора: все, все одного вида или один; возвращает число удалённых."""
+
+    def _remove(conn):
+        return conn.execute("""
+            DELETE FROM admin_routes
+            WHERE admin_id = ? AND (? IS NULL OR kind = ?) AND (? IS NULL OR value = ?)
+        """, (admin_id, kind, kind, value, value)).rowcount
+
+    return await _write(_remove)
+
+
+async def get_open_ticket_loads() -> List[Dict[str, Any]]:
+    """Незакрытые заявки с исполнителем — для расчёта нагрузки администраторов (utils/assignment.py)."""
+
+    def fetch_loads(conn):
+        rows = conn.execute("""
+            SELECT id, admin_id, priority, floor FROM tickets
+            WHERE status IN ('open', 'in_progress', 'on_hold') AND admin_id IS NOT NULL
+        """).fetchall()
+        return [{'id': row[0], 'admin_id': row[1], 'priority': row[2], 'floor': row[3]} for row in rows]
+
+    return await _read(fetch_loads)
 
 
 async def get_all_tickets(status: str = None, department: str = None, priority: str = None) -> List[Dict]:
     """Получает список всех заявок с опциональной фильтрацией."""
 
-    def fetch_tickets():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_tickets(conn):
         cursor = conn.cursor()
         query = """
             SELECT t.id, t.ticket_number, t.title, t.status, t.priority, t.category, 
@@ -509,17 +1171,15 @@ async def get_all_tickets(status: str = None, department: str = None, priority:
                 'category': row[5], 'user_id': row[6], 'admin_id': row[7], 'created_at': row[8],
                 'user_name': row[9], 'department': row[10]
             })
-        conn.close()
         return tickets
 
-    return await asyncio.to_thread(fetch_tickets)
+    return await _read(fetch_tickets)
 
 
 async def get_ticket_by_id(ticket_id: int) -> Dict | None:
     """Возвращает подробную информацию по тикету (по id)."""
 
-    def _get():
-        conn = sqlite3.connect(DB_PATH)
+    def _get(conn):
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -531,60 +1191,246 @@ async def get_ticket_by_id(ticket_id: int) -> Dict | None:
         """, (ticket_id,))
 
         row = cursor.fetchone()
-        conn.close()
         return row  # Возвращает tuple
 
-    return await asyncio.to_thread(_get)
+    return await _read(_get)
+
+
+TICKETS_PAGE_SIZE = 10
+
+# Общая выборка для списков заявок; порядок (created_at, id) по убыванию совпадает с индексами idx_tickets_*_created
+_TICKET_LIST_SELECT = """
+    SELECT t.id, t.ticket_number, t.title, t.status, t.priority, t.category,
+           t.user_id, t.admin_id, t.created_at, u.full_name, u.department
+    FROM tickets t
+    LEFT JOIN authorized_users u ON t.user_id = u.telegram_id
+"""
+
+
+def _ticket_list_row(row) -> Dict:
+    return {
+        'id': row[0], 'number': row[1], 'title': row[2], 'status': row[3], 'priority': row[4],
+        'category': row[5], 'user_id': row[6], 'admin_id': row[7], 'created_at': row[8],
+        'user_name': row[9], 'department': row[10]
+    }
+
+
+async def get_tickets_page(status: str = None, priority: str = None, department: str = None,
+                           after_id: int = None, before_id: int = None,
+                           limit: int = TICKETS_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Страница заявок (новые сверху) с keyset-пагинацией.
+
+    after_id — следующая страница после заявки с этим id, before_id — предыдущая
+    страница перед ней. Стоимость не зависит от номера страницы: позиция ищется
+    по индексу, а не пропуском OFFSET строк.
+    Возвращает {'tickets': [...], 'has_prev': bool, 'has_next': bool}.
+    """
+
+    def fetch_page(conn):
+        conditions, params = [], []
+        if status: conditions.append("t.status = ?"); params.append(status)
+        if priority: conditions.append("t.priority = ?"); params.append(priority)
+        if department: conditions.append("u.department = ?"); params.append(department)
+
+        backwards = before_id is not None
+        anchor = before_id if backwards else after_id
+        if anchor is not None:
+            op = ">" if backwards else "<"
+            conditions.append(f"(t.created_at, t.id) {op} (SELECT created_at, id FROM tickets WHERE id = ?)")
+            params.append(anchor)
+
+        order = "ASC" if backwards else "DESC"
+        query = _TICKET_LIST_SELECT
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY t.created_at {order}, t.id {order} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = conn.execute(query, params).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+            has_prev, has_next = more, True
+        else:
+            has_prev, has_next = anchor is not None, more
+        return {'tickets': [_ticket_list_row(row) for row in rows], 'has_prev': has_prev, 'has_next': has_next}
+
+    return await _read(fetch_page)
+
+
+DASHBOARD_TOP_N = 5
+
+# Один запрос на всю сводку: группы берутся из ticket_counters, последние заявки каждой
+# группы — по индексу (<разрез>, created_at) с LIMIT, поэтому объём работы не зависит от размера истории
+_DASHBOARD_SQL = " UNION ALL ".join(f"""
+    SELECT g.dim AS dim, g.value AS value, g.count AS count, t.id AS id, t.ticket_number AS number,
+           t.title AS title, t.status AS status, t.priority AS priority, t.created_at AS created_at
+    FROM ticket_counters g
+    JOIN tickets t ON t.id IN (
+        SELECT id FROM tickets WHERE {dim} = g.value ORDER BY created_at DESC, id DESC LIMIT :top_n
+    )
+    WHERE g.dim = '{dim}' AND g.count > 0
+""" for dim in DASHBOARD_DIMENSIONS) + " ORDER BY dim, count DESC, value, created_at DESC, id DESC"
+
+
+async def get_ticket_dashboard(top_n: int = DASHBOARD_TOP_N) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Сводка заявок по статусам, приоритетам, этажам и категориям.
+
+    Возвращает {разрез: [{'value', 'count', 'tickets': [top_n новейших]}, ...]}, группы
+    отсортированы по убыванию count. Результат кэшируется на несколько секунд и
+    сбрасывается при изменении заявок.
+    """
+    hit, dashboard = _dashboard_cache.get(top_n)
+    if hit:
+        return dashboard
+
+    def fetch_dashboard(conn):
+        dashboard = {dim: [] for dim in DASHBOARD_DIMENSIONS}
+        groups = {}
+        for dim, value, count, ticket_id, number, title, status, priority, created_at in conn.execute(
+                _DASHBOARD_SQL, {'top_n': top_n}):
+            group = groups.get((dim, value))
+            if group is None:
+                group = groups[(dim, value)] = {'value': value, 'count': count, 'tickets': []}
+                dashboard[dim].append(group)
+            group['tickets'].append({
+                'id': ticket_id, 'number': number, 'title': title, 'status': status,
+                'priority': priority, 'created_at': created_at,
+            })
+        return dashboard
 
+    generation = _dashboard_cache.generation()
+    dashboard = await _read(fetch_dashboard)
+    _dashboard_cache.set(top_n, dashboard, generation)
+    return dashboard
 
-async def assign_ticket_to_admin(ticket_id: int, admin_id: int, old_status: str = 'open') -> bool:
-    """Назначает заявку на администратора и устанавливает статус 'in_progress'."""
 
-    def assign_ticket():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                UPDATE tickets SET admin_id = ?, status = 'in_progress' WHERE id = ? AND status = ?
-            """, (admin_id, ticket_id, old_status))
+async def get_ticket_details(ticket_id: int) -> Dict | None:
+    """Одна заявка по первичному ключу: описание, автор, исполнитель и вложения."""
 
-            if cursor.rowcount > 0:
-                old_status_for_history = 'open'
-                cursor.execute("""
-                    INSERT INTO ticket_history (ticket_id, old_status, new_status, changed_by, comment)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                ticket_id, old_status_for_history, 'in_progress', admin_id, 'Назначен администратор и начата работа'))
+    def fetch_details(conn):
+        row = conn.execute("""
+            SELECT t.id, t.ticket_number, t.title, t.status, t.priority, t.category,
+                   t.user_id, t.admin_id, t.created_at, u.full_name, u.department,
+                   t.description, t.closed_at, t.floor, t.pc_name, a.full_name, t.version
+            FROM tickets t
+            LEFT JOIN authorized_users u ON t.user_id = u.telegram_id
+            LEFT JOIN sys_admins a ON t.admin_id = a.telegram_id
+            WHERE t.id = ?
+        """, (ticket_id,)).fetchone()
+        if not row:
+            return None
 
-            return cursor.rowcount > 0
-        except sqlite3.Error as e:
-            logger.error(f"DB: Ошибка назначения тикета {ticket_id} администратору {admin_id}: {e}")
-            return False
-        finally:
-            conn.commit()
-            conn.close()
+        ticket = _ticket_list_row(row)
+        ticket.update({
+            'description': row[11], 'closed_at': row[12], 'floor': row[13], 'pc_name': row[14],
+            'admin_name': row[15], 'version': row[16],
+        })
+        ticket['attachments'] = [
+            {'file_id': a[0], 'file_type': a[1], 'file_name': a[2]}
+            for a in conn.execute(
+                "SELECT file_id, file_type, file_name FROM ticket_attachments WHERE ticket_id = ? ORDER BY id",
+                (ticket_id,))
+        ]
+        return ticket
+
+    return await _read(fetch_details)
+
+
+async def claim_ticket(ticket_id: int, admin_id: int, expected_status: str = 'open',
+                       expected_version: int | None = None) -> Dict[str, Any] | None:
+    """
+    Назначает заявку на администратора (статус 'in_progress') условным UPDATE: из нескольких
+    одновременных нажатий «Назначить на себя» выигрывает ровно одно. expected_version — версия,
+    которую видел администратор; если заявку с тех пор меняли, назначение не выполняется.
+    Возвращает {'claimed', 'admin_id', 'admin_name', 'status', 'version', 'priority', 'floor'} —
+    при неудаче с текущим исполнителем (победителем), None — если заявки нет.
+    """
+
+    def claim(conn):
+        row = conn.execute("""
+            UPDATE tickets SET admin_id = ?, status = 'in_progress', version = version + 1
+            WHERE id = ? AND status = ? AND (? IS NULL OR version = ?)
+            RETURNING version
+        """, (admin_id, ticket_id, expected_status, expected_version, expected_version)).fetchone()
+        if row is not None:
+            conn.execute("""
+                INSERT INTO ticket_history (ticket_id, old_status, new_status, changed_by, comment)
+                VALUES (?, ?, 'in_progress', ?, 'Назначен администратор и начата работа')
+            """, (ticket_id, expected_status, admin_id))
 
-    return await asyncio.to_thread(assign_ticket)
+        current = conn.execute("""
+            SELECT t.admin_id, COALESCE(a.full_name, u.full_name), t.status, t.version, t.priority, t.floor
+            FROM tickets t
+            LEFT JOIN sys_admins a ON t.admin_id = a.telegram_id
+            LEFT JOIN authorized_users u ON t.admin_id = u.telegram_id
+            WHERE t.id = ?
+        """, (ticket_id,)).fetchone()
+        if current is None:
+            return None
+        return {'claimed': row is not None, 'admin_id': current[0], 'admin_name': current[1],
+                'status': current[2], 'version': current[3], 'priority': current[4], 'floor': current[5]}
 
+    try:
+        result = await _write(claim)
+    except sqlite3.Error as e:
+        logger.error(f"DB: Ошибка назначения тикета {ticket_id} администратору {admin_id}: {e}")
+        return None
+    if result and result['claimed']:
+        _invalidate_tickets()
+    return result
 
-async def update_ticket_status(ticket_id: int, new_status: str, admin_id: int, comment: str = None) -> bool:
-    """Обновляет статус заявки и создает запись в истории."""
 
-    def update_status():
-        conn = sqlite3.connect(DB_PATH)
+async def assign_ticket_to_admin(ticket_id: int, admin_id: int, old_status: str = 'open') -> bool:
+    """Назначает заявку на администратора и устанавливает статус 'in_progress' (см. claim_ticket)."""
+    result = await claim_ticket(ticket_id, admin_id, expected_status=old_status)
+    return bool(result and result['claimed'])
+
+
+async def update_ticket_status(ticket_id: int, new_status: str, admin_id: int, comment: str = None,
+                               expected_version: int | None = None) -> bool:
+    """
+    Обновляет статус заявки и создает запись в истории.
+    expected_version — версия, которую видел администратор: если заявку с тех пор изменил
+    кто-то другой, статус не меняется и возвращается False.
+    Закрытие ('await_rating', 'closed') в той же транзакции учитывается в статистике
+    администратора, а повторное открытие или смена закрывшего снимает прежнее закрытие.
+    """
+
+    def update_status(conn):
         cursor = conn.cursor()
 
-        # 1. Получаем текущий статус для истории
-        cursor.execute("SELECT status FROM tickets WHERE id = ?", (ticket_id,))
-        old_status = cursor.fetchone()
+        # 1. Получаем текущий статус для истории (чтение и запись — в одной транзакции писателя)
+        cursor.execute("""
+            SELECT status, version, admin_id, date(closed_at), (julianday(closed_at) - julianday(created_at)) * 86400
+            FROM tickets WHERE id = ?
+        """, (ticket_id,))
+        current = cursor.fetchone()
 
-        if not old_status: return False
-        old_status = old_status[0]
+        if not current: return False
+        old_status, version, old_admin_id, closed_day, close_seconds = current
+        if expected_version is not None and version != expected_version:
+            logger.info(f"DB: Заявка {ticket_id} изменена (версия {version}, ожидалась {expected_version})")
+            return False
 
+        was_closed = old_status in CLOSED_TICKET_STATUSES and closed_day is not None
+        closing = new_status in CLOSED_TICKET_STATUSES
         try:
+            # Закрытие учитывается за закрывшим: при смене статуса внутри закрытых оно переходит к новому
+            if was_closed and old_admin_id and (not closing or old_admin_id != admin_id):
+                _record_ticket_closed(conn, old_admin_id, closed_day, close_seconds, delta=-1)
             cursor.execute("""
-                UPDATE tickets SET status = ?, admin_id = ? WHERE id = ?
-            """, (new_status, admin_id, ticket_id))
+                UPDATE tickets SET status = ?, admin_id = ?, version = version + 1,
+                    closed_at = CASE WHEN ? THEN COALESCE(closed_at, CURRENT_TIMESTAMP) END
+                WHERE id = ?
+                RETURNING date(closed_at), (julianday(closed_at) - julianday(created_at)) * 86400
+            """, (new_status, admin_id, closing, ticket_id))
+            closed_day, close_seconds = cursor.fetchone()
+            if closing and (not was_closed or old_admin_id != admin_id):
+                _record_ticket_closed(conn, admin_id, closed_day, close_seconds)
 
             # 2. Создаем запись в истории
             cursor.execute("""
@@ -595,19 +1441,20 @@ async def update_ticket_status(ticket_id: int, new_status: str, admin_id: int, c
             return cursor.rowcount > 0
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка обновления статуса тикета {ticket_id}: {e}")
-            return False
-        finally:
-            conn.commit()
-            conn.close()
+            raise  # писатель откатит и статистику, и статус
 
-    return await asyncio.to_thread(update_status)
+    try:
+        result = await _write(update_status)
+    except sqlite3.Error:
+        return False
+    _invalidate_tickets()
+    return result
 
 
 async def get_ticket_history(ticket_id: int) -> List[Dict]:
     """Получает историю изменений статусов для заявки."""
 
-    def fetch_history():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_history(conn):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT 
@@ -624,17 +1471,15 @@ async def get_ticket_history(ticket_id: int) -> List[Dict]:
                 'old_status': row[0], 'new_status': row[1], 'changed_at': row[2], 'comment': row[3],
                 'changed_by_name': row[4] if row[4] else 'Система'
             })
-        conn.close()
         return history
 
-    return await asyncio.to_thread(fetch_history)
+    return await _read(fetch_history)
 
 
 async def get_user_tickets(user_id: int) -> List[Dict]:
     """Получает список заявок пользователя."""
 
-    def fetch_tickets():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_tickets(conn):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, ticket_number, title, status, created_at, category, priority
@@ -643,7 +1488,6 @@ async def get_user_tickets(user_id: int) -> List[Dict]:
         """, (user_id,))
 
         rows = cursor.fetchall()
-        conn.close()
 
         tickets = []
         for r in rows:
@@ -653,7 +1497,7 @@ async def get_user_tickets(user_id: int) -> List[Dict]:
             })
         return tickets
 
-    return await asyncio.to_thread(fetch_tickets)
+    return await _read(fetch_tickets)
 
 
 # --- ФУНКЦИИ АДМИНИСТРАТОРА И РЕЙТИНГА ---
@@ -661,8 +1505,7 @@ async def get_user_tickets(user_id: int) -> List[Dict]:
 async def get_admin_info(admin_id: int) -> dict | None:
     """Получает ФИО и средний рейтинг администратора."""
 
-    def fetch_admin_info():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_admin_info(conn):
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -670,8 +1513,6 @@ async def get_admin_info(admin_id: int) -> dict | None:
             FROM sys_admins WHERE telegram_id = ?
         """, (admin_id,))
         result = cursor.fetchone()
-
-        conn.close()
         if result:
             full_name, total_rating, rating_count = result
             avg_rating = total_rating / rating_count if rating_count > 0 else 0.0
@@ -680,14 +1521,13 @@ async def get_admin_info(admin_id: int) -> dict | None:
             }
         return None
 
-    return await asyncio.to_thread(fetch_admin_info)
+    return await _read(fetch_admin_info)
 
 
 async def register_sys_admin(telegram_id: int, full_name: str, position: str) -> bool:
     """Регистрирует пользователя как SysAdmin в sys_admins и обновляет role в authorized_users."""
 
-    def register():
-        conn = sqlite3.connect(DB_PATH)
+    def register(conn):
         cursor = conn.cursor()
 
         try:
@@ -700,78 +1540,116 @@ async def register_sys_admin(telegram_id: int, full_name: str, position: str) ->
 
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка регистрации SysAdmin {telegram_id}: {e}")
-            return False
-        finally:
-            conn.commit()
-            conn.close()
-            return True
+            raise
+        return True
 
-    return await asyncio.to_thread(register)
+    try:
+        result = await _write(register)
+    except sqlite3.Error:
+        return False
+    _invalidate_user(telegram_id)
+    return result
+
+
+def _record_ticket_closed(conn, admin_id: int, day: str, close_seconds: float, delta: int = 1):
+    """
+    Учитывает закрытую заявку в статистике администратора (за всё время и за день).
+    delta=-1 снимает учтённое закрытие (заявку открыли заново или закрывший сменился).
+    """
+    close_seconds = close_seconds or 0
+    bucket = bisect_left(CLOSE_TIME_BUCKETS, max(close_seconds, 0))
+    for period in (ADMIN_STATS_ALL, day):
+        conn.execute("""
+            INSERT INTO admin_stats (admin_id, period, closed_count, close_seconds_sum) VALUES (?, ?, ?, ?)
+            ON CONFLICT(admin_id, period) DO UPDATE SET
+                closed_count = closed_count + excluded.closed_count,
+                close_seconds_sum = close_seconds_sum + excluded.close_seconds_sum
+        """, (admin_id, period, delta, close_seconds * delta))
+        conn.execute("""
+            INSERT INTO admin_close_time_buckets (admin_id, period, bucket, count) VALUES (?, ?, ?, ?)
+            ON CONFLICT(admin_id, period, bucket) DO UPDATE SET count = count + excluded.count
+        """, (admin_id, period, bucket, delta))
+
+
+def _record_ticket_rating(conn, admin_id: int, day: str, rating: int):
+    """Учитывает оценку в статистике администратора и в sys_admins (атомарными инкрементами)."""
+    rating_column = f"rating_{rating}"  # rating проверен вызывающим кодом: 1..5
+    for period in (ADMIN_STATS_ALL, day):
+        conn.execute(f"""
+            INSERT INTO admin_stats (admin_id, period, rating_count, rating_sum, {rating_column}) VALUES (?, ?, 1, ?, 1)
+            ON CONFLICT(admin_id, period) DO UPDATE SET
+                rating_count = rating_count + 1, rating_sum = rating_sum + excluded.rating_sum,
+                {rating_column} = {rating_column} + 1
+        """, (admin_id, period, rating))
+    conn.execute("""
+        UPDATE sys_admins SET total_rating = total_rating + ?, rating_count = rating_count + 1
+        WHERE telegram_id = ?
+    """, (rating, admin_id))
 
 
 async def update_admin_rating(admin_id: int, rating: int):
-    """Обновляет рейтинг администратора и average_rating."""
-
-    def update_rating():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT total_rating, rating_count FROM sys_admins WHERE telegram_id = ?", (admin_id,))
-        result = cursor.fetchone()
+    """
+    Добавляет оценку к рейтингу администратора одним UPDATE (без чтения-изменения-записи).
+    Оценки заявок учитываются в finalize_ticket_rating; функция оставлена для ручных корректировок.
+    """
+
+    def update_rating(conn):
+        cursor = conn.execute("""
+            UPDATE sys_admins SET total_rating = total_rating + ?, rating_count = rating_count + 1
+            WHERE telegram_id = ?
+        """, (rating, admin_id))
 
-        if not result:
+        if cursor.rowcount == 0:
             logger.warning(f"DB: SysAdmin {admin_id} не найден для обновления рейтинга.")
             return
+        logger.info(f"DB: Рейтинг SysAdmin {admin_id} обновлен. Новая оценка: {rating}.")
 
-        total_rating, rating_count = result
-
-        new_total_rating = total_rating + rating
-        new_rating_count = rating_count + 1
-
-        cursor.execute("""
-            UPDATE sys_admins SET total_rating = ?, rating_count = ?
-            WHERE telegram_id = ?
-        """, (new_total_rating, new_rating_count, admin_id))
+    await _write(update_rating)
 
-        conn.commit()
-        conn.close()
-        logger.info(
-            f"DB: Рейтинг SysAdmin {admin_id} обновлен. Новая оценка: {rating}. Всего оценок: {new_rating_count}")
 
-    await asyncio.to_thread(update_rating)
+async def close_ticket_for_rating(ticket_id: int, admin_id: int, notify_user: bool = False) -> int | None:
+    """
+    Обновляет статус заявки на 'await_rating' и возвращает user_id создателя.
+    В той же транзакции заявка учитывается в статистике администратора,
+    а с notify_user — в outbox ставится запрос оценки автору.
+    """
 
-
-async def close_ticket_for_rating(ticket_id: int, admin_id: int) -> int | None:
-    """Обновляет статус заявки на 'await_rating' и возвращает user_id создателя."""
-
-    def close_ticket():
-        conn = sqlite3.connect(DB_PATH)
+    def close_ticket(conn):
         cursor = conn.cursor()
 
         cursor.execute("""
             UPDATE tickets 
-            SET status = 'await_rating', admin_id = ?, closed_at = CURRENT_TIMESTAMP
-            WHERE id = ? AND status != 'await_rating'
+            SET status = 'await_rating', admin_id = ?, closed_at = CURRENT_TIMESTAMP, version = version + 1
+            WHERE id = ? AND status NOT IN ('await_rating', 'closed')
+            RETURNING user_id, date(closed_at), (julianday(closed_at) - julianday(created_at)) * 86400, ticket_number
         """, (admin_id, ticket_id))
 
-        if cursor.rowcount == 0:
+        row = cursor.fetchone()
+        if row is None:
             return None
 
-        cursor.execute("SELECT user_id FROM tickets WHERE id = ?", (ticket_id,))
-        user_id = cursor.fetchone()[0]
-
-        conn.commit()
-        conn.close()
+        user_id, day, close_seconds, ticket_number = row
+        _record_ticket_closed(conn, admin_id, day, close_seconds)
+        if notify_user:
+            _enqueue_notifications(conn, 'rating_request', [user_id],
+                                   {'ticket_id': ticket_id, 'number': ticket_number})
         return user_id
 
-    return await asyncio.to_thread(close_ticket)
+    result = await _write(close_ticket)
+    _invalidate_tickets()
+    return result
 
 
-async def finalize_ticket_rating(ticket_id: int, rating: int) -> dict | None:
-    """Записывает оценку, обновляет статус заявки и возвращает данные для обновления рейтинга."""
+async def finalize_ticket_rating(ticket_id: int, rating: int, notify_admin: bool = False) -> dict | None:
+    """
+    Записывает оценку, закрывает заявку и в той же транзакции обновляет рейтинг
+    и статистику администратора (с notify_admin — и ставит ему уведомление в outbox).
+    Повторная оценка той же заявки не учитывается.
+    """
+    if rating not in range(1, 6):
+        return None
 
-    def finalize():
-        conn = sqlite3.connect(DB_PATH)
+    def finalize(conn):
         cursor = conn.cursor()
 
         cursor.execute("SELECT admin_id, ticket_number, user_id FROM tickets WHERE id = ?", (ticket_id,))
@@ -784,10 +1662,26 @@ async def finalize_ticket_rating(ticket_id: int, rating: int) -> dict | None:
             logger.error(f"DB: Заявка {ticket_id} не была назначена администратору.")
             return None
 
-        cursor.execute("UPDATE tickets SET status = 'closed' WHERE id = ?", (ticket_id,))
+        cursor.execute("""
+            UPDATE tickets SET status = 'closed', rating = ?, version = version + 1
+            WHERE id = ? AND status = 'await_rating'
+            RETURNING date('now')
+        """, (rating, ticket_id))
+        row = cursor.fetchone()
+        if row is None:
+            return None
 
-        conn.commit()
-        conn.close()
+        _record_ticket_rating(conn, admin_id, row[0], rating)
+        if notify_admin:
+            # Средний рейтинг — уже с учётом этой оценки; уведомляются только зарегистрированные SysAdmin'ы
+            admin = cursor.execute("SELECT total_rating, rating_count FROM sys_admins WHERE telegram_id = ?",
+                                   (admin_id,)).fetchone()
+            if admin is not None:
+                total_rating, rating_count = admin
+                _enqueue_notifications(conn, 'rating_received', [admin_id], {
+                    'number': ticket_number, 'rating': rating,
+                    'avg_rating': round(total_rating / rating_count, 2) if rating_count else 0.0,
+                })
 
         return {
             'admin_id': admin_id,
@@ -796,7 +1690,68 @@ async def finalize_ticket_rating(ticket_id: int, rating: int) -> dict | None:
             'rating': rating
         }
 
-    return await asyncio.to_thread(finalize)
+    result = await _write(finalize)
+    _invalidate_tickets()
+    return result
+
+
+def _close_time_percentile(buckets: Dict[int, int], total: int, percentile: float) -> int | None:
+    """Верхняя граница корзины, в которую попадает перцентиль (None — больше последней границы)."""
+    threshold = total * percentile
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= threshold:
+            return CLOSE_TIME_BUCKETS[bucket] if bucket < len(CLOSE_TIME_BUCKETS) else None
+    return None
+
+
+async def get_admin_stats(admin_id: int, days: int = 7) -> Dict[str, Any]:
+    """
+    Статистика администратора из admin_stats: за всё время и по дням за последние days дней.
+    Чтение по первичному ключу, без пересчёта по заявкам.
+    """
+
+    def fetch_stats(conn):
+        def summary(row, buckets):
+            (period, closed_count, close_seconds_sum, rating_count, rating_sum, *histogram) = row
+            return {
+                'period': period,
+                'closed_count': closed_count,
+                'avg_close_seconds': close_seconds_sum / closed_count if closed_count else None,
+                'p90_close_seconds': (_close_time_percentile(buckets, closed_count, 0.9)
+                                      if closed_count else None),
+                'rating_count': rating_count,
+                'avg_rating': round(rating_sum / rating_count, 2) if rating_count else 0.0,
+                'ratings': dict(zip(range(1, 6), histogram)),
+            }
+
+        columns = """period, closed_count, close_seconds_sum, rating_count, rating_sum,
+                     rating_1, rating_2, rating_3, rating_4, rating_5"""
+        # Дни считаются в UTC, как date('now') при записи статистики
+        since = time.strftime("%Y-%m-%d", time.gmtime(time.time() - max(days - 1, 0) * 86400))
+        rows = conn.execute(f"""
+            SELECT {columns} FROM admin_stats
+            WHERE admin_id = ? AND (period = ? OR period BETWEEN ? AND '9999-12-31')
+        """, (admin_id, ADMIN_STATS_ALL, since)).fetchall()
+        buckets: Dict[str, Dict[int, int]] = {}
+        for period, bucket, count in conn.execute("""
+            SELECT period, bucket, count FROM admin_close_time_buckets
+            WHERE admin_id = ? AND (period = ? OR period BETWEEN ? AND '9999-12-31')
+        """, (admin_id, ADMIN_STATS_ALL, since)):
+            buckets.setdefault(period, {})[bucket] = count
+
+        stats = {'total': None, 'days': []}
+        for row in rows:
+            item = summary(row, buckets.get(row[0], {}))
+            if row[0] == ADMIN_STATS_ALL:
+                stats['total'] = item
+            else:
+                stats['days'].append(item)
+        stats['days'].sort(key=lambda item: item['period'], reverse=True)
+        return stats
+
+    return await _read(fetch_stats)
 
 
 # --- ФУНКЦИИ УПРАВЛЕНИЯ ОБОРУДОВАНИЕМ ---
@@ -804,30 +1759,93 @@ async def finalize_ticket_rating(ticket_id: int, rating: int) -> dict | None:
 async def create_equipment(inv_number: str, model: str, serial: str, category: str) -> bool:
     """Создает запись об оборудовании в таблице equipment."""
 
-    def _create():
-        conn = sqlite3.connect(DB_PATH)
+    def _create(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("""
                 INSERT INTO equipment (inv_number, model, serial, category)
                 VALUES (?, ?, ?, ?)
             """, (inv_number, model, serial, category))
-            conn.commit()
             return True
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка создания оборудования {inv_number}: {e}")
-            return False
-        finally:
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(_create)
+    try:
+        return await _write(_create)
+    except sqlite3.Error:
+        return False
+
+
+def _reserve_inventory_block(conn, category_code: str, year: int, count: int) -> List[str]:
+    """Резервирует count подряд идущих номеров одним UPDATE ... RETURNING в текущей транзакции."""
+    last_value = conn.execute("""
+        INSERT INTO inventory_sequences (category_code, year, last_value) VALUES (?, ?, ?)
+        ON CONFLICT(category_code, year) DO UPDATE SET last_value = last_value + excluded.last_value
+        RETURNING last_value
+    """, (category_code, year, count)).fetchone()[0]
+    return [f"{category_code}-{year}-{seq:04d}" for seq in range(last_value - count + 1, last_value + 1)]
+
+
+async def reserve_inventory_numbers(category_code: str, year: int, count: int = 1) -> List[str]:
+    """Резервирует блок уникальных инвентарных номеров вида CODE-YYYY-NNNN."""
+    if count < 1:
+        return []
+    return await _write(lambda conn: _reserve_inventory_block(conn, category_code, year, count))
+
+
+async def create_equipment_batch(category: str, category_code: str, year: int,
+                                 items: List[Tuple[str, str]]) -> List[str]:
+    """
+    Регистрирует партию оборудования одной транзакцией: резервирует блок номеров
+    и вставляет строки (модель, серийный номер). Возвращает выданные номера;
+    при ошибке вставки откатывается и резерв номеров.
+    """
+    if not items:
+        return []
+
+    def _create_batch(conn):
+        numbers = _reserve_inventory_block(conn, category_code, year, len(items))
+        conn.executemany(
+            "INSERT INTO equipment (inv_number, model, serial, category) VALUES (?, ?, ?, ?)",
+            [(number, model, serial, category) for number, (model, serial) in zip(numbers, items)])
+        return numbers
+
+    try:
+        return await _write(_create_batch)
+    except sqlite3.Error as e:
+        logger.error(f"DB: Ошибка пакетного создания оборудования ({len(items)} шт.): {e}")
+        return []
+
+
+def import_equipment_rows(rows: List[Tuple[str, str, str, Optional[str], Optional[int]]], year: int) -> List[str]:
+    """
+    Вставляет пачку оборудования одной транзакцией (синхронно, для потокового импорта вне event loop).
+
+    rows: (категория, код категории, модель, серийный номер, id рабочего места).
+    Номера резервируются одним блоком на каждый код категории в той же транзакции;
+    возвращаются в порядке rows.
+    """
+
+    def _insert(conn):
+        counts: Dict[str, int] = {}
+        for _, code, _, _, _ in rows:
+            counts[code] = counts.get(code, 0) + 1
+        blocks = {code: iter(_reserve_inventory_block(conn, code, year, n)) for code, n in counts.items()}
+        numbers = [next(blocks[code]) for _, code, _, _, _ in rows]
+        conn.executemany("""
+            INSERT INTO equipment (inv_number, model, serial, category, workplace_id) VALUES (?, ?, ?, ?, ?)
+        """, [(number, model, serial, category, workplace_id)
+              for number, (category, _, model, serial, workplace_id) in zip(numbers, rows)])
+        return numbers
+
+    return _get_writer().run(_insert)
 
 
 async def get_equipment(equipment_id: int = None, inv_number: str = None) -> Dict | None:
     """Получает информацию об оборудовании по ID или инвентарному номеру."""
 
-    def fetch_equipment():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_equipment(conn):
         cursor = conn.cursor()
 
         if equipment_id:
@@ -842,21 +1860,19 @@ async def get_equipment(equipment_id: int = None, inv_number: str = None) -> Dic
             return None
 
         r = cursor.fetchone()
-        conn.close()
         if not r: return None
         return {
             'id': r[0], 'inv_number': r[1], 'model': r[2], 'serial': r[3], 'category': r[4],
             'status': r[5], 'assigned_at': r[6], 'user_id': r[7]
         }
 
-    return await asyncio.to_thread(fetch_equipment)
+    return await _read(fetch_equipment)
 
 
 async def assign_equipment_to_user(equipment_id: int, user_id: int, assigned_by: int) -> bool:
     """Назначает оборудование пользователю и создает запись в истории."""
 
-    def _assign():
-        conn = sqlite3.connect(DB_PATH)
+    def _assign(conn):
         cursor = conn.cursor()
 
         try:
@@ -868,67 +1884,89 @@ async def assign_equipment_to_user(equipment_id: int, user_id: int, assigned_by:
                 INSERT INTO equipment_history (equipment_id, from_user_id, to_user_id, assigned_by)
                 VALUES (?, NULL, ?, ?)
             """, (equipment_id, user_id, assigned_by))
-
-            conn.commit()
             return True
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка назначения оборудования {equipment_id} пользователю {user_id}: {e}")
-            return False
-        finally:
-            conn.close()
-
-    return await asyncio.to_thread(_assign)
+            raise
 
+    try:
+        return await _write(_assign)
+    except sqlite3.Error:
+        return False
+
+
+EQUIPMENT_PAGE_SIZE = 15
+
+# Порядок (created_at, id) по убыванию совпадает с индексом idx_equipment_created
+_EQUIPMENT_LIST_SELECT = """
+    SELECT e.id, e.inv_number, e.model, e.serial, e.category, e.status, e.assigned_at, u.full_name
+    FROM equipment e
+    LEFT JOIN authorized_users u ON e.user_id = u.telegram_id
+"""
+
+
+async def get_equipment_page(after_id: int = None, before_id: int = None,
+                             limit: int = EQUIPMENT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Страница оборудования (новое сверху) с keyset-пагинацией, как get_tickets_page.
+    Возвращает {'equipment': [...], 'has_prev': bool, 'has_next': bool}.
+    """
+
+    def fetch_page(conn):
+        backwards = before_id is not None
+        anchor = before_id if backwards else after_id
+        query, params = _EQUIPMENT_LIST_SELECT, []
+        if anchor is not None:
+            op = ">" if backwards else "<"
+            query += f" WHERE (e.created_at, e.id) {op} (SELECT created_at, id FROM equipment WHERE id = ?)"
+            params.append(anchor)
+        order = "ASC" if backwards else "DESC"
+        query += f" ORDER BY e.created_at {order}, e.id {order} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = conn.execute(query, params).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+            has_prev, has_next = more, True
+        else:
+            has_prev, has_next = anchor is not None, more
+        equipment = [{
+            'id': row[0], 'inv_number': row[1], 'model': row[2], 'serial': row[3], 'category': row[4],
+            'status': row[5], 'assigned_at': row[6], 'user_name': row[7]
+        } for row in rows]
+        return {'equipment': equipment, 'has_prev': has_prev, 'has_next': has_next}
 
-async def get_all_equipment(status: str = None) -> List[Dict]:
-    """Получает список всего оборудования с информацией о пользователях."""
+    return await _read(fetch_page)
 
-    def fetch_all():
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        query = """
-            SELECT e.id, e.inv_number, e.model, e.serial, e.category, e.status, e.assigned_at, 
-                   u.full_name
-            FROM equipment e
-            LEFT JOIN authorized_users u ON e.user_id = u.telegram_id
-            WHERE 1=1
-        """
-        params = []
-        if status: query += " AND e.status = ?"; params.append(status)
-        query += " ORDER BY e.created_at DESC"
 
-        cursor.execute(query, params)
+async def get_equipment_counts(statuses: Tuple[str, ...] = ('available', 'assigned')) -> Dict[str, int]:
+    """Количество оборудования по статусам; считается по индексу idx_equipment_status_created без чтения строк."""
 
-        equipment = []
-        for row in cursor.fetchall():
-            equipment.append({
-                'id': row[0], 'inv_number': row[1], 'model': row[2], 'serial': row[3], 'category': row[4],
-                'status': row[5], 'assigned_at': row[6], 'user_name': row[7]
-            })
-        conn.close()
-        return equipment
+    def count(conn):
+        return {status: conn.execute("SELECT COUNT(*) FROM equipment WHERE status = ?", (status,)).fetchone()[0]
+                for status in statuses}
 
-    return await asyncio.to_thread(fetch_all)
+    return await _read(count)
 
 
 async def delete_equipment(inv_number: str) -> bool:
     """Удаляет оборудование по инвентарному номеру."""
 
-    def _delete():
-        conn = sqlite3.connect(DB_PATH)
+    def _delete(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("DELETE FROM equipment WHERE inv_number = ?", (inv_number,))
-            conn.commit()
             return cursor.rowcount > 0
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка удаления оборудования {inv_number}: {e}")
-            return False
-        finally:
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(_delete)
+    try:
+        return await _write(_delete)
+    except sqlite3.Error:
+        return False
 
 
 # --- ФУНКЦИИ ДЛЯ ПОЛЬЗОВАТЕЛЬСКОГО ИНТЕРФЕЙСА (ПОВТОРНОЕ ОПРЕДЕЛЕНИЕ) ---
@@ -936,8 +1974,7 @@ async def delete_equipment(inv_number: str) -> bool:
 async def get_user_equipment(user_id: int) -> List[Dict]:
     """Получает список оборудования, назначенного пользователю."""
 
-    def fetch_eq():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_eq(conn):
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -953,17 +1990,15 @@ async def get_user_equipment(user_id: int) -> List[Dict]:
                 'id': row[0], 'inv_number': row[1], 'model': row[2], 'serial': row[3], 'category': row[4],
                 'status': row[5], 'assigned_at': row[6]
             })
-        conn.close()
         return equipment
 
-    return await asyncio.to_thread(fetch_eq)
+    return await _read(fetch_eq)
 
 
 async def get_user_tickets(user_id: int) -> List[Dict]:
     """Получает список заявок пользователя."""
 
-    def fetch_tickets():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_tickets(conn):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, ticket_number, title, status, created_at, category, priority
@@ -972,7 +2007,6 @@ async def get_user_tickets(user_id: int) -> List[Dict]:
         """, (user_id,))
 
         rows = cursor.fetchall()
-        conn.close()
 
         tickets = []
         for r in rows:
@@ -982,7 +2016,7 @@ async def get_user_tickets(user_id: int) -> List[Dict]:
             })
         return tickets
 
-    return await asyncio.to_thread(fetch_tickets)
+    return await _read(fetch_tickets)
 
 
 # --- ФУНКЦИИ УПРАВЛЕНИЯ РАБОЧИМИ МЕСТАМИ ---
@@ -995,26 +2029,23 @@ async def get_workplace(number: str) -> Dict | None:
 async def get_workplace_by_number(number: str) -> Dict | None:
     """Возвращает рабочее место по его номеру (number)."""
 
-    def _get():
-        conn = sqlite3.connect(DB_PATH)
+    def _get(conn):
         cursor = conn.cursor()
         cursor.execute(
             "SELECT id, number, department, location, floor, primary_pc, peripherals FROM workplaces WHERE number = ?",
             (number,))
         r = cursor.fetchone()
-        conn.close()
         if not r: return None
         return {'id': r[0], 'number': r[1], 'department': r[2], 'location': r[3], 'floor': r[4], 'primary_pc': r[5],
                 'peripherals': r[6]}
 
-    return await asyncio.to_thread(_get)
+    return await _read(_get)
 
 
 async def get_workplace_equipment(workplace_id: int) -> List[Dict]:
     """Получает список оборудования, закрепленного за рабочим местом."""
 
-    def fetch_eq():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_eq(conn):
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -1030,17 +2061,15 @@ async def get_workplace_equipment(workplace_id: int) -> List[Dict]:
                 'id': row[0], 'inv_number': row[1], 'model': row[2], 'serial': row[3], 'category': row[4],
                 'status': row[5], 'user_id': row[6]
             })
-        conn.close()
         return equipment
 
-    return await asyncio.to_thread(fetch_eq)
+    return await _read(fetch_eq)
 
 
 async def get_all_workplaces() -> List[Dict]:
     """Получает список всех рабочих мест."""
 
-    def fetch_all():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_all(conn):
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -1057,51 +2086,48 @@ async def get_all_workplaces() -> List[Dict]:
                 'department': row[2],
                 'location': row[3]
             })
-        conn.close()
         return workplaces
 
-    return await asyncio.to_thread(fetch_all)
+    return await _read(fetch_all)
 
 
 async def create_workplace(number: str, department: str, location: str) -> bool:
     """Создает новое рабочее место с указанными параметрами."""
 
-    def _create():
-        conn = sqlite3.connect(DB_PATH)
+    def _create(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("""
                 INSERT INTO workplaces (number, department, location)
                 VALUES (?, ?, ?)
             """, (number, department, location))
-            conn.commit()
             return True
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка создания рабочего места {number}: {e}")
-            return False
-        finally:
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(_create)
+    try:
+        return await _write(_create)
+    except sqlite3.Error:
+        return False
 
 
 async def delete_workplace(number: str) -> bool:
     """Удаляет рабочее место по его номеру."""
 
-    def _delete():
-        conn = sqlite3.connect(DB_PATH)
+    def _delete(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("DELETE FROM workplaces WHERE number = ?", (number,))
-            conn.commit()
             return cursor.rowcount > 0
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка удаления рабочего места {number}: {e}")
-            return False
-        finally:
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(_delete)
+    try:
+        return await _write(_delete)
+    except sqlite3.Error:
+        return False
 
 
 # --- МЕТОДЫ ОПРЕДЕЛЕНИЯ ЭТАЖА И ДРУГИЕ УТИЛИТЫ ---
@@ -1138,52 +2164,46 @@ def get_floor_from_ip(ip: str, hostname: Optional[str] = None) -> Optional[int]:
 async def get_available_floors() -> List[int]:
     """Возвращает список уникальных номеров этажей из таблицы workplaces."""
 
-    def fetch_floors():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_floors(conn):
         cursor = conn.cursor()
         cursor.execute("SELECT DISTINCT floor FROM workplaces WHERE floor IS NOT NULL ORDER BY floor ASC")
         floors = [row[0] for row in cursor.fetchall()]
-        conn.close()
         allowed = {2, 4, 5}
         filtered = [f for f in floors if f in allowed]
         return filtered if filtered else sorted(list(allowed))
 
-    return await asyncio.to_thread(fetch_floors)
+    return await _read(fetch_floors)
 
 
 async def get_workplaces_by_floor(floor: int) -> List[Dict]:
     """Возвращает рабочие места для указанного этажа."""
 
-    def fetch_workplaces():
-        conn = sqlite3.connect(DB_PATH)
+    def fetch_workplaces(conn):
         cursor = conn.cursor()
         cursor.execute("SELECT number, primary_pc FROM workplaces WHERE floor = ? ORDER BY number ASC", (floor,))
         workplaces = []
         for row in cursor.fetchall():
             workplaces.append({'number': row[0], 'pc_name': row[1]})
-        conn.close()
         return workplaces
 
-    workplaces = await asyncio.to_thread(fetch_workplaces)
+    workplaces = await _read(fetch_workplaces)
     # Если таблица пустая (новая БД) — повторно выполним автосоздание и перечитаем.
     if not workplaces:
-        await asyncio.to_thread(_seed_default_workplaces)
-        workplaces = await asyncio.to_thread(fetch_workplaces)
+        await _write(_seed_default_workplaces)
+        workplaces = await _read(fetch_workplaces)
     return workplaces
 
 
 async def get_all_users_for_mailing() -> list[int]:
     """Получает Telegram ID всех активных пользователей для рассылки."""
 
-    def _get_ids():
-        conn = sqlite3.connect(DB_PATH)
+    def _get_ids(conn):
         cursor = conn.cursor()
         cursor.execute("SELECT telegram_id FROM authorized_users")
         user_ids = [row[0] for row in cursor.fetchall()]
-        conn.close()
         return user_ids
 
-    return await asyncio.to_thread(_get_ids)
+    return await _read(_get_ids)
 
 
 # --- Вложения к заявкам ---
@@ -1192,23 +2212,22 @@ async def add_ticket_attachment(ticket_id: int, file_id: str, file_type: str = "
                                 file_name: Optional[str] = None) -> bool:
     """Сохранить вложение к заявке."""
 
-    def _add():
-        conn = sqlite3.connect(DB_PATH)
+    def _add(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("""
                 INSERT INTO ticket_attachments (ticket_id, file_id, file_type, file_name)
                 VALUES (?, ?, ?, ?)
             """, (ticket_id, file_id, file_type, file_name))
-            conn.commit()
             return True
         except sqlite3.Error as e:
             logger.error(f"DB: ошибка добавления вложения для заявки {ticket_id}: {e}")
-            return False
-        finally:
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(_add)
+    try:
+        return await _write(_add)
+    except sqlite3.Error:
+        return False
 
 
 # --- FAQ ---
@@ -1216,27 +2235,25 @@ async def add_ticket_attachment(ticket_id: int, file_id: str, file_type: str = "
 async def add_faq_item(question: str, answer: str) -> bool:
     """Добавить пункт в FAQ."""
 
-    def _add():
-        conn = sqlite3.connect(DB_PATH)
+    def _add(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("INSERT INTO faq (question, answer) VALUES (?, ?)", (question, answer))
-            conn.commit()
             return True
         except sqlite3.Error as e:
             logger.error(f"DB: ошибка добавления FAQ: {e}")
-            return False
-        finally:
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(_add)
+    try:
+        return await _write(_add)
+    except sqlite3.Error:
+        return False
 
 
 async def get_faq_items(limit: Optional[int] = None) -> List[Dict]:
     """Получить список FAQ (последние сверху)."""
 
-    def _get():
-        conn = sqlite3.connect(DB_PATH)
+    def _get(conn):
         cursor = conn.cursor()
         query = "SELECT id, question, answer, created_at FROM faq ORDER BY created_at DESC"
         if limit:
@@ -1250,36 +2267,33 @@ async def get_faq_items(limit: Optional[int] = None) -> List[Dict]:
                 "answer": row[2],
                 "created_at": row[3],
             })
-        conn.close()
         return items
 
-    return await asyncio.to_thread(_get)
+    return await _read(_get)
 
 
 async def delete_faq_item(faq_id: int) -> bool:
     """Удалить пункт FAQ."""
 
-    def _delete():
-        conn = sqlite3.connect(DB_PATH)
+    def _delete(conn):
         cursor = conn.cursor()
         try:
             cursor.execute("DELETE FROM faq WHERE id = ?", (faq_id,))
-            conn.commit()
             return cursor.rowcount > 0
         except sqlite3.Error as e:
             logger.error(f"DB: ошибка удаления FAQ {faq_id}: {e}")
-            return False
-        finally:
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(_delete)
+    try:
+        return await _write(_delete)
+    except sqlite3.Error:
+        return False
 
 
 async def save_faq_material(title: str, description: str, file_info: Optional[Dict] = None) -> Dict | None:
     """Сохраняет новый материал FAQ и возвращает его данные для рассылки."""
 
-    def _save():
-        conn = sqlite3.connect(DB_PATH)
+    def _save(conn):
         cursor = conn.cursor()
 
         file_id = file_info.get('id') if file_info else None
@@ -1293,23 +2307,22 @@ async def save_faq_material(title: str, description: str, file_info: Optional[Di
             """, (title, description, file_id, file_type))
 
             faq_id = cursor.lastrowid
-            conn.commit()
             return {'id': faq_id, 'title': title, 'description': description, 'file_id': file_id,
                     'file_type': file_type}
         except sqlite3.Error as e:
             logger.error(f"DB: Ошибка сохранения FAQ: {e}")
-            return None
-        finally:
-            conn.close()
+            raise
 
-    return await asyncio.to_thread(_save)
+    try:
+        return await _write(_save)
+    except sqlite3.Error:
+        return None
 
 
 async def get_latest_faq_material() -> Dict | None:
     """Получает самый свежий материал FAQ для рассылки."""
 
-    def _get():
-        conn = sqlite3.connect(DB_PATH)
+    def _get(conn):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, title, description, file_id, file_type 
@@ -1317,21 +2330,33 @@ async def get_latest_faq_material() -> Dict | None:
             ORDER BY created_at DESC LIMIT 1
         """)
         row = cursor.fetchone()
-        conn.close()
         if row:
             return {
                 'id': row[0], 'title': row[1], 'description': row[2], 'file_id': row[3], 'file_type': row[4],
             }
         return None
 
-    return await asyncio.to_thread(_get)
+    return await _read(_get)
+
+
+async def get_faq_material(faq_id: int) -> Dict | None:
+    """Получает один материал FAQ по id."""
+
+    def _get(conn):
+        row = conn.execute("""
+            SELECT id, title, description, file_id, file_type FROM faq_materials WHERE id = ?
+        """, (faq_id,)).fetchone()
+        if row:
+            return {'id': row[0], 'title': row[1], 'description': row[2], 'file_id': row[3], 'file_type': row[4]}
+        return None
+
+    return await _read(_get)
 
 
 async def get_all_faq_materials() -> list[dict]:
     """Получает список всех сохраненных материалов FAQ/гайдов."""
 
-    def _get_all():
-        conn = sqlite3.connect(DB_PATH)
+    def _get_all(conn):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, title, description, file_id, file_type 
@@ -1341,17 +2366,15 @@ async def get_all_faq_materials() -> list[dict]:
         columns = [desc[0] for desc in cursor.description]
         # Преобразуем результат в список словарей для удобства
         faq_list = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        conn.close()
         return faq_list
 
-    return await asyncio.to_thread(_get_all)
+    return await _read(_get_all)
 
 
 async def get_user_credentials(telegram_id: int) -> List[Dict]:
     """Получить сохраненные доступы пользователя."""
 
-    def _get():
-        conn = sqlite3.connect(DB_PATH)
+    def _get(conn):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT service, login, password, url, note, created_at
@@ -1360,7 +2383,6 @@ async def get_user_credentials(telegram_id: int) -> List[Dict]:
             ORDER BY created_at DESC
         """, (telegram_id,))
         rows = cursor.fetchall()
-        conn.close()
         creds = []
         for r in rows:
             creds.append({
@@ -1373,6 +2395,551 @@ async def get_user_credentials(telegram_id: int) -> List[Dict]:
             })
         return creds
 
-    return await asyncio.to_thread(_get)
+    return await _read(_get)
+
+
+# --- РАССЫЛКИ ---
+
+async def create_broadcast(kind: str, text: str, created_by: int | None = None, file_id: str | None = None,
+                           file_type: str | None = None, recipients: List[int] | None = None,
+                           faq_id: int | None = None) -> Tuple[int, int]:
+    """
+    Создаёт рассылку и очередь доставки одной транзакцией.
+    recipients=None — все авторизованные пользователи; для рассылки материала FAQ (faq_id)
+    — только те, кому он ещё не доставлялся. Возвращает (id рассылки, число получателей).
+    """
+
+    def _create(conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO broadcasts (kind, text, file_id, file_type, created_by, faq_id) VALUES (?, ?, ?, ?, ?, ?)
+        """, (kind, text, file_id, file_type, created_by, faq_id))
+        broadcast_id = cursor.lastrowid
+        if recipients is None and faq_id is not None:
+            cursor.execute("""
+                INSERT INTO broadcast_deliveries (broadcast_id, chat_id)
+                SELECT ?, u.telegram_id FROM authorized_users u
+                WHERE NOT EXISTS (SELECT 1 FROM faq_deliveries d WHERE d.faq_id = ? AND d.telegram_id = u.telegram_id)
+            """, (broadcast_id, faq_id))
+        elif recipients is None:
+            cursor.execute("""
+                INSERT INTO broadcast_deliveries (broadcast_id, chat_id) SELECT ?, telegram_id FROM authorized_users
+            """, (broadcast_id,))
+        else:
+            cursor.executemany("INSERT OR IGNORE INTO broadcast_deliveries (broadcast_id, chat_id) VALUES (?, ?)",
+                               [(broadcast_id, chat_id) for chat_id in recipients])
+        total = conn.execute("SELECT COUNT(*) FROM broadcast_deliveries WHERE broadcast_id = ?",
+                             (broadcast_id,)).fetchone()[0]
+        return broadcast_id, total
+
+    return await _write(_create)
+
+
+async def get_broadcast(broadcast_id: int) -> Dict | None:
+    """Возвращает рассылку со счётчиками доставки по статусам."""
+
+    def _get(conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, kind, text, file_id, file_type, created_by, status, progress_chat_id, progress_message_id,
+                   faq_id
+            FROM broadcasts WHERE id = ?
+        """, (broadcast_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        columns = [desc[0] for desc in cursor.description]
+        broadcast = dict(zip(columns, row))
+        counts = dict(conn.execute("""
+            SELECT status, COUNT(*) FROM broadcast_deliveries WHERE broadcast_id = ? GROUP BY status
+        """, (broadcast_id,)).fetchall())
+        broadcast['counts'] = counts
+        broadcast['total'] = sum(counts.values())
+        return broadcast
+
+    return await _read(_get)
+
+
+async def get_unfinished_broadcast_ids() -> List[int]:
+    """ID рассылок, прерванных остановкой бота."""
+
+    def _get(conn):
+        return [row[0] for row in conn.execute("SELECT id FROM broadcasts WHERE status = 'running' ORDER BY id")]
+
+    return await _read(_get)
+
+
+async def get_pending_broadcast_recipients(broadcast_id: int) -> List[int]:
+    """Получатели рассылки, которым сообщение ещё не доставлено."""
+
+    def _get(conn):
+        return [row[0] for row in conn.execute("""
+            SELECT chat_id FROM broadcast_deliveries WHERE broadcast_id = ? AND status = 'pending'
+        """, (broadcast_id,))]
+
+    return await _read(_get)
+
+
+async def mark_broadcast_delivery(broadcast_id: int, chat_id: int, status: str, attempts: int,
+                                  error: str | None = None):
+    """Фиксирует итог доставки одному получателю (sent / failed / blocked)."""
+
+    def _mark(conn):
+        conn.execute("""
+            UPDATE broadcast_deliveries SET status = ?, attempts = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE broadcast_id = ? AND chat_id = ?
+        """, (status, attempts, error, broadcast_id, chat_id))
+        if status == 'sent':
+            # Для рассылки материала FAQ отмечаем доставку в той же транзакции
+            conn.execute("""
+                INSERT OR IGNORE INTO faq_deliveries (faq_id, telegram_id)
+                SELECT faq_id, ? FROM broadcasts WHERE id = ? AND faq_id IS NOT NULL
+            """, (chat_id, broadcast_id))
+
+    await _write(_mark)
+
+
+async def set_broadcast_status(broadcast_id: int, status: str):
+    """Меняет статус рассылки (running / done / cancelled)."""
+
+    def _set(conn):
+        conn.execute("""
+            UPDATE broadcasts SET status = ?,
+                finished_at = CASE WHEN ? IN ('done', 'cancelled') THEN CURRENT_TIMESTAMP ELSE finished_at END
+            WHERE id = ?
+        """, (status, status, broadcast_id))
+
+    await _write(_set)
+
+
+async def set_broadcast_progress_message(broadcast_id: int, chat_id: int, message_id: int):
+    """Запоминает сообщение, в котором показывается прогресс рассылки."""
+
+    def _set(conn):
+        conn.execute("UPDATE broadcasts SET progress_chat_id = ?, progress_message_id = ? WHERE id = ?",
+                     (chat_id, message_id, broadcast_id))
+
+    await _write(_set)
+
+
+# --- SLA ---
+
+SLA_ACTIVE_STATUSES = ('open', 'in_progress', 'on_hold')
+
+# Условие, при котором срок ещё нарушается: для реакции — заявку никто не взял в работу
+# (автоназначенная, но не взятая заявка тоже 'open'), для решения — не закрыта
+_SLA_PENDING_CONDITIONS = {
+    'response': "status = 'open'",
+    'resolution': f"status IN {SLA_ACTIVE_STATUSES}",
+}
+
+
+async def get_sla_open_tickets() -> List[Dict[str, Any]]:
+    """Незакрытые заявки для построения SLA-таймеров при старте: время создания (epoch) и сработавшие сроки."""
+
+    def fetch_open(conn):
+        rows = conn.execute(f"""
+            SELECT t.id, t.priority, t.status, t.admin_id, CAST(strftime('%s', t.created_at) AS INTEGER),
+                   (SELECT group_concat(e.kind) FROM sla_events e WHERE e.ticket_id = t.id)
+            FROM tickets t
+            WHERE t.status IN {SLA_ACTIVE_STATUSES}
+        """).fetchall()
+        return [
+            {'id': row[0], 'priority': row[1], 'status': row[2], 'admin_id': row[3], 'created_ts': row[4],
+             'fired': set(row[5].split(',')) if row[5] else set()}
+            for row in rows
+        ]
+
+    return await _read(fetch_open)
+
+
+async def fire_sla_events(events: List[Tuple[int, str]], notify_admins: bool = False, digest_threshold: int = 5,
+                          digest_lines: int = 20) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Фиксирует нарушения сроков (заявка, 'response' / 'resolution') одной транзакцией.
+    Учитываются только сроки, которые всё ещё нарушаются и не были зафиксированы раньше;
+    для них возвращаются (вид, данные заявки).
+    notify_admins: в той же транзакции эскалации ставятся в outbox всем администраторам —
+    по одной на срок, а если их больше digest_threshold, одной сводкой (первые digest_lines).
+    """
+
+    def _fire(conn):
+        fired = []
+        for ticket_id, kind in events:
+            row = conn.execute(f"""
+                SELECT ticket_number, title, priority, status, admin_id FROM tickets
+                WHERE id = ? AND {_SLA_PENDING_CONDITIONS[kind]}
+            """, (ticket_id,)).fetchone()
+            if row is None:
+                continue
+            cursor = conn.execute("INSERT OR IGNORE INTO sla_events (ticket_id, kind) VALUES (?, ?)",
+                                  (ticket_id, kind))
+            if cursor.rowcount:
+                fired.append((kind, {'id': ticket_id, 'number': row[0], 'title': row[1], 'priority': row[2],
+                                     'status': row[3], 'admin_id': row[4]}))
+
+        if notify_admins and fired:
+            admin_ids = [row[0] for row in conn.execute(
+                "SELECT telegram_id FROM authorized_users WHERE role = 'admin'")]
+            if len(fired) > digest_threshold:
+                items = [{'deadline': kind, 'number': ticket['number'], 'priority': ticket['priority']}
+                         for kind, ticket in fired[:digest_lines]]
+                # Сводка, которую воркер ещё не забрал (аренда сдвигает next_attempt_at вперёд), дополняется:
+                # массовая просрочка, зафиксированная несколькими транзакциями, приходит одной сводкой
+                merged = set()
+                for notification_id, chat_id, body in conn.execute("""
+                    SELECT id, chat_id, payload FROM notification_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= ? AND kind = 'sla_digest' AND attempts = 0
+                """, (time.time(),)).fetchall():
+                    if chat_id in merged or chat_id not in admin_ids:
+                        continue
+                    payload = json.loads(body)
+                    payload['count'] += len(fired)
+                    payload['items'] = (payload['items'] + items)[:digest_lines]
+                    conn.execute("UPDATE notification_outbox SET payload = ? WHERE id = ?",
+                                 (json.dumps(payload, ensure_ascii=False), notification_id))
+                    merged.add(chat_id)
+                _enqueue_notifications(conn, 'sla_digest', [chat_id for chat_id in admin_ids if chat_id not in merged],
+                                       {'count': len(fired), 'items': items})
+            else:
+                for kind, ticket in fired:
+                    _enqueue_notifications(conn, 'sla_escalation', admin_ids, {
+                        'deadline': kind, 'ticket_id': ticket['id'], 'number': ticket['number'],
+                        'title': ticket['title'], 'priority': ticket['priority'], 'status': ticket['status'],
+                    })
+        return fired
+
+    return await _write(_fire)
+
+
+# --- ПЛАНОВЫЕ РАССЫЛКИ И ЗАДАЧИ ПЛАНИРОВЩИКА ---
+
+def _mailing_text_hash(text: str) -> str:
+    return hashlib.sha256(text.strip().encode('utf-8')).hexdigest()
+
+
+async def create_scheduled_mailing(text: str, schedule: str, created_by: int | None = None) -> Tuple[int, bool]:
+    """
+    Регистрирует плановую рассылку. Если активная рассылка с тем же текстом и расписанием
+    уже есть, новая не создаётся. Возвращает (id рассылки, создана ли она сейчас).
+    """
+
+    def _create(conn):
+        text_hash = _mailing_text_hash(text)
+        # Проверка и вставка в одной транзакции писателя; уникальный индекс — страховка от гонок
+        existing = conn.execute("SELECT id FROM scheduled_mailings WHERE schedule = ? AND text_hash = ? "
+                                "AND status = 'active'", (schedule, text_hash)).fetchone()
+        if existing is not None:
+            return existing[0], False
+        cursor = conn.execute("INSERT INTO scheduled_mailings (text, text_hash, schedule, created_by) "
+                              "VALUES (?, ?, ?, ?)", (text, text_hash, schedule, created_by))
+        return cursor.lastrowid, True
+
+    return await _write(_create)
+
+
+def _scheduled_mailing_row(row) -> Dict[str, Any]:
+    return {'id': row[0], 'text': row[1], 'schedule': row[2], 'created_by': row[3], 'status': row[4],
+            'created_at': row[5], 'last_run_at': row[6], 'last_broadcast_id': row[7]}
+
+
+_SCHEDULED_MAILING_SELECT = """
+    SELECT id, text, schedule, created_by, status, created_at, last_run_at, last_broadcast_id
+    FROM scheduled_mailings
+"""
+
+
+async def get_scheduled_mailing(mailing_id: int) -> Dict[str, Any] | None:
+    def _get(conn):
+        row = conn.execute(_SCHEDULED_MAILING_SELECT + " WHERE id = ?", (mailing_id,)).fetchone()
+        return _scheduled_mailing_row(row) if row else None
+
+    return await _read(_get)
+
+
+async def get_active_scheduled_mailings() -> List[Dict[str, Any]]:
+    """Активные плановые рассылки (без обращения к списку получателей)."""
+
+    def _list(conn):
+        # Без ORDER BY читается только частичный индекс активных; список короткий, сортируем в Python
+        rows = conn.execute(_SCHEDULED_MAILING_SELECT + " WHERE status = 'active'").fetchall()
+        return sorted((_scheduled_mailing_row(row) for row in rows), key=lambda mailing: mailing['id'])
+
+    return await _read(_list)
+
+
+async def cancel_scheduled_mailing(mailing_id: int) -> bool:
+    """Отменяет активную плановую рассылку; False, если её нет или она уже отменена."""
+
+    def _cancel(conn):
+        return conn.execute("""
+            UPDATE scheduled_mailings SET status = 'cancelled', cancelled_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = 'active'
+        """, (mailing_id,)).rowcount > 0
+
+    return await _write(_cancel)
+
+
+async def mark_scheduled_mailing_run(mailing_id: int, broadcast_id: int):
+    def _mark(conn):
+        conn.execute("UPDATE scheduled_mailings SET last_run_at = CURRENT_TIMESTAMP, last_broadcast_id = ? "
+                     "WHERE id = ?", (broadcast_id, mailing_id))
+
+    await _write(_mark)
+
+
+# Хранилище задач APScheduler (utils/jobstore.py). Методы хранилища синхронные, поэтому здесь
+# используются синхронные pool.run / writer.run. MailingScheduler вызывает планировщик из отдельного
+# потока; в потоке event loop остаются только обращения самого планировщика при срабатывании задач
+# (выборка наступивших и перенос cron-задачи на следующий запуск). Запись при этом ждёт не дольше
+# одной уже начатой пачки писателя — см. WriteQueue.run.
+
+def load_scheduler_job(job_id: str) -> bytes | None:
+    row = _get_pool().run(lambda conn: conn.execute(
+        "SELECT job_state FROM scheduler_jobs WHERE id = ?", (job_id,)).fetchone())
+    return row[0] if row else None
+
+
+def get_scheduler_jobs(max_run_time: float | None = None) -> List[Tuple[str, bytes]]:
+    """(id, состояние) задач по возрастанию next_run_time; с max_run_time — только наступившие."""
+
+    def _list(conn):
+        if max_run_time is None:
+            return conn.execute("SELECT id, job_state FROM scheduler_jobs "
+                                "ORDER BY next_run_time IS NULL, next_run_time").fetchall()
+        return conn.execute("SELECT id, job_state FROM scheduler_jobs WHERE next_run_time <= ? "
+                            "ORDER BY next_run_time", (max_run_time,)).fetchall()
+
+    return _get_pool().run(_list)
+
+
+def get_next_scheduler_run_time() -> float | None:
+    return _get_pool().run(lambda conn: conn.execute(
+        "SELECT min(next_run_time) FROM scheduler_jobs").fetchone()[0])
+
+
+def add_scheduler_job(job_id: str, next_run_time: float | None, job_state: bytes) -> bool:
+    """False, если задача с таким id уже есть."""
+    return _get_writer().run(lambda conn: conn.execute(
+        "INSERT INTO scheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?) ON CONFLICT (id) DO NOTHING",
+        (job_id, next_run_time, job_state)).rowcount > 0)
+
+
+def update_scheduler_job(job_id: str, next_run_time: float | None, job_state: bytes) -> bool:
+    return _get_writer().run(lambda conn: conn.execute(
+        "UPDATE scheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+        (next_run_time, job_state, job_id)).rowcount > 0)
+
+
+def remove_scheduler_jobs(job_ids: List[str] | None = None) -> int:
+    """Удаляет задачи по id (None — все); возвращает число удалённых."""
+
+    def _remove(conn):
+        if job_ids is None:
+            return conn.execute("DELETE FROM scheduler_jobs").rowcount
+        return conn.executemany("DELETE FROM scheduler_jobs WHERE id = ?", [(job_id,) for job_id in job_ids]).rowcount
+
+    return _get_writer().run(_remove)
+
+
+# --- СОСТОЯНИЯ FSM ---
+
+async def get_fsm_record(key: str, updated_after: float) -> Tuple[Optional[str], str, float] | None:
+    """(состояние, данные в JSON, время изменения) по ключу FSM; запись старше updated_after считается брошенной."""
+
+    def _get(conn):
+        return conn.execute("SELECT state, data, updated_at FROM fsm_states WHERE key = ? AND updated_at > ?",
+                            (key, updated_after)).fetchone()
+
+    return await _read(_get)
+
+
+async def save_fsm_records(upserts: List[Tuple[str, Optional[str], str, float]], deletes: List[str]):
+    """Сбрасывает накопленные изменения FSM одной транзакцией: (ключ, состояние, JSON, время) и удаления."""
+
+    def _save(conn):
+        if upserts:
+            conn.executemany("""
+                INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+            """, upserts)
+        if deletes:
+            conn.executemany("DELETE FROM fsm_states WHERE key = ?", [(key,) for key in deletes])
+
+    await _write(_save)
+
+
+async def purge_fsm_records(updated_before: float) -> int:
+    """Удаляет брошенные состояния FSM; возвращает число удалённых."""
+
+    def _purge(conn):
+        return conn.execute("DELETE FROM fsm_states WHERE updated_at <= ?", (updated_before,)).rowcount
+
+    return await _write(_purge)
+
+
+# --- ОЧЕРЕДЬ УВЕДОМЛЕНИЙ (OUTBOX) ---
+
+def _enqueue_notifications(conn, kind: str, chat_ids: List[int], payload: Dict[str, Any]) -> int:
+    """Ставит уведомление kind для каждого чата в outbox в текущей транзакции (вызывается из пишущих функций)."""
+    now = time.time()
+    body = json.dumps(payload, ensure_ascii=False)
+    conn.executemany("""
+        INSERT INTO notification_outbox (chat_id, kind, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)
+    """, [(chat_id, kind, body, now, now) for chat_id in chat_ids])
+    return len(chat_ids)
+
+
+async def get_next_notification_due() -> float | None:
+    """Время ближайшей попытки отправки (None — очередь пуста); читается по индексу очереди."""
+
+    def _get(conn):
+        return conn.execute("SELECT min(next_attempt_at) FROM notification_outbox "
+                            "WHERE status = 'pending'").fetchone()[0]
+
+    return await _read(_get)
+
+
+async def claim_notifications(now: float, limit: int, lease: float) -> List[Dict[str, Any]]:
+    """
+    Забирает до limit наступивших уведомлений и сдвигает их следующую попытку на lease секунд:
+    если процесс упадёт во время отправки, уведомление вернётся в очередь по истечении аренды.
+    """
+
+    def _claim(conn):
+        rows = conn.execute("""
+            UPDATE notification_outbox SET next_attempt_at = ?
+            WHERE id IN (
+                SELECT id FROM notification_outbox
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT ?
+            )
+            RETURNING id, chat_id, kind, payload, attempts, created_at
+        """, (now + lease, now, limit)).fetchall()
+        return [{'id': row[0], 'chat_id': row[1], 'kind': row[2], 'payload': json.loads(row[3]),
+                 'attempts': row[4], 'created_at': row[5]} for row in rows]
+
+    return await _write(_claim)
+
+
+async def mark_notification(notification_id: int, status: str, attempts: int, next_attempt_at: float | None = None,
+                            sent_at: float | None = None, error: str | None = None,
+                            ticket_card: Tuple[int, int, int] | None = None) -> int | None:
+    """
+    Итог попытки: 'sent', 'dead' (в dead-letter) или 'pending' с новым временем попытки.
+    ticket_card — (ticket_id, chat_id, message_id) отправленной карточки заявки: она попадает в индекс
+    ticket_notifications, и возвращается текущая версия заявки (карточка могла устареть, пока была в очереди).
+    """
+
+    def _mark(conn):
+        conn.execute("""
+            UPDATE notification_outbox
+            SET status = ?, attempts = ?, next_attempt_at = COALESCE(?, next_attempt_at), sent_at = ?, error = ?
+            WHERE id = ?
+        """, (status, attempts, next_attempt_at, sent_at, error, notification_id))
+        if ticket_card is None:
+            return None
+        conn.execute("""
+            INSERT OR IGNORE INTO ticket_notifications (ticket_id, chat_id, message_id, sent_at) VALUES (?, ?, ?, ?)
+        """, (*ticket_card, sent_at or time.time()))
+        row = conn.execute("SELECT version FROM tickets WHERE id = ?", (ticket_card[0],)).fetchone()
+        return row[0] if row else None
+
+    return await _write(_mark)
+
+
+async def get_outbox_stats(since: float) -> Dict[str, Any]:
+    """Число уведомлений по статусам, возраст самого старого в очереди и задержки доставки с момента since."""
+
+    def _stats(conn):
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM notification_outbox GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT min(created_at) FROM notification_outbox WHERE status = 'pending'").fetchone()[0]
+        latencies = [row[0] for row in conn.execute("""
+            SELECT sent_at - created_at FROM notification_outbox WHERE status = 'sent' AND sent_at >= ?
+        """, (since,))]
+        return counts, oldest, latencies
+
+    counts, oldest, latencies = await _read(_stats)
+    latencies.sort()
+
+    def percentile(p: float) -> float | None:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else None
+
+    return {
+        'counts': counts,
+        'oldest_pending_age': time.time() - oldest if oldest is not None else None,
+        'sent_recently': len(latencies),
+        'latency_p50': percentile(0.5),
+        'latency_p95': percentile(0.95),
+        'latency_max': latencies[-1] if latencies else None,
+    }
+
+
+async def requeue_dead_notifications() -> int:
+    """Возвращает уведомления из dead-letter в очередь (после устранения причины); возвращает их число."""
+
+    def _requeue(conn):
+        return conn.execute("""
+            UPDATE notification_outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, error = NULL
+            WHERE status = 'dead'
+        """, (time.time(),)).rowcount
+
+    return await _write(_requeue)
+
+
+async def purge_sent_notifications(sent_before: float) -> int:
+    """Удаляет доставленные уведомления старше sent_before; dead-letter не трогается."""
+
+    def _purge(conn):
+        return conn.execute("DELETE FROM notification_outbox WHERE status = 'sent' AND sent_at < ?",
+                            (sent_before,)).rowcount
+
+    return await _write(_purge)
+
+
+# --- КАРТОЧКИ ЗАЯВОК У АДМИНИСТРАТОРОВ ---
+
+async def get_ticket_card(ticket_id: int) -> Dict[str, Any] | None:
+    """Текущее состояние заявки для карточки и все сообщения-карточки о ней (индекс ticket_notifications)."""
+
+    def _get(conn):
+        row = conn.execute("""
+            SELECT t.ticket_number, t.status, t.version, t.admin_id, COALESCE(a.full_name, au.full_name),
+                   u.full_name, t.floor, t.pc_name, t.category, t.title
+            FROM tickets t
+            LEFT JOIN authorized_users u ON t.user_id = u.telegram_id
+            LEFT JOIN sys_admins a ON t.admin_id = a.telegram_id
+            LEFT JOIN authorized_users au ON t.admin_id = au.telegram_id
+            WHERE t.id = ?
+        """, (ticket_id,)).fetchone()
+        if row is None:
+            return None
+        messages = conn.execute("SELECT chat_id, message_id FROM ticket_notifications WHERE ticket_id = ?",
+                                (ticket_id,)).fetchall()
+        return {
+            'ticket_id': ticket_id, 'number': row[0], 'status': row[1], 'version': row[2], 'admin_id': row[3],
+            'admin_name': row[4], 'author': row[5], 'floor': row[6], 'workplace': row[7], 'category': row[8],
+            'title': row[9], 'messages': [tuple(message) for message in messages],
+        }
+
+    return await _read(_get)
+
+
+async def forget_ticket_notifications(ticket_id: int, chat_ids: List[int]):
+    """Убирает из индекса карточки, которые больше нельзя изменить (сообщение удалено, бот заблокирован)."""
+
+    def _forget(conn):
+        conn.executemany("DELETE FROM ticket_notifications WHERE ticket_id = ? AND chat_id = ?",
+                         [(ticket_id, chat_id) for chat_id in chat_ids])
+
+    await _write(_forget)
+
+
+async def purge_ticket_notifications(sent_before: float) -> int:
+    """Удаляет из индекса карточки, отправленные раньше sent_before: старые карточки больше не обновляются."""
 
+    def _purge(conn):
+        return conn.execute("DELETE FROM ticket_notifications WHERE sent_at < ?", (sent_before,)).rowcount
 
+    return await _write(_purge)
@@ -1,19 +1,37 @@
 # -*- coding: utf-8 -*-
 # Файл: it_ecosystem_bot/handlers/admin.py
 import logging
-from aiogram import Router, types, F, Bot
-from aiogram.filters import Command
+import time
+from aiogram import Router, types, F
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from apscheduler.schedulers.asyncio import AsyncIOScheduler  # Импортируем Scheduler
 
-from database import get_user_role, register_sys_admin, get_all_users_for_mailing
-from utils.auth_checks import super_admin_required, is_super_admin
-from keyboards.common import get_faq_admin_keyboard, get_mailing_schedule_keyboard, main_menu_keyboard
+from database import (
+    register_sys_admin, get_cache_stats, get_outbox_stats, requeue_dead_notifications, get_admin_telegram_ids,
+)
+from utils.broadcast import Broadcaster
+from utils.mailings import MailingScheduler
+from utils.notifications import NotificationOutbox
+from utils.routing import ROUTE_KINDS, AdminRouting
+from utils.auth_checks import RoleFilter, SuperAdminFilter
+from keyboards.common import (
+    get_faq_admin_keyboard, get_mailing_schedule_keyboard, get_scheduled_mailings_keyboard, main_menu_keyboard,
+)
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Доступ проверяется фильтрами роутеров, а не в каждом обработчике
+admin_router = Router()
+admin_router.message.filter(RoleFilter("admin"))
+admin_router.callback_query.filter(RoleFilter("admin"))
+
+super_admin_router = Router()
+super_admin_router.message.filter(SuperAdminFilter())
+
+router.include_routers(admin_router, super_admin_router)
+
 
 class AdminStates(StatesGroup):
     waiting_for_admin_id = State()
@@ -28,16 +46,11 @@ class AdminStates(StatesGroup):
 # 1. СТАРТ АДМИН-ПАНЕЛИ (ТОЛЬКО ДЛЯ ADMIN)
 # =================================================================
 
-@router.message(F.text == "🛠️ Админ-панель")
-async def cmd_admin_panel(message: types.Message):
-    user_role = await get_user_role(message.from_user.id)
-    if user_role != 'admin':
-        await message.answer("🚫 <b>Доступ запрещен.</b>")
-        return
-
+@admin_router.message(F.text == "🛠️ Админ-панель")
+async def cmd_admin_panel(message: types.Message, is_super_admin: bool):
     panel_text = "🛠️ <b>Админ-панель</b>\n\n"
 
-    if is_super_admin(message.from_user.id):
+    if is_super_admin:
         panel_text += "🔑 <b>СУПЕР АДМИН</b>:\n<code>/reg_admin</code> - Зарегистрировать нового SysAdmin'а."
 
     await message.answer(panel_text)
@@ -52,25 +65,8 @@ async def cmd_admin_panel(message: types.Message):
 # 2. РАССЫЛКА (ADMIN) - ИСПРАВЛЕН ВОЗВРАТ КНОПОК
 # =================================================================
 
-async def send_scheduled_mailing(bot: Bot, mailing_text: str):
-    """Функция, которую вызывает планировщик (Scheduler)."""
-    user_ids = await get_all_users_for_mailing()
-
-    for user_id in user_ids:
-        try:
-            await bot.send_message(user_id, mailing_text)
-        except Exception:
-            pass
-    logger.info(f"SCHEDULER: Выполнена плановая рассылка.")
-
-
-@router.message(F.text == "📢 Рассылка")
+@admin_router.message(F.text == "📢 Рассылка")
 async def cmd_start_mailing(message: types.Message, state: FSMContext):
-    user_role = await get_user_role(message.from_user.id)
-    if user_role != 'admin':
-        await message.answer("🚫 <b>Доступ запрещен.</b>")
-        return
-
     await message.answer(
         "📢 <b>Новая рассылка</b>\n"
         "Введите текст сообщения для рассылки всем авторизованным пользователям:",
@@ -79,7 +75,7 @@ async def cmd_start_mailing(message: types.Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_mailing_text)
 
 
-@router.message(AdminStates.waiting_for_mailing_text)
+@admin_router.message(AdminStates.waiting_for_mailing_text)
 async def process_mailing_text(message: types.Message, state: FSMContext):
     mailing_text = message.text
     await state.update_data(mailing_text=mailing_text)
@@ -91,47 +87,36 @@ async def process_mailing_text(message: types.Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_mailing_schedule)
 
 
-@router.callback_query(AdminStates.waiting_for_mailing_schedule, F.data.startswith("mail_schedule_"))
-async def process_mailing_schedule(callback: types.CallbackQuery, state: FSMContext, bot: Bot,
-                                   scheduler: AsyncIOScheduler):
+@admin_router.callback_query(AdminStates.waiting_for_mailing_schedule, F.data.startswith("mail_schedule_"))
+async def process_mailing_schedule(callback: types.CallbackQuery, state: FSMContext, mailings: MailingScheduler,
+                                   broadcaster: Broadcaster, user_role: str | None):
     action = callback.data
     data = await state.get_data()
     mailing_text = data['mailing_text']
     user_id = callback.from_user.id
 
-    user_role = await get_user_role(user_id)
     await state.clear()
 
     if action == "mail_schedule_now":
-        user_ids = await get_all_users_for_mailing()
-        success_count = 0
-
-        for u_id in user_ids:
-            try:
-                await bot.send_message(u_id, mailing_text)
-                success_count += 1
-            except Exception:
-                pass
-
-        await callback.message.edit_text(
-            f"✅ <b>Рассылка завершена!</b>\n\nОтправлено: {success_count} сообщений."
-        )
+        # Рассылка идёт в фоне; прогресс обновляется в этом же сообщении
+        await broadcaster.start('text', mailing_text, created_by=user_id,
+                                progress_chat_id=callback.message.chat.id,
+                                progress_message_id=callback.message.message_id)
 
     elif action == "mail_schedule_weekly":
-        # Планирование на будние дни (Пн-Пт в 19:00 UZT)
-        scheduler.add_job(
-            send_scheduled_mailing,
-            trigger='cron',
-            day_of_week='mon-fri',
-            hour=19,
-            minute=0,
-            timezone='Asia/Tashkent',  # UZT time zone
-            args=[bot, mailing_text]
-        )
-        await callback.message.edit_text(
-            "✅ <b>Рассылка запланирована!</b>\n\n"
-            "Будет отправляться автоматически каждый будний день (Пн-Пт) в 19:00 UZT."
-        )
+        # Планирование на будние дни (Пн-Пт в 19:00 UZT); задача хранится в БД и переживает рестарт
+        mailing_id, created = await mailings.schedule(mailing_text, 'weekdays_19', created_by=user_id)
+        if created:
+            await callback.message.edit_text(
+                f"✅ <b>Рассылка #{mailing_id} запланирована!</b>\n\n"
+                "Будет отправляться автоматически каждый будний день (Пн-Пт) в 19:00 UZT.\n"
+                "Список и отмена: /mailings"
+            )
+        else:
+            await callback.message.edit_text(
+                f"ℹ️ <b>Такая рассылка уже запланирована</b> (#{mailing_id}), повторно она не добавлена.\n"
+                "Список и отмена: /mailings"
+            )
 
     # !!! ФИКС: Возвращаем главное меню с основными кнопками
     await callback.message.answer(
@@ -141,12 +126,159 @@ async def process_mailing_schedule(callback: types.CallbackQuery, state: FSMCont
     await callback.answer()
 
 
+@admin_router.message(Command("mailings"))
+async def cmd_scheduled_mailings(message: types.Message, mailings: MailingScheduler):
+    """Список плановых рассылок с кнопками отмены."""
+    active = await mailings.list()
+    if not active:
+        await message.answer("🗓️ Плановых рассылок нет.")
+        return
+
+    lines = ["🗓️ <b>Плановые рассылки</b>\n"]
+    for mailing in active:
+        next_run = mailing['next_run_time'].strftime('%d.%m.%Y %H:%M') if mailing['next_run_time'] else "—"
+        preview = mailing['text'] if len(mailing['text']) <= 60 else mailing['text'][:57] + "..."
+        lines.append(f"<b>#{mailing['id']}</b> · {mailing['schedule_title']} · следующая: {next_run}\n{preview}")
+    await message.answer("\n\n".join(lines), reply_markup=get_scheduled_mailings_keyboard(active))
+
+
+@admin_router.callback_query(F.data.startswith("mailing_cancel_"))
+async def cancel_scheduled_mailing(callback: types.CallbackQuery, mailings: MailingScheduler):
+    mailing_id = int(callback.data.split("_")[-1])
+    if await mailings.cancel(mailing_id):
+        await callback.answer(f"Рассылка #{mailing_id} отменена.")
+        logger.info(f"SCHEDULER: админ {callback.from_user.id} отменил плановую рассылку #{mailing_id}.")
+    else:
+        await callback.answer(f"Рассылка #{mailing_id} уже отменена.")
+
+    active = await mailings.list()
+    if active:
+        await callback.message.edit_reply_markup(reply_markup=get_scheduled_mailings_keyboard(active))
+    else:
+        await callback.message.edit_text("🗓️ Плановых рассылок нет.")
+
+
+@admin_router.message(Command("cache_stats"))
+async def cmd_cache_stats(message: types.Message):
+    """Показывает метрики кэшей ролей/профилей."""
+    lines = ["📊 <b>Кэши БД</b>\n"]
+    for name, stats in get_cache_stats().items():
+        lines.append(
+            f"<b>{name}</b>: записей {stats['size']}, попаданий {stats['hits']}, промахов {stats['misses']} "
+            f"({stats['hit_rate']:.0%}), вытеснено {stats['evictions']}, инвалидаций {stats['invalidations']}"
+        )
+    await message.answer("\n".join(lines))
+
+
+def _seconds(value: float | None) -> str:
+    return "—" if value is None else f"{value:.1f} c"
+
+
+@admin_router.message(Command("outbox"))
+async def cmd_outbox_stats(message: types.Message, outbox: NotificationOutbox):
+    """Очередь уведомлений: статусы, задержка доставки за последний час, dead-letter."""
+    stats = await get_outbox_stats(time.time() - 3600)
+    runtime = outbox.stats()
+    counts = stats['counts']
+    await message.answer(
+        "📨 <b>Уведомления (outbox)</b>\n\n"
+        f"В очереди: {counts.get('pending', 0)} (старейшее ждёт {_seconds(stats['oldest_pending_age'])})\n"
+        f"Доставлено: {counts.get('sent', 0)}, не доставлено (dead-letter): {counts.get('dead', 0)}\n"
+        f"За час доставлено {stats['sent_recently']}, задержка p50 {_seconds(stats['latency_p50'])}, "
+        f"p95 {_seconds(stats['latency_p95'])}, макс. {_seconds(stats['latency_max'])}\n"
+        f"С запуска: отправлено {runtime['sent']}, повторов {runtime['retried']}, в dead-letter {runtime['dead']}\n\n"
+        "Повторить недоставленные: /outbox_retry"
+    )
+
+
+@admin_router.message(Command("outbox_retry"))
+async def cmd_outbox_retry(message: types.Message, outbox: NotificationOutbox):
+    """Возвращает уведомления из dead-letter в очередь."""
+    requeued = await requeue_dead_notifications()
+    outbox.wake()
+    await message.answer(f"🔁 Возвращено в очередь уведомлений: {requeued}.")
+
+
+ROUTES_HELP = (
+    "Добавить: <code>/route_add [ID админа] floor 4</code>, <code>/route_add category Доступы</code>\n"
+    "Снять: <code>/route_del [ID админа] floor 4</code>, <code>/route_del floor</code> (все этажи), "
+    "<code>/route_del</code> (все маршруты)\n"
+    "Без ID — маршруты для себя."
+)
+ROUTE_KIND_TITLES = {'floor': "этажи", 'category': "категории"}
+
+
+def _parse_route_args(args: str | None, default_admin_id: int) -> tuple[int, str | None, str | None]:
+    """«[ID] [вид [значение]]» -> (администратор, вид, значение); значение может содержать пробелы."""
+    parts = (args or "").split(maxsplit=1)
+    admin_id = default_admin_id
+    if parts and parts[0].isdigit():
+        admin_id = int(parts[0])
+        parts = parts[1].split(maxsplit=1) if len(parts) > 1 else []
+    kind = parts[0] if parts else None
+    value = parts[1] if len(parts) > 1 else None
+    return admin_id, kind, value
+
+
+@admin_router.message(Command("routes"))
+async def cmd_routes(message: types.Message, routing: AdminRouting):
+    """Таблица маршрутизации уведомлений о новых заявках."""
+    routes = routing.routes()
+    lines = ["🧭 <b>Маршрутизация новых заявок</b>\n",
+             "Уведомление получают ответственные за этаж или категорию заявки; нет ответственных — все.\n"]
+    for admin_id in sorted(routes):
+        parts = []
+        for kind in ROUTE_KINDS:
+            values = [value for route_kind, value in routes[admin_id] if route_kind == kind]
+            if values:
+                parts.append(f"{ROUTE_KIND_TITLES[kind]}: {', '.join(values)}")
+        mark = " (вы)" if admin_id == message.from_user.id else ""
+        lines.append(f"• <code>{admin_id}</code>{mark} — {'; '.join(parts)}")
+    if not routes:
+        lines.append("Маршрутов нет: о каждой заявке уведомляются все администраторы.")
+    lines.append(f"\n{ROUTES_HELP}")
+    await message.answer("\n".join(lines))
+
+
+@admin_router.message(Command("route_add"))
+async def cmd_route_add(message: types.Message, command: CommandObject, routing: AdminRouting):
+    """Назначает администратору этаж или категорию."""
+    admin_id, kind, value = _parse_route_args(command.args, message.from_user.id)
+    if kind is None or value is None:
+        await message.answer(ROUTES_HELP)
+        return
+    if admin_id not in await get_admin_telegram_ids():
+        await message.answer(f"❌ <code>{admin_id}</code> не администратор.")
+        return
+    try:
+        added = await routing.add(admin_id, kind, value)
+    except ValueError as e:
+        await message.answer(f"❌ Маршрут не добавлен: {e}.\n\n{ROUTES_HELP}")
+        return
+
+    logger.info(f"Admin {message.from_user.id} добавил маршрут {kind}={value} для {admin_id}")
+    await message.answer("✅ Маршрут добавлен." if added else "Такой маршрут уже есть.")
+
+
+@admin_router.message(Command("route_del"))
+async def cmd_route_del(message: types.Message, command: CommandObject, routing: AdminRouting):
+    """Снимает маршрут, все маршруты одного вида или все маршруты администратора."""
+    admin_id, kind, value = _parse_route_args(command.args, message.from_user.id)
+    try:
+        removed = await routing.remove(admin_id, kind, value)
+    except ValueError as e:
+        await message.answer(f"❌ {e}.\n\n{ROUTES_HELP}")
+        return
+
+    logger.info(f"Admin {message.from_user.id} снял маршруты {kind or '*'}={value or '*'} у {admin_id}: {removed}")
+    await message.answer(f"🗑 Снято маршрутов: {removed}.")
+
+
 # =================================================================
 # 3. РЕГИСТРАЦИЯ СИСТЕМНЫХ АДМИНИСТРАТОРОВ
 # =================================================================
 
-@router.message(Command("reg_admin"))
-@super_admin_required
+@super_admin_router.message(Command("reg_admin"))
 async def cmd_reg_admin(message: types.Message, state: FSMContext, **kwargs):
     await state.clear()
     await message.answer(
@@ -157,7 +289,7 @@ async def cmd_reg_admin(message: types.Message, state: FSMContext, **kwargs):
     await state.set_state(AdminStates.waiting_for_admin_id)
 
 
-@router.message(AdminStates.waiting_for_admin_id)
+@super_admin_router.message(AdminStates.waiting_for_admin_id)
 async def process_admin_id(message: types.Message, state: FSMContext, **kwargs):
     try:
         admin_id = int(message.text.strip())
@@ -170,7 +302,7 @@ async def process_admin_id(message: types.Message, state: FSMContext, **kwargs):
     await state.set_state(AdminStates.waiting_for_admin_name)
 
 
-@router.message(AdminStates.waiting_for_admin_name)
+@super_admin_router.message(AdminStates.waiting_for_admin_name)
 async def process_admin_name(message: types.Message, state: FSMContext, **kwargs):
     admin_name = message.text.strip()
     await state.update_data(admin_name=admin_name)
@@ -178,7 +310,7 @@ async def process_admin_name(message: types.Message, state: FSMContext, **kwargs
     await state.set_state(AdminStates.waiting_for_admin_position)
 
 
-@router.message(AdminStates.waiting_for_admin_position)
+@super_admin_router.message(AdminStates.waiting_for_admin_position)
 async def process_admin_position(message: types.Message, state: FSMContext, **kwargs):
     state_data = await state.get_data()
     admin_id = state_data['admin_id']
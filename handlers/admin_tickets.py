@@ -1,20 +1,27 @@
 # Файл: it_ecosystem_bot/handlers/admin_tickets.py
 # -*- coding: utf-8 -*-
 import logging
-from aiogram import Router, types, F
+from aiogram import Bot, Router, types, F
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from database import (
-    get_all_tickets, get_ticket_history, assign_ticket_to_admin,
-    update_ticket_status, get_user_role
+    get_ticket_dashboard, get_tickets_page, get_ticket_details, get_ticket_history, claim_ticket,
+    update_ticket_status
 )
-from utils.auth_checks import is_admin
+from utils.assignment import AssignmentEngine
+from utils.auth_checks import RoleFilter
+from utils.faq_media import media_sender
+from utils.sla import SlaEngine
+from utils.ticket_cards import TicketCardEditor
 
 logger = logging.getLogger(__name__)
 router = Router()
+# Весь роутер только для администраторов: апдейты остальных отсекаются до кода обработчиков
+router.message.filter(RoleFilter("admin"))
+router.callback_query.filter(RoleFilter("admin"))
 
 
 class TicketManagementStates(StatesGroup):
@@ -30,63 +37,120 @@ class TicketManagementStates(StatesGroup):
 # 1. ПРОСМОТР ВСЕ ЗАЯВОК (АДМИН МЕНЮ)
 # =================================================================
 
+STATUS_EMOJI = {
+    'open': '🟢',
+    'in_progress': '🟡',
+    'on_hold': '🟠',
+    'closed': '✅',
+    'await_rating': '⭐️'
+}
+
+
+def _tickets_page_text(page: dict, status: str | None) -> str:
+    """Текст страницы списка заявок."""
+    title = f"Заявки со статусом: {status.upper()}" if status else "Все заявки"
+    text = f"📋 <b>{title}</b>\n\n"
+
+    for ticket in page['tickets']:
+        admin_name = "—"
+        if ticket['admin_id']:
+            admin_name = f"Admin {ticket['admin_id']}"
+
+        text += (
+            f"{STATUS_EMOJI.get(ticket['status'], '•')} <code>{ticket['number']}</code>\n"
+            f"   Заголовок: {ticket['title'][:50]}\n"
+            f"   Приоритет: {ticket['priority']}\n"
+            f"   От пользователя: {ticket['user_name'] or 'Неизвестен'}\n"
+            f"   Назначен: {admin_name}\n\n"
+        )
+    return text
+
+
+def _tickets_page_keyboard(page: dict, status: str | None) -> types.InlineKeyboardMarkup:
+    """Кнопки заявок страницы и навигация: курсор страницы — id крайней заявки."""
+    kb = InlineKeyboardBuilder()
+    for ticket in page['tickets']:
+        kb.button(text=f"{ticket['number']} - {ticket['title'][:25]}",
+                  callback_data=f"ticket_detail_{ticket['id']}")
+    kb.adjust(1)
+
+    scope = status or "all"
+    nav = []
+    if page['has_prev']:
+        nav.append(types.InlineKeyboardButton(
+            text="◀️ Назад", callback_data=f"tickets_page:{scope}:prev:{page['tickets'][0]['id']}"))
+    if page['has_next']:
+        nav.append(types.InlineKeyboardButton(
+            text="Вперёд ▶️", callback_data=f"tickets_page:{scope}:next:{page['tickets'][-1]['id']}"))
+    if nav:
+        kb.row(*nav)
+
+    kb.row(types.InlineKeyboardButton(text="« Назад", callback_data="filter_cancel"))
+    return kb.as_markup()
+
+
+async def _show_tickets_page(callback: types.CallbackQuery, status: str | None,
+                             after_id: int | None = None, before_id: int | None = None):
+    page = await get_tickets_page(status=status, after_id=after_id, before_id=before_id)
+
+    if not page['tickets']:
+        text = f"📭 <b>Нет заявок со статусом '{status}'.</b>" if status else "📭 <b>Нет заявок в системе.</b>"
+        await callback.message.edit_text(text)
+        await callback.answer()
+        return
+
+    await callback.message.edit_text(_tickets_page_text(page, status),
+                                     reply_markup=_tickets_page_keyboard(page, status))
+    await callback.answer()
+
+
+DASHBOARD_TITLES = {
+    'priority': "Приоритеты",
+    'floor': "Этажи",
+    'category': "Категории",
+}
+
+
 @router.message(F.text == "📋 Все заявки")
 async def cmd_view_all_tickets(message: types.Message):
-    """Показывает список всех заявок с фильтрацией."""
-    
-    if not is_admin(message.from_user.id):
-        await message.answer("🚫 <b>Доступ запрещен.</b> Только администраторы могут просматривать заявки.")
-        return
+    """Показывает сводку заявок по статусам, приоритетам, этажам и категориям."""
     
-    # Получаем все заявки
-    tickets = await get_all_tickets()
+    dashboard = await get_ticket_dashboard()
     
-    if not tickets:
+    if not dashboard['status']:
         await message.answer("📭 <b>Нет заявок в системе.</b>")
         return
     
-    # Формируем сообщение со списком заявок
+    # По статусам — счётчики и последние заявки
     text = "📋 <b>Все заявки в системе</b>\n\n"
     
-    # Группируем по статусам
-    statuses = {}
-    for ticket in tickets:
-        status = ticket['status']
-        if status not in statuses:
-            statuses[status] = []
-        statuses[status].append(ticket)
-    
-    # Формируем текст с группировкой
-    status_emoji = {
-        'open': '🟢',
-        'in_progress': '🟡',
-        'on_hold': '🟠',
-        'closed': '✅',
-        'await_rating': '⭐️'
-    }
-    
-    for status, items in statuses.items():
-        emoji = status_emoji.get(status, '•')
-        text += f"\n{emoji} <b>{status.upper()}</b> ({len(items)})\n"
-        for ticket in items[:5]:  # Показываем первые 5 заявок
+    for group in dashboard['status']:
+        emoji = STATUS_EMOJI.get(group['value'], '•')
+        text += f"\n{emoji} <b>{group['value'].upper()}</b> ({group['count']})\n"
+        for ticket in group['tickets']:
             text += f"  • <code>{ticket['number']}</code> - {ticket['title'][:30]}\n"
-        if len(items) > 5:
-            text += f"  ... и ещё {len(items) - 5}\n"
+        if group['count'] > len(group['tickets']):
+            text += f"  ... и ещё {group['count'] - len(group['tickets'])}\n"
     
-    text += "\n<b>Используйте команду для фильтрации:</b>\n"
+    # Остальные разрезы — только счётчики
+    for dim, title in DASHBOARD_TITLES.items():
+        if dashboard[dim]:
+            counts = ", ".join(f"{group['value']}: {group['count']}" for group in dashboard[dim])
+            text += f"\n<b>{title}:</b> {counts}"
+    
+    text += "\n\n<b>Используйте команду для фильтрации:</b>\n"
     text += "/filter_tickets - фильтровать по статусу, приоритету, отделу"
     
-    await message.answer(text)
+    kb = InlineKeyboardBuilder()
+    kb.button(text="📄 Все заявки постранично", callback_data="tickets_page:all:first:0")
+    
+    await message.answer(text, reply_markup=kb.as_markup())
 
 
 @router.message(Command("filter_tickets"))
 async def cmd_filter_tickets(message: types.Message, state: FSMContext):
     """Открывает меню фильтрации заявок."""
     
-    if not is_admin(message.from_user.id):
-        await message.answer("🚫 <b>Доступ запрещен.</b>")
-        return
-    
     # Создаём клавиатуру с опциями фильтрации
     kb = InlineKeyboardBuilder()
     
@@ -113,45 +177,23 @@ async def handle_filter_status(callback: types.CallbackQuery, state: FSMContext)
     """Обрабатывает фильтр по статусу."""
     
     status = callback.data.replace("filter_status_", "")
+    await _show_tickets_page(callback, status)
+
+
+@router.callback_query(F.data.startswith("tickets_page:"))
+async def handle_tickets_page(callback: types.CallbackQuery):
+    """Листает список заявок: tickets_page:<статус|all>:<first|next|prev>:<id крайней заявки>."""
     
-    # Получаем отфильтрованные заявки
-    tickets = await get_all_tickets(status=status)
-    
-    if not tickets:
-        await callback.message.edit_text(f"📭 <b>Нет заявок со статусом '{status}'.</b>")
-        await callback.answer()
-        return
-    
-    # Формируем список заявок
-    text = f"📋 <b>Заявки со статусом: {status.upper()}</b>\n\n"
-    
-    for idx, ticket in enumerate(tickets[:20], 1):  # Показываем максимум 20
-        admin_name = "—"
-        if ticket['admin_id']:
-            admin_name = f"Admin {ticket['admin_id']}"
-        
-        text += (
-            f"{idx}. <code>{ticket['number']}</code>\n"
-            f"   Заголовок: {ticket['title'][:50]}\n"
-            f"   Приоритет: {ticket['priority']}\n"
-            f"   От пользователя: {ticket['user_name'] or 'Неизвестен'}\n"
-            f"   Назначен: {admin_name}\n\n"
-        )
-    
-    if len(tickets) > 20:
-        text += f"... и ещё {len(tickets) - 20} заявок"
-    
-    # Клавиатура для выбора заявки
-    kb = InlineKeyboardBuilder()
-    for ticket in tickets[:10]:
-        kb.button(text=f"{ticket['number']} - {ticket['title'][:25]}", 
-                 callback_data=f"ticket_detail_{ticket['id']}")
-    kb.adjust(1)
-    
-    kb.button(text="« Назад", callback_data="filter_cancel")
+    _, scope, direction, anchor = callback.data.split(":")
+    status = None if scope == "all" else scope
+    anchor_id = int(anchor)
     
-    await callback.message.edit_text(text, reply_markup=kb.as_markup())
-    await callback.answer()
+    if direction == "next":
+        await _show_tickets_page(callback, status, after_id=anchor_id)
+    elif direction == "prev":
+        await _show_tickets_page(callback, status, before_id=anchor_id)
+    else:
+        await _show_tickets_page(callback, status)
 
 
 @router.callback_query(F.data == "filter_cancel")
@@ -173,9 +215,8 @@ async def show_ticket_details(callback: types.CallbackQuery, state: FSMContext):
     
     ticket_id = int(callback.data.replace("ticket_detail_", ""))
     
-    # Получаем все заявки и ищем нужную
-    all_tickets = await get_all_tickets()
-    ticket = next((t for t in all_tickets if t['id'] == ticket_id), None)
+    # Одна заявка по первичному ключу вместе с описанием и вложениями
+    ticket = await get_ticket_details(ticket_id)
     
     if not ticket:
         await callback.message.edit_text("❌ <b>Заявка не найдена.</b>")
@@ -191,7 +232,7 @@ async def show_ticket_details(callback: types.CallbackQuery, state: FSMContext):
     # Формируем подробный текст
     admin_name = "—"
     if ticket['admin_id']:
-        admin_name = f"Admin {ticket['admin_id']}"
+        admin_name = ticket['admin_name'] or f"Admin {ticket['admin_id']}"
     
     text = (
         f"📋 <b>Заявка {ticket['number']}</b>\n\n"
@@ -199,24 +240,30 @@ async def show_ticket_details(callback: types.CallbackQuery, state: FSMContext):
         f"<b>Приоритет:</b> {ticket['priority']}\n"
         f"<b>Категория:</b> {ticket['category']}\n"
         f"<b>Заголовок:</b> {ticket['title']}\n"
-        f"<b>Описание:</b> {ticket['title']}\n\n"
+        f"<b>Описание:</b> {ticket['description'] or '—'}\n\n"
         f"<b>От:</b> {ticket['user_name'] or 'Неизвестен'} (ID: {ticket['user_id']})\n"
         f"<b>Отделение:</b> {ticket['department'] or '—'}\n"
         f"<b>Создана:</b> {ticket['created_at']}\n"
         f"<b>Назначена:</b> {admin_name}\n"
     )
     
+    if ticket['attachments']:
+        text += f"<b>Вложения:</b> {len(ticket['attachments'])}\n"
+    
     if history:
         text += f"\n<b>История изменений:</b> {len(history)} записей"
     
     # Клавиатура с действиями
     kb = InlineKeyboardBuilder()
     
-    if not ticket['admin_id']:
+    # Автоназначенная заявка тоже открыта: исполнитель (или любой администратор) берёт её в работу
+    if ticket['status'] == 'open':
         kb.button(text="✋ Назначить на себя", callback_data=f"ticket_assign_{ticket_id}")
     
     kb.button(text="📝 Изменить статус", callback_data=f"ticket_status_{ticket_id}")
     kb.button(text="📜 История", callback_data=f"ticket_history_{ticket_id}")
+    if ticket['attachments']:
+        kb.button(text=f"📎 Вложения ({len(ticket['attachments'])})", callback_data=f"ticket_files_{ticket_id}")
     kb.adjust(1)
     
     kb.button(text="« Назад", callback_data="filter_cancel")
@@ -225,32 +272,91 @@ async def show_ticket_details(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("ticket_files_"))
+async def send_ticket_files(callback: types.CallbackQuery, bot: Bot):
+    """Присылает вложения заявки отдельными сообщениями."""
+    
+    ticket_id = int(callback.data.replace("ticket_files_", ""))
+    ticket = await get_ticket_details(ticket_id)
+    
+    if not ticket or not ticket['attachments']:
+        await callback.answer("Вложений нет.", show_alert=True)
+        return
+    
+    for attachment in ticket['attachments']:
+        send = media_sender(bot, attachment['file_id'], attachment['file_type'], f"📎 {ticket['number']}")
+        await send(callback.message.chat.id)
+    await callback.answer()
+
+
 # =================================================================
 # 3. НАЗНАЧЕНИЕ ЗАЯВКИ НА АДМИНИСТРАТОРА
 # =================================================================
 
+def _claim_conflict_text(result: dict) -> str:
+    """Почему назначение не состоялось: заявку уже взял другой администратор или её изменили."""
+    admin_id = result['admin_id']
+    if admin_id and result['status'] != 'open':
+        return f"Заявку уже взял {result['admin_name'] or f'Admin {admin_id}'}."
+    return "Заявка изменилась, пока вы её просматривали. Откройте её заново."
+
+
 @router.callback_query(F.data.startswith("ticket_assign_"))
-async def handle_assign_ticket(callback: types.CallbackQuery, state: FSMContext):
+async def handle_assign_ticket(callback: types.CallbackQuery, state: FSMContext, sla: SlaEngine,
+                               cards: TicketCardEditor, assigner: AssignmentEngine):
     """Назначает заявку на текущего администратора."""
     
     ticket_id = int(callback.data.replace("ticket_assign_", ""))
     admin_id = callback.from_user.id
     
-    # Назначаем заявку
-    success = await assign_ticket_to_admin(ticket_id, admin_id)
-    
-    if success:
+    # Назначение условное: если заявку изменили после открытия карточки, выигрывает первый
+    current = (await state.get_data()).get('current_ticket') or {}
+    expected_version = current.get('version') if current.get('id') == ticket_id else None
+    result = await claim_ticket(ticket_id, admin_id, expected_version=expected_version)
+    
+    if result and result['claimed']:
+        sla.ticket_assigned(ticket_id)
+        cards.ticket_changed(ticket_id)
+        assigner.ticket_changed(ticket_id, admin_id, result['status'], result['priority'], result['floor'])
+        if expected_version is not None:
+            # Дальнейшая смена статуса сверяется уже с версией после назначения
+            await state.update_data(current_ticket={**current, 'version': result['version']})
         await callback.message.edit_text(
             "✅ <b>Заявка успешно назначена на вас!</b>\n\n"
             "Теперь вы можете изменять её статус и добавлять комментарии."
         )
         logger.info(f"Admin {admin_id} назначил заявку {ticket_id} на себя")
+    elif result:
+        await callback.message.edit_text(f"❌ <b>Заявка не назначена.</b> {_claim_conflict_text(result)}")
     else:
         await callback.message.edit_text("❌ <b>Ошибка при назначении заявки.</b>")
     
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("ticket_claim_"))
+async def handle_claim_from_card(callback: types.CallbackQuery, sla: SlaEngine, cards: TicketCardEditor,
+                                 assigner: AssignmentEngine):
+    """«Назначить на себя» на карточке новой заявки: карточки всех администраторов обновит редактор."""
+    
+    ticket_id = int(callback.data.replace("ticket_claim_", ""))
+    admin_id = callback.from_user.id
+    
+    result = await claim_ticket(ticket_id, admin_id)
+    # И при проигрыше: карточка нажавшего могла устареть
+    cards.ticket_changed(ticket_id)
+    
+    if result and result['claimed']:
+        sla.ticket_assigned(ticket_id)
+        assigner.ticket_changed(ticket_id, admin_id, result['status'], result['priority'], result['floor'])
+        logger.info(f"Admin {admin_id} назначил заявку {ticket_id} на себя (из карточки)")
+        await callback.answer("✅ Заявка назначена на вас.")
+    elif result:
+        await callback.answer(_claim_conflict_text(result), show_alert=True)
+    else:
+        await callback.answer("Заявка не найдена.", show_alert=True)
+
+
 # =================================================================
 # 4. ИЗМЕНЕНИЕ СТАТУСА ЗАЯВКИ
 # =================================================================
@@ -260,7 +366,10 @@ async def choose_new_status(callback: types.CallbackQuery, state: FSMContext):
     """Показывает меню выбора нового статуса."""
     
     ticket_id = int(callback.data.replace("ticket_status_", ""))
-    await state.update_data(current_ticket_id=ticket_id)
+    # Версия, которую видел администратор: статус не перезапишет чужое изменение
+    current = (await state.get_data()).get('current_ticket') or {}
+    await state.update_data(current_ticket_id=ticket_id,
+                            expected_version=current.get('version') if current.get('id') == ticket_id else None)
     
     # Статусы с эмодзи
     statuses = [
@@ -310,26 +419,60 @@ async def confirm_status_change(callback: types.CallbackQuery, state: FSMContext
     await callback.answer()
 
 
+STATUS_CONFLICT_TEXT = ("❌ <b>Статус не обновлён:</b> заявку изменил другой администратор, "
+                        "пока вы выбирали статус. Откройте её заново.")
+
+
+def _expected_version(state_data: dict, ticket_id: int) -> int | None:
+    """Версия открытой карточки — только если статус меняют именно этой заявке, а не из старого сообщения."""
+    if state_data.get('current_ticket_id') != ticket_id:
+        return None
+    return state_data.get('expected_version')
+
+
+def _update_sla(sla: SlaEngine, ticket_id: int, new_status: str):
+    """Смена статуса админом снимает срок реакции, а закрытие — и срок решения."""
+    if new_status in ('closed', 'await_rating'):
+        sla.ticket_resolved(ticket_id)
+    else:
+        sla.ticket_assigned(ticket_id)
+
+
+def _update_load(assigner: AssignmentEngine, state_data: dict, ticket_id: int, admin_id: int, new_status: str):
+    """Сменивший статус становится исполнителем; приоритет и этаж — из открытой карточки, если это она."""
+    current = state_data.get('current_ticket') or {}
+    if current.get('id') != ticket_id:
+        current = {}
+    assigner.ticket_changed(ticket_id, admin_id, new_status, current.get('priority'), current.get('floor'))
+
+
 @router.message(StateFilter(TicketManagementStates.adding_comment))
-async def handle_comment(message: types.Message, state: FSMContext):
+async def handle_comment(message: types.Message, state: FSMContext, sla: SlaEngine, cards: TicketCardEditor,
+                         assigner: AssignmentEngine):
     """Обрабатывает комментарий и обновляет статус."""
     
     state_data = await state.get_data()
     ticket_id = state_data.get('ticket_id_for_status')
     new_status = state_data.get('new_status')
+    expected_version = _expected_version(state_data, ticket_id)
     comment = message.text
     admin_id = message.from_user.id
     
     # Обновляем статус с комментарием
-    success = await update_ticket_status(ticket_id, new_status, admin_id, comment)
+    success = await update_ticket_status(ticket_id, new_status, admin_id, comment, expected_version)
     
     if success:
+        _update_sla(sla, ticket_id, new_status)
+        _update_load(assigner, state_data, ticket_id, admin_id, new_status)
+        cards.ticket_changed(ticket_id)
         await message.answer(
             f"✅ <b>Статус заявки обновлен!</b>\n\n"
             f"Новый статус: {new_status}\n"
             f"Комментарий: {comment}"
         )
         logger.info(f"Admin {admin_id} обновил статус заявки {ticket_id} на {new_status}")
+    elif expected_version is not None:
+        await message.answer(STATUS_CONFLICT_TEXT)
     else:
         await message.answer("❌ <b>Ошибка при обновлении статуса.</b>")
     
@@ -337,23 +480,31 @@ async def handle_comment(message: types.Message, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("skip_comment_"))
-async def skip_comment(callback: types.CallbackQuery, state: FSMContext):
+async def skip_comment(callback: types.CallbackQuery, state: FSMContext, sla: SlaEngine, cards: TicketCardEditor,
+                       assigner: AssignmentEngine):
     """Пропускает комментарий и обновляет статус."""
     
     data_parts = callback.data.replace("skip_comment_", "").split("_")
     ticket_id = int(data_parts[0])
     new_status = "_".join(data_parts[1:])
     admin_id = callback.from_user.id
+    state_data = await state.get_data()
+    expected_version = _expected_version(state_data, ticket_id)
     
     # Обновляем статус без комментария
-    success = await update_ticket_status(ticket_id, new_status, admin_id, None)
+    success = await update_ticket_status(ticket_id, new_status, admin_id, None, expected_version)
     
     if success:
+        _update_sla(sla, ticket_id, new_status)
+        _update_load(assigner, state_data, ticket_id, admin_id, new_status)
+        cards.ticket_changed(ticket_id)
         await callback.message.edit_text(
             f"✅ <b>Статус заявки обновлен!</b>\n\n"
             f"Новый статус: {new_status}"
         )
         logger.info(f"Admin {admin_id} обновил статус заявки {ticket_id} на {new_status}")
+    elif expected_version is not None:
+        await callback.message.edit_text(STATUS_CONFLICT_TEXT)
     else:
         await callback.message.edit_text("❌ <b>Ошибка при обновлении статуса.</b>")
     
@@ -1,21 +1,33 @@
 # Файл: it_ecosystem_bot/handlers/equipment.py
+import asyncio
 import logging
-from aiogram import Router, types, F
+import os
+import tempfile
+
+from aiogram import Router, types, F, Bot
+from aiogram.types import BufferedInputFile, FSInputFile
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from database import (
-    create_equipment, get_all_equipment, get_equipment, delete_equipment,
-    assign_equipment_to_user, get_user_equipment, get_user_role
+    create_equipment, get_equipment_page, get_equipment_counts, get_equipment, delete_equipment,
+    assign_equipment_to_user, get_user_equipment, get_user_role, get_all_workplaces
 )
-from utils.auth_checks import is_admin
-from utils.inventory_generator import generate_inventory_number, get_available_categories
+from utils.auth_checks import RoleFilter
+from utils.equipment_import import ImportFormatError, import_equipment_file
+from utils.inventory_generator import generate_inventory_number, get_available_categories, register_equipment_batch
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Управление инвентарём — только для администраторов; роль проверяет фильтр роутера
+admin_router = Router()
+admin_router.message.filter(RoleFilter("admin"))
+admin_router.callback_query.filter(RoleFilter("admin"))
+router.include_router(admin_router)
+
 
 class EquipmentStates(StatesGroup):
     viewing_equipment = State()
@@ -26,30 +38,35 @@ class EquipmentStates(StatesGroup):
     managing_equipment = State()
     assigning_user = State()
     confirming_assignment = State()
+    bulk_choosing_category = State()
+    bulk_entering_model = State()
+    bulk_entering_serials = State()
+    waiting_import_file = State()
+
+
+# Максимум устройств в одной поставке (одна транзакция, один блок номеров)
+BULK_MAX_ITEMS = 1000
 
 
 # =================================================================
 # 1. ПРОСМОТР ВСЕ ОБОРУДОВАНИЯ (АДМИН МЕНЮ)
 # =================================================================
 
-@router.message(F.text == "💻 Оборудование")
+@admin_router.message(F.text == "💻 Оборудование")
 async def cmd_view_equipment(message: types.Message):
     """Показывает статистику оборудования."""
     
-    if not is_admin(message.from_user.id):
-        await message.answer("🚫 <b>Доступ запрещен.</b> Только администраторы могут управлять оборудованием.")
-        return
-    
     # Получаем статистику оборудования
-    available = await get_all_equipment(status='available')
-    assigned = await get_all_equipment(status='assigned')
+    counts = await get_equipment_counts()
     
     text = (
         f"💻 <b>Инвентарный учет оборудования</b>\n\n"
-        f"✅ Доступное: {len(available)}\n"
-        f"👤 Назначено пользователям: {len(assigned)}\n\n"
+        f"✅ Доступное: {counts['available']}\n"
+        f"👤 Назначено пользователям: {counts['assigned']}\n\n"
         f"<b>Команды:</b>\n"
         f"/eq_create - Добавить новое оборудование\n"
+        f"/eq_bulk - Оформить поставку (партию оборудования)\n"
+        f"/eq_import - Импорт оборудования из .xlsx/.csv\n"
         f"/eq_list - Список всего оборудования\n"
         f"/eq_assign - Назначить оборудование пользователю\n"
     )
@@ -67,8 +84,8 @@ async def cmd_view_equipment(message: types.Message):
 # 2. СОЗДАНИЕ НОВОГО ОБОРУДОВАНИЯ
 # =================================================================
 
-@router.message(Command("eq_create"))
-@router.callback_query(F.data == "eq_create_btn")
+@admin_router.message(Command("eq_create"))
+@admin_router.callback_query(F.data == "eq_create_btn")
 async def cmd_create_equipment(message_or_callback, state: FSMContext):
     """Начинает процесс создания нового оборудования."""
     
@@ -80,13 +97,6 @@ async def cmd_create_equipment(message_or_callback, state: FSMContext):
         message = message_or_callback.message
         is_msg = False
     
-    if not is_admin(message.from_user.id):
-        if not is_msg:
-            await message_or_callback.answer("🚫 Доступ запрещен.")
-        else:
-            await message.answer("🚫 Доступ запрещен.")
-        return
-    
     # Показываем выбор категории
     categories = get_available_categories()
     
@@ -109,7 +119,7 @@ async def cmd_create_equipment(message_or_callback, state: FSMContext):
         await message_or_callback.answer()
 
 
-@router.callback_query(F.data.startswith("eq_cat_"), StateFilter(EquipmentStates.choosing_category))
+@admin_router.callback_query(F.data.startswith("eq_cat_"), StateFilter(EquipmentStates.choosing_category))
 async def select_category(callback: types.CallbackQuery, state: FSMContext):
     """Обрабатывает выбор категории."""
     
@@ -117,7 +127,7 @@ async def select_category(callback: types.CallbackQuery, state: FSMContext):
     await state.update_data(equipment_category=category)
     
     # Генерируем инвентарный номер
-    inv_number = generate_inventory_number(category)
+    inv_number = await generate_inventory_number(category)
     
     await callback.message.edit_text(
         f"✅ <b>Категория выбрана:</b> {category}\n\n"
@@ -130,7 +140,7 @@ async def select_category(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.message(StateFilter(EquipmentStates.entering_model))
+@admin_router.message(StateFilter(EquipmentStates.entering_model))
 async def enter_model(message: types.Message, state: FSMContext):
     """Обрабатывает ввод модели."""
     
@@ -145,7 +155,7 @@ async def enter_model(message: types.Message, state: FSMContext):
     await state.set_state(EquipmentStates.entering_serial)
 
 
-@router.message(StateFilter(EquipmentStates.entering_serial))
+@admin_router.message(StateFilter(EquipmentStates.entering_serial))
 async def enter_serial(message: types.Message, state: FSMContext):
     """Обрабатывает ввод серийного номера и завершает создание."""
     
@@ -175,70 +185,239 @@ async def enter_serial(message: types.Message, state: FSMContext):
 
 
 # =================================================================
-# 3. ПРОСМОТР СПИСКА ОБОРУДОВАНИЯ
+# 2.1. ПАКЕТНАЯ РЕГИСТРАЦИЯ ПОСТАВКИ
 # =================================================================
 
-@router.message(Command("eq_list"))
-@router.callback_query(F.data == "eq_list_btn")
-async def cmd_list_equipment(message_or_callback, state: FSMContext):
-    """Показывает список оборудования с фильтрацией."""
-    
-    if isinstance(message_or_callback, types.Message):
-        message = message_or_callback
-        is_msg = True
+@admin_router.message(Command("eq_bulk"))
+async def cmd_bulk_equipment(message: types.Message, state: FSMContext):
+    """Начинает регистрацию поставки: одна категория и модель, много устройств."""
+
+    kb = InlineKeyboardBuilder()
+    for cat_name, cat_code in get_available_categories().items():
+        kb.button(text=f"{cat_code} - {cat_name.replace('_', ' ').title()}",
+                  callback_data=f"eq_bulk_cat_{cat_name}")
+    kb.adjust(2)
+
+    await message.answer("📦 <b>Регистрация поставки</b>\n\nВыберите категорию оборудования:",
+                         reply_markup=kb.as_markup())
+    await state.set_state(EquipmentStates.bulk_choosing_category)
+
+
+@admin_router.callback_query(F.data.startswith("eq_bulk_cat_"), StateFilter(EquipmentStates.bulk_choosing_category))
+async def bulk_select_category(callback: types.CallbackQuery, state: FSMContext):
+    """Запоминает категорию поставки."""
+
+    category = callback.data.replace("eq_bulk_cat_", "")
+    await state.update_data(bulk_category=category)
+
+    await callback.message.edit_text(
+        f"✅ <b>Категория:</b> {category}\n\n"
+        f"Введите <b>модель</b> поставленного оборудования:"
+    )
+    await state.set_state(EquipmentStates.bulk_entering_model)
+    await callback.answer()
+
+
+@admin_router.message(StateFilter(EquipmentStates.bulk_entering_model))
+async def bulk_enter_model(message: types.Message, state: FSMContext):
+    """Запоминает модель и просит серийные номера."""
+
+    model = message.text.strip()
+    await state.update_data(bulk_model=model)
+
+    await message.answer(
+        f"✅ <b>Модель:</b> {model}\n\n"
+        f"Отправьте <b>серийные номера</b>, по одному в строке,\n"
+        f"или просто <b>количество</b> устройств, если серийные номера не учитываются "
+        f"(не более {BULK_MAX_ITEMS})."
+    )
+    await state.set_state(EquipmentStates.bulk_entering_serials)
+
+
+@admin_router.message(StateFilter(EquipmentStates.bulk_entering_serials))
+async def bulk_enter_serials(message: types.Message, state: FSMContext):
+    """Регистрирует всю поставку одной транзакцией и отправляет список выданных номеров."""
+
+    text = (message.text or "").strip()
+    if text.isdigit():
+        serials = [""] * int(text)
     else:
-        message = message_or_callback.message
-        is_msg = False
-    
-    if not is_admin(message.from_user.id):
-        if not is_msg:
-            await message_or_callback.answer("🚫 Доступ запрещен.")
-        else:
-            await message.answer("🚫 Доступ запрещен.")
+        serials = [line.strip() for line in text.splitlines() if line.strip()]
+
+    if not serials or len(serials) > BULK_MAX_ITEMS:
+        await message.answer(f"❌ Укажите от 1 до {BULK_MAX_ITEMS} устройств.")
+        return
+
+    state_data = await state.get_data()
+    category = state_data['bulk_category']
+    model = state_data['bulk_model']
+
+    numbers = await register_equipment_batch(category, [(model, serial) for serial in serials])
+    await state.clear()
+
+    if not numbers:
+        await message.answer("❌ <b>Ошибка при регистрации поставки.</b> Ни одно устройство не добавлено.")
+        return
+
+    report = "inv_number;model;serial\n" + "".join(
+        f"{number};{model};{serial}\n" for number, serial in zip(numbers, serials)
+    )
+    await message.answer_document(
+        BufferedInputFile(report.encode("utf-8-sig"), filename=f"delivery_{numbers[0]}.csv"),
+        caption=(
+            f"✅ <b>Поставка зарегистрирована:</b> {len(numbers)} шт.\n"
+            f"<b>Номера:</b> <code>{numbers[0]}</code> … <code>{numbers[-1]}</code>"
+        ),
+    )
+    logger.info(f"Admin {message.from_user.id} зарегистрировал поставку {len(numbers)} шт. "
+                f"({numbers[0]} … {numbers[-1]})")
+
+
+# =================================================================
+# 2.2. ИМПОРТ ОБОРУДОВАНИЯ ИЗ ФАЙЛА
+# =================================================================
+
+@admin_router.message(Command("eq_import"))
+async def cmd_import_equipment(message: types.Message, state: FSMContext):
+    """Просит файл .xlsx/.csv для импорта оборудования."""
+
+    await message.answer(
+        "📥 <b>Импорт оборудования</b>\n\n"
+        "Отправьте файл <b>.xlsx</b> или <b>.csv</b> с колонками:\n"
+        "<code>category</code> (laptop / LT / ноутбук), <code>model</code>, "
+        "<code>serial</code> и <code>workplace</code> (необязательные).\n\n"
+        "Инвентарные номера будут выданы автоматически."
+    )
+    await state.set_state(EquipmentStates.waiting_import_file)
+
+
+@admin_router.message(StateFilter(EquipmentStates.waiting_import_file), F.document)
+async def process_import_file(message: types.Message, state: FSMContext, bot: Bot):
+    """Скачивает файл, импортирует его в фоновом потоке и отправляет построчный отчёт."""
+
+    document = message.document
+    ext = os.path.splitext(document.file_name or "")[1].lower()
+    if ext not in (".xlsx", ".csv"):
+        await message.answer("❌ Нужен файл .xlsx или .csv.")
         return
+
+    await state.clear()
+    status = await message.answer("⏳ Импорт запущен...")
+    workplace_ids = {wp['number']: wp['id'] for wp in await get_all_workplaces()}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, f"import{ext}")
+        report_path = os.path.join(tmpdir, "import_report.csv")
+        await bot.download(document, destination=source)
+
+        try:
+            result = await asyncio.to_thread(import_equipment_file, source, report_path, workplace_ids)
+        except ImportFormatError as e:
+            await status.edit_text(f"❌ <b>Файл не импортирован:</b> {e}")
+            return
+        except Exception as e:
+            logger.error(f"Ошибка импорта оборудования из {document.file_name}: {e}")
+            await status.edit_text("❌ <b>Ошибка при импорте оборудования.</b>")
+            return
+
+        numbers = (f"\n<b>Номера:</b> <code>{result.first_number}</code> … <code>{result.last_number}</code>"
+                   if result.imported else "")
+        await status.delete()
+        await message.answer_document(
+            FSInputFile(report_path, filename=f"report_{document.file_name}.csv"),
+            caption=(
+                f"✅ <b>Импорт завершён</b>\n\n"
+                f"Строк: {result.total}\n"
+                f"Добавлено: {result.imported}\n"
+                f"Ошибок: {result.failed}{numbers}"
+            ),
+        )
+
+    logger.info(f"Admin {message.from_user.id} импортировал оборудование из {document.file_name}: "
+                f"{result.imported} из {result.total}")
+
+
+@admin_router.message(StateFilter(EquipmentStates.waiting_import_file))
+async def import_file_expected(message: types.Message):
+    """Напоминает, что ожидается документ."""
+    await message.answer("📎 Отправьте файл .xlsx или .csv как документ.")
+
+
+# =================================================================
+# 3. ПРОСМОТР СПИСКА ОБОРУДОВАНИЯ
+# =================================================================
+
+def _equipment_page_text(page: dict) -> str:
+    """Текст страницы списка оборудования."""
+    if not page['equipment']:
+        return "📭 <b>В системе нет оборудования.</b>"
+
+    text = "📋 <b>Список оборудования</b>\n\n"
+    for item in page['equipment']:
+        status_emoji = "✅" if item['status'] == 'available' else "👤"
+        user_info = f" → {item['user_name']}" if item['user_name'] else ""
+        text += (
+            f"<code>{item['inv_number']}</code>\n"
+            f"   {item['model']} | {item['serial']}\n"
+            f"   {status_emoji} {item['status']}{user_info}\n\n"
+        )
+    return text
+
+
+def _equipment_page_keyboard(page: dict) -> types.InlineKeyboardMarkup:
+    """Навигация по страницам: курсор страницы — id крайнего устройства."""
+    kb = InlineKeyboardBuilder()
+    nav = []
+    if page['has_prev']:
+        nav.append(types.InlineKeyboardButton(
+            text="◀️ Назад", callback_data=f"eq_page:prev:{page['equipment'][0]['id']}"))
+    if page['has_next']:
+        nav.append(types.InlineKeyboardButton(
+            text="Вперёд ▶️", callback_data=f"eq_page:next:{page['equipment'][-1]['id']}"))
+    if nav:
+        kb.row(*nav)
+
+    kb.row(types.InlineKeyboardButton(text="🔍 Фильтровать", callback_data="eq_filter"),
+           types.InlineKeyboardButton(text="➕ Добавить", callback_data="eq_create_btn"))
+    kb.row(types.InlineKeyboardButton(text="« Назад", callback_data="eq_back"))
+    return kb.as_markup()
+
+
+@admin_router.message(Command("eq_list"))
+@admin_router.callback_query(F.data == "eq_list_btn")
+async def cmd_list_equipment(message_or_callback, state: FSMContext):
+    """Показывает первую страницу списка оборудования."""
     
-    # Получаем всё оборудование
-    equipment = await get_all_equipment()
+    page = await get_equipment_page()
+    text, markup = _equipment_page_text(page), _equipment_page_keyboard(page)
     
-    if not equipment:
-        text = "📭 <b>В системе нет оборудования.</b>"
+    if isinstance(message_or_callback, types.Message):
+        await message_or_callback.answer(text, reply_markup=markup)
     else:
-        text = f"📋 <b>Список оборудования</b> (всего: {len(equipment)})\n\n"
-        
-        for idx, item in enumerate(equipment[:15], 1):
-            status_emoji = "✅" if item['status'] == 'available' else "👤"
-            user_info = f" → {item['user_name']}" if item['user_name'] else ""
-            
-            text += (
-                f"{idx}. <code>{item['inv_number']}</code>\n"
-                f"   {item['model']} | {item['serial']}\n"
-                f"   {status_emoji} {item['status']}{user_info}\n\n"
-            )
-        
-        if len(equipment) > 15:
-            text += f"... и ещё {len(equipment) - 15}"
-    
-    kb = InlineKeyboardBuilder()
-    kb.button(text="🔍 Фильтровать", callback_data="eq_filter")
-    kb.button(text="➕ Добавить", callback_data="eq_create_btn")
-    kb.adjust(2)
-    kb.button(text="« Назад", callback_data="eq_back")
+        await message_or_callback.message.edit_text(text, reply_markup=markup)
+        await message_or_callback.answer()
+
+
+@admin_router.callback_query(F.data.startswith("eq_page:"))
+async def handle_equipment_page(callback: types.CallbackQuery):
+    """Листает список оборудования: eq_page:<next|prev>:<id крайнего устройства>."""
     
-    if is_msg:
-        await message.answer(text, reply_markup=kb.as_markup())
+    _, direction, anchor = callback.data.split(":")
+    if direction == "prev":
+        page = await get_equipment_page(before_id=int(anchor))
     else:
-        await message.edit_text(text, reply_markup=kb.as_markup())
+        page = await get_equipment_page(after_id=int(anchor))
     
-    if not is_msg:
-        await message_or_callback.answer()
+    await callback.message.edit_text(_equipment_page_text(page), reply_markup=_equipment_page_keyboard(page))
+    await callback.answer()
 
 
 # =================================================================
 # 4. НАЗНАЧЕНИЕ ОБОРУДОВАНИЯ ПОЛЬЗОВАТЕЛЮ
 # =================================================================
 
-@router.message(Command("eq_assign"))
-@router.callback_query(F.data == "eq_assign_btn")
+@admin_router.message(Command("eq_assign"))
+@admin_router.callback_query(F.data == "eq_assign_btn")
 async def cmd_assign_equipment(message_or_callback, state: FSMContext):
     """Начинает процесс назначения оборудования."""
     
@@ -249,13 +428,6 @@ async def cmd_assign_equipment(message_or_callback, state: FSMContext):
         message = message_or_callback.message
         is_msg = False
     
-    if not is_admin(message.from_user.id):
-        if not is_msg:
-            await message_or_callback.answer("🚫 Доступ запрещен.")
-        else:
-            await message.answer("🚫 Доступ запрещен.")
-        return
-    
     text = (
         "👤 <b>Назначение оборудования пользователю</b>\n\n"
         "Введите <b>инвентарный номер оборудования</b> (например, LT-2025-0001):"
@@ -272,7 +444,7 @@ async def cmd_assign_equipment(message_or_callback, state: FSMContext):
         await message_or_callback.answer()
 
 
-@router.message(StateFilter(EquipmentStates.assigning_user))
+@admin_router.message(StateFilter(EquipmentStates.assigning_user))
 async def input_equipment_inv_number(message: types.Message, state: FSMContext):
     """Получает инвентарный номер оборудования."""
     
@@ -295,7 +467,7 @@ async def input_equipment_inv_number(message: types.Message, state: FSMContext):
     )
 
 
-@router.message(StateFilter(EquipmentStates.assigning_user))
+@admin_router.message(StateFilter(EquipmentStates.assigning_user))
 async def input_user_id_for_assignment(message: types.Message, state: FSMContext):
     """Получает ID пользователя для назначения оборудования."""
     
@@ -366,19 +538,15 @@ async def show_user_equipment(message: types.Message):
 # 6. УДАЛЕНИЕ ОБОРУДОВАНИЯ (АДМИН)
 # =================================================================
 
-@router.message(Command("eq_delete"))
+@admin_router.message(Command("eq_delete"))
 async def cmd_delete_equipment(message: types.Message, state: FSMContext):
     """Удаляет оборудование из системы."""
     
-    if not is_admin(message.from_user.id):
-        await message.answer("🚫 Доступ запрещен.")
-        return
-    
     await message.answer("🗑️ <b>Удаление оборудования</b>\n\nВведите инвентарный номер для удаления:")
     await state.set_state(EquipmentStates.managing_equipment)
 
 
-@router.message(StateFilter(EquipmentStates.managing_equipment))
+@admin_router.message(StateFilter(EquipmentStates.managing_equipment))
 async def confirm_delete_equipment(message: types.Message, state: FSMContext):
     """Подтверждает удаление оборудования."""
     
@@ -408,7 +576,7 @@ async def confirm_delete_equipment(message: types.Message, state: FSMContext):
     await state.clear()
 
 
-@router.callback_query(F.data.startswith("eq_delete_confirm_"))
+@admin_router.callback_query(F.data.startswith("eq_delete_confirm_"))
 async def perform_delete(callback: types.CallbackQuery):
     """Выполняет удаление оборудования."""
     
@@ -425,7 +593,7 @@ async def perform_delete(callback: types.CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data == "eq_delete_cancel")
+@admin_router.callback_query(F.data == "eq_delete_cancel")
 async def cancel_delete(callback: types.CallbackQuery):
     """Отменяет удаление оборудования."""
     
@@ -437,7 +605,7 @@ async def cancel_delete(callback: types.CallbackQuery):
 # 7. ВСПОМОГАТЕЛЬНЫЕ КНОПКИ
 # =================================================================
 
-@router.callback_query(F.data == "eq_back")
+@admin_router.callback_query(F.data == "eq_back")
 async def go_back_to_main(callback: types.CallbackQuery):
     """Возвращает на главное меню оборудования."""
     await callback.message.delete()
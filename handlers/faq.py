@@ -1,18 +1,26 @@
 # -*- coding: utf-8 -*-
 # Файл: it_ecosystem_bot/handlers/faq.py
 import logging
-import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
 
-from database import get_user_role, save_faq_material, get_all_users_for_mailing, get_all_faq_materials
+from database import save_faq_material, get_all_faq_materials, get_faq_material
+from utils.auth_checks import RoleFilter
+from utils.broadcast import Broadcaster
+from utils.faq_media import media_sender, prepare_media
 from keyboards.common import main_menu_keyboard, get_faq_initial_keyboard, get_faq_guides_list_keyboard
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Добавление и повторная рассылка материалов — только для администраторов; роль проверяет фильтр роутера
+admin_router = Router()
+admin_router.message.filter(RoleFilter("admin"))
+admin_router.callback_query.filter(RoleFilter("admin"))
+router.include_router(admin_router)
+
 
 class FAQStates(StatesGroup):
     waiting_for_title = State()
@@ -20,50 +28,23 @@ class FAQStates(StatesGroup):
     waiting_for_file = State()
 
 
-# --- АСИНХРОННАЯ ФУНКЦИЯ РАССЫЛКИ ---
-async def send_faq_mailing(bot: Bot, faq_data: dict):
-    """Отправляет уведомление о новом FAQ всем пользователям."""
-
-    user_ids = await get_all_users_for_mailing()
-    logger.info(f"FAQ: Найдено {len(user_ids)} пользователей для рассылки. Пробуем отправить...")
-
-    title = faq_data['title']
-    description = faq_data['description']
-    file_id = faq_data.get('file_id')
-    file_type = faq_data.get('file_type')
+# --- РАССЫЛКА О НОВОМ МАТЕРИАЛЕ ---
+async def send_faq_mailing(broadcaster: Broadcaster, faq_data: dict, created_by: int, progress_chat_id: int):
+    """Запускает фоновую рассылку уведомления о FAQ всем, кто его ещё не получал."""
 
     caption_text = (
         f"📣 <b>[ВАЖНО] Новый гайд/FAQ:</b>\n\n"
-        f"<b>Тема:</b> {title}\n"
-        f"<b>Описание:</b> {description}\n\n"
+        f"<b>Тема:</b> {faq_data['title']}\n"
+        f"<b>Описание:</b> {faq_data['description']}\n\n"
         f"<i>Подробности в разделе '❓ FAQ'.</i>"
     )
 
-    success_count = 0
-
-    for user_id in user_ids:
-        try:
-            if file_id:
-                if 'photo' in file_type:
-                    await bot.send_photo(user_id, photo=file_id, caption=caption_text)
-                elif 'video' in file_type:
-                    await bot.send_video(user_id, video=file_id, caption=caption_text)
-                elif 'document' in file_type or 'pdf' in file_type or 'word' in file_type:
-                    await bot.send_document(user_id, document=file_id, caption=caption_text)
-                else:
-                    await bot.send_message(user_id, caption_text)
-            else:
-                await bot.send_message(user_id, caption_text)
-
-            success_count += 1
-
-        except Exception as e:
-            logger.error(
-                f"FAQ: Не удалось отправить рассылку пользователю {user_id}. Вероятно, заблокировал бота. Ошибка: {e}")
-            pass
-
-    logger.info(
-        f"FAQ: Уведомление о гайде '{title}' успешно отправлено {success_count} пользователям из {len(user_ids)}.")
+    broadcast_id = await broadcaster.start(
+        'faq', caption_text, created_by=created_by,
+        file_id=faq_data.get('file_id'), file_type=faq_data.get('file_type'),
+        progress_chat_id=progress_chat_id, faq_id=faq_data['id'],
+    )
+    logger.info(f"FAQ: Уведомление о гайде '{faq_data['title']}' поставлено в рассылку #{broadcast_id}.")
 
 
 # =================================================================
@@ -129,8 +110,7 @@ async def cmd_show_single_guide(callback: types.CallbackQuery, bot: Bot):
         await callback.message.edit_text("❌ Ошибка ID гайда.")
         return
 
-    guides = await get_all_faq_materials()
-    guide = next((g for g in guides if g['id'] == faq_id), None)
+    guide = await get_faq_material(faq_id)
 
     if not guide:
         await callback.message.edit_text("❌ Гайд не найден.", reply_markup=get_faq_initial_keyboard())
@@ -154,19 +134,14 @@ async def cmd_show_single_guide(callback: types.CallbackQuery, bot: Bot):
         # Редактируем сообщение для отображения текста
         await callback.message.edit_text(text, reply_markup=kb)
 
-        file_id = guide['file_id']
-        file_type = guide['file_type']
+        if prepare_media(guide['file_id'], guide['file_type']) is None:
+            await bot.send_message(callback.from_user.id, "❌ Неизвестный тип вложения.")
+            return
 
         try:
             # Отправляем прикрепленный файл отдельным сообщением
-            if 'photo' in file_type:
-                await bot.send_photo(callback.from_user.id, photo=file_id, caption="Вложение к гайду")
-            elif 'video' in file_type:
-                await bot.send_video(callback.from_user.id, video=file_id, caption="Вложение к гайду")
-            elif 'document' in file_type or 'pdf' in file_type or 'word' in file_type:
-                await bot.send_document(callback.from_user.id, document=file_id, caption="Вложение к гайду")
-            else:
-                await bot.send_message(callback.from_user.id, "❌ Неизвестный тип вложения.")
+            send = media_sender(bot, guide['file_id'], guide['file_type'], "Вложение к гайду")
+            await send(callback.from_user.id)
         except Exception as e:
             logger.error(f"FAQ: Не удалось отправить вложение гайда {faq_id} пользователю {callback.from_user.id}: {e}")
             await bot.send_message(callback.from_user.id, "❌ Не удалось отобразить прикрепленный файл.")
@@ -180,29 +155,24 @@ async def cmd_show_single_guide(callback: types.CallbackQuery, bot: Bot):
 # 2. УПРАВЛЕНИЕ FAQ (ADMIN FSM) - Логика финализации
 # =================================================================
 
-@router.callback_query(F.data == "faq_add")
+@admin_router.callback_query(F.data == "faq_add")
 async def cmd_admin_faq_add(callback: types.CallbackQuery, state: FSMContext):
     """Начало процесса добавления материала."""
 
     await callback.answer()  # !!! КЛЮЧЕВОЕ ИСПРАВЛЕНИЕ: Отвечаем сразу !!!
 
-    user_role = await get_user_role(callback.from_user.id)
-    if user_role != 'admin':
-        await callback.message.answer("🚫 Доступ запрещен.")
-        return
-
     await callback.message.edit_text("➕ <b>Добавление FAQ</b>\n\nВведите <b>Название</b> гайда/статьи:")
     await state.set_state(FAQStates.waiting_for_title)
 
 
-@router.message(FAQStates.waiting_for_title)
+@admin_router.message(FAQStates.waiting_for_title)
 async def process_faq_title(message: types.Message, state: FSMContext):
     await state.update_data(title=message.text.strip())
     await message.answer("📝 Введите краткое <b>Описание</b> (ответ, текст гайда):")
     await state.set_state(FAQStates.waiting_for_description)
 
 
-@router.message(FAQStates.waiting_for_description)
+@admin_router.message(FAQStates.waiting_for_description)
 async def process_faq_description(message: types.Message, state: FSMContext):
     await state.update_data(description=message.text.strip())
     await message.answer(
@@ -211,8 +181,8 @@ async def process_faq_description(message: types.Message, state: FSMContext):
     await state.set_state(FAQStates.waiting_for_file)
 
 
-@router.message(FAQStates.waiting_for_file, Command("skip"))
-async def process_faq_file_skip(message: types.Message, state: FSMContext, bot: Bot):
+@admin_router.message(FAQStates.waiting_for_file, Command("skip"))
+async def process_faq_file_skip(message: types.Message, state: FSMContext, broadcaster: Broadcaster):
     """Обработка пропуска прикрепления файла и финализация."""
 
     data = await state.get_data()
@@ -222,17 +192,17 @@ async def process_faq_file_skip(message: types.Message, state: FSMContext, bot:
 
     # 2. Отправка рассылки
     if faq_record:
-        asyncio.create_task(send_faq_mailing(bot, faq_record))
+        await send_faq_mailing(broadcaster, faq_record, message.from_user.id, message.chat.id)
 
     await message.answer(
-        f"✅ <b>FAQ '{data['title']}' успешно сохранен и разослан!</b> (Без вложения).",
+        f"✅ <b>FAQ '{data['title']}' сохранен, рассылка запущена!</b> (Без вложения).",
         reply_markup=main_menu_keyboard('admin')
     )
     await state.clear()
 
 
-@router.message(FAQStates.waiting_for_file, F.photo | F.video | F.document)
-async def process_faq_file(message: types.Message, state: FSMContext, bot: Bot):
+@admin_router.message(FAQStates.waiting_for_file, F.photo | F.video | F.document)
+async def process_faq_file(message: types.Message, state: FSMContext, broadcaster: Broadcaster):
     """Обработка прикрепления файла (фото, видео, документ) и финализация."""
 
     file_info = {}
@@ -256,11 +226,28 @@ async def process_faq_file(message: types.Message, state: FSMContext, bot: Bot):
 
     # 2. Отправка рассылки
     if faq_record:
-        asyncio.create_task(send_faq_mailing(bot, faq_record))
+        await send_faq_mailing(broadcaster, faq_record, message.from_user.id, message.chat.id)
 
     await message.answer(
-        f"✅ <b>FAQ '{data['title']}' успешно сохранен и разослан!</b>\n"
+        f"✅ <b>FAQ '{data['title']}' сохранен, рассылка запущена!</b>\n"
         f"Тип вложения: {file_info['type']}",
         reply_markup=main_menu_keyboard('admin')
     )
-    await state.clear()
\ No newline at end of file
+    await state.clear()
+
+
+@admin_router.message(Command("faq_resend"))
+async def cmd_faq_resend(message: types.Message, broadcaster: Broadcaster):
+    """Повторяет анонс материала FAQ только для тех, кто его ещё не получал: /faq_resend <id>."""
+
+    parts = (message.text or "").split()
+    if len(parts) != 2 or not parts[1].isdigit():
+        await message.answer("Использование: <code>/faq_resend &lt;id гайда&gt;</code>")
+        return
+
+    faq_record = await get_faq_material(int(parts[1]))
+    if not faq_record:
+        await message.answer("❌ Гайд не найден.")
+        return
+
+    await send_faq_mailing(broadcaster, faq_record, message.from_user.id, message.chat.id)
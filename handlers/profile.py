@@ -6,7 +6,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 # !!! ИСПРАВЛЕНИЕ: ИМПОРТИРУЕМ main_menu_keyboard ВМЕСТО НЕЙЗВЕСТНОЙ ФУНКЦИИ
-from database import get_user_role, get_admin_info, remove_authorized_user, get_user_tickets, get_user_equipment, \
+from database import get_admin_info, get_admin_stats, remove_authorized_user, get_user_tickets, get_user_equipment, \
     get_full_user_profile
 from keyboards.common import confirm_logout_keyboard, main_menu_keyboard  # Используем main_menu_keyboard
 
@@ -65,11 +65,11 @@ async def show_user_profile(message: types.Message):
 # =================================================================
 
 @router.callback_query(F.data == "profile_tickets")
-async def show_user_tickets_history(callback: types.CallbackQuery):
+async def show_user_tickets_history(callback: types.CallbackQuery, user_role: str | None):
     """Показывает историю заявок пользователя."""
 
     user_id = callback.from_user.id
-    if not await get_user_role(user_id):
+    if not user_role:
         await callback.answer("⚠️ Сессия не найдена.", show_alert=True)
         return
 
@@ -147,9 +147,23 @@ async def show_user_equipment_in_profile(callback: types.CallbackQuery):
 # 4. СТАТИСТИКА АДМИНИСТРАТОРА (Callback)
 # =================================================================
 
+def _format_duration(seconds: float | None) -> str:
+    """Длительность для статистики: «2 ч 15 мин», «3 дн 4 ч»."""
+    if seconds is None:
+        return "—"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours} ч {minutes} мин"
+    days, hours = divmod(hours, 24)
+    return f"{days} дн {hours} ч"
+
+
 @router.callback_query(F.data == "profile_stats")
 async def show_admin_statistics(callback: types.CallbackQuery):
-    """Показывает статистику администратора."""
+    """Показывает статистику администратора (из материализованной admin_stats)."""
 
     user_id = callback.from_user.id
     admin_info = await get_admin_info(user_id)
@@ -162,12 +176,32 @@ async def show_admin_statistics(callback: types.CallbackQuery):
         await callback.answer()
         return
 
+    stats = await get_admin_stats(user_id, days=7)
+    total = stats['total']
+
     text = (
         f"📊 <b>Статистика администратора</b>\n\n"
         f"<b>ФИО:</b> {admin_info['full_name']}\n"
         f"<b>Средний рейтинг:</b> {admin_info['avg_rating']}/5.0 ⭐️\n"
     )
 
+    if total and total['closed_count']:
+        p90 = total['p90_close_seconds']
+        text += (
+            f"<b>Закрыто заявок:</b> {total['closed_count']}\n"
+            f"<b>Среднее время закрытия:</b> {_format_duration(total['avg_close_seconds'])}\n"
+            f"<b>90% заявок закрыто за:</b> {'≤ ' + _format_duration(p90) if p90 else '> 30 дн'}\n"
+        )
+    if total and total['rating_count']:
+        histogram = "  ".join(f"{stars}⭐ {count}" for stars, count in sorted(total['ratings'].items(), reverse=True))
+        text += f"<b>Оценки:</b> {histogram}\n"
+
+    if stats['days']:
+        text += "\n<b>Последние 7 дней:</b>\n"
+        for day in stats['days']:
+            rating = f", рейтинг {day['avg_rating']}" if day['rating_count'] else ""
+            text += f"  {day['period']}: закрыто {day['closed_count']}{rating}\n"
+
     kb = InlineKeyboardBuilder()
     kb.button(text="« Назад к профилю", callback_data="profile_back")
 
@@ -265,10 +299,10 @@ async def process_logout_confirm(callback: types.CallbackQuery, state: FSMContex
 
 
 @router.callback_query(F.data == "logout_cancel")
-async def process_logout_cancel(callback: types.CallbackQuery, state: FSMContext):
+async def process_logout_cancel(callback: types.CallbackQuery, state: FSMContext, user_role: str | None):
     """Обрабатывает отмену выхода."""
     await state.clear()
-    role = await get_user_role(callback.from_user.id)
+    role = user_role
 
     # Чтобы вернуть главное меню, нужно вызвать main_menu_keyboard
     if role:
@@ -4,7 +4,6 @@ from aiogram import Router, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
-from database import get_user_role
 from keyboards.common import main_menu_keyboard, get_start_auth_keyboard
 
 logger = logging.getLogger(__name__)
@@ -12,14 +11,13 @@ router = Router()
 
 
 @router.message(Command("start"))
-async def cmd_start(message: types.Message, state: FSMContext):
+async def cmd_start(message: types.Message, state: FSMContext, user_role: str | None):
     """
     Обработка команды /start.
     Показывает меню, если авторизован, или кнопку входа.
     """
 
     user_id = message.from_user.id
-    user_role = await get_user_role(user_id)
 
     await state.clear()
 
@@ -41,10 +39,9 @@ async def cmd_start(message: types.Message, state: FSMContext):
 
 
 @router.message(Command("check_role"))
-async def cmd_check_role(message: types.Message):
+async def cmd_check_role(message: types.Message, user_role: str | None):
     """Диагностическая команда для проверки текущей роли в БД (оставляем для отладки)."""
     user_id = message.from_user.id
-    user_role = await get_user_role(user_id)
 
     if user_role:
         await message.answer(
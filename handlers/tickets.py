@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 # it_ecosystem_bot/handlers/tickets.py
 import logging
-from aiogram import Router, types, F, Bot
+from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
@@ -9,23 +9,21 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from database import (
     save_new_ticket,
-    get_admin_telegram_ids,
     close_ticket_for_rating,
     finalize_ticket_rating,
-    get_admin_info,
     get_user_tickets,
-    get_user_role,
     get_full_user_profile,
-    update_admin_rating,
     get_available_floors,
     get_workplaces_by_floor,
     add_ticket_attachment,
 )
-from keyboards.common import (
-    get_rating_keyboard,
-    get_admin_ticket_actions,
-    inline_main_menu,
-)
+from utils.assignment import AssignmentEngine
+from utils.auth_checks import RoleFilter
+from utils.notifications import NotificationOutbox
+from utils.routing import AdminRouting
+from utils.ticket_cards import TicketCardEditor
+from utils.sla import SlaEngine
+from keyboards.common import inline_main_menu
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -56,16 +54,17 @@ def floors_keyboard(floors: list[int]) -> types.InlineKeyboardMarkup:
 
 
 def workplaces_keyboard(workplaces: list[dict]) -> types.InlineKeyboardMarkup:
-    kb = InlineKeyboardBuilder()
+    # Ряды собираются напрямую: InlineKeyboardBuilder.button() копирует всю разметку на каждую кнопку,
+    # и на этаже из ~90 мест это десятки миллисекунд CPU на один ответ
+    buttons = []
     for wp in workplaces:
         text = wp["number"]
         if wp.get("pc_name"):
             text = f"{wp['number']} ({wp['pc_name']})"
-        kb.button(text=text, callback_data=f"wp_{wp['number']}")
-    kb.button(text="⬅️ К выбору этажа", callback_data="back_to_floor")
-    kb.button(text="🚫 Отмена", callback_data="ticket_cancel")
-    kb.adjust(2)
-    return kb.as_markup()
+        buttons.append(types.InlineKeyboardButton(text=text, callback_data=f"wp_{wp['number']}"))
+    buttons.append(types.InlineKeyboardButton(text="⬅️ К выбору этажа", callback_data="back_to_floor"))
+    buttons.append(types.InlineKeyboardButton(text="🚫 Отмена", callback_data="ticket_cancel"))
+    return types.InlineKeyboardMarkup(inline_keyboard=[buttons[i:i + 2] for i in range(0, len(buttons), 2)])
 
 
 def category_keyboard() -> types.InlineKeyboardMarkup:
@@ -88,8 +87,7 @@ def photo_keyboard() -> types.InlineKeyboardMarkup:
 
 
 # --- Старт создания заявки ----------------------------------------------------
-async def _start_ticket_flow(message: types.Message, state: FSMContext):
-    user_role = await get_user_role(message.from_user.id)
+async def _start_ticket_flow(message: types.Message, state: FSMContext, user_role: str | None):
     if not user_role:
         await message.answer("Сначала авторизуйся /start и войди.", reply_markup=None)
         return
@@ -105,13 +103,14 @@ async def _start_ticket_flow(message: types.Message, state: FSMContext):
 
 @router.message(F.text == "🟦 Создать запрос")
 @router.message(Command("create_ticket"))
-async def cmd_create_ticket(message: types.Message, state: FSMContext):
-    await _start_ticket_flow(message, state)
+async def cmd_create_ticket(message: types.Message, state: FSMContext, user_role: str | None):
+    await _start_ticket_flow(message, state, user_role)
 
 
 @router.callback_query(F.data == "menu_create_ticket")
-async def cb_create_ticket(callback: types.CallbackQuery, state: FSMContext):
-    await _start_ticket_flow(callback.message, state)
+async def cb_create_ticket(callback: types.CallbackQuery, state: FSMContext, user_role: str | None):
+    # callback.message отправлен ботом, поэтому роль берём из middleware, а не по message.from_user
+    await _start_ticket_flow(callback.message, state, user_role)
     await callback.answer()
 
 
@@ -202,9 +201,11 @@ async def process_description(message: types.Message, state: FSMContext):
 
 
 @router.callback_query(TicketStates.waiting_for_photo, F.data == "skip_photo")
-async def skip_photo(callback: types.CallbackQuery, state: FSMContext, bot: Bot):
+async def skip_photo(callback: types.CallbackQuery, state: FSMContext, sla: SlaEngine, outbox: NotificationOutbox,
+                     assigner: AssignmentEngine, routing: AdminRouting):
     await state.update_data(photo_id=None)
-    await finalize_ticket(callback.message, state, bot)
+    # callback.message отправлен ботом: автор заявки — нажавший кнопку
+    await finalize_ticket(callback.message, state, sla, outbox, assigner, routing, callback.from_user.id)
     await callback.answer()
 
 
@@ -215,22 +216,38 @@ async def prompt_photo(callback: types.CallbackQuery):
 
 
 @router.message(TicketStates.waiting_for_photo, F.photo)
-async def process_photo(message: types.Message, state: FSMContext, bot: Bot):
+async def process_photo(message: types.Message, state: FSMContext, sla: SlaEngine, outbox: NotificationOutbox,
+                        assigner: AssignmentEngine, routing: AdminRouting):
     await state.update_data(photo_id=message.photo[-1].file_id)
-    await finalize_ticket(message, state, bot)
+    await finalize_ticket(message, state, sla, outbox, assigner, routing, message.from_user.id)
 
 
 # --- Финал создания ----------------------------------------------------------
-async def finalize_ticket(message: types.Message, state: FSMContext, bot: Bot):
+async def finalize_ticket(message: types.Message, state: FSMContext, sla: SlaEngine, outbox: NotificationOutbox,
+                          assigner: AssignmentEngine, routing: AdminRouting, user_id: int):
     data = await state.get_data()
-    user_id = message.from_user.id
     user_profile = await get_full_user_profile(user_id)
-    user_full_name = user_profile["full_name"] if user_profile else "Неизвестно"
 
     data.setdefault("priority", "medium")
 
+    # Исполнитель выбирается по нагрузке в памяти, без запросов к БД
+    assignment = assigner.pick(data["priority"], data.get("floor"))
+    # Уведомляются ответственные за этаж и категорию (и исполнитель); нет ответственных — все администраторы
+    recipients = routing.recipients(data.get("floor"), data.get("category"))
+    if recipients and assignment:
+        recipients.add(assignment.admin_id)
     try:
-        ticket_id, ticket_number = await save_new_ticket(user_id, data)
+        # Уведомления администраторам пишутся в outbox той же транзакцией, что и заявка
+        try:
+            ticket_id, ticket_number = await save_new_ticket(
+                user_id, data, notify_admins=True, assignee=assignment.admin_id if assignment else None,
+                recipients=recipients)
+        except Exception:
+            if assignment:
+                assigner.release(assignment)
+            raise
+        if assignment:
+            assigner.bind(assignment, ticket_id)
 
         photo_id = data.get("photo_id")
         if photo_id:
@@ -241,30 +258,14 @@ async def finalize_ticket(message: types.Message, state: FSMContext, bot: Bot):
         await state.clear()
         return
 
-    admin_ids = await get_admin_telegram_ids()
-    notification_text = (
-        f"🆕 <b>Новая заявка</b>\n"
-        f"Номер: <b>{ticket_number}</b>\n"
-        f"Автор: {user_full_name}\n"
-        f"Этаж/место: {data.get('floor')} / {data.get('workplace')}\n"
-        f"Категория: {data.get('category')}\n"
-        f"Заголовок: {data.get('title')}"
-    )
-
-    for admin_id in admin_ids:
-        try:
-            await bot.send_message(
-                chat_id=admin_id,
-                text=notification_text,
-                reply_markup=get_admin_ticket_actions(ticket_id),
-            )
-        except Exception as e:
-            logger.error(f"Не удалось уведомить админа {admin_id}: {e}")
+    sla.track(ticket_id, data["priority"])
+    # Отправка админам идёт в фоне: подтверждение пользователю не ждёт Telegram
+    outbox.wake()
 
     await message.answer(
         f"✅ Заявка создана! Номер <b>{ticket_number}</b>.\n"
         f"Этаж: {data.get('floor')}, место: {data.get('workplace')}.",
-        reply_markup=inline_main_menu(await get_user_role(user_id) or "user"),
+        reply_markup=inline_main_menu((user_profile or {}).get("role") or "user"),
     )
     await state.clear()
 
@@ -295,72 +296,52 @@ async def cb_my_tickets(callback: types.CallbackQuery):
 
 
 # --- Закрытие админом и рейтинг ---------------------------------------------
-@router.callback_query(F.data.startswith("admin_close_"))
-async def handle_admin_close_button(callback: types.CallbackQuery, bot: Bot):
-    user_role = await get_user_role(callback.from_user.id)
-    if user_role != "admin":
-        await callback.answer("Только для админов", show_alert=True)
-        return
-
+@router.callback_query(F.data.startswith("admin_close_"), RoleFilter("admin"))
+async def handle_admin_close_button(callback: types.CallbackQuery, sla: SlaEngine,
+                                    outbox: NotificationOutbox, cards: TicketCardEditor,
+                                    assigner: AssignmentEngine):
     ticket_id = int(callback.data.split("_")[-1])
     admin_id = callback.from_user.id
-    creator_id = await close_ticket_for_rating(ticket_id, admin_id)
+    # Запрос оценки автору ставится в outbox вместе со сменой статуса
+    creator_id = await close_ticket_for_rating(ticket_id, admin_id, notify_user=True)
+    # Карточка остаётся на месте: её (и карточки других администраторов) обновит редактор
+    cards.ticket_changed(ticket_id)
 
     if creator_id is None:
-        await callback.message.edit_text("Не удалось закрыть заявку (возможно уже закрыта).")
-        await callback.answer()
+        await callback.answer("Не удалось закрыть заявку (возможно уже закрыта).", show_alert=True)
         return
 
-    await callback.message.edit_text("Заявка переведена в статус 'ожидает оценку'.")
-
-    try:
-        await bot.send_message(
-            chat_id=creator_id,
-            text="✅ Ваша заявка выполнена. Пожалуйста, оцените работу администратора:",
-            reply_markup=get_rating_keyboard(ticket_id),
-        )
-    except Exception as e:
-        logger.error(f"Не удалось отправить запрос рейтинга пользователю {creator_id}: {e}")
-
-    await callback.answer()
+    sla.ticket_resolved(ticket_id)
+    assigner.ticket_changed(ticket_id, admin_id, 'await_rating')
+    outbox.wake()
+    await callback.answer("Заявка переведена в статус 'ожидает оценку'.")
 
 
 @router.callback_query(F.data.startswith("rate_"))
-async def process_rating(callback: types.CallbackQuery, bot: Bot):
+async def process_rating(callback: types.CallbackQuery, outbox: NotificationOutbox, cards: TicketCardEditor):
     _, ticket_id, rating = callback.data.split("_")
     ticket_id = int(ticket_id)
     rating = int(rating)
 
-    result = await finalize_ticket_rating(ticket_id, rating)
+    # Рейтинг, статистика администратора и уведомление ему — в одной транзакции с заявкой
+    result = await finalize_ticket_rating(ticket_id, rating, notify_admin=True)
     if not result:
         await callback.message.edit_text("Не удалось сохранить оценку.")
         await callback.answer()
         return
 
-    await update_admin_rating(result["admin_id"], result["rating"])
-    admin_info = await get_admin_info(result["admin_id"])
-
+    outbox.wake()
+    cards.ticket_changed(ticket_id)
     await callback.message.edit_text("Спасибо за оценку! Заявка закрыта.")
-
-    if admin_info:
-        try:
-            await bot.send_message(
-                result["admin_id"],
-                f"⭐ Тебе поставили {rating}/5 за заявку {result['ticket_number']}.\n"
-                f"Средний рейтинг: {admin_info['avg_rating']}/5.",
-            )
-        except Exception as e:
-            logger.error(f"Не удалось отправить рейтинг админу {result['admin_id']}: {e}")
-
     await callback.answer()
 
 
 # --- Отмена / выход из FSM ---------------------------------------------------
 @router.callback_query(F.data == "ticket_cancel")
 @router.message(Command("cancel"))
-async def cancel_ticket(event: types.Message | types.CallbackQuery, state: FSMContext):
+async def cancel_ticket(event: types.Message | types.CallbackQuery, state: FSMContext, user_role: str | None):
     await state.clear()
-    role = await get_user_role(event.from_user.id)
+    role = user_role
     if isinstance(event, types.CallbackQuery):
         await event.message.edit_text("Создание заявки отменено.", reply_markup=inline_main_menu(role or "user"))
         await event.answer()
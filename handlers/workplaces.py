@@ -7,14 +7,22 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from database import (
-    create_workplace, get_workplace, get_workplace_equipment, get_all_workplaces,
-    get_user_role
+    create_workplace, get_workplace, get_workplace_equipment, get_all_workplaces
 )
-from utils.auth_checks import is_admin
+from utils.auth_checks import RoleFilter
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Создание рабочих мест — только для администраторов; роль проверяет фильтр роутера.
+# Просмотр доступен всем; админский роутер подключён первым, чтобы его варианты
+# «🏢 Рабочие места» и «« Назад» с кнопкой создания срабатывали раньше общих.
+admin_router = Router()
+admin_router.message.filter(RoleFilter("admin"))
+admin_router.callback_query.filter(RoleFilter("admin"))
+common_router = Router()
+router.include_routers(admin_router, common_router)
+
 
 class WorkplaceStates(StatesGroup):
     creating_workplace = State()
@@ -27,8 +35,14 @@ class WorkplaceStates(StatesGroup):
 # 1. ПРОСМОТР ВСЕ РАБОЧИХ МЕСТ
 # =================================================================
 
-@router.message(F.text == "🏢 Рабочие места")
-async def cmd_view_workplaces(message: types.Message):
+@admin_router.message(F.text == "🏢 Рабочие места")
+async def cmd_view_workplaces_admin(message: types.Message):
+    """Список рабочих мест с кнопкой создания."""
+    await cmd_view_workplaces(message, can_create=True)
+
+
+@common_router.message(F.text == "🏢 Рабочие места")
+async def cmd_view_workplaces(message: types.Message, can_create: bool = False):
     """Показывает список всех рабочих мест."""
     
     workplaces = await get_all_workplaces()
@@ -60,7 +74,7 @@ async def cmd_view_workplaces(message: types.Message):
     
     kb.adjust(2)
     
-    if is_admin(message.from_user.id):
+    if can_create:
         kb.button(text="➕ Создать рабочее место", callback_data="wp_create_btn")
     
     await message.answer(text, reply_markup=kb.as_markup())
@@ -70,8 +84,8 @@ async def cmd_view_workplaces(message: types.Message):
 # 2. СОЗДАНИЕ РАБОЧЕГО МЕСТА (АДМИН)
 # =================================================================
 
-@router.message(Command("wp_create"))
-@router.callback_query(F.data == "wp_create_btn")
+@admin_router.message(Command("wp_create"))
+@admin_router.callback_query(F.data == "wp_create_btn")
 async def cmd_create_workplace(message_or_callback, state: FSMContext):
     """Начинает процесс создания нового рабочего места."""
     
@@ -82,13 +96,6 @@ async def cmd_create_workplace(message_or_callback, state: FSMContext):
         message = message_or_callback.message
         is_msg = False
     
-    if not is_admin(message.from_user.id):
-        if not is_msg:
-            await message_or_callback.answer("🚫 Доступ запрещен.")
-        else:
-            await message.answer("🚫 Доступ запрещен.")
-        return
-    
     text = (
         "🏢 <b>Создание нового рабочего места</b>\n\n"
         "Введите <b>номер рабочего места</b> (например, 101, 102-А):"
@@ -105,7 +112,7 @@ async def cmd_create_workplace(message_or_callback, state: FSMContext):
         await message_or_callback.answer()
 
 
-@router.message(StateFilter(WorkplaceStates.entering_number))
+@admin_router.message(StateFilter(WorkplaceStates.entering_number))
 async def enter_wp_number(message: types.Message, state: FSMContext):
     """Получает номер рабочего места."""
     
@@ -120,7 +127,7 @@ async def enter_wp_number(message: types.Message, state: FSMContext):
     await state.set_state(WorkplaceStates.entering_department)
 
 
-@router.message(StateFilter(WorkplaceStates.entering_department))
+@admin_router.message(StateFilter(WorkplaceStates.entering_department))
 async def enter_wp_department(message: types.Message, state: FSMContext):
     """Получает отделение."""
     
@@ -135,7 +142,7 @@ async def enter_wp_department(message: types.Message, state: FSMContext):
     await state.set_state(WorkplaceStates.entering_location)
 
 
-@router.message(StateFilter(WorkplaceStates.entering_location))
+@admin_router.message(StateFilter(WorkplaceStates.entering_location))
 async def enter_wp_location(message: types.Message, state: FSMContext):
     """Получает местоположение и завершает создание."""
     
@@ -169,7 +176,7 @@ async def enter_wp_location(message: types.Message, state: FSMContext):
 # 3. ПРОСМОТР ДЕТАЛЕЙ РАБОЧЕГО МЕСТА
 # =================================================================
 
-@router.callback_query(F.data.startswith("wp_detail_"))
+@common_router.callback_query(F.data.startswith("wp_detail_"))
 async def show_workplace_details(callback: types.CallbackQuery):
     """Показывает подробную информацию о рабочем месте."""
     
@@ -216,7 +223,7 @@ async def show_workplace_details(callback: types.CallbackQuery):
 # 4. ПОКАЗАТЬ ВСЕ РАБОЧИЕ МЕСТА (РАЗВЁРНУТЫЙ СПИСОК)
 # =================================================================
 
-@router.callback_query(F.data == "wp_show_all")
+@common_router.callback_query(F.data == "wp_show_all")
 async def show_all_workplaces(callback: types.CallbackQuery):
     """Показывает полный список всех рабочих мест."""
     
@@ -247,8 +254,14 @@ async def show_all_workplaces(callback: types.CallbackQuery):
 # 5. ВСПОМОГАТЕЛЬНЫЕ КНОПКИ
 # =================================================================
 
-@router.callback_query(F.data == "wp_back")
-async def go_back_to_workplaces(callback: types.CallbackQuery):
+@admin_router.callback_query(F.data == "wp_back")
+async def go_back_to_workplaces_admin(callback: types.CallbackQuery):
+    """Возврат к списку рабочих мест с кнопкой создания."""
+    await go_back_to_workplaces(callback, can_create=True)
+
+
+@common_router.callback_query(F.data == "wp_back")
+async def go_back_to_workplaces(callback: types.CallbackQuery, can_create: bool = False):
     """Возвращает на главное меню рабочих мест."""
     
     workplaces = await get_all_workplaces()
@@ -277,7 +290,7 @@ async def go_back_to_workplaces(callback: types.CallbackQuery):
     
     kb.adjust(2)
     
-    if is_admin(callback.from_user.id):
+    if can_create:
         kb.button(text="➕ Создать рабочее место", callback_data="wp_create_btn")
     
     await callback.message.edit_text(text, reply_markup=kb.as_markup())
@@ -69,10 +69,18 @@ def get_rating_keyboard(ticket_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def get_admin_ticket_actions(ticket_id: int) -> InlineKeyboardMarkup:
-    """Кнопка 'Закрыть заявку' для администратора."""
+def get_admin_ticket_actions(ticket_id: int, status: str = 'open') -> InlineKeyboardMarkup | None:
+    """
+    Кнопки карточки заявки у администратора: открытую можно взять в работу или закрыть,
+    взятую — закрыть; у закрытой кнопок нет (None).
+    """
+    if status in ('await_rating', 'closed'):
+        return None
     kb = InlineKeyboardBuilder()
+    if status == 'open':
+        kb.button(text="✋ Назначить на себя", callback_data=f"ticket_claim_{ticket_id}")
     kb.button(text="✅ Закрыть заявку", callback_data=f"admin_close_{ticket_id}")
+    kb.adjust(1)
     return kb.as_markup()
 
 
@@ -87,6 +95,15 @@ def get_mailing_schedule_keyboard() -> InlineKeyboardMarkup:
     return kb.as_markup()
 
 
+def get_scheduled_mailings_keyboard(mailings: List[Dict]) -> InlineKeyboardMarkup:
+    """Кнопки отмены для списка плановых рассылок."""
+    kb = InlineKeyboardBuilder()
+    for mailing in mailings:
+        kb.button(text=f"❌ Отменить #{mailing['id']}", callback_data=f"mailing_cancel_{mailing['id']}")
+    kb.adjust(2)
+    return kb.as_markup()
+
+
 # --- КЛАВИАТУРЫ ДЛЯ ПРОФИЛЯ/FAQ ---
 
 def get_faq_admin_keyboard() -> InlineKeyboardMarkup:
@@ -0,0 +1,96 @@
+# Файл: it_ecosystem_bot/test_assignment.py
+"""Куча нагрузки администраторов и выбор исполнителя (utils/assignment.py)."""
+import random
+
+import pytest
+
+from utils.assignment import AssignmentEngine, LoadHeap, make_policy
+
+
+def _ticket(ticket_id, admin_id, priority='medium', floor=None):
+    return {'id': ticket_id, 'admin_id': admin_id, 'priority': priority, 'floor': floor}
+
+
+def test_heap_returns_least_loaded_after_updates():
+    rnd = random.Random(1)
+    heap, loads = LoadHeap(), {}
+    # Много обновлений одних и тех же администраторов: устаревшие записи снимаются лениво и при сжатии
+    for _ in range(5000):
+        admin_id = rnd.randrange(50)
+        if rnd.random() < 0.1:
+            heap.discard(admin_id)
+            loads.pop(admin_id, None)
+        else:
+            loads[admin_id] = rnd.randint(0, 100)
+            heap.set(admin_id, loads[admin_id])
+        assert len(heap) == len(loads)
+        if loads:
+            load, admin_id = heap.peek()
+            assert load == min(loads.values()) and loads[admin_id] == load
+    assert len(heap._heap) <= 2 * len(loads) + 1024
+
+
+def test_heap_ties_go_to_longest_unchanged():
+    heap = LoadHeap()
+    for admin_id in (3, 1, 2):
+        heap.set(admin_id, 0.0)
+    assert heap.peek() == (0.0, 3)
+    heap.set(3, 0.0)
+    assert heap.peek() == (0.0, 1)
+    heap.discard(1)
+    heap.discard(2)
+    heap.discard(3)
+    assert heap.peek() is None
+
+
+def test_least_loaded_spreads_new_tickets():
+    engine = AssignmentEngine(make_policy('least_loaded'))
+    engine.load([1, 2, 3], [_ticket(10, 1, 'high'), _ticket(11, 2, 'low')])
+    assert engine.loads() == {1: 3.0, 2: 1.0, 3: 0.0}
+
+    # Выбор сразу резервирует вес, поэтому подряд идущие заявки не уходят одному администратору
+    picks = [engine.pick('medium', None) for _ in range(3)]
+    assert [pick.admin_id for pick in picks] == [3, 2, 3]
+    assert engine.loads() == {1: 3.0, 2: 3.0, 3: 4.0}
+
+    engine.bind(picks[0], 100)
+    engine.release(picks[1])
+    assert engine.loads() == {1: 3.0, 2: 1.0, 3: 4.0}
+
+    # Закрытие снимает нагрузку, передача переносит её другому администратору
+    engine.ticket_changed(100, 3, 'closed')
+    engine.ticket_changed(10, 2, 'in_progress')
+    assert engine.loads() == {1: 0.0, 2: 4.0, 3: 2.0}
+    assert engine.pick('low', None).admin_id == 1
+
+
+def test_floor_affinity_prefers_admin_on_the_floor_within_penalty():
+    engine = AssignmentEngine(make_policy('floor_affinity', floor_penalty=2.0))
+    engine.load([1, 2], [_ticket(10, 1, 'medium', floor=4)])
+    # Нагрузка 2.0 против 0.0: не больше штрафа — заявка на 4 этаже уходит тому, кто уже там
+    assert engine.pick('low', 4).admin_id == 1
+    # Теперь 3.0 против 0.0: дешевле отправить свободного
+    assert engine.pick('low', 4).admin_id == 2
+    # На этаже без заявок — самый свободный
+    assert engine.pick('low', 7).admin_id == 2
+
+
+def test_rebuild_keeps_unsaved_reservations():
+    engine = AssignmentEngine(make_policy('least_loaded'))
+    engine.load([1, 2], [])
+    pending = engine.pick('high', None)
+    assert pending.admin_id == 1
+    # Пересборка из БД между выбором и сохранением заявки не теряет резерв
+    engine.load([1, 2], [_ticket(10, 2, 'low')])
+    assert engine.loads() == {1: 3.0, 2: 1.0}
+    engine.bind(pending, 11)
+    engine.ticket_changed(11, 1, 'closed')
+    assert engine.loads() == {1: 0.0, 2: 1.0}
+
+
+def test_manual_and_unknown_policies():
+    engine = AssignmentEngine(make_policy('manual'))
+    engine.load([1, 2], [])
+    assert engine.pick('high', 3) is None
+    with pytest.raises(ValueError):
+        make_policy('round_robin')
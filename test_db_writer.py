@@ -0,0 +1,73 @@
+# Файл: it_ecosystem_bot/test_db_writer.py
+"""Очередь писателя: ошибка задания откатывает всё задание, но не соседей по пачке."""
+import asyncio
+import sqlite3
+
+import database
+
+ADMIN = 101
+USER = 200
+
+
+def _drop(path, table):
+    conn = sqlite3.connect(path)
+    conn.execute(f"DROP TABLE {table}")
+    conn.commit()
+    conn.close()
+
+
+def _fetch(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    row = conn.execute(sql, params).fetchone()
+    conn.close()
+    return row
+
+
+def test_failed_job_is_rolled_back_within_batch(db):
+    def insert(login):
+        def job(conn):
+            conn.execute("INSERT INTO auth_directory (login, password, full_name) VALUES (?, 'x', 'Имя')", (login,))
+        return job
+
+    def insert_then_fail(conn):
+        insert('half')(conn)
+        conn.execute("INSERT INTO no_such_table VALUES (1)")
+
+    async def scenario():
+        # Три задания попадают в одну пачку писателя
+        results = await asyncio.gather(database._write(insert('first')), database._write(insert_then_fail),
+                                       database._write(insert('last')), return_exceptions=True)
+        logins = {row[0] for row in sqlite3.connect(db.path).execute("SELECT login FROM auth_directory")}
+        return results, logins
+
+    results, logins = db.run(scenario)
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], sqlite3.OperationalError)
+    assert {'first', 'last'} <= logins and 'half' not in logins
+
+
+def test_equipment_is_not_assigned_without_history(db):
+    async def scenario():
+        await db.user(USER)
+        await database.create_equipment('LT-2026-0001', 'ThinkPad', 'SN1', 'laptop')
+        equipment = await database.get_equipment(inv_number='LT-2026-0001')
+        _drop(db.path, 'equipment_history')
+        assigned = await database.assign_equipment_to_user(equipment['id'], USER, ADMIN)
+        return assigned, _fetch(db.path, "SELECT user_id, status FROM equipment WHERE id = ?", (equipment['id'],))
+
+    assigned, (user_id, status) = db.run(scenario)
+    assert assigned is False
+    # UPDATE оборудования откатился вместе с несостоявшейся записью истории
+    assert user_id is None and status == 'available'
+
+
+def test_admin_role_is_not_granted_without_sys_admin_row(db):
+    async def scenario():
+        await db.user(USER)
+        _drop(db.path, 'sys_admins')
+        registered = await database.register_sys_admin(USER, 'Новый админ', 'инженер')
+        return registered, _fetch(db.path, "SELECT role FROM authorized_users WHERE telegram_id = ?", (USER,))
+
+    registered, (role,) = db.run(scenario)
+    assert registered is False
+    assert role == 'user'
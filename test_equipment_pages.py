@@ -0,0 +1,57 @@
+# Файл: it_ecosystem_bot/test_equipment_pages.py
+"""Keyset-пагинация списка оборудования (get_equipment_page) и счётчики по статусам."""
+import sqlite3
+
+import database
+
+ADMIN = 101
+USER = 200
+EQUIPMENT = 17
+
+
+async def _seed(db):
+    await db.user(USER)
+    for i in range(EQUIPMENT):
+        await database.create_equipment(f"LT-2026-{i:04d}", "ThinkPad", f"SN{i}", 'laptop')
+    # По три устройства с одинаковым created_at: порядок внутри группы задаёт id
+    conn = sqlite3.connect(db.path)
+    conn.execute("UPDATE equipment SET created_at = datetime('2026-01-01', '+' || (id / 3) || ' minutes')")
+    conn.commit()
+    conn.close()
+    for i in range(4):
+        equipment = await database.get_equipment(inv_number=f"LT-2026-{i:04d}")
+        await database.assign_equipment_to_user(equipment['id'], USER, ADMIN)
+
+
+def test_pages_cover_all_equipment_in_both_directions(db):
+    async def scenario():
+        await _seed(db)
+        pages, after_id = [], None
+        while True:
+            page = await database.get_equipment_page(after_id=after_id, limit=5)
+            pages.append(page)
+            if not page['has_next']:
+                break
+            after_id = page['equipment'][-1]['id']
+        backwards = [await database.get_equipment_page(before_id=page['equipment'][0]['id'], limit=5)
+                     for page in pages[1:]]
+        conn = sqlite3.connect(db.path)
+        expected = [row[0] for row in conn.execute("SELECT id FROM equipment ORDER BY created_at DESC, id DESC")]
+        conn.close()
+        return expected, pages, backwards
+
+    expected, pages, backwards = db.run(scenario)
+    assert [item['id'] for page in pages for item in page['equipment']] == expected
+    assert [len(page['equipment']) for page in pages] == [5, 5, 5, 2]
+    assert not pages[0]['has_prev'] and all(page['has_prev'] for page in pages[1:])
+    for previous, back in zip(pages, backwards):
+        assert back['equipment'] == previous['equipment']
+        assert back['has_prev'] == previous['has_prev'] and back['has_next']
+
+
+def test_counts_by_status(db):
+    async def scenario():
+        await _seed(db)
+        return await database.get_equipment_counts()
+
+    assert db.run(scenario) == {'available': EQUIPMENT - 4, 'assigned': 4}
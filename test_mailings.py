@@ -0,0 +1,77 @@
+# Файл: it_ecosystem_bot/test_mailings.py
+"""Плановые рассылки: задачи в SQLiteJobStore и запись хранилища вне потока event loop."""
+import asyncio
+import time
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+import database
+import utils.mailings as mailings_module
+from database import create_scheduled_mailing
+from utils.jobstore import SQLiteJobStore
+from utils.mailings import JOBSTORE_ALIAS, MailingScheduler
+
+WRITER_BUSY = 1.0
+
+
+def _with_mailings(db, scenario):
+    async def main():
+        scheduler = AsyncIOScheduler(jobstores={JOBSTORE_ALIAS: SQLiteJobStore()})
+        scheduler.start()
+        try:
+            return await scenario(MailingScheduler(scheduler, broadcaster=None))
+        finally:
+            scheduler.shutdown(wait=False)
+
+    return db.run(main)
+
+
+def test_schedule_list_and_cancel(db):
+    async def scenario(mailings):
+        first = await mailings.schedule("Отчёт", 'weekdays_19')
+        again = await mailings.schedule("Отчёт", 'weekdays_19')
+        listed = await mailings.list()
+        cancelled = await mailings.cancel(first[0])
+        return first, again, listed, cancelled, await mailings.list(), database.load_scheduler_job(f"mailing_{first[0]}")
+
+    first, again, listed, cancelled, after, job_state = _with_mailings(db, scenario)
+    assert first[1] and again == (first[0], False)
+    assert [mailing['id'] for mailing in listed] == [first[0]]
+    assert listed[0]['next_run_time'] is not None
+    assert cancelled and after == [] and job_state is None
+
+
+def test_schedule_does_not_block_loop_behind_writer_batch(db, monkeypatch):
+    busy = []
+
+    async def create_then_busy(*args):
+        # Между записью рассылки и записью задачи писатель занят долгой пачкой
+        created = await create_scheduled_mailing(*args)
+        busy.append(asyncio.ensure_future(database._write(lambda conn: time.sleep(WRITER_BUSY))))
+        await asyncio.sleep(0.05)
+        return created
+
+    monkeypatch.setattr(mailings_module, 'create_scheduled_mailing', create_then_busy)
+
+    async def scenario(mailings):
+        gaps, stop = [], asyncio.Event()
+
+        async def ticker():
+            last = time.monotonic()
+            while not stop.is_set():
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                gaps.append(now - last)
+                last = now
+
+        ticking = asyncio.ensure_future(ticker())
+        result = await mailings.schedule("Отчёт", 'weekdays_19')
+        stop.set()
+        await ticking
+        await busy[0]
+        return result, max(gaps)
+
+    (_, created), max_gap = _with_mailings(db, scenario)
+    assert created
+    # Добавление задачи ждало писателя в отдельном потоке, цикл событий продолжал работать
+    assert max_gap < WRITER_BUSY / 2
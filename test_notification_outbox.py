@@ -0,0 +1,125 @@
+# Файл: it_ecosystem_bot/test_notification_outbox.py
+"""Outbox уведомлений: аренда при выборке, повтор временных ошибок и dead-letter."""
+import asyncio
+import sqlite3
+import time
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+
+import database
+from benchmarks.fake_bot import FakeSession, make_bot
+from utils.broadcast import ChatRateLimiter, TokenBucket
+from utils.notifications import NotificationOutbox
+
+ADMINS = [101, 102, 103]
+AUTHOR = 200
+
+
+class FailingSession(FakeSession):
+    """Отправка в чат из failures завершается заданной ошибкой Telegram."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    async def make_request(self, bot, method, timeout=None):
+        error = self.failures.get(getattr(method, 'chat_id', None))
+        if error is not None:
+            raise error(method=method, message="ошибка теста")
+        return await super().make_request(bot, method, timeout)
+
+
+def _with_notifications(db, scenario):
+    """Сценарий над outbox, в котором уже лежит уведомление о заявке каждому администратору."""
+    async def main():
+        await db.admins(*ADMINS)
+        await db.user(AUTHOR)
+        # Уведомление о заявке ставится в outbox каждому администратору в той же транзакции
+        await database.save_new_ticket(AUTHOR, {'title': 'Нет сети', 'floor': 2}, notify_admins=True)
+        return await scenario(db.path)
+
+    return db.run(main)
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    rows = {chat_id: (status, attempts, next_attempt_at, error) for chat_id, status, attempts, next_attempt_at, error
+            in conn.execute("SELECT chat_id, status, attempts, next_attempt_at, error FROM notification_outbox")}
+    conn.close()
+    return rows
+
+
+async def _deliver(session, max_attempts=8):
+    """Запускает воркер и ждёт, пока у каждого уведомления будет хотя бы одна попытка."""
+    outbox = NotificationOutbox(make_bot(session), bucket=TokenBucket(1000), chat_limiter=ChatRateLimiter(0.0),
+                                max_attempts=max_attempts)
+    outbox.start()
+    outbox.wake()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        counts = (await database.get_outbox_stats(0))['counts']
+        if outbox.sent + outbox.retried + outbox.dead >= sum(counts.values()):
+            break
+        await asyncio.sleep(0.02)
+    await outbox.stop()
+    return outbox
+
+
+def test_claim_leases_notifications(db):
+    async def scenario(path):
+        now = time.time()
+        first = await database.claim_notifications(now, 10, lease=60)
+        during_lease = await database.claim_notifications(now + 1, 10, lease=60)
+        # Воркер «упал», не отметив результат: после аренды уведомления снова доступны
+        after_lease = await database.claim_notifications(now + 61, 10, lease=60)
+        return first, during_lease, after_lease
+
+    first, during_lease, after_lease = _with_notifications(db, scenario)
+    assert sorted(item['chat_id'] for item in first) == ADMINS
+    assert all(item['kind'] == 'ticket_created' and item['attempts'] == 0 for item in first)
+    assert during_lease == []
+    assert sorted(item['id'] for item in after_lease) == sorted(item['id'] for item in first)
+
+
+def test_claim_respects_limit(db):
+    async def scenario(path):
+        now = time.time()
+        return [len(await database.claim_notifications(now, 2, lease=60)) for _ in range(3)]
+
+    assert _with_notifications(db, scenario) == [2, 1, 0]
+
+
+def test_transient_error_is_retried_and_permanent_is_dead(db):
+    async def scenario(path):
+        started = time.time()
+        session = FailingSession({ADMINS[1]: TelegramNetworkError, ADMINS[2]: TelegramForbiddenError})
+        outbox = await _deliver(session)
+        return started, outbox, _rows(path)
+
+    started, outbox, rows = _with_notifications(db, scenario)
+    assert (outbox.sent, outbox.retried, outbox.dead) == (1, 1, 1)
+    assert rows[ADMINS[0]][:2] == ('sent', 1)
+    # Временная ошибка: уведомление в очереди с отложенной следующей попыткой
+    status, attempts, next_attempt_at, error = rows[ADMINS[1]]
+    assert (status, attempts) == ('pending', 1) and error
+    assert next_attempt_at >= started + 1
+    # Бот заблокирован: повтор не поможет, сразу dead-letter
+    status, attempts, _, error = rows[ADMINS[2]]
+    assert (status, attempts) == ('dead', 1) and error
+
+
+def test_exhausted_attempts_go_to_dead_letter_and_can_be_requeued(db):
+    async def scenario(path):
+        session = FailingSession({admin_id: TelegramNetworkError for admin_id in ADMINS})
+        await _deliver(session, max_attempts=1)
+        dead = _rows(path)
+        requeued = await database.requeue_dead_notifications()
+        # После устранения причины уведомления из dead-letter доставляются
+        outbox = await _deliver(FakeSession())
+        return dead, requeued, outbox, _rows(path)
+
+    dead, requeued, outbox, delivered = _with_notifications(db, scenario)
+    assert all(status == 'dead' and attempts == 1 for status, attempts, _, _ in dead.values())
+    assert requeued == len(ADMINS)
+    assert outbox.sent == len(ADMINS)
+    assert all(status == 'sent' and error is None for status, _, _, error in delivered.values())
@@ -0,0 +1,75 @@
+# Файл: it_ecosystem_bot/test_routing.py
+"""Индекс маршрутизации уведомлений о новых заявках (utils/routing.py)."""
+import pytest
+
+from utils.routing import AdminRouting, normalize_route
+
+ADMINS = [101, 102, 103]
+
+
+def test_recipients_by_floor_or_category():
+    routing = AdminRouting()
+    routing.load([(101, 'floor', '2'), (102, 'floor', '3'), (103, 'category', 'Доступы'), (101, 'category', 'Доступы')])
+    assert routing.recipients(2, 'Сеть/Интернет') == {101}
+    assert routing.recipients(3, 'Доступы') == {101, 102, 103}
+    # Категория сравнивается без учёта регистра и пробелов по краям
+    assert routing.recipients(None, ' доступы ') == {101, 103}
+    # Нет ответственных — пустое множество: уведомляются все администраторы
+    assert routing.recipients(5, 'Принтер') == set()
+    assert routing.recipients(None, None) == set()
+
+
+def test_normalize_route():
+    assert normalize_route(' Floor ', ' 04 ') == ('floor', '4')
+    assert normalize_route('category', ' Доступы ') == ('category', 'Доступы')
+    for kind, value in (('room', '1'), ('floor', 'второй'), ('category', '  ')):
+        with pytest.raises(ValueError):
+            normalize_route(kind, value)
+
+
+def test_routes_persist_and_index_follows_changes(db):
+    async def scenario():
+        await db.admins(*ADMINS)
+        routing = AdminRouting()
+        await routing.start()
+        added = [await routing.add(101, 'floor', 4), await routing.add(101, 'floor', '4'),
+                 await routing.add(102, 'category', 'Доступы'), await routing.add(102, 'category', 'доступы'),
+                 await routing.add(103, 'floor', 4)]
+        before = routing.recipients(4, 'ДОСТУПЫ')
+
+        # Маршрут в другом регистре снят, но такой же остался: администратор всё ещё отвечает за категорию
+        removed_one = await routing.remove(102, 'category', 'доступы')
+        still = routing.recipients(None, 'Доступы')
+        removed_all = await routing.remove(103)
+        after = routing.recipients(4, 'Доступы')
+
+        # После рестарта индекс строится из таблицы и совпадает с тем, что был в памяти
+        restarted = AdminRouting()
+        count = await restarted.start()
+        return added, before, removed_one, still, removed_all, after, routing.routes(), restarted, count
+
+    added, before, removed_one, still, removed_all, after, routes, restarted, count = db.run(scenario)
+    assert added == [True, False, True, True, True]
+    assert before == {101, 102, 103}
+    assert (removed_one, still) == (1, {102})
+    assert (removed_all, after) == (1, {101, 102})
+    assert routes == {101: [('floor', '4')], 102: [('category', 'Доступы')]}
+    assert count == 2 and restarted.routes() == routes
+    assert restarted.recipients(4, 'доступы') == {101, 102}
+
+
+def test_remove_by_kind(db):
+    async def scenario():
+        await db.admins(*ADMINS)
+        routing = AdminRouting()
+        await routing.start()
+        for floor in (1, 2, 3):
+            await routing.add(101, 'floor', floor)
+        await routing.add(101, 'category', 'Принтер')
+        removed = await routing.remove(101, 'floor')
+        return removed, routing.routes(), routing.recipients(2, 'Принтер')
+
+    removed, routes, recipients = db.run(scenario)
+    assert removed == 3
+    assert routes == {101: [('category', 'Принтер')]}
+    assert recipients == {101}
@@ -0,0 +1,87 @@
+# Файл: it_ecosystem_bot/test_sla.py
+"""SLA-таймеры: сроки, не зафиксированные в БД из-за ошибки, не теряются."""
+import asyncio
+import sqlite3
+import time
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+import utils.sla as sla
+from utils.sla import SlaEngine
+
+# Просроченные сроки двух заявок из _engine(); срок решения второй заявки ещё впереди
+DUE = [(1, 'response'), (1, 'resolution'), (2, 'response')]
+
+
+def _engine() -> SlaEngine:
+    engine = SlaEngine(AsyncIOScheduler())
+    engine.track(1, 'high', created_ts=time.time() - 10 * 3600)
+    engine.track(2, 'high', created_ts=time.time() - 3600)
+    return engine
+
+
+def _fire(calls, error=None):
+    async def fire_sla_events(events, **kwargs):
+        calls.append(sorted(events))
+        if error is not None:
+            raise error
+        return list(events)
+
+    return fire_sla_events
+
+
+def test_db_error_keeps_deadlines_with_delayed_retry(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sla, 'fire_sla_events', _fire(calls, sqlite3.OperationalError("database is locked")))
+
+    async def scenario():
+        engine = _engine()
+        await engine._fire_due()
+        return engine
+
+    started = time.time()
+    engine = asyncio.run(scenario())
+    assert calls == [sorted(DUE)]
+    # Все четыре срока на месте, ближайшая задача планировщика — повтор через FIRE_RETRY_DELAY
+    assert engine.pending == 4
+    assert started + sla.FIRE_RETRY_DELAY <= engine._scheduled_at <= time.time() + sla.FIRE_RETRY_DELAY
+
+
+def test_retry_fires_deadlines_after_db_error(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sla, 'FIRE_RETRY_DELAY', 0.0)
+
+    async def scenario():
+        engine = _engine()
+        monkeypatch.setattr(sla, 'fire_sla_events', _fire(calls, sqlite3.OperationalError("disk I/O error")))
+        await engine._fire_due()
+        monkeypatch.setattr(sla, 'fire_sla_events', _fire(calls))
+        await engine._fire_due()
+        return engine
+
+    engine = asyncio.run(scenario())
+    assert calls == [sorted(DUE), sorted(DUE)]
+    assert engine.pending == 1
+
+
+def test_deadline_reset_during_failed_write_is_kept(monkeypatch):
+    calls = []
+
+    async def scenario():
+        engine = _engine()
+
+        async def fire_and_retrack(events, **kwargs):
+            calls.append(sorted(events))
+            # Пока шла запись, заявку 2 переоткрыли с новым сроком реакции
+            engine.track(2, 'low')
+            raise sqlite3.OperationalError("database is locked")
+
+        monkeypatch.setattr(sla, 'fire_sla_events', fire_and_retrack)
+        await engine._fire_due()
+        return engine
+
+    started = time.time()
+    engine = asyncio.run(scenario())
+    low_response = sla.SLA_POLICIES['low'][0]
+    assert engine._deadlines[(2, 'response')] >= started + low_response
+    assert engine._deadlines[(1, 'response')] < started + low_response
@@ -0,0 +1,71 @@
+# Файл: it_ecosystem_bot/test_ticket_claims.py
+"""Назначение заявки условным UPDATE по версии (claim_ticket, update_ticket_status)."""
+import asyncio
+
+import database
+
+ADMINS = [101, 102, 103, 104, 105, 106, 107, 108]
+AUTHOR = 200
+
+
+def _with_ticket(db, scenario):
+    """Сценарий над одной новой заявкой; администраторы и автор уже зарегистрированы."""
+    async def main():
+        await db.admins(*ADMINS)
+        await db.user(AUTHOR)
+        ticket_id, _ = await database.save_new_ticket(AUTHOR, {'title': 'Не печатает принтер'})
+        return await scenario(ticket_id)
+
+    return db.run(main)
+
+
+def test_concurrent_claims_have_one_winner(db):
+    async def scenario(ticket_id):
+        return await asyncio.gather(*(database.claim_ticket(ticket_id, admin_id, expected_version=0)
+                                      for admin_id in ADMINS))
+
+    results = _with_ticket(db, scenario)
+    winners = [result for result in results if result['claimed']]
+    assert len(winners) == 1
+    winner = winners[0]['admin_id']
+    # Проигравшие видят победителя и новую версию заявки
+    assert all(result['admin_id'] == winner and result['version'] == 1 for result in results)
+    assert all(result['status'] == 'in_progress' for result in results)
+
+
+def test_claim_with_stale_version_fails(db):
+    async def scenario(ticket_id):
+        stale = await database.claim_ticket(ticket_id, ADMINS[0], expected_version=1)
+        fresh = await database.claim_ticket(ticket_id, ADMINS[0], expected_version=0)
+        history = await database.get_ticket_history(ticket_id)
+        return stale, fresh, history
+
+    stale, fresh, history = _with_ticket(db, scenario)
+    assert not stale['claimed'] and stale['admin_id'] is None and stale['version'] == 0
+    assert fresh['claimed'] and fresh['admin_id'] == ADMINS[0] and fresh['version'] == 1
+    # В истории только успешное назначение
+    assert len([entry for entry in history if entry['new_status'] == 'in_progress']) == 1
+
+
+def test_claim_missing_ticket(db):
+    async def scenario(ticket_id):
+        return await database.claim_ticket(ticket_id + 1000, ADMINS[0])
+
+    assert _with_ticket(db, scenario) is None
+
+
+def test_status_change_checks_version(db):
+    async def scenario(ticket_id):
+        await database.claim_ticket(ticket_id, ADMINS[0], expected_version=0)
+        # Второй администратор видел заявку до назначения
+        stale = await database.update_ticket_status(ticket_id, 'on_hold', ADMINS[1], None, expected_version=0)
+        fresh = await database.update_ticket_status(ticket_id, 'on_hold', ADMINS[0], None, expected_version=1)
+        again = await database.claim_ticket(ticket_id, ADMINS[1], expected_status='on_hold', expected_version=1)
+        ticket = await database.get_ticket_details(ticket_id)
+        return stale, fresh, again, ticket
+
+    stale, fresh, again, ticket = _with_ticket(db, scenario)
+    assert stale is False
+    assert fresh is True
+    assert not again['claimed'] and again['version'] == 2
+    assert ticket['status'] == 'on_hold' and ticket['admin_id'] == ADMINS[0]
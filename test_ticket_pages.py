@@ -0,0 +1,88 @@
+# Файл: it_ecosystem_bot/test_ticket_pages.py
+"""Keyset-пагинация списка заявок администратора (get_tickets_page)."""
+import sqlite3
+
+import database
+
+AUTHOR = 200
+TICKETS = 23
+
+
+async def _seed(db):
+    await db.user(AUTHOR)
+    for i in range(TICKETS):
+        await database.save_new_ticket(AUTHOR, {'title': f"Заявка {i}", 'priority': 'high' if i % 3 == 0 else 'low'})
+    # По четыре заявки с одинаковым created_at: порядок внутри группы задаёт id
+    conn = sqlite3.connect(db.path)
+    conn.execute("UPDATE tickets SET created_at = datetime('2026-01-01', '+' || (id / 4) || ' minutes')")
+    conn.commit()
+    conn.close()
+
+
+def _expected_order(path, where=""):
+    conn = sqlite3.connect(path)
+    ids = [row[0] for row in conn.execute(f"SELECT id FROM tickets {where} ORDER BY created_at DESC, id DESC")]
+    conn.close()
+    return ids
+
+
+async def _forward(limit, **filters):
+    pages, after_id = [], None
+    while True:
+        page = await database.get_tickets_page(after_id=after_id, limit=limit, **filters)
+        pages.append(page)
+        if not page['has_next']:
+            return pages
+        after_id = page['tickets'][-1]['id']
+
+
+def test_forward_pages_cover_all_tickets_once(db):
+    async def scenario():
+        await _seed(db)
+        return _expected_order(db.path), await _forward(5)
+
+    expected, pages = db.run(scenario)
+    ids = [ticket['id'] for page in pages for ticket in page['tickets']]
+    assert ids == expected
+    assert [len(page['tickets']) for page in pages] == [5, 5, 5, 5, 3]
+    assert not pages[0]['has_prev'] and all(page['has_prev'] for page in pages[1:])
+
+
+def test_backward_page_matches_forward_page(db):
+    async def scenario():
+        await _seed(db)
+        pages = await _forward(5)
+        # «Назад» с каждой страницы возвращает ровно предыдущую
+        backwards = [await database.get_tickets_page(before_id=page['tickets'][0]['id'], limit=5)
+                     for page in pages[1:]]
+        return pages, backwards
+
+    pages, backwards = db.run(scenario)
+    for previous, back in zip(pages, backwards):
+        assert [t['id'] for t in back['tickets']] == [t['id'] for t in previous['tickets']]
+        assert back['has_next']
+        assert back['has_prev'] == previous['has_prev']
+
+
+def test_filtered_pages(db):
+    async def scenario():
+        await _seed(db)
+        return _expected_order(db.path, "WHERE priority = 'high'"), await _forward(3, priority='high')
+
+    expected, pages = db.run(scenario)
+    tickets = [ticket for page in pages for ticket in page['tickets']]
+    assert [ticket['id'] for ticket in tickets] == expected
+    assert all(ticket['priority'] == 'high' for ticket in tickets)
+
+
+def test_empty_and_exact_pages(db):
+    async def scenario():
+        await _seed(db)
+        empty = await database.get_tickets_page(status='closed')
+        exact = await database.get_tickets_page(limit=TICKETS)
+        return empty, exact
+
+    empty, exact = db.run(scenario)
+    assert empty == {'tickets': [], 'has_prev': False, 'has_next': False}
+    # Ровно limit заявок: следующей страницы нет
+    assert len(exact['tickets']) == TICKETS and not exact['has_next']
@@ -0,0 +1,298 @@
+# Файл: it_ecosystem_bot/utils/assignment.py
+"""
+Автоназначение новых заявок по нагрузке администраторов.
+
+Нагрузка администратора — сумма весов его незакрытых заявок (вес зависит от
+приоритета). Она держится в памяти: при старте и периодически строится заново
+из таблицы tickets, а между пересборками обновляется обработчиками при каждом
+назначении и смене статуса (ticket_changed). Выбор исполнителя — вершина
+двоичной кучи с ленивым удалением, O(log n) без запросов к БД, поэтому
+save_new_ticket получает исполнителя сразу.
+
+Правило выбора подключаемое (POLICIES, настройка ASSIGN_POLICY):
+    least_loaded   — самый свободный администратор;
+    floor_affinity — то же, но заявка на этаже, где у администратора уже есть
+                     заявки, дешевле на floor_penalty: не нужно идти на другой этаж;
+    manual         — без автоназначения, заявки берут вручную.
+Назначенная заявка остаётся в статусе 'open', пока исполнитель не возьмёт её
+в работу, так что срок реакции SLA по-прежнему считается.
+"""
+import heapq
+import itertools
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from database import get_admin_telegram_ids, get_open_ticket_loads
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_WEIGHTS: Dict[str, float] = {
+    'high': 3.0,
+    'medium': 2.0,
+    'low': 1.0,
+}
+DEFAULT_PRIORITY = 'medium'
+# Статусы, в которых заявка нагружает исполнителя
+ACTIVE_STATUSES = ('open', 'in_progress', 'on_hold')
+# Штраф за заявку на другом этаже, в единицах нагрузки (как одна заявка среднего приоритета)
+FLOOR_PENALTY = 2.0
+
+
+class Assignment(NamedTuple):
+    admin_id: int
+    weight: float
+    floor: Optional[int]
+    key: int  # id заявки; до сохранения — временный отрицательный ключ
+
+
+class LoadHeap:
+    """Мин-куча администраторов по нагрузке с ленивым удалением устаревших записей."""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, int]] = []
+        # Актуальная запись администратора; записи кучи, не совпадающие с ней, считаются снятыми
+        self._entries: Dict[int, Tuple[float, int, int]] = {}
+        # При равной нагрузке первым идёт тот, чья нагрузка менялась раньше всех
+        self._seq = itertools.count()
+
+    def set(self, admin_id: int, load: float):
+        entry = (load, next(self._seq), admin_id)
+        self._entries[admin_id] = entry
+        heapq.heappush(self._heap, entry)
+        self._compact()
+
+    def discard(self, admin_id: int):
+        self._entries.pop(admin_id, None)
+        self._compact()
+
+    def peek(self) -> Optional[Tuple[float, int]]:
+        """(нагрузка, администратор) с минимальной нагрузкой или None, если куча пуста."""
+        while self._heap:
+            entry = self._heap[0]
+            if self._entries.get(entry[2]) is entry:
+                return entry[0], entry[2]
+            heapq.heappop(self._heap)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._entries) + 1024:
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+
+
+class AssignmentPolicy:
+    """Правило выбора исполнителя. Движок сообщает ему нагрузку и этажи заявок каждого администратора."""
+
+    name = ''
+
+    def update(self, admin_id: int, load: float, floors: Iterable[int]):
+        pass
+
+    def remove(self, admin_id: int):
+        pass
+
+    def pick(self, weight: float, floor: Optional[int]) -> Optional[int]:
+        return None
+
+
+class ManualPolicy(AssignmentPolicy):
+    """Без автоназначения: заявку берут вручную."""
+
+    name = 'manual'
+
+
+class LeastLoadedPolicy(AssignmentPolicy):
+    """Самый свободный администратор."""
+
+    name = 'least_loaded'
+
+    def __init__(self):
+        self.heap = LoadHeap()
+
+    def update(self, admin_id: int, load: float, floors: Iterable[int]):
+        self.heap.set(admin_id, load)
+
+    def remove(self, admin_id: int):
+        self.heap.discard(admin_id)
+
+    def pick(self, weight: float, floor: Optional[int]) -> Optional[int]:
+        top = self.heap.peek()
+        return top[1] if top else None
+
+
+class FloorAffinityPolicy(LeastLoadedPolicy):
+    """
+    Самый свободный с учётом этажа: администратор с заявками на этаже новой заявки выигрывает,
+    если его нагрузка не больше, чем у самого свободного, плюс floor_penalty.
+    """
+
+    name = 'floor_affinity'
+
+    def __init__(self, floor_penalty: float = FLOOR_PENALTY):
+        super().__init__()
+        self.floor_penalty = floor_penalty
+        self._floor_heaps: Dict[int, LoadHeap] = {}
+        self._admin_floors: Dict[int, set] = {}
+
+    def update(self, admin_id: int, load: float, floors: Iterable[int]):
+        super().update(admin_id, load, floors)
+        floors = set(floors)
+        for floor in self._admin_floors.get(admin_id, set()) - floors:
+            self._floor_heaps[floor].discard(admin_id)
+        for floor in floors:
+            self._floor_heaps.setdefault(floor, LoadHeap()).set(admin_id, load)
+        self._admin_floors[admin_id] = floors
+
+    def remove(self, admin_id: int):
+        super().remove(admin_id)
+        for floor in self._admin_floors.pop(admin_id, set()):
+            self._floor_heaps[floor].discard(admin_id)
+
+    def pick(self, weight: float, floor: Optional[int]) -> Optional[int]:
+        top = self.heap.peek()
+        if top is None:
+            return None
+        local = self._floor_heaps[floor].peek() if floor in self._floor_heaps else None
+        if local is not None and local[0] <= top[0] + self.floor_penalty:
+            return local[1]
+        return top[1]
+
+
+POLICIES = {
+    ManualPolicy.name: ManualPolicy,
+    LeastLoadedPolicy.name: LeastLoadedPolicy,
+    FloorAffinityPolicy.name: FloorAffinityPolicy,
+}
+
+
+def make_policy(name: str, floor_penalty: float = FLOOR_PENALTY) -> AssignmentPolicy:
+    if name == FloorAffinityPolicy.name:
+        return FloorAffinityPolicy(floor_penalty)
+    if name not in POLICIES:
+        raise ValueError(f"Неизвестное правило назначения: {name} (доступны: {', '.join(POLICIES)})")
+    return POLICIES[name]()
+
+
+class AssignmentEngine:
+    """Нагрузка администраторов в памяти и выбор исполнителя новой заявки. Один экземпляр на бота."""
+
+    def __init__(self, policy: AssignmentPolicy, weights: Optional[Dict[str, float]] = None):
+        self.policy = policy
+        self.weights = weights or PRIORITY_WEIGHTS
+        self._tickets: Dict[int, Assignment] = {}
+        self._loads: Dict[int, float] = {}
+        self._floors: Dict[int, Counter] = {}
+        self._temp_keys = itertools.count(-1, -1)
+
+    # --- Публичный API ---
+
+    async def start(self) -> int:
+        return await self.rebuild()
+
+    async def rebuild(self) -> int:
+        """Строит нагрузку заново по таблице tickets (при старте и периодически — задача планировщика)."""
+        count = self.load(await get_admin_telegram_ids(), await get_open_ticket_loads())
+        logger.info(f"ASSIGN: администраторов {len(self._loads)}, незакрытых заявок {count}, "
+                    f"правило {self.policy.name}")
+        return count
+
+    def load(self, admin_ids: Iterable[int], tickets: Iterable[Dict]) -> int:
+        """Заменяет нагрузку: администраторы и их незакрытые заявки (id, admin_id, priority, floor)."""
+        # Резервы назначений, ещё не сохранённых в БД, переживают пересборку
+        pending = [a for a in self._tickets.values() if a.key < 0]
+        for admin_id in list(self._loads):
+            self.policy.remove(admin_id)
+        self._tickets, self._loads, self._floors = {}, {}, {}
+        for admin_id in admin_ids:
+            self._loads[admin_id] = 0.0
+            self._floors[admin_id] = Counter()
+        for ticket in tickets:
+            self._add(Assignment(ticket['admin_id'], self._weight(ticket['priority']), ticket['floor'],
+                                 ticket['id']), notify=False)
+        for assignment in pending:
+            self._add(assignment, notify=False)
+        for admin_id in self._loads:
+            self._notify(admin_id)
+        return len(self._tickets)
+
+    def pick(self, priority: Optional[str], floor: Optional[int]) -> Optional[Assignment]:
+        """
+        Выбирает исполнителя новой заявки и сразу резервирует за ним её вес, чтобы одновременные
+        заявки не ушли одному администратору. После сохранения — bind(), при ошибке — release().
+        """
+        weight = self._weight(priority)
+        admin_id = self.policy.pick(weight, floor)
+        if admin_id is None:
+            return None
+        assignment = Assignment(admin_id, weight, floor, next(self._temp_keys))
+        self._add(assignment)
+        return assignment
+
+    def bind(self, assignment: Assignment, ticket_id: int):
+        """Резерв становится заявкой ticket_id."""
+        self._remove(assignment.key)
+        # Если пересборка между выбором и сохранением уже прочитала заявку из БД, она учтена
+        if ticket_id not in self._tickets:
+            self._add(assignment._replace(key=ticket_id))
+
+    def release(self, assignment: Assignment):
+        """Заявка не сохранилась: резерв снимается."""
+        self._remove(assignment.key)
+
+    def ticket_changed(self, ticket_id: int, admin_id: Optional[int], status: str,
+                       priority: Optional[str] = None, floor: Optional[int] = None):
+        """
+        Заявку назначили, передали другому или сменили статус. priority и floor нужны только
+        для заявок, которых движок ещё не знает (взятых из общей очереди).
+        """
+        current = self._tickets.get(ticket_id)
+        if status not in ACTIVE_STATUSES or admin_id is None:
+            if current is not None:
+                self._remove(ticket_id)
+            return
+        if current is not None and current.admin_id == admin_id:
+            return
+        if current is not None:
+            self._remove(ticket_id)
+            priority_weight, floor = current.weight, current.floor
+        else:
+            priority_weight = self._weight(priority)
+        if admin_id in self._loads:
+            self._add(Assignment(admin_id, priority_weight, floor, ticket_id))
+
+    def loads(self) -> Dict[int, float]:
+        return dict(self._loads)
+
+    # --- Внутреннее ---
+
+    def _weight(self, priority: Optional[str]) -> float:
+        return self.weights.get(priority or DEFAULT_PRIORITY, self.weights[DEFAULT_PRIORITY])
+
+    def _add(self, assignment: Assignment, notify: bool = True):
+        if assignment.admin_id not in self._loads:
+            return
+        self._tickets[assignment.key] = assignment
+        self._loads[assignment.admin_id] += assignment.weight
+        if assignment.floor is not None:
+            self._floors[assignment.admin_id][assignment.floor] += 1
+        if notify:
+            self._notify(assignment.admin_id)
+
+    def _remove(self, key: int):
+        assignment = self._tickets.pop(key, None)
+        if assignment is None or assignment.admin_id not in self._loads:
+            return
+        self._loads[assignment.admin_id] -= assignment.weight
+        floors = self._floors[assignment.admin_id]
+        if assignment.floor is not None:
+            floors[assignment.floor] -= 1
+            if floors[assignment.floor] <= 0:
+                del floors[assignment.floor]
+        self._notify(assignment.admin_id)
+
+    def _notify(self, admin_id: int):
+        self.policy.update(admin_id, self._loads[admin_id], self._floors[admin_id].keys())
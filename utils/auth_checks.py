@@ -1,24 +1,20 @@
 # Файл: it_ecosystem_bot/utils/auth_checks.py
 import os
 import logging
-from typing import Callable, Awaitable, Any
-from aiogram.types import Message
-# Для работы декоратора
-from aiogram import Router
-
-logger = logging.getLogger(__name__)
+from functools import lru_cache
+from typing import Callable, Awaitable, Any, Dict, FrozenSet
+from aiogram import BaseMiddleware
+from aiogram.filters import Filter
+from aiogram.types import TelegramObject, User
 
+from database import get_user_role
 
-def is_admin(telegram_id: int) -> bool:
-    """Проверяет, является ли пользователь администратором (по БД, не по .env)."""
-    # Эта функция используется для проверки роли пользователя из БД
-    # Она заглушка - реальная проверка делается в обработчиках через get_user_role()
-    # Используется только для быстрой проверки перед основной логикой
-    return True  # По умолчанию даём доступ (проверка будет в обработчиках)
+logger = logging.getLogger(__name__)
 
 
-def is_super_admin(telegram_id: int) -> bool:
-    """Проверяет, является ли пользователь Супер-Админом по ID из .env."""
+@lru_cache(maxsize=1)
+def super_admin_ids() -> FrozenSet[int]:
+    """ID Супер-Админов из .env; разбираются один раз за процесс."""
 
     # Приоритетная переменная по структуре кода
     super_admin_ids_str = os.getenv('SUPER_ADMIN_IDS', '')
@@ -32,32 +28,59 @@ def is_super_admin(telegram_id: int) -> bool:
         else:
             # Ни одна из переменных не найдена
             logger.critical("AUTH_CHECKS: Переменная SUPER_ADMIN_IDS или ADMIN_IDS не найдена в .env.")
-            return False
+            return frozenset()
+
+    # Парсим ID, игнорируя пустые строки и нечисловые значения
+    ids = frozenset(int(id.strip()) for id in super_admin_ids_str.split(',') if id.strip().isdigit())
+    if not ids:
+        logger.error("AUTH_CHECKS: Переменная SUPER/ADMIN_IDS пуста или содержит нечисловые значения.")
+    return ids
 
-    try:
-        # Парсим ID, игнорируя пустые строки и нечисловые значения
-        super_admin_ids = [int(id.strip()) for id in super_admin_ids_str.split(',') if id.strip().isdigit()]
 
-        if not super_admin_ids:
-            logger.error("AUTH_CHECKS: Переменная SUPER/ADMIN_IDS пуста или содержит нечисловые значения.")
-            return False
+def is_super_admin(telegram_id: int) -> bool:
+    """Проверяет, является ли пользователь Супер-Админом по ID из .env."""
+    return telegram_id in super_admin_ids()
 
-        return telegram_id in super_admin_ids
-    except ValueError:
-        logger.error("AUTH_CHECKS: Ошибка парсинга ID в .env")
-        return False
 
+async def is_admin(telegram_id: int) -> bool:
+    """
+    Проверяет роль администратора по БД (через кэш ролей).
+    В обработчиках вместо неё используется роль, подставленная AuthMiddleware.
+    """
+    return await get_user_role(telegram_id) == 'admin'
 
-def super_admin_required(handler: Callable[[Message], Awaitable[Any]]):
-    """Декоратор для ограничения доступа к функциям только для Супер-Админов."""
 
-    async def wrapper(message: Message, *args, **kwargs):
-        if is_super_admin(message.from_user.id):
-            return await handler(message, *args, **kwargs)
+class AuthMiddleware(BaseMiddleware):
+    """
+    Определяет пользователя один раз на апдейт и передаёт обработчикам и фильтрам:
+    user_role (None — не авторизован) и is_super_admin.
+    Регистрируется как outer-middleware на dp.update, после встроенного UserContextMiddleware.
+    """
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user: User | None = data.get('event_from_user')
+        if user is None:
+            data['user_role'] = None
+            data['is_super_admin'] = False
         else:
-            await message.answer(
-                "🚫 <b>Доступ запрещен.</b> У вас нет прав Супер-Администратора для выполнения этой команды.")
-            logger.warning(f"Попытка доступа Супер-Админ: {message.from_user.id}")
-            return
+            data['user_role'] = await get_user_role(user.id)
+            data['is_super_admin'] = is_super_admin(user.id)
+        return await handler(event, data)
+
+
+class RoleFilter(Filter):
+    """Пропускает апдейт, только если роль из AuthMiddleware входит в roles."""
+
+    def __init__(self, *roles: str):
+        self.roles = frozenset(roles)
+
+    async def __call__(self, event: TelegramObject, user_role: str | None = None) -> bool:
+        return user_role in self.roles
+
+
+class SuperAdminFilter(Filter):
+    """Пропускает апдейт только от Супер-Админа."""
 
-    return wrapper
\ No newline at end of file
+    async def __call__(self, event: TelegramObject, is_super_admin: bool = False) -> bool:
+        return is_super_admin
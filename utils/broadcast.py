@@ -0,0 +1,266 @@
+# Файл: it_ecosystem_bot/utils/broadcast.py
+"""
+Движок рассылок: ограниченная параллельность, лимиты Telegram и возобновление после рестарта.
+
+Состояние доставки каждому получателю хранится в broadcast_deliveries, поэтому
+после перезапуска бота рассылка продолжается с недоставленных получателей.
+Между отправкой и фиксацией результата возможен рестарт, поэтому гарантия —
+«не менее одного раза» для сообщений, которые были в полёте в момент остановки.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError,
+    TelegramRetryAfter, TelegramServerError,
+)
+
+from database import (
+    create_broadcast, get_broadcast, get_pending_broadcast_recipients, get_unfinished_broadcast_ids,
+    mark_broadcast_delivery, set_broadcast_progress_message, set_broadcast_status,
+)
+from utils.faq_media import media_sender
+
+logger = logging.getLogger(__name__)
+
+# Telegram допускает ~30 сообщений/с на бота и ~1 сообщение/с в один чат; держим запас
+GLOBAL_RATE = 25.0
+PER_CHAT_INTERVAL = 1.0
+CONCURRENCY = 10
+MAX_ATTEMPTS = 5
+PROGRESS_INTERVAL = 3.0
+
+
+class TokenBucket:
+    """Глобальный лимитер: не более rate отправок в секунду, с паузой после 429."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        # Ёмкость 1: без накопленного «залпа», в любом окне в 1 с не больше rate + 1 отправок
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Останавливает все отправки на seconds (ответ RetryAfter)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ChatRateLimiter:
+    """Лимитер на чат: между сообщениями в один чат не меньше interval секунд."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_allowed: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        allowed = self._next_allowed.get(chat_id, 0.0)
+        self._next_allowed[chat_id] = max(now, allowed) + self.interval
+        if allowed > now:
+            await asyncio.sleep(allowed - now)
+        if len(self._next_allowed) > 10_000:
+            self._next_allowed = {c: t for c, t in self._next_allowed.items() if t > now}
+
+
+Sender = Callable[[int], Awaitable]
+
+
+class Broadcaster:
+    """Запускает, возобновляет и отслеживает рассылки. Один экземпляр на бота (общие лимиты)."""
+
+    def __init__(self, bot: Bot, rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL,
+                 concurrency: int = CONCURRENCY, max_attempts: int = MAX_ATTEMPTS,
+                 progress_interval: float = PROGRESS_INTERVAL):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.progress_interval = progress_interval
+        # Лимиты общие на бота: их же использует outbox уведомлений (utils/notifications.py)
+        self.bucket = TokenBucket(rate)
+        self.chat_limiter = ChatRateLimiter(per_chat_interval)
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    # --- Публичный API ---
+
+    async def start(self, kind: str, text: str, created_by: Optional[int] = None, file_id: Optional[str] = None,
+                    file_type: Optional[str] = None, progress_chat_id: Optional[int] = None,
+                    progress_message_id: Optional[int] = None, recipients: Optional[List[int]] = None,
+                    faq_id: Optional[int] = None) -> int:
+        """
+        Создаёт рассылку и запускает её в фоне. Если указан progress_chat_id, прогресс
+        показывается в сообщении progress_message_id (или в новом сообщении этого чата).
+        С faq_id рассылка уходит только тем, кому материал ещё не доставлялся.
+        """
+        broadcast_id, total = await create_broadcast(kind, text, created_by, file_id, file_type, recipients, faq_id)
+        logger.info(f"BROADCAST: рассылка #{broadcast_id} ({kind}) создана, получателей: {total}")
+
+        if progress_chat_id is not None:
+            progress_text = self._progress_text(broadcast_id, {'pending': total}, total, done=False)
+            try:
+                if progress_message_id is None:
+                    progress_message_id = (await self.bot.send_message(progress_chat_id, progress_text)).message_id
+                else:
+                    await self.bot.edit_message_text(progress_text, chat_id=progress_chat_id,
+                                                     message_id=progress_message_id)
+                await set_broadcast_progress_message(broadcast_id, progress_chat_id, progress_message_id)
+            except TelegramAPIError as e:
+                logger.warning(f"BROADCAST: не удалось показать прогресс рассылки #{broadcast_id}: {e}")
+
+        self._spawn(broadcast_id)
+        return broadcast_id
+
+    async def resume_unfinished(self) -> List[int]:
+        """Возобновляет рассылки, прерванные остановкой бота (вызывается при старте)."""
+        broadcast_ids = await get_unfinished_broadcast_ids()
+        for broadcast_id in broadcast_ids:
+            logger.info(f"BROADCAST: возобновление рассылки #{broadcast_id}")
+            self._spawn(broadcast_id)
+        return broadcast_ids
+
+    async def cancel(self, broadcast_id: int) -> bool:
+        """Отменяет рассылку: недоставленные получатели больше не обрабатываются."""
+        task = self._tasks.get(broadcast_id)
+        if task is None:
+            return False
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await set_broadcast_status(broadcast_id, 'cancelled')
+        return True
+
+    async def wait(self, broadcast_id: int):
+        """Дожидается завершения рассылки, запущенной этим экземпляром."""
+        task = self._tasks.get(broadcast_id)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def stop(self):
+        """Останавливает все рассылки; статус остаётся 'running', и при старте они возобновятся."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # --- Внутреннее ---
+
+    def _spawn(self, broadcast_id: int):
+        task = asyncio.create_task(self._run(broadcast_id), name=f"broadcast-{broadcast_id}")
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    def _resolve_sender(self, broadcast: Dict) -> Sender:
+        """Выбирает метод отправки один раз на рассылку, а не на каждого получателя."""
+        return media_sender(self.bot, broadcast['file_id'], broadcast['file_type'], broadcast['text'])
+
+    async def _run(self, broadcast_id: int):
+        broadcast = await get_broadcast(broadcast_id)
+        if broadcast is None:
+            return
+        send = self._resolve_sender(broadcast)
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id in await get_pending_broadcast_recipients(broadcast_id):
+            queue.put_nowait(chat_id)
+
+        started = time.monotonic()
+        workers = [asyncio.create_task(self._worker(broadcast_id, queue, send))
+                   for _ in range(min(self.concurrency, queue.qsize()))]
+        reporter = asyncio.create_task(self._report_loop(broadcast))
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers + [reporter]:
+                task.cancel()
+            await asyncio.gather(*workers, reporter, return_exceptions=True)
+
+        await set_broadcast_status(broadcast_id, 'done')
+        final = await get_broadcast(broadcast_id)
+        await self._report(final, done=True)
+        logger.info(f"BROADCAST: рассылка #{broadcast_id} завершена за {time.monotonic() - started:.1f} c: "
+                    f"{final['counts']}")
+
+    async def _worker(self, broadcast_id: int, queue: asyncio.Queue, send: Sender):
+        while True:
+            try:
+                chat_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            status, attempts, error = await self._deliver(chat_id, send)
+            await mark_broadcast_delivery(broadcast_id, chat_id, status, attempts, error)
+
+    async def _deliver(self, chat_id: int, send: Sender):
+        """Отправляет одно сообщение с учётом лимитов; возвращает (статус, попытки, ошибка)."""
+        attempts = failures = 0
+        while True:
+            attempts += 1
+            await self.chat_limiter.wait(chat_id)
+            await self.bucket.acquire()
+            try:
+                await send(chat_id)
+                return 'sent', attempts, None
+            except TelegramRetryAfter as e:
+                # Флуд-контроль не считается неудачей: ждём указанное время всеми воркерами и повторяем
+                logger.warning(f"BROADCAST: RetryAfter {e.retry_after} c")
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError as e:
+                return 'blocked', attempts, str(e)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                failures += 1
+                if failures >= self.max_attempts:
+                    return 'failed', attempts, str(e)
+                await asyncio.sleep(min(2 ** failures, 30))
+            except (TelegramBadRequest, TelegramAPIError) as e:
+                return 'failed', attempts, str(e)
+            except Exception as e:
+                logger.error(f"BROADCAST: непредвиденная ошибка отправки в чат {chat_id}: {e}")
+                return 'failed', attempts, str(e)
+
+    async def _report_loop(self, broadcast: Dict):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            current = await get_broadcast(broadcast['id'])
+            await self._report(current, done=False)
+
+    async def _report(self, broadcast: Dict, done: bool):
+        if not broadcast or not broadcast['progress_chat_id']:
+            return
+        text = self._progress_text(broadcast['id'], broadcast['counts'], broadcast['total'], done)
+        try:
+            await self.bot.edit_message_text(text, chat_id=broadcast['progress_chat_id'],
+                                             message_id=broadcast['progress_message_id'])
+        except TelegramRetryAfter:
+            pass  # прогресс обновится на следующем такте
+        except TelegramBadRequest as e:
+            if "not modified" not in str(e):
+                logger.warning(f"BROADCAST: не удалось обновить прогресс рассылки #{broadcast['id']}: {e}")
+
+    @staticmethod
+    def _progress_text(broadcast_id: int, counts: Dict[str, int], total: int, done: bool) -> str:
+        sent, failed, blocked = counts.get('sent', 0), counts.get('failed', 0), counts.get('blocked', 0)
+        header = "✅ <b>Рассылка завершена</b>" if done else "📤 <b>Идёт рассылка</b>"
+        return (
+            f"{header} #{broadcast_id}\n\n"
+            f"Отправлено: {sent} из {total}\n"
+            f"Заблокировали бота: {blocked}\n"
+            f"Ошибок: {failed}\n"
+            f"Осталось: {counts.get('pending', 0)}"
+        )
@@ -0,0 +1,85 @@
+# Файл: it_ecosystem_bot/utils/cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Внутрипроцессный LRU-кэш с временем жизни записей и счётчиками попаданий.
+
+    Кэшируется и отсутствие значения (None), поэтому повторные запросы по
+    неавторизованному пользователю тоже не идут в БД. Чтобы значение, прочитанное
+    до инвалидации, не попало в кэш после неё, set() принимает поколение,
+    полученное через generation() до чтения из БД.
+    """
+
+    def __init__(self, name: str, maxsize: int = 10_000, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Возвращает (найдено, значение)."""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, item[1]
+            if item is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key: Hashable, value: Any, generation: int | None = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return  # между чтением из БД и записью в кэш была инвалидация
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def configure(self, maxsize: int, ttl: float):
+        with self._lock:
+            self.maxsize, self.ttl = maxsize, ttl
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
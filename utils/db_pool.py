@@ -0,0 +1,220 @@
+# Файл: it_ecosystem_bot/utils/db_pool.py
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _open_connection(path: str, statement_cache_size: int,
+                     pragmas: Optional[Dict[str, Any]] = None) -> sqlite3.Connection:
+    """Открывает соединение в режиме ручного управления транзакциями и применяет PRAGMA."""
+    # isolation_level=None: BEGIN/COMMIT выполняем явно, sqlite3 не открывает транзакции сам
+    conn = sqlite3.connect(
+        path,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=statement_cache_size,
+    )
+    # PRAGMA synchronous/cache_size/mmap_size/... действуют на соединение, а не на файл
+    for name, value in (pragmas or {}).items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Пул долгоживущих SQLite-соединений для чтения, закреплённых за потоками пула.
+
+    Каждый поток исполнителя открывает одно соединение при первом обращении и
+    переиспользует его до закрытия пула: connect/close и повторный разбор схемы
+    больше не выполняются на каждый запрос. Подготовленные выражения кэшируются
+    самим sqlite3 (параметр cached_statements).
+    """
+
+    def __init__(self, path: str, size: int = 4, statement_cache_size: int = 256,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.size = size
+        self.statement_cache_size = statement_cache_size
+        self.pragmas = pragmas or {}
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="db-read")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока, открывая его при первом вызове."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _open_connection(self.path, self.statement_cache_size, self.pragmas)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+            logger.debug(f"DB: открыто соединение пула в потоке {threading.current_thread().name}")
+        return conn
+
+    def _call(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        return fn(self._connection())
+
+    async def read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Асинхронно выполняет читающую функцию на соединении пула."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn)
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Синхронный вариант для кода, работающего вне event loop."""
+        return self._executor.submit(self._call, fn).result()
+
+    def close(self):
+        """Останавливает потоки пула и закрывает все открытые соединения."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logger.error(f"DB: ошибка закрытия соединения пула: {e}")
+            self._connections.clear()
+
+
+class WriteQueue:
+    """
+    Единственный поток-писатель SQLite с группировкой записей.
+
+    Корутины кладут пишущие функции в asyncio-очередь и ждут собственный future.
+    Всё, что накопилось в очереди к моменту очередного такта, выполняется в
+    потоке-писателе одной транзакцией (один fsync); каждая функция изолирована
+    SAVEPOINT'ом, поэтому ошибка одной записи не откатывает соседние.
+    """
+
+    def __init__(self, path: str, statement_cache_size: int = 256, pragmas: Optional[Dict[str, Any]] = None,
+                 journal_mode: Optional[str] = None, max_batch: int = 256):
+        self.path = path
+        self.statement_cache_size = statement_cache_size
+        self.pragmas = pragmas or {}
+        self.journal_mode = journal_mode
+        self.max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batches = 0
+        self.writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Вызывается только из потока-писателя
+        if self._conn is None:
+            self._conn = _open_connection(self.path, self.statement_cache_size, self.pragmas)
+            if self.journal_mode:
+                # journal_mode хранится в файле БД; достаточно выставить его писателем вне транзакции
+                mode = self._conn.execute(f"PRAGMA journal_mode={self.journal_mode}").fetchone()[0]
+                if mode.upper() != self.journal_mode.upper():
+                    logger.warning(f"DB: не удалось включить journal_mode={self.journal_mode}, активен {mode}.")
+        return self._conn
+
+    def _commit_batch(self, fns: List[Callable[[sqlite3.Connection], Any]]) -> List[Tuple[bool, Any]]:
+        """
+        Выполняет пачку записей одной транзакцией; возвращает (успех, результат/ошибка) по каждой.
+        Задание откатывается к своей точке сохранения, только если выбросило исключение: задание,
+        которое поймало ошибку и вернуло значение, фиксируется вместе с уже выполненными выражениями.
+        Поэтому пишущие функции пробрасывают ошибку из задания и превращают её в False снаружи.
+        """
+        conn = self._connection()
+        results: List[Tuple[bool, Any]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn in fns:
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    value = fn(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_job")
+                    conn.execute("RELEASE write_job")
+                    results.append((False, e))
+                else:
+                    conn.execute("RELEASE write_job")
+                    results.append((True, value))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"DB: ошибка фиксации пачки из {len(fns)} записей: {e}")
+            if conn.in_transaction:
+                conn.rollback()
+            return [(False, e)] * len(fns)
+
+        self.batches += 1
+        self.writes += len(fns)
+        return results
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(), name="db-writer")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                results = await loop.run_in_executor(self._executor, self._commit_batch, [fn for fn, _ in batch])
+            except Exception as e:
+                results = [(False, e)] * len(batch)
+
+            for (_, fut), (ok, value) in zip(batch, results):
+                if not fut.done():
+                    if ok:
+                        fut.set_result(value)
+                    else:
+                        fut.set_exception(value)
+                self._queue.task_done()
+
+    async def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Ставит запись в очередь и ждёт её фиксации."""
+        self._ensure_started()
+        fut = self._loop.create_future()
+        self._queue.put_nowait((fn, fut))
+        return await fut
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        Синхронная запись тем же потоком-писателем, отдельным заданием вне пачек очереди.
+
+        Вызов блокирует поток, пока писатель не закончит уже начатую пачку (не больше
+        max_batch записей и один commit) и само задание. Из event loop так можно писать
+        только редко; корутины пишут через submit, синхронный код — из отдельного потока.
+        """
+        ok, value = self._executor.submit(self._commit_batch, [fn]).result()[0]
+        if not ok:
+            raise value
+        return value
+
+    async def maintenance(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполняет fn(conn) в потоке-писателе вне транзакции (checkpoint, VACUUM, смена PRAGMA)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connection()))
+
+    async def drain(self):
+        """Дожидается фиксации всех записей, уже поставленных в очередь."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+    def close(self):
+        """Останавливает поток-писатель и закрывает его соединение."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._executor.shutdown(wait=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
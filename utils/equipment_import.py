@@ -0,0 +1,183 @@
+# Файл: it_ecosystem_bot/utils/equipment_import.py
+"""Потоковый импорт оборудования из .xlsx/.csv с пакетной выдачей инвентарных номеров."""
+import csv
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from database import import_equipment_rows
+from utils.inventory_generator import CATEGORY_CODES
+
+logger = logging.getLogger(__name__)
+
+# Строк в одной транзакции записи
+CHUNK_SIZE = 2000
+MAX_FIELD_LENGTH = 255
+
+# Допустимые заголовки колонок (в нижнем регистре) -> поле
+COLUMN_ALIASES = {
+    'category': 'category', 'категория': 'category',
+    'model': 'model', 'модель': 'model',
+    'serial': 'serial', 'serial number': 'serial', 'sn': 'serial', 'серийный номер': 'serial',
+    'workplace': 'workplace', 'рабочее место': 'workplace',
+}
+
+# Русские названия категорий -> ключ CATEGORY_CODES
+CATEGORY_ALIASES = {
+    'ноутбук': 'laptop', 'компьютер': 'desktop', 'системный блок': 'desktop', 'монитор': 'monitor',
+    'принтер': 'printer', 'роутер': 'router', 'маршрутизатор': 'router', 'телефон': 'phone',
+    'клавиатура': 'keyboard', 'мышь': 'mouse', 'гарнитура': 'headset', 'наушники': 'headset',
+    'usb': 'usb_device', 'другое': 'other',
+}
+_CODE_TO_CATEGORY = {code.lower(): name for name, code in CATEGORY_CODES.items()}
+
+
+class ImportFormatError(Exception):
+    """Файл нельзя импортировать целиком (формат, заголовки)."""
+
+
+@dataclass
+class ImportResult:
+    total: int = 0
+    imported: int = 0
+    failed: int = 0
+    first_number: Optional[str] = None
+    last_number: Optional[str] = None
+
+
+def _iter_xlsx(path: str) -> Iterator[Sequence]:
+    from openpyxl import load_workbook
+
+    # read_only: строки читаются потоково, без загрузки всего листа в память
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def _iter_csv(path: str) -> Iterator[Sequence]:
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def iter_rows(path: str) -> Iterator[Sequence]:
+    """Потоково читает строки файла (включая заголовок)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.xlsx':
+        return _iter_xlsx(path)
+    if ext == '.csv':
+        return _iter_csv(path)
+    raise ImportFormatError(f"Неподдерживаемый формат {ext or 'без расширения'}: нужен .xlsx или .csv")
+
+
+def _header_map(header: Sequence) -> Dict[str, int]:
+    columns = {}
+    for idx, value in enumerate(header):
+        field = COLUMN_ALIASES.get(str(value or '').strip().lower())
+        if field and field not in columns:
+            columns[field] = idx
+    missing = {'category', 'model'} - columns.keys()
+    if missing:
+        raise ImportFormatError(f"Нет обязательных колонок: {', '.join(sorted(missing))}")
+    return columns
+
+
+def _resolve_category(value: str) -> Optional[str]:
+    key = value.strip().lower()
+    if key in CATEGORY_CODES:
+        return key
+    return CATEGORY_ALIASES.get(key) or _CODE_TO_CATEGORY.get(key)
+
+
+def _cell(row: Sequence, idx: Optional[int]) -> str:
+    if idx is None or idx >= len(row) or row[idx] is None:
+        return ''
+    return str(row[idx]).strip()
+
+
+def import_equipment_file(path: str, report_path: str, workplace_ids: Dict[str, int],
+                          chunk_size: int = CHUNK_SIZE) -> ImportResult:
+    """
+    Импортирует оборудование из файла (синхронно; запускать через asyncio.to_thread).
+
+    Строки валидируются по одной, валидные копятся в пачку до chunk_size и
+    записываются одной транзакцией с блочным резервированием номеров. В report_path
+    построчно пишется CSV-отчёт (строка; статус; инв. номер; ошибка), поэтому
+    память ограничена размером пачки независимо от размера файла.
+    """
+    result = ImportResult()
+    year = datetime.now().year
+    rows = iter_rows(path)
+
+    with open(report_path, 'w', newline='', encoding='utf-8-sig') as report_file:
+        report = csv.writer(report_file, delimiter=';')
+        report.writerow(['row', 'status', 'inv_number', 'error'])
+
+        try:
+            header = next(rows)
+        except StopIteration:
+            raise ImportFormatError("Файл пуст")
+        columns = _header_map(header)
+
+        chunk: List[Tuple[str, str, str, Optional[str], Optional[int]]] = []
+        chunk_rows: List[int] = []
+
+        def flush():
+            try:
+                numbers = import_equipment_rows(chunk, year)
+            except Exception as e:
+                logger.error(f"IMPORT: ошибка записи пачки строк {chunk_rows[0]}-{chunk_rows[-1]}: {e}")
+                result.failed += len(chunk)
+                report.writerows([row_no, 'error', '', f'ошибка записи пачки: {e}'] for row_no in chunk_rows)
+            else:
+                result.imported += len(numbers)
+                result.first_number = result.first_number or numbers[0]
+                result.last_number = numbers[-1]
+                report.writerows([row_no, 'ok', number, ''] for row_no, number in zip(chunk_rows, numbers))
+            chunk.clear()
+            chunk_rows.clear()
+
+        for row_no, row in enumerate(rows, start=2):
+            category_raw = _cell(row, columns['category'])
+            model = _cell(row, columns['model'])
+            serial = _cell(row, columns.get('serial'))
+            workplace = _cell(row, columns.get('workplace'))
+            if not (category_raw or model or serial or workplace):
+                continue  # пустые строки в конце листа
+            result.total += 1
+
+            category = _resolve_category(category_raw)
+            error = None
+            if category is None:
+                error = f"неизвестная категория '{category_raw}'"
+            elif not model:
+                error = "не указана модель"
+            elif max(len(model), len(serial)) > MAX_FIELD_LENGTH:
+                error = f"значение длиннее {MAX_FIELD_LENGTH} символов"
+            elif workplace and workplace not in workplace_ids:
+                error = f"рабочее место '{workplace}' не найдено"
+            if error:
+                result.failed += 1
+                report.writerow([row_no, 'error', '', error])
+                continue
+
+            chunk.append((category, CATEGORY_CODES[category], model, serial or None,
+                          workplace_ids.get(workplace) if workplace else None))
+            chunk_rows.append(row_no)
+            if len(chunk) >= chunk_size:
+                flush()
+
+        if chunk:
+            flush()
+
+    logger.info(f"IMPORT: {path}: строк {result.total}, импортировано {result.imported}, ошибок {result.failed}")
+    return result
@@ -0,0 +1,61 @@
+# Файл: it_ecosystem_bot/utils/faq_media.py
+"""Отправка вложений FAQ: метод Telegram выбирается один раз на материал, а не на каждого получателя."""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional
+
+from aiogram import Bot
+
+# Тип вложения -> (метод Bot, имя параметра с file_id)
+MEDIA_METHODS = {
+    'photo': ('send_photo', 'photo'),
+    'video': ('send_video', 'video'),
+    'document': ('send_document', 'document'),
+}
+
+
+@dataclass(frozen=True)
+class PreparedMedia:
+    method: str
+    field: str
+    file_id: str
+
+
+@lru_cache(maxsize=64)
+def resolve_media_kind(file_type: Optional[str]) -> Optional[str]:
+    """Нормализует file_type (в т.ч. старые значения вроде 'pdf'/'word') к ключу MEDIA_METHODS."""
+    if not file_type:
+        return None
+    file_type = file_type.lower()
+    if file_type in MEDIA_METHODS:
+        return file_type
+    if 'photo' in file_type:
+        return 'photo'
+    if 'video' in file_type:
+        return 'video'
+    if 'document' in file_type or 'pdf' in file_type or 'word' in file_type:
+        return 'document'
+    return None
+
+
+@lru_cache(maxsize=256)
+def prepare_media(file_id: Optional[str], file_type: Optional[str]) -> Optional[PreparedMedia]:
+    """Готовит описание отправки вложения; результат кэшируется по (file_id, file_type)."""
+    kind = resolve_media_kind(file_type)
+    if not file_id or kind is None:
+        return None
+    method, field = MEDIA_METHODS[kind]
+    return PreparedMedia(method, field, file_id)
+
+
+def media_sender(bot: Bot, file_id: Optional[str], file_type: Optional[str],
+                 caption: str) -> Callable[[int], Awaitable]:
+    """
+    Возвращает функцию отправки материала в чат. Без вложения (или с неизвестным
+    типом) отправляется только текст.
+    """
+    media = prepare_media(file_id, file_type)
+    if media is None:
+        return lambda chat_id: bot.send_message(chat_id, caption)
+    send = getattr(bot, media.method)
+    return lambda chat_id: send(chat_id, caption=caption, **{media.field: media.file_id})
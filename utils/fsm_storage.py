@@ -0,0 +1,195 @@
+# Файл: it_ecosystem_bot/utils/fsm_storage.py
+"""
+Хранилище FSM aiogram в основной SQLite-БД (таблица fsm_states).
+
+Чтения обслуживаются LRU-кэшем в памяти, поэтому в обычном диалоге не дороже
+MemoryStorage; в БД идут только промахи (первое обращение пользователя после
+рестарта). Записи копятся в буфере и сбрасываются фоновой задачей одной
+транзакцией раз в flush_interval, а также при close(): плановый рестарт не
+теряет ничего, аварийный — не больше последнего интервала. Состояния, которые
+не менялись дольше ttl, считаются брошенными: они не читаются и периодически
+удаляются из таблицы (purge_expired).
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database import get_fsm_record, purge_fsm_records, save_fsm_records
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 10_000
+STATE_TTL = 24 * 3600.0
+FLUSH_INTERVAL = 0.5
+
+
+class _Record:
+    # expires_at — момент, после которого диалог считается брошенным; у пустой записи — бесконечность.
+    # referenced — признак обращения с прошлого прохода вытеснения (second chance)
+    __slots__ = ('state', 'data', 'expires_at', 'referenced')
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], expires_at: float = math.inf):
+        self.state = state
+        self.data = data
+        self.expires_at = expires_at
+        self.referenced = False
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище: LRU-кэш + отложенная запись в fsm_states. Один экземпляр на Dispatcher."""
+
+    def __init__(self, cache_size: int = CACHE_SIZE, state_ttl: float = STATE_TTL,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.cache_size = cache_size
+        self.state_ttl = state_ttl
+        self.flush_interval = flush_interval
+        # Кэшируется и отсутствие состояния, чтобы фильтры по состоянию не ходили в БД на каждый апдейт.
+        # Вытеснение — LRU с «вторым шансом»: попадание только ставит флаг, без перестановки в OrderedDict,
+        # поэтому чтение стоит один поиск по ключу, как в MemoryStorage
+        self._cache: "OrderedDict[StorageKey, _Record]" = OrderedDict()
+        # Изменённые, но ещё не записанные записи; из кэша их может вытеснить, отсюда — нет
+        self._dirty: Dict[StorageKey, _Record] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self.misses = 0
+        self.flushes = 0
+
+    # --- API BaseStorage ---
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        # Попадание в кэш разобрано здесь же, без вызова _record: это самый частый вызов (фильтры состояний).
+        # Срок жизни записей кэша проверяет purge_expired, а не каждое чтение
+        record = self._cache.get(key)
+        if record is not None:
+            record.referenced = True
+            return record.state
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        record.data = data.copy()
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._cache.get(key)
+        if record is not None:
+            record.referenced = True
+            return record.data.copy()
+        return (await self._record(key)).data.copy()
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        record = await self._record(key)
+        record.data.update(data)
+        self._touch(key, record)
+        return record.data.copy()
+
+    async def close(self) -> None:
+        """Останавливает фоновую запись и сбрасывает буфер в БД (вызывается до close_db)."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    # --- Обслуживание ---
+
+    async def flush(self) -> int:
+        """Записывает накопленные изменения одной транзакцией; возвращает число записей."""
+        if not self._dirty:
+            return 0
+        pending, self._dirty = self._dirty, {}
+        upserts, deletes = [], []
+        # Сериализация до первого await: изменения, сделанные во время записи, попадут в следующий сброс
+        for key, record in pending.items():
+            db_key = self._db_key(key)
+            if record.state is None and not record.data:
+                deletes.append(db_key)
+            else:
+                upserts.append((db_key, record.state, json.dumps(record.data, ensure_ascii=False, default=str),
+                                record.expires_at - self.state_ttl))
+        try:
+            await save_fsm_records(upserts, deletes)
+        except Exception as e:
+            logger.error(f"FSM: не удалось сохранить {len(pending)} состояний, повтор при следующем сбросе: {e}")
+            for key, record in pending.items():
+                self._dirty.setdefault(key, record)
+            return 0
+        self.flushes += 1
+        return len(pending)
+
+    async def purge_expired(self) -> int:
+        """
+        Сбрасывает брошенные состояния (не менявшиеся дольше state_ttl) в кэше и удаляет их из БД.
+        Периодическая задача планировщика: её интервал — точность срабатывания TTL для кэшированных записей.
+        """
+        now = time.time()
+        for record in list(self._cache.values()) + list(self._dirty.values()):
+            if record.expires_at <= now:
+                record.state, record.data, record.expires_at = None, {}, math.inf
+        removed = await purge_fsm_records(now - self.state_ttl)
+        if removed:
+            logger.info(f"FSM: удалено брошенных состояний: {removed}")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {'size': len(self._cache), 'dirty': len(self._dirty), 'misses': self.misses, 'flushes': self.flushes}
+
+    # --- Внутреннее ---
+
+    @staticmethod
+    def _db_key(key: StorageKey) -> str:
+        return (f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:"
+                f"{key.business_connection_id or ''}:{key.destiny}")
+
+    async def _record(self, key: StorageKey) -> _Record:
+        record = self._cache.get(key)
+        if record is not None:
+            record.referenced = True
+        elif key in self._dirty:
+            # Вытеснена из кэша до записи в БД
+            record = self._dirty[key]
+            self._remember(key, record)
+        else:
+            self.misses += 1
+            row = await get_fsm_record(self._db_key(key), time.time() - self.state_ttl)
+            # Пока шло чтение, запись по ключу могла появиться: она новее прочитанной
+            record = self._dirty.get(key) or self._cache.get(key)
+            if record is None:
+                record = _Record(row[0], json.loads(row[1]), row[2] + self.state_ttl) if row else _Record(None, {})
+                self._remember(key, record)
+
+        if record.expires_at <= time.time():
+            # Брошенный диалог: начинается заново; строку в БД удалит purge_expired
+            record.state, record.data, record.expires_at = None, {}, math.inf
+        return record
+
+    def _remember(self, key: StorageKey, record: _Record):
+        self._cache[key] = record
+        while len(self._cache) > self.cache_size:
+            oldest_key, oldest = self._cache.popitem(last=False)
+            if oldest.referenced:
+                # К записи обращались: она получает второй шанс и уходит в конец очереди
+                oldest.referenced = False
+                self._cache[oldest_key] = oldest
+
+    def _touch(self, key: StorageKey, record: _Record):
+        record.expires_at = time.time() + self.state_ttl
+        self._dirty[key] = record
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop(), name="fsm-flush")
+
+    async def _flush_loop(self):
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
@@ -1,9 +1,8 @@
 # Файл: it_ecosystem_bot/utils/inventory_generator.py
-import sqlite3
-import time
 from datetime import datetime
+from typing import List, Tuple
 
-DB_PATH = 'it_ecosystem.db'
+from database import create_equipment_batch, reserve_inventory_numbers
 
 # Категории оборудования и их коды
 CATEGORY_CODES = {
@@ -21,67 +20,57 @@ CATEGORY_CODES = {
 }
 
 
-def generate_inventory_number(category: str) -> str:
+def get_category_code(category: str) -> str:
+    """Возвращает код категории (OT для неизвестных)."""
+    return CATEGORY_CODES.get(category.lower(), 'OT')
+
+
+async def generate_inventory_number(category: str) -> str:
     """
     Генерирует уникальный инвентарный номер вида: [CATEGORY_CODE]-YYYY-NNNN
     Например: LT-2025-0001, DT-2025-0042
-    
+
+    Номер резервируется в таблице inventory_sequences и больше не выдаётся,
+    даже если оборудование так и не будет создано.
+
     Args:
         category: Категория оборудования (например, 'laptop', 'desktop')
-        
+
     Returns:
         Уникальный инвентарный номер
     """
-    
-    # Получаем код категории
-    category_code = CATEGORY_CODES.get(category.lower(), 'OT')
-    
-    # Текущий год
-    year = datetime.now().year
-    
-    # Получаем последний номер для этой категории в текущем году
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    pattern = f"{category_code}-{year}-%"
-    cursor.execute(
-        "SELECT MAX(inv_number) FROM equipment WHERE inv_number LIKE ?",
-        (pattern,)
-    )
-    last_result = cursor.fetchone()[0]
-    conn.close()
-    
-    # Определяем следующий номер последовательности
-    if last_result:
-        # Извлекаем номер из последнего инвентарного номера
-        last_seq = int(last_result.split('-')[-1])
-        next_seq = last_seq + 1
-    else:
-        next_seq = 1
-    
-    # Форматируем номер
-    inventory_number = f"{category_code}-{year}-{next_seq:04d}"
-    
-    return inventory_number
-
-
-def generate_next_inventory_for_batch(category: str, count: int = 1) -> list[str]:
+    numbers = await reserve_inventory_numbers(get_category_code(category), datetime.now().year, 1)
+    return numbers[0]
+
+
+async def generate_next_inventory_for_batch(category: str, count: int = 1) -> list[str]:
     """
     Генерирует несколько инвентарных номеров подряд.
-    
+
+    Весь блок резервируется одним запросом, номера уникальны и идут подряд.
+
     Args:
         category: Категория оборудования
         count: Количество номеров для генерации
-        
+
     Returns:
         Список сгенерированных инвентарных номеров
     """
-    
-    numbers = []
-    for _ in range(count):
-        numbers.append(generate_inventory_number(category))
-    
-    return numbers
+    return await reserve_inventory_numbers(get_category_code(category), datetime.now().year, count)
+
+
+async def register_equipment_batch(category: str, items: List[Tuple[str, str]]) -> list[str]:
+    """
+    Регистрирует партию оборудования одной категории.
+
+    Args:
+        category: Категория оборудования
+        items: Пары (модель, серийный номер)
+
+    Returns:
+        Выданные инвентарные номера в порядке items (пустой список при ошибке)
+    """
+    return await create_equipment_batch(category, get_category_code(category), datetime.now().year, items)
 
 
 def get_available_categories() -> dict:
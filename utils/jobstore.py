@@ -0,0 +1,92 @@
+# Файл: it_ecosystem_bot/utils/jobstore.py
+"""
+Хранилище задач APScheduler в основной БД (таблица scheduler_jobs).
+
+Повторяет устройство SQLAlchemyJobStore из APScheduler, но работает через пул
+чтения и поток-писатель database.py, поэтому не требует SQLAlchemy и отдельного
+файла. Задачи переживают рестарт: при старте планировщик читает из таблицы только
+ближайший срок, а состояние задачи десериализуется, когда она должна сработать.
+"""
+import logging
+import pickle
+from typing import List, Tuple
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from database import (
+    add_scheduler_job, get_next_scheduler_run_time, get_scheduler_jobs, load_scheduler_job,
+    remove_scheduler_jobs, update_scheduler_job,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteJobStore(BaseJobStore):
+    """Задачи хранятся как pickle-состояние Job; функция задачи — ссылкой «модуль:имя»."""
+
+    def __init__(self, pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+
+    def lookup_job(self, job_id):
+        job_state = load_scheduler_job(job_id)
+        return self._reconstitute_job(job_state) if job_state is not None else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs(get_scheduler_jobs(max_run_time=datetime_to_utc_timestamp(now)))
+
+    def get_next_run_time(self):
+        return utc_timestamp_to_datetime(get_next_scheduler_run_time())
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs(get_scheduler_jobs())
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        if not add_scheduler_job(job.id, datetime_to_utc_timestamp(job.next_run_time), self._dump(job)):
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        if not update_scheduler_job(job.id, datetime_to_utc_timestamp(job.next_run_time), self._dump(job)):
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        if not remove_scheduler_jobs([job_id]):
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        remove_scheduler_jobs()
+
+    # --- Внутреннее ---
+
+    def _dump(self, job: Job) -> bytes:
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state: bytes) -> Job:
+        state = pickle.loads(job_state)
+        state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, rows: List[Tuple[str, bytes]]) -> List[Job]:
+        jobs: List[Job] = []
+        failed: List[str] = []
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except Exception as e:
+                # Например, функция задачи переименована: такую задачу уже не запустить
+                logger.error(f"SCHEDULER: не удалось восстановить задачу {job_id}, она удаляется: {e}")
+                failed.append(job_id)
+        if failed:
+            remove_scheduler_jobs(failed)
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}>"
@@ -0,0 +1,148 @@
+# Файл: it_ecosystem_bot/utils/mailings.py
+"""
+Плановые (повторяющиеся) рассылки поверх APScheduler.
+
+Рассылка хранится в scheduled_mailings, задача планировщика — в SQLiteJobStore
+и ссылается на неё только по id. Поэтому задачи переживают рестарт, а текст и
+список получателей читаются из БД в момент срабатывания, а не при старте бота.
+
+Методы хранилища синхронные и пишут через поток-писатель, дожидаясь текущей
+пачки записей. Поэтому вызовы планировщика, которые обращаются к хранилищу,
+делаются в отдельном потоке (asyncio.to_thread), а не в потоке event loop.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from database import (
+    cancel_scheduled_mailing, create_scheduled_mailing, get_active_scheduled_mailings, get_scheduled_mailing,
+    mark_scheduled_mailing_run,
+)
+from utils.broadcast import Broadcaster
+
+logger = logging.getLogger(__name__)
+
+JOBSTORE_ALIAS = 'mailings'
+JOB_ID_PREFIX = 'mailing_'
+
+# Расписание -> (подпись для админа, параметры cron-триггера)
+SCHEDULES: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    'weekdays_19': ("Будни (Пн-Пт), 19:00 UZT",
+                    {'day_of_week': 'mon-fri', 'hour': 19, 'minute': 0, 'timezone': 'Asia/Tashkent'}),
+}
+# Рассылка, пропущенная из-за простоя бота, отправляется, если опоздание не больше часа
+MISFIRE_GRACE_SECONDS = 3600
+
+_broadcaster: Optional[Broadcaster] = None
+
+
+async def run_scheduled_mailing(mailing_id: int):
+    """
+    Функция задачи планировщика. Задача сохраняется в БД ссылкой на эту функцию,
+    поэтому она модульная и получает только id рассылки.
+    """
+    mailing = await get_scheduled_mailing(mailing_id)
+    if mailing is None or mailing['status'] != 'active':
+        logger.warning(f"SCHEDULER: плановая рассылка #{mailing_id} не активна, запуск пропущен.")
+        return
+    if _broadcaster is None:
+        logger.error(f"SCHEDULER: рассыльщик не инициализирован, плановая рассылка #{mailing_id} не запущена.")
+        return
+    broadcast_id = await _broadcaster.start('text', mailing['text'], created_by=mailing['created_by'])
+    await mark_scheduled_mailing_run(mailing_id, broadcast_id)
+    logger.info(f"SCHEDULER: по плановой рассылке #{mailing_id} запущена рассылка #{broadcast_id}.")
+
+
+class MailingScheduler:
+    """Создание, отмена и восстановление плановых рассылок. Один экземпляр на бота."""
+
+    def __init__(self, scheduler: AsyncIOScheduler, broadcaster: Broadcaster):
+        global _broadcaster
+        _broadcaster = broadcaster
+        self.scheduler = scheduler
+
+    async def start(self):
+        """
+        Сверяет задачи в хранилище с активными рассылками: недостающие задачи ставятся,
+        задачи отменённых рассылок удаляются. Получатели при этом не запрашиваются.
+        """
+        active = {mailing['id']: mailing for mailing in await get_active_scheduled_mailings()}
+        jobs = await self._jobs()
+
+        for job_id in jobs:
+            mailing_id = self._mailing_id(job_id)
+            if mailing_id not in active:
+                await asyncio.to_thread(self._remove_job, job_id)
+                logger.info(f"SCHEDULER: удалена задача {job_id} без активной рассылки.")
+        restored = 0
+        for mailing_id, mailing in active.items():
+            if self._job_id(mailing_id) not in jobs:
+                await asyncio.to_thread(self._add_job, mailing_id, mailing['schedule'])
+                restored += 1
+        logger.info(f"SCHEDULER: плановых рассылок: {len(active)}, задач восстановлено: {restored}.")
+
+    async def schedule(self, text: str, schedule: str, created_by: Optional[int] = None) -> Tuple[int, bool]:
+        """Планирует рассылку; повторная с тем же текстом и расписанием не создаётся. Возвращает (id, создана)."""
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Неизвестное расписание: {schedule}")
+        mailing_id, created = await create_scheduled_mailing(text, schedule, created_by)
+        # Задача ставится и для найденного дубликата: если её не было (сбой между записью и add_job), она появится
+        await asyncio.to_thread(self._add_job, mailing_id, schedule)
+        if created:
+            logger.info(f"SCHEDULER: плановая рассылка #{mailing_id} ({schedule}) создана админом {created_by}.")
+        return mailing_id, created
+
+    async def cancel(self, mailing_id: int) -> bool:
+        cancelled = await cancel_scheduled_mailing(mailing_id)
+        await asyncio.to_thread(self._remove_job, self._job_id(mailing_id))
+        if cancelled:
+            logger.info(f"SCHEDULER: плановая рассылка #{mailing_id} отменена.")
+        return cancelled
+
+    async def list(self) -> List[Dict[str, Any]]:
+        """Активные рассылки с подписью расписания и временем следующего запуска."""
+        mailings = await get_active_scheduled_mailings()
+        jobs = await self._jobs()
+        for mailing in mailings:
+            job = jobs.get(self._job_id(mailing['id']))
+            mailing['next_run_time'] = job.next_run_time if job else None
+            mailing['schedule_title'] = SCHEDULES.get(mailing['schedule'], (mailing['schedule'],))[0]
+        return mailings
+
+    # --- Внутреннее ---
+
+    async def _jobs(self) -> Dict[str, Job]:
+        jobs = await asyncio.to_thread(self.scheduler.get_jobs, jobstore=JOBSTORE_ALIAS)
+        return {job.id: job for job in jobs}
+
+    @staticmethod
+    def _job_id(mailing_id: int) -> str:
+        return f"{JOB_ID_PREFIX}{mailing_id}"
+
+    @staticmethod
+    def _mailing_id(job_id: str) -> Optional[int]:
+        suffix = job_id[len(JOB_ID_PREFIX):] if job_id.startswith(JOB_ID_PREFIX) else ''
+        return int(suffix) if suffix.isdigit() else None
+
+    def _add_job(self, mailing_id: int, schedule: str):
+        self.scheduler.add_job(
+            run_scheduled_mailing,
+            trigger='cron',
+            args=[mailing_id],
+            id=self._job_id(mailing_id),
+            jobstore=JOBSTORE_ALIAS,
+            replace_existing=True,
+            coalesce=True,
+            misfire_grace_time=MISFIRE_GRACE_SECONDS,
+            **SCHEDULES[schedule][1],
+        )
+
+    def _remove_job(self, job_id: str):
+        try:
+            self.scheduler.remove_job(job_id, jobstore=JOBSTORE_ALIAS)
+        except JobLookupError:
+            pass
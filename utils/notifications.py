@@ -0,0 +1,246 @@
+# Файл: it_ecosystem_bot/utils/notifications.py
+"""
+Доставка уведомлений по заявкам из outbox (таблица notification_outbox).
+
+Уведомление записывается в той же транзакции, что и изменение заявки
+(save_new_ticket, close_ticket_for_rating, finalize_ticket_rating,
+fire_sla_events), поэтому
+обработчик отвечает пользователю сразу, а отправка не теряется ни при ошибке
+Telegram, ни при рестарте. Фоновый воркер забирает наступившие уведомления
+с арендой (lease), отправляет их с ограниченной параллельностью в общих с
+рассылками лимитах, повторяет временные ошибки с растущей паузой и переводит
+в dead-letter постоянные (бот заблокирован, чат не найден) и исчерпавшие
+попытки. Гарантия — «не менее одного раза»: уведомление, отправленное перед
+самым падением процесса, может прийти повторно после истечения аренды.
+
+В таблице хранится вид уведомления и данные, а текст и клавиатура строятся при
+отправке (RENDERERS), так что тексты можно менять без миграции очереди.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from database import claim_notifications, get_next_notification_due, mark_notification, purge_sent_notifications
+from keyboards.common import get_rating_keyboard
+from utils.broadcast import GLOBAL_RATE, PER_CHAT_INTERVAL, ChatRateLimiter, TokenBucket
+from utils.ticket_cards import TicketCardEditor, render_card
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = 8
+MAX_ATTEMPTS = 8
+# Пауза перед повтором: 2, 4, 8 ... секунд, но не больше 10 минут
+RETRY_BASE = 2.0
+RETRY_MAX = 600.0
+# Сколько уведомление «принадлежит» воркеру после выборки; должно с запасом покрывать отправку
+LEASE_SECONDS = 120.0
+# Без вызовов wake() очередь всё равно проверяется не реже этого (уведомления с отложенным повтором)
+IDLE_INTERVAL = 30.0
+LATENCY_WINDOW = 1000
+# Доставленные уведомления хранятся для статистики задержек, затем удаляются
+SENT_RETENTION_DAYS = 7
+
+Rendered = Tuple[str, Optional[InlineKeyboardMarkup]]
+
+
+def _ticket_created(payload: Dict[str, Any]) -> Rendered:
+    # Карточка заявки; дальше её обновляет TicketCardEditor
+    return render_card(payload)
+
+
+def _rating_request(payload: Dict[str, Any]) -> Rendered:
+    text = (f"✅ Ваша заявка <b>{payload['number']}</b> выполнена. "
+            f"Пожалуйста, оцените работу администратора:")
+    return text, get_rating_keyboard(payload['ticket_id'])
+
+
+def _rating_received(payload: Dict[str, Any]) -> Rendered:
+    text = (f"⭐ Тебе поставили {payload['rating']}/5 за заявку {payload['number']}.\n"
+            f"Средний рейтинг: {payload['avg_rating']}/5.")
+    return text, None
+
+
+SLA_DEADLINE_TITLES = {
+    'response': "нет реакции",
+    'resolution': "не решена в срок",
+}
+
+
+def _sla_escalation(payload: Dict[str, Any]) -> Rendered:
+    text = (f"⏰ <b>SLA: {SLA_DEADLINE_TITLES[payload['deadline']]}</b>\n"
+            f"Заявка <code>{payload['number']}</code> ({payload['priority']}): {payload['title']}\n"
+            f"Статус: {payload['status']}")
+    return text, None
+
+
+def _sla_digest(payload: Dict[str, Any]) -> Rendered:
+    # Сводка вместо потока сообщений, если за одно срабатывание нарушено много сроков (например, после простоя)
+    lines = [f"• <code>{item['number']}</code> ({item['priority']}) — {SLA_DEADLINE_TITLES[item['deadline']]}"
+             for item in payload['items']]
+    if payload['count'] > len(lines):
+        lines.append(f"... и ещё {payload['count'] - len(lines)}")
+    return f"⏰ <b>Нарушены сроки SLA: {payload['count']}</b>\n\n" + "\n".join(lines), None
+
+
+RENDERERS: Dict[str, Callable[[Dict[str, Any]], Rendered]] = {
+    'ticket_created': _ticket_created,
+    'rating_request': _rating_request,
+    'rating_received': _rating_received,
+    'sla_escalation': _sla_escalation,
+    'sla_digest': _sla_digest,
+}
+# Уведомления-карточки: их сообщения попадают в индекс ticket_notifications
+CARD_KINDS = {'ticket_created'}
+
+
+class NotificationOutbox:
+    """Фоновый воркер outbox. Один экземпляр на бота; обработчики вызывают wake() после записи."""
+
+    def __init__(self, bot: Bot, bucket: Optional[TokenBucket] = None,
+                 chat_limiter: Optional[ChatRateLimiter] = None, concurrency: int = CONCURRENCY,
+                 max_attempts: int = MAX_ATTEMPTS, lease: float = LEASE_SECONDS,
+                 cards: Optional[TicketCardEditor] = None):
+        self.bot = bot
+        self.cards = cards
+        self.bucket = bucket or TokenBucket(GLOBAL_RATE)
+        self.chat_limiter = chat_limiter or ChatRateLimiter(PER_CHAT_INTERVAL)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._wakeup = asyncio.Event()
+        self._slot_freed = asyncio.Event()
+        self._sending: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="notification-outbox")
+
+    def wake(self):
+        """Новые уведомления записаны: проверить очередь сейчас, не дожидаясь IDLE_INTERVAL."""
+        self._wakeup.set()
+
+    async def stop(self):
+        """
+        Останавливает воркер. Прерванные отправки остаются в очереди и будут повторены
+        после истечения аренды (при следующем запуске).
+        """
+        tasks = [task for task in [self._task, *self._sending] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def purge_sent(self):
+        """Периодическая очистка доставленных уведомлений (задача планировщика)."""
+        removed = await purge_sent_notifications(time.time() - SENT_RETENTION_DAYS * 86400)
+        if removed:
+            logger.info(f"OUTBOX: удалено доставленных уведомлений: {removed}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики с момента запуска и задержки доставки (с момента записи в outbox) по последним отправкам."""
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else None
+
+        return {'sent': self.sent, 'retried': self.retried, 'dead': self.dead, 'sending': len(self._sending),
+                'latency_p50': percentile(0.5), 'latency_p95': percentile(0.95)}
+
+    # --- Внутреннее ---
+
+    async def _run(self):
+        while True:
+            try:
+                await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"OUTBOX: ошибка выборки уведомлений: {e}")
+                await asyncio.sleep(1.0)
+
+    async def _poll(self):
+        if len(self._sending) >= self.concurrency:
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+            return
+
+        # Сбрасываем до чтения: wake(), пришедший во время выборки, не потеряется
+        self._wakeup.clear()
+        now = time.time()
+        due = await get_next_notification_due()
+        if due is None or due > now:
+            timeout = IDLE_INTERVAL if due is None else min(due - now, IDLE_INTERVAL)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        for notification in await claim_notifications(now, self.concurrency - len(self._sending), self.lease):
+            task = asyncio.create_task(self._deliver(notification))
+            self._sending.add(task)
+            task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Task):
+        self._sending.discard(task)
+        self._slot_freed.set()
+
+    async def _deliver(self, notification: Dict[str, Any]):
+        notification_id, chat_id = notification['id'], notification['chat_id']
+        attempts = notification['attempts'] + 1
+        renderer = RENDERERS.get(notification['kind'])
+        if renderer is None:
+            await self._dead(notification_id, attempts, f"неизвестный вид уведомления {notification['kind']}")
+            return
+
+        text, reply_markup = renderer(notification['payload'])
+        await self.chat_limiter.wait(chat_id)
+        await self.bucket.acquire()
+        try:
+            message = await self.bot.send_message(chat_id, text, reply_markup=reply_markup)
+        except TelegramRetryAfter as e:
+            # Флуд-контроль не считается неудачной попыткой: пауза для всех отправок бота и повтор
+            self.bucket.pause(e.retry_after)
+            await self._retry(notification_id, attempts - 1, e.retry_after, str(e))
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Бот заблокирован, чат не найден, некорректное сообщение — повтор не поможет
+            await self._dead(notification_id, attempts, str(e))
+        except Exception as e:
+            if attempts >= self.max_attempts:
+                await self._dead(notification_id, attempts, str(e))
+            else:
+                await self._retry(notification_id, attempts, min(RETRY_BASE ** attempts, RETRY_MAX), str(e))
+        else:
+            sent_at = time.time()
+            payload = notification['payload']
+            card = None
+            if notification['kind'] in CARD_KINDS and getattr(message, 'message_id', None):
+                card = (payload['ticket_id'], chat_id, message.message_id)
+            version = await mark_notification(notification_id, 'sent', attempts, sent_at=sent_at, ticket_card=card)
+            self.sent += 1
+            self._latencies.append(sent_at - notification['created_at'])
+            # Заявку изменили, пока уведомление ждало в очереди: только что отправленная карточка устарела
+            if card and self.cards and version is not None and version != payload.get('version', 0):
+                self.cards.ticket_changed(payload['ticket_id'])
+
+    async def _retry(self, notification_id: int, attempts: int, delay: float, error: str):
+        self.retried += 1
+        await mark_notification(notification_id, 'pending', attempts, next_attempt_at=time.time() + delay, error=error)
+        # Воркер мог уснуть до более позднего срока: пусть пересчитает ближайший
+        self.wake()
+
+    async def _dead(self, notification_id: int, attempts: int, error: str):
+        self.dead += 1
+        logger.warning(f"OUTBOX: уведомление #{notification_id} не доставлено ({attempts} попыток): {error}")
+        await mark_notification(notification_id, 'dead', attempts, error=error)
@@ -0,0 +1,116 @@
+# Файл: it_ecosystem_bot/utils/routing.py
+"""
+Маршрутизация уведомлений о новых заявках по этажам и категориям.
+
+Администратор отвечает за этажи и/или категории (таблица admin_routes).
+Уведомление о новой заявке получают ответственные за её этаж или категорию;
+если таких нет — все администраторы, как раньше, так что заявка без
+ответственных не теряется. Таблица целиком держится в памяти как индекс
+(вид, значение) -> администраторы: поиск при создании заявки не обращается
+к БД. Индекс загружается при старте и меняется вместе с таблицей командами
+/route_add, /route_del (запись сначала в БД, потом в индекс).
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from database import add_admin_route, get_admin_routes, remove_admin_routes
+
+logger = logging.getLogger(__name__)
+
+ROUTE_KINDS = ('floor', 'category')
+
+Route = Tuple[str, str]  # (вид, значение)
+
+
+def normalize_kind(kind: str) -> str:
+    kind = kind.strip().lower()
+    if kind not in ROUTE_KINDS:
+        raise ValueError(f"вид маршрута — {' или '.join(ROUTE_KINDS)}")
+    return kind
+
+
+def normalize_route(kind: str, value) -> Route:
+    """Приводит маршрут к виду, в котором он хранится; ValueError — если вид или значение некорректны."""
+    kind = normalize_kind(kind)
+    value = str(value).strip()
+    if kind == 'floor':
+        try:
+            value = str(int(value))
+        except ValueError:
+            raise ValueError("этаж — целое число") from None
+    if not value:
+        raise ValueError("не указано значение")
+    return kind, value
+
+
+def _key(kind: str, value: str) -> Route:
+    # Категории сравниваются без учёта регистра: «сеть/интернет» совпадает с «Сеть/Интернет»
+    return kind, value.casefold()
+
+
+class AdminRouting:
+    """Индекс маршрутов в памяти. Один экземпляр на бота."""
+
+    def __init__(self):
+        self._index: Dict[Route, Set[int]] = {}
+        self._routes: Dict[int, Set[Route]] = {}
+
+    async def start(self) -> int:
+        routes = await get_admin_routes()
+        self.load(routes)
+        logger.info(f"ROUTING: маршрутов {len(routes)}, администраторов с маршрутами {len(self._routes)}")
+        return len(routes)
+
+    def load(self, routes: Iterable[Tuple[int, str, str]]):
+        self._index, self._routes = {}, {}
+        for admin_id, kind, value in routes:
+            self._put(admin_id, (kind, value))
+
+    def recipients(self, floor: Optional[int], category: Optional[str]) -> Set[int]:
+        """Ответственные за этаж или категорию заявки; пустое множество — уведомлять всех."""
+        admin_ids: Set[int] = set()
+        if floor is not None:
+            admin_ids |= self._index.get(_key('floor', str(floor)), set())
+        if category:
+            admin_ids |= self._index.get(_key('category', category.strip()), set())
+        return admin_ids
+
+    def routes(self) -> Dict[int, List[Route]]:
+        return {admin_id: sorted(routes) for admin_id, routes in self._routes.items()}
+
+    async def add(self, admin_id: int, kind: str, value) -> bool:
+        route = normalize_route(kind, value)
+        added = await add_admin_route(admin_id, *route)
+        self._put(admin_id, route)
+        return added
+
+    async def remove(self, admin_id: int, kind: Optional[str] = None, value=None) -> int:
+        """Снимает один маршрут, все маршруты вида или (без kind) все маршруты администратора."""
+        if kind is not None and value is not None:
+            kind, value = normalize_route(kind, value)
+        elif kind is not None:
+            kind = normalize_kind(kind)
+        removed = await remove_admin_routes(admin_id, kind, value)
+        for route in list(self._routes.get(admin_id, ())):
+            if (kind is None or route[0] == kind) and (value is None or route[1] == value):
+                self._drop(admin_id, route)
+        return removed
+
+    # --- Внутреннее ---
+
+    def _put(self, admin_id: int, route: Route):
+        self._routes.setdefault(admin_id, set()).add(route)
+        self._index.setdefault(_key(*route), set()).add(admin_id)
+
+    def _drop(self, admin_id: int, route: Route):
+        routes = self._routes.get(admin_id, set())
+        routes.discard(route)
+        if not routes:
+            self._routes.pop(admin_id, None)
+        key = _key(*route)
+        if any(_key(*other) == key for other in routes):
+            return  # тот же маршрут в другом регистре
+        admins = self._index.get(key, set())
+        admins.discard(admin_id)
+        if not admins:
+            self._index.pop(key, None)
@@ -0,0 +1,183 @@
+# Файл: it_ecosystem_bot/utils/sla.py
+"""
+SLA-таймеры заявок: сроки реакции и решения по приоритету.
+
+Сроки всех незакрытых заявок держатся в памяти в двоичной куче. В APScheduler
+стоит одна date-задача — на ближайший срок, — поэтому таблица tickets не
+опрашивается, а постановка и снятие таймера стоят O(log n). При старте куча
+строится заново из БД. Сработавшие эскалации записываются в sla_events, так что
+после рестарта они не повторяются, а уведомления администраторам в той же
+транзакции ставятся в outbox (utils/notifications.py) и уходят в общих с
+рассылками лимитах, с повторами — срабатывание таймера не ждёт отправки.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from database import fire_sla_events, get_sla_open_tickets
+from utils.notifications import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+# Приоритет -> (срок реакции, срок решения), секунды
+SLA_POLICIES: Dict[str, Tuple[int, int]] = {
+    'high': (30 * 60, 4 * 3600),
+    'medium': (2 * 3600, 24 * 3600),
+    'low': (8 * 3600, 3 * 86400),
+}
+DEFAULT_PRIORITY = 'medium'
+# Если в одной транзакции набралось больше эскалаций (например, после долгого простоя), шлём сводку
+DIGEST_THRESHOLD = 5
+DIGEST_MAX_LINES = 20
+# Сколько сроков фиксируется в БД одной транзакцией
+FIRE_CHUNK = 500
+# Через сколько секунд повторить сроки, которые не удалось зафиксировать в БД
+FIRE_RETRY_DELAY = 30.0
+
+Deadline = Tuple[float, int, str]  # (срок, id заявки, вид срока)
+
+
+class SlaEngine:
+    """Куча сроков + одна задача планировщика на ближайший из них. Один экземпляр на бота."""
+
+    JOB_ID = 'sla_next_deadline'
+
+    def __init__(self, scheduler: AsyncIOScheduler, outbox: Optional[NotificationOutbox] = None,
+                 policies: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.scheduler = scheduler
+        self.outbox = outbox
+        self.policies = policies or SLA_POLICIES
+        self._heap: List[Deadline] = []
+        # Актуальный срок по (заявка, вид); записи кучи, не совпадающие с ним, считаются снятыми
+        self._deadlines: Dict[Tuple[int, str], float] = {}
+        self._scheduled_at: Optional[float] = None
+        self._fire_lock = asyncio.Lock()
+
+    # --- Публичный API ---
+
+    async def start(self) -> int:
+        """Строит кучу по незакрытым заявкам из БД и ставит задачу на ближайший срок."""
+        for ticket in await get_sla_open_tickets():
+            response, resolution = self._policy(ticket['priority'])
+            if ticket['status'] == 'open' and 'response' not in ticket['fired']:
+                self._deadlines[(ticket['id'], 'response')] = ticket['created_ts'] + response
+            if 'resolution' not in ticket['fired']:
+                self._deadlines[(ticket['id'], 'resolution')] = ticket['created_ts'] + resolution
+        self._heap = [(deadline, ticket_id, kind) for (ticket_id, kind), deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+        self._reschedule()
+        logger.info(f"SLA: загружено таймеров: {len(self._deadlines)}")
+        return len(self._deadlines)
+
+    def track(self, ticket_id: int, priority: Optional[str], created_ts: Optional[float] = None):
+        """Ставит сроки реакции и решения для новой заявки."""
+        created_ts = time.time() if created_ts is None else created_ts
+        response, resolution = self._policy(priority)
+        self._push(ticket_id, 'response', created_ts + response)
+        self._push(ticket_id, 'resolution', created_ts + resolution)
+        self._reschedule()
+
+    def ticket_assigned(self, ticket_id: int):
+        """Заявку взяли в работу: срок реакции снимается."""
+        self._deadlines.pop((ticket_id, 'response'), None)
+        self._after_removal()
+
+    def ticket_resolved(self, ticket_id: int):
+        """Заявка решена: снимаются оба срока."""
+        self._deadlines.pop((ticket_id, 'response'), None)
+        self._deadlines.pop((ticket_id, 'resolution'), None)
+        self._after_removal()
+
+    @property
+    def pending(self) -> int:
+        return len(self._deadlines)
+
+    # --- Внутреннее ---
+
+    def _policy(self, priority: Optional[str]) -> Tuple[int, int]:
+        return self.policies.get(priority or DEFAULT_PRIORITY, self.policies[DEFAULT_PRIORITY])
+
+    def _push(self, ticket_id: int, kind: str, deadline: float):
+        self._deadlines[(ticket_id, kind)] = deadline
+        heapq.heappush(self._heap, (deadline, ticket_id, kind))
+
+    def _is_live(self, entry: Deadline) -> bool:
+        deadline, ticket_id, kind = entry
+        return self._deadlines.get((ticket_id, kind)) == deadline
+
+    def _after_removal(self):
+        # Снятые записи удаляются из кучи лениво; если их стало больше половины, куча пересобирается
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._heap = [entry for entry in self._heap if self._is_live(entry)]
+            heapq.heapify(self._heap)
+        self._reschedule()
+
+    def _reschedule(self):
+        """Ставит (или переносит) единственную задачу планировщика на ближайший живой срок."""
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+        if not self._heap:
+            if self._scheduled_at is not None and self.scheduler.get_job(self.JOB_ID):
+                self.scheduler.remove_job(self.JOB_ID)
+            self._scheduled_at = None
+            return
+
+        deadline = self._heap[0][0]
+        if deadline == self._scheduled_at:
+            return
+        self.scheduler.add_job(
+            self._fire_due,
+            trigger='date',
+            run_date=datetime.fromtimestamp(deadline, tz=timezone.utc),
+            id=self.JOB_ID,
+            replace_existing=True,
+            # Срок может наступить, пока предыдущий запуск ещё не завершился: второй экземпляр
+            # дождётся его на _fire_lock, а не будет пропущен планировщиком
+            max_instances=2,
+            misfire_grace_time=None,  # просроченный срок (например, после простоя) всё равно обрабатывается
+        )
+        self._scheduled_at = deadline
+
+    async def _fire_due(self):
+        async with self._fire_lock:
+            now = time.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if self._is_live(entry):
+                    _, ticket_id, kind = entry
+                    del self._deadlines[(ticket_id, kind)]
+                    due.append((ticket_id, kind))
+
+            escalations, done = 0, 0
+            try:
+                while done < len(due):
+                    chunk = due[done:done + FIRE_CHUNK]
+                    # Повторная проверка по БД: заявку могли взять или закрыть, а эскалацию — уже отправить
+                    escalations += len(await fire_sla_events(chunk, notify_admins=True,
+                                                             digest_threshold=DIGEST_THRESHOLD,
+                                                             digest_lines=DIGEST_MAX_LINES))
+                    done += len(chunk)
+            except Exception as e:
+                # Незафиксированные сроки возвращаются в кучу, иначе их эскалации потеряются до рестарта.
+                # Срок, поставленный заново, пока шла запись, не трогаем
+                retry_at = time.time() + FIRE_RETRY_DELAY
+                for ticket_id, kind in due[done:]:
+                    if (ticket_id, kind) not in self._deadlines:
+                        self._push(ticket_id, kind, retry_at)
+                logger.error(f"SLA: не удалось зафиксировать эскалации ({len(due) - done}), "
+                             f"повтор через {FIRE_RETRY_DELAY:.0f} c: {e}")
+            finally:
+                if escalations:
+                    logger.warning(f"SLA: эскалаций: {escalations}")
+                    if self.outbox is not None:
+                        self.outbox.wake()
+                # Задача date-типа после запуска удаляется, поэтому ставим следующую безусловно
+                self._scheduled_at = None
+                self._reschedule()
@@ -0,0 +1,169 @@
+# Файл: it_ecosystem_bot/utils/ticket_cards.py
+"""
+Карточки заявок у администраторов: уведомление о новой заявке, которое outbox
+отправил каждому администратору, обновляется на месте при смене исполнителя
+или статуса.
+
+Какое сообщение о какой заявке получил каждый администратор, хранится в индексе
+ticket_notifications (запись — при доставке уведомления). Обработчики после
+изменения заявки вызывают ticket_changed(); редактор копит изменения в окне
+interval и затем правит карточки пачкой: по одной правке на сообщение, сколько
+бы раз заявку ни меняли за окно, текст строится по текущему состоянию заявки.
+Правки идут в общих с рассылками лимитах Telegram. Карточки, которые больше
+нельзя изменить (сообщение удалено, бот заблокирован), убираются из индекса.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from database import forget_ticket_notifications, get_ticket_card, purge_ticket_notifications
+from keyboards.common import get_admin_ticket_actions
+from utils.broadcast import GLOBAL_RATE, PER_CHAT_INTERVAL, ChatRateLimiter, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Окно накопления изменений перед пачкой правок
+FLUSH_INTERVAL = 1.0
+CONCURRENCY = 8
+# Сколько после отправки карточка обновляется; более старые убираются из индекса
+CARD_RETENTION_DAYS = 30
+# Сколько при остановке ждать правок, накопленных в текущем окне
+STOP_TIMEOUT = 5.0
+
+STATUS_LABELS = {
+    'open': '🟢 Открыта',
+    'in_progress': '🟡 В работе',
+    'on_hold': '🟠 На удержании',
+    'await_rating': '⭐️ Ожидает оценку',
+    'closed': '✅ Закрыта',
+}
+
+Rendered = Tuple[str, Optional[InlineKeyboardMarkup]]
+
+
+def render_card(card: Dict[str, Any]) -> Rendered:
+    """
+    Текст и кнопки карточки. card — данные уведомления ticket_created (при отправке)
+    или get_ticket_card (при обновлении); у новой заявки строки статуса нет.
+    """
+    text = (
+        f"🆕 <b>Новая заявка</b>\n"
+        f"Номер: <b>{card['number']}</b>\n"
+        f"Автор: {card.get('author') or 'Неизвестно'}\n"
+        f"Этаж/место: {card.get('floor')} / {card.get('workplace')}\n"
+        f"Категория: {card.get('category')}\n"
+        f"Заголовок: {card.get('title')}"
+    )
+    status = card.get('status', 'open')
+    if status != 'open' or card.get('admin_id'):
+        line = STATUS_LABELS.get(status, status)
+        admin_id = card.get('admin_id')
+        if admin_id:
+            # Автоназначенная заявка открыта, пока исполнитель её не взял
+            line += ", назначена" if status == 'open' else " —"
+            line += f" {card.get('admin_name') or f'Admin {admin_id}'}"
+        text += f"\n\n<b>Статус:</b> {line}"
+    return text, get_admin_ticket_actions(card['ticket_id'], status)
+
+
+class TicketCardEditor:
+    """Фоновый редактор карточек. Один экземпляр на бота; обработчики вызывают ticket_changed()."""
+
+    def __init__(self, bot: Bot, bucket: Optional[TokenBucket] = None,
+                 chat_limiter: Optional[ChatRateLimiter] = None, interval: float = FLUSH_INTERVAL,
+                 concurrency: int = CONCURRENCY):
+        self.bot = bot
+        self.bucket = bucket or TokenBucket(GLOBAL_RATE)
+        self.chat_limiter = chat_limiter or ChatRateLimiter(PER_CHAT_INTERVAL)
+        self.interval = interval
+        self.concurrency = concurrency
+        self._pending: Set[int] = set()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.edited = 0
+        self.failed = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="ticket-card-editor")
+
+    def ticket_changed(self, ticket_id: int):
+        """Заявка изменилась: её карточки будут обновлены в ближайшей пачке."""
+        self._pending.add(ticket_id)
+        self._changed.set()
+
+    async def stop(self):
+        """Останавливает редактор, отправив правки, накопленные в текущем окне (не дольше STOP_TIMEOUT)."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending:
+            try:
+                await asyncio.wait_for(self._flush(), STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("CARDS: не все карточки обновлены до остановки.")
+
+    async def purge_old(self):
+        """Периодическая очистка индекса карточек (задача планировщика)."""
+        removed = await purge_ticket_notifications(time.time() - CARD_RETENTION_DAYS * 86400)
+        if removed:
+            logger.info(f"CARDS: из индекса удалено старых карточек: {removed}")
+
+    # --- Внутреннее ---
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            # Окно накопления: изменения за interval уходят одной пачкой
+            await asyncio.sleep(self.interval)
+            self._changed.clear()
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"CARDS: ошибка обновления карточек: {e}")
+
+    async def _flush(self):
+        tickets, self._pending = self._pending, set()
+        self.batches += 1
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._update_ticket(ticket_id, semaphore) for ticket_id in tickets))
+
+    async def _update_ticket(self, ticket_id: int, semaphore: asyncio.Semaphore):
+        card = await get_ticket_card(ticket_id)
+        if card is None or not card['messages']:
+            return
+        text, reply_markup = render_card(card)
+        gone: List[int] = []
+
+        async def edit(chat_id: int, message_id: int):
+            await self.chat_limiter.wait(chat_id)
+            async with semaphore:
+                await self.bucket.acquire()
+                try:
+                    await self.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id,
+                                                     reply_markup=reply_markup)
+                    self.edited += 1
+                except TelegramRetryAfter as e:
+                    # Пауза для всех отправок бота; заявка попадёт в следующую пачку
+                    self.bucket.pause(e.retry_after)
+                    self.ticket_changed(ticket_id)
+                except TelegramBadRequest as e:
+                    # Карточка уже в этом виде (её обновили раньше) — не ошибка
+                    if 'not modified' not in e.message:
+                        gone.append(chat_id)
+                except TelegramForbiddenError:
+                    gone.append(chat_id)
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning(f"CARDS: не удалось обновить карточку заявки {ticket_id} в чате {chat_id}: {e}")
+
+        await asyncio.gather(*(edit(chat_id, message_id) for chat_id, message_id in card['messages']))
+        if gone:
+            await forget_ticket_notifications(ticket_id, gone)
@@ -0,0 +1,193 @@
+# Файл: it_ecosystem_bot/utils/webhook.py
+"""
+Режим вебхука: aiohttp-сервер принимает обновления от Telegram и передаёт их
+ограниченному пулу обработчиков.
+
+Ответ Telegram отдаётся сразу после постановки обновления в очередь, поэтому
+следующее обновление приходит, не дожидаясь обработчика. Пул состоит из
+фиксированного числа воркеров над общей очередью: свободный воркер берёт
+любое обновление, а обновления одного пользователя обрабатываются строго по
+порядку (шаги FSM-диалога не обгоняют друг друга). Когда принятых, но не
+обработанных обновлений становится queue_size, приём замедляется
+(backpressure), а не плодит задачи без ограничения.
+
+Остановка: сервер перестаёт принимать запросы, пул дорабатывает всё, что уже
+принято, затем вызывается shutdown диспетчера. Очередь писателя БД и буфер FSM
+сбрасываются дальше в app.py (storage.close, close_db).
+"""
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+from config import WebhookConfig
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+# Сколько ждать доработки принятых обновлений при остановке
+DRAIN_TIMEOUT = 30.0
+
+
+class UpdatePool:
+    """
+    Фиксированный пул воркеров над общей очередью. Обновление пользователя, которого
+    уже обрабатывает другой воркер, откладывается за ним и обрабатывается им же следом.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, workers: int, queue_size: int,
+                 workflow_data: Optional[Dict[str, Any]] = None):
+        self.dp = dp
+        self.bot = bot
+        self.workflow_data = workflow_data or {}
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._capacity = asyncio.Semaphore(queue_size)  # принятые, но ещё не обработанные обновления
+        self._active: Dict[int, Deque[Update]] = {}  # пользователь/чат -> отложенные за воркером обновления
+        self._tasks: List[asyncio.Task] = []
+        self.processed = 0
+        self.failed = 0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker(), name=f"webhook-worker-{i}") for i in range(self.workers)]
+
+    async def submit(self, update: Update):
+        """Ставит обновление в очередь; когда принято queue_size необработанных, ждёт свободного места."""
+        await self._capacity.acquire()
+        self._queue.put_nowait(update)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() + sum(len(pending) for pending in self._active.values())
+
+    async def close(self, timeout: float = DRAIN_TIMEOUT):
+        """Дожидается обработки всех принятых обновлений (не дольше timeout) и останавливает воркеры."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"WEBHOOK: не дождались обработки {self.queued} обновлений за {timeout:.0f} c.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    @staticmethod
+    def _shard(update: Update) -> int:
+        context = UserContextMiddleware.resolve_event_context(update)
+        if context.user is not None:
+            return context.user.id
+        if context.chat is not None:
+            return context.chat.id
+        return update.update_id
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            key = self._shard(update)
+            pending = self._active.get(key)
+            if pending is not None:
+                # Пользователя уже обрабатывает другой воркер: он возьмёт это обновление следом
+                pending.append(update)
+                continue
+            pending = self._active[key] = deque()
+            try:
+                while True:
+                    await self._process(update)
+                    if not pending:
+                        break
+                    update = pending.popleft()
+            finally:
+                del self._active[key]
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update, **self.workflow_data)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.exception(f"WEBHOOK: ошибка обработки обновления {update.update_id}: {e}")
+        finally:
+            self._capacity.release()
+            self._queue.task_done()
+
+
+class WebhookHandler:
+    """aiohttp-обработчик POST от Telegram: проверка секрета, разбор и постановка в пул."""
+
+    def __init__(self, pool: UpdatePool, bot: Bot, secret: str):
+        self.pool = pool
+        self.bot = bot
+        self.secret = secret
+
+    async def __call__(self, request: web.Request) -> web.Response:
+        # Сравнение за постоянное время: секрет не подбирается по времени ответа
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), self.secret):
+            logger.warning(f"WEBHOOK: запрос без верного секрета от {request.remote}")
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': self.bot})
+        except (ValueError, ValidationError) as e:
+            logger.warning(f"WEBHOOK: некорректное обновление: {e}")
+            return web.Response(status=400)
+        await self.pool.submit(update)
+        return web.Response()
+
+
+def _install_stop_signals(stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: остановка по KeyboardInterrupt
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config: WebhookConfig, allowed_updates: Optional[List[str]] = None,
+                      stop: Optional[asyncio.Event] = None, set_webhook: bool = True, **workflow_data) -> UpdatePool:
+    """
+    Запускает вебхук-сервер и работает до сигнала остановки (или stop.set()).
+    workflow_data передаётся в обработчики так же, как в dp.start_polling.
+    """
+    secret = config.secret or secrets.token_urlsafe(32)
+    stop = stop or asyncio.Event()
+    _install_stop_signals(stop)
+
+    workflow_data = {'dispatcher': dp, 'bots': [bot], **dp.workflow_data, **workflow_data}
+    pool = UpdatePool(dp, bot, config.workers, config.queue_size, workflow_data)
+    app = web.Application()
+    app.router.add_post(config.path, WebhookHandler(pool, bot, secret))
+    runner = web.AppRunner(app, handle_signals=False, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, config.host, config.port)
+
+    await dp.emit_startup(bot=bot, **workflow_data)
+    pool.start()
+    await site.start()
+    if set_webhook:
+        await bot.set_webhook(f"{config.url}{config.path}", secret_token=secret, allowed_updates=allowed_updates,
+                              max_connections=config.max_connections)
+    logger.info(f"WEBHOOK: сервер слушает {config.host}:{config.port}{config.path}, воркеров: {config.workers}")
+
+    try:
+        await stop.wait()
+    finally:
+        started = time.monotonic()
+        # Вебхук в Telegram не снимается: обновления, пришедшие во время рестарта, дождутся нового процесса
+        await runner.cleanup()
+        await pool.close()
+        logger.info(f"WEBHOOK: остановлен, обработано {pool.processed} (ошибок {pool.failed}), "
+                    f"доработка заняла {time.monotonic() - started:.1f} c")
+        try:
+            await dp.emit_shutdown(bot=bot, **workflow_data)
+        finally:
+            await bot.session.close()
+    return pool